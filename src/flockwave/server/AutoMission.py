@@ -1,10 +1,6 @@
-import csv
-import simplekml
-from geopy.distance import distance
-from geopy.point import Point
 from .latlon2xy import geoToCart, cartToGeo
+from .planning.grid import rectangular_lawnmower
 import numpy as np
-import matplotlib.pyplot as plt
 
 
 class AutoSplitMission:
@@ -35,96 +31,15 @@ class AutoSplitMission:
         start_index: int,
     ) -> None:
 
-        center_lat = center_latitude
-        center_lon = center_longitude
-        # print("Number Of Dronessssssssss", num_of_drones)
-        num_rectangles = num_of_drones
-        grid_spacing = grid_space
-        meters_for_extended_lines = 250
-
-        full_width, full_height = coverage_area, coverage_area
-
-        rectangle_height = full_height / num_rectangles
-
-        center_point = Point(center_lat, center_lon)
-
-        west_edge = distance(meters=full_width / 2).destination(center_point, 270)
-        index = start_index
-        # print("center", center_lat, center_lon)
-
-        for i in range(num_rectangles):
-
-            top_offset = (
-                (i * rectangle_height) - (full_height / 2) + (rectangle_height / 2)
-            )
-
-            top_center = distance(meters=top_offset).destination(center_point, 0)
-            top = distance(meters=rectangle_height / 2).destination(top_center, 0)
-            bottom = distance(meters=rectangle_height / 2).destination(top_center, 180)
-
-            kml = simplekml.Kml()
-
-            csv_data = []
-            waypoint = []
-            current_lat = bottom.latitude
-            line_number = 0
-            line = kml.newlinestring()
-            line.altitudemode = simplekml.AltitudeMode.clamptoground
-            line.style.linestyle.color = simplekml.Color.black
-            line.style.linestyle.width = 2
-            waypoint_number = 1
-
-            while current_lat <= top.latitude:
-                line_number += 1
-                current_point = Point(current_lat, west_edge.longitude)
-                east_point = distance(meters=full_width).destination(current_point, 90)
-                if line_number % 2 == 1:
-                    csv_data.append((current_point.longitude, current_point.latitude))
-                    csv_data.append((east_point.longitude, east_point.latitude))
-
-                    line.coords.addcoordinates(
-                        [
-                            (current_point.longitude, current_point.latitude),
-                            (east_point.longitude, east_point.latitude),
-                        ]
-                    )
-                    kml.newpoint(
-                        name=f"{waypoint_number}",
-                        coords=[(current_point.longitude, current_point.latitude)],
-                    )
-                    waypoint_number += 1
-                    kml.newpoint(
-                        name=f"{waypoint_number}",
-                        coords=[(east_point.longitude, east_point.latitude)],
-                    )
-                    waypoint_number += 1
-                else:
-                    csv_data.append((east_point.longitude, east_point.latitude))
-                    csv_data.append((current_point.longitude, current_point.latitude))
-
-                    line.coords.addcoordinates(
-                        [
-                            (east_point.longitude, east_point.latitude),
-                            (current_point.longitude, current_point.latitude),
-                        ]
-                    )
-                    kml.newpoint(
-                        name=f"{waypoint_number}",
-                        coords=[(east_point.longitude, east_point.latitude)],
-                    )
-                    waypoint_number += 1
-                    kml.newpoint(
-                        name=f"{waypoint_number}",
-                        coords=[(current_point.longitude, current_point.latitude)],
-                    )
-                    waypoint_number += 1
-                current_lat = (
-                    distance(meters=grid_spacing).destination(current_point, 0).latitude
-                )
-
-            index += 1
-            self.waypoints.append(csv_data)
-        return self.waypoints
+        paths = rectangular_lawnmower(
+            (center_latitude, center_longitude),
+            coverage_area,
+            coverage_area,
+            grid_space,
+            num_of_drones,
+        )
+        self.waypoints.extend(paths)
+        return paths
 
     def GroupSplitting(
         self, center_lat_lons, num_of_drones, grid_spacing, coverage_area
@@ -5,7 +5,6 @@ from geopy.point import Point
 from geopy.point import Point
 from .latlon2xy import geoToCart, cartToGeo
 import numpy as np
-import matplotlib.pyplot as plt
 
 
 class SpecificSplitMission():
@@ -1,7 +1,6 @@
 import csv
-import simplekml
-from geopy.distance import distance
-from geopy.point import Point
+from flockwave.server.planning import path_to_kml
+from flockwave.server.planning.grid import rectangular_lawnmower
 
 
 def CreateGridsForSpecifiedAreaAndSpecifiedDrones(
@@ -12,118 +11,25 @@ def CreateGridsForSpecifiedAreaAndSpecifiedDrones(
     coverage_area: int,
     start_index: int,
 ) -> None:
-    center_lat = center_latitude
-    center_lon = center_longitude
-
-    num_rectangles = num_of_drones
-    grid_spacing = grid_space
     meters_for_extended_lines = 250
 
-    full_width, full_height = coverage_area, coverage_area
-
-    rectangle_height = full_height / num_rectangles
-
-    center_point = Point(center_lat, center_lon)
-
-    west_edge = distance(meters=full_width / 2).destination(center_point, 270)
-    index = start_index
-
-    for i in range(num_rectangles):
-        top_offset = (i * rectangle_height) - (full_height / 2) + (rectangle_height / 2)
-
-        top_center = distance(meters=top_offset).destination(center_point, 0)
-        top = distance(meters=rectangle_height / 2).destination(top_center, 0)
-        bottom = distance(meters=rectangle_height / 2).destination(top_center, 180)
-
-        kml = simplekml.Kml()
-
-        csv_data = []
-
-        current_lat = bottom.latitude
-        line_number = 0
-        line = kml.newlinestring()
-        line.altitudemode = simplekml.AltitudeMode.clamptoground
-        line.style.linestyle.color = simplekml.Color.black
-        line.style.linestyle.width = 2
-        waypoint_number = 1
-
-        while current_lat <= top.latitude:
-            line_number += 1
-            current_point = Point(current_lat, west_edge.longitude)
-            east_point = distance(meters=full_width).destination(current_point, 90)
-            if line_number % 2 == 1:
-                csv_data.append((current_point.latitude, current_point.longitude))
-                csv_data.append((east_point.latitude, east_point.longitude))
-
-                line.coords.addcoordinates(
-                    [
-                        (current_point.longitude, current_point.latitude),
-                        (east_point.longitude, east_point.latitude),
-                    ]
-                )
-                kml.newpoint(
-                    name=f"{waypoint_number}",
-                    coords=[(current_point.longitude, current_point.latitude)],
-                )
-                waypoint_number += 1
-                kml.newpoint(
-                    name=f"{waypoint_number}",
-                    coords=[(east_point.longitude, east_point.latitude)],
-                )
-                waypoint_number += 1
-            else:
-                csv_data.append((east_point.latitude, east_point.longitude))
-                csv_data.append((current_point.latitude, current_point.longitude))
-
-                line.coords.addcoordinates(
-                    [
-                        (east_point.longitude, east_point.latitude),
-                        (current_point.longitude, current_point.latitude),
-                    ]
-                )
-                kml.newpoint(
-                    name=f"{waypoint_number}",
-                    coords=[(east_point.longitude, east_point.latitude)],
-                )
-                waypoint_number += 1
-                kml.newpoint(
-                    name=f"{waypoint_number}",
-                    coords=[(current_point.longitude, current_point.latitude)],
-                )
-                waypoint_number += 1
-
-            if line_number % 2 == 1:
-                point_135 = distance(meters=meters_for_extended_lines).destination(
-                    east_point, 135
-                )
-                csv_data.append((point_135.latitude, point_135.longitude))
-                line.coords.addcoordinates([(point_135.longitude, point_135.latitude)])
-                kml.newpoint(
-                    name=f"{waypoint_number}",
-                    coords=[(point_135.longitude, point_135.latitude)],
-                )
-                waypoint_number += 1
-            else:
-                point_225 = distance(meters=meters_for_extended_lines).destination(
-                    current_point, 225
-                )
-                csv_data.append((point_225.latitude, point_225.longitude))
-                line.coords.addcoordinates([(point_225.longitude, point_225.latitude)])
-                kml.newpoint(
-                    name=f"{waypoint_number}",
-                    coords=[(point_225.longitude, point_225.latitude)],
-                )
-                waypoint_number += 1
-
-            current_lat = (
-                distance(meters=grid_spacing).destination(current_point, 0).latitude
-            )
+    paths = rectangular_lawnmower(
+        (center_latitude, center_longitude),
+        coverage_area,
+        coverage_area,
+        grid_space,
+        num_of_drones,
+        turn_extension=meters_for_extended_lines,
+    )
 
+    for index, path in enumerate(paths, start=start_index):
         kml_filename = f"search-drone-{index}.kml"
-        kml.save(
+        with open(
             "C:/Users/vshar/OneDrive/Documents/fullstack/skybrush-server/src/flockwave/server/VTOL/kmls/"
-            + kml_filename
-        )
+            + kml_filename,
+            "w",
+        ) as file:
+            file.write(path_to_kml(path, name=f"search-drone-{index}"))
 
         csv_filename = f"search-drone-{index}.csv"
         with open(
@@ -133,8 +39,7 @@ def CreateGridsForSpecifiedAreaAndSpecifiedDrones(
             newline="",
         ) as file:
             writer = csv.writer(file)
-            writer.writerows(csv_data)
-        index += 1
+            writer.writerows(path[:, ::-1].tolist())
 
 
 def GroupSplitting(
@@ -1,7 +1,6 @@
 import math
 import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
 from scipy import interpolate
 import simplekml
 import xml.etree.ElementTree as ET
@@ -1,4 +1,5 @@
 from flockwave.server.ext.mavlink.automission import AutoMissionManager
+from flockwave.server.ext.mavlink.mission_upload import FleetMissionUploader
 from flockwave.server.ext.mavlink.enums import MAVCommand
 from flockwave.gps.vectors import GPSCoordinate
 from flockwave.server.model import UAV
@@ -11,6 +12,12 @@ async def add_mavlink_mission1(
 ) -> None:
     manager = AutoMissionManager.for_uav(uav)
     await manager.clear_mission()
+    await manager.set_automission_areas(create_mavlink_mission1(i, alt, rtl_height))
+
+
+def create_mavlink_mission1(
+    i: int, alt: int, rtl_height: int
+) -> List[tuple[MAVCommand, dict[str, int]]]:
     search_file = "C:/Users/vshar/OneDrive/Documents/fullstack/skybrush-server/src/flockwave/server/VTOL/csvs/search-drone-"
     flag = 0
     points_coordinate = [
@@ -118,8 +125,7 @@ async def add_mavlink_mission1(
                 prev_lon = lon
             flag = 1
             count += 1
-    points_mission = convert_to_missioncmd(points_coordinate)
-    await manager.set_automission_areas(points_mission)
+    return convert_to_missioncmd(points_coordinate)
 
 
 async def add_mavlink_mission(i: int, alt: int, uav: UAV, initial_takeoff: int) -> None:
@@ -221,14 +227,21 @@ async def main(uavs: dict[str, UAV]) -> bool:
     from ..socket.globalVariable import getAlts,vtol_rtl_height
 
     alts = getAlts()
+    missions = {}
     for i, uav in enumerate(uavs):
         # initial_takeoff = vtol_takeoff_height[int(uav)]
         alt = alts[uav]
         rtl_height = vtol_rtl_height[int(uav)]
         vehicle = uavs[uav]
         if vehicle:
-            await add_mavlink_mission1(i + 1, alt, vehicle, rtl_height)
+            missions[vehicle] = create_mavlink_mission1(i + 1, alt, rtl_height)
             # initial_takeoff += 5
         # await add_mavlink_mission(index, alt, uav, altitudes[i])
+
+    # Upload the missions to all the vehicles concurrently
+    results = await FleetMissionUploader().run(missions)
+    failed = sorted(uav_id for uav_id, error in results.items() if error)
+    if failed:
+        raise RuntimeError(f"Mission upload failed for: {', '.join(failed)}")
     print("Uploaded")
     return True
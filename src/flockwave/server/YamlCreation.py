@@ -1,6 +1,9 @@
+import hashlib
 import math
-from scipy import interpolate
-import os, sys
+import numpy as np
+import os
+
+from threading import Lock
 
 
 class FenceToYAML:
@@ -19,7 +22,7 @@ class FenceToYAML:
         self.origin_shift_m = origin_shift_m
         self.origin = None
         self.obstacles_list = []
-        print(fence_coordinates)
+        self._cart_frame = None
 
     # ----------------------------------------------------
     # Compute destination lat/lon given distance and bearing
@@ -43,27 +46,58 @@ class FenceToYAML:
         return (math.degrees(lat2), math.degrees(lon2))
 
     # ----------------------------------------------------
-    # Convert geolocation to cartesian x, y
+    # Interpolation knots of the cartesian frame around the origin
     # ----------------------------------------------------
-    def geoToCart(self, geoLocation):
-        endDistance = self.endDistance
+    def get_cart_frame(self):
+        """Returns the latitudes, longitudes and cartesian coordinates that
+        the piecewise linear mapping between geodetic and cartesian
+        coordinates interpolates between. Computed once per origin.
+        """
         origin = self.origin
+        if self._cart_frame is None or self._cart_frame[0] != origin:
+            endDistance = self.endDistance
+            rEndDistance = math.sqrt(2 * (endDistance**2))
+            bearing = 45
 
-        rEndDistance = math.sqrt(2 * (endDistance**2))
-        bearing = 45
+            lEnd = self.destination_location(
+                origin[0], origin[1], rEndDistance, 180 + bearing
+            )
+            rEnd = self.destination_location(
+                origin[0], origin[1], rEndDistance, bearing
+            )
 
-        lEnd = self.destination_location(
-            origin[0], origin[1], rEndDistance, 180 + bearing
-        )
-        rEnd = self.destination_location(origin[0], origin[1], rEndDistance, bearing)
+            cart = np.array([-endDistance, 0, endDistance], dtype=np.float64)
+            lats = np.array([lEnd[0], origin[0], rEnd[0]], dtype=np.float64)
+            lons = np.array([lEnd[1], origin[1], rEnd[1]], dtype=np.float64)
+            self._cart_frame = (origin, lats, lons, cart)
 
-        x_cart, y_cart = [-endDistance, 0, endDistance], [-endDistance, 0, endDistance]
-        x_lon, y_lat = [lEnd[1], origin[1], rEnd[1]], [lEnd[0], origin[0], rEnd[0]]
+        return self._cart_frame[1:]
 
-        f_lat = interpolate.interp1d(y_lat, y_cart)
-        f_lon = interpolate.interp1d(x_lon, x_cart)
+    # ----------------------------------------------------
+    # Convert geolocations to cartesian x, y
+    # ----------------------------------------------------
+    def geo_to_cart_array(self, points):
+        """Converts an array of latitude-longitude pairs to an array of
+        cartesian x-y pairs in one go.
+
+        Raises:
+            ValueError: if a point lies outside the area covered by the frame
+        """
+        lats, lons, cart = self.get_cart_frame()
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        lat, lon = points[:, 0], points[:, 1]
+        if (
+            np.any(lat < lats[0])
+            or np.any(lat > lats[-1])
+            or np.any(lon < lons[0])
+            or np.any(lon > lons[-1])
+        ):
+            raise ValueError("A value in x_new is out of the interpolation range.")
+
+        return np.column_stack((np.interp(lon, lons, cart), np.interp(lat, lats, cart)))
 
-        y, x = f_lat(geoLocation[0]), f_lon(geoLocation[1])
+    def geoToCart(self, geoLocation):
+        x, y = self.geo_to_cart_array([geoLocation])[0]
         return float(x), float(y)
 
     # ----------------------------------------------------
@@ -72,30 +106,21 @@ class FenceToYAML:
     def generate_outer_simple(self, inner_polygon, offset_m=None):
         if offset_m is None:
             offset_m = self.buffer_distance
-        lat_c = sum(p[0] for p in inner_polygon) / len(inner_polygon)
-        lon_c = sum(p[1] for p in inner_polygon) / len(inner_polygon)
-        outer_polygon = []
-        for lat, lon in inner_polygon:
-            d_lat = lat - lat_c
-            d_lon = lon - lon_c
-            length = math.sqrt(d_lat**2 + d_lon**2)
-            if length == 0:
-                length = 1
-            scale = offset_m / 111320
-            new_lat = lat + (d_lat / length) * scale
-            new_lon = lon + (d_lon / length) * scale
-            outer_polygon.append([new_lat, new_lon])
-        return outer_polygon
+        points = np.asarray(inner_polygon, dtype=np.float64).reshape(-1, 2)
+        offsets = points - points.mean(axis=0)
+        length = np.hypot(offsets[:, 0], offsets[:, 1])
+        length[length == 0] = 1
+        scale = offset_m / 111320
+        return (points + offsets / length[:, None] * scale).tolist()
 
     # ----------------------------------------------------
     # Compute origin shifted southwest
     # ----------------------------------------------------
     def compute_origin(self):
         outer_index = self.labels.index("outer")
-        outer_fence = self.fence_coordinates[outer_index]
+        outer_fence = np.asarray(self.fence_coordinates[outer_index], dtype=np.float64)
 
-        min_lat = min(lat for lat, _ in outer_fence)
-        min_lon = min(lon for _, lon in outer_fence)
+        min_lat, min_lon = (float(value) for value in outer_fence.min(axis=0))
 
         lat_shift = self.origin_shift_m / 111320
         lon_shift = self.origin_shift_m / (111320 * math.cos(math.radians(min_lat)))
@@ -107,69 +132,53 @@ class FenceToYAML:
     # Convert polygon points to XY
     # ----------------------------------------------------
     def convert_to_xy_array(self, name, points, scale_factor=2):
-        xy_points = []
-        for lat, lon in points:
-            x, y = self.geoToCart((lat, lon))
-            xy_points.append([x / scale_factor, y / scale_factor])
-        # print(f"\n{name} XY Points:")
-        # print(xy_points)
-        return xy_points
+        return self.geo_to_cart_array(points) / scale_factor
 
     # ----------------------------------------------------
     # Process all fences and generate obstacles list
     # ----------------------------------------------------
-    def process_fences(self):
-        print("Outerrrrrrrrrrrr")
+    def process_fences(self, scale_factor=2):
         if self.origin is None:
             self.compute_origin()
 
         outer_index = self.labels.index("outer")
         outer_fence = self.fence_coordinates[outer_index]
         outer_polygon = self.generate_outer_simple(outer_fence)
-        print("Outer Polygon", outer_polygon)
         inner_polygon = outer_fence
-        all_points = inner_polygon + outer_polygon
-
-        # Define boundaries
-        top_boundary = [
-            all_points[0],
-            all_points[len(inner_polygon)],
-            all_points[len(inner_polygon) + 1],
-            all_points[1],
-        ]
-        right_boundary = [
-            all_points[1],
-            all_points[len(inner_polygon) + 1],
-            all_points[len(inner_polygon) + 2],
-            all_points[2],
-        ]
-        bottom_boundary = [
-            all_points[2],
-            all_points[len(inner_polygon) + 2],
-            all_points[len(inner_polygon) + 3],
-            all_points[3],
-        ]
-        left_boundary = [
-            all_points[3],
-            all_points[len(inner_polygon) + 3],
-            all_points[len(inner_polygon)],
-            all_points[0],
-        ]
-        print(top_boundary, right_boundary, bottom_boundary, left_boundary)
-        # Convert boundaries to XY
-        self.obstacles_list = [
-            self.convert_to_xy_array("Right Boundary", right_boundary),
-            self.convert_to_xy_array("Bottom Boundary", bottom_boundary),
-            self.convert_to_xy_array("Left Boundary", left_boundary),
-            self.convert_to_xy_array("Top Boundary", top_boundary),
-        ]
-
-        # Convert inner fences
+        n = len(inner_polygon)
+
+        # Boundaries between the fence and its outward buffer, in the order
+        # right, bottom, left, top; indices refer to the inner polygon
+        # followed by the outer polygon
+        boundary_indices = np.array(
+            [
+                [1, n + 1, n + 2, 2],
+                [2, n + 2, n + 3, 3],
+                [3, n + 3, n, 0],
+                [0, n, n + 1, 1],
+            ]
+        )
+        all_points = np.concatenate(
+            (
+                np.asarray(inner_polygon, dtype=np.float64).reshape(-1, 2),
+                np.asarray(outer_polygon, dtype=np.float64).reshape(-1, 2),
+            )
+        )
+        rings = list(all_points[boundary_indices])
+
+        # Inner fences
         for i, label in enumerate(self.labels):
             if label != "outer":
-                name = f"Fence_{label}_{i}"
-                inner_xy = self.convert_to_xy_array(name, self.fence_coordinates[i])
-                self.obstacles_list.append(inner_xy)
+                rings.append(
+                    np.asarray(self.fence_coordinates[i], dtype=np.float64).reshape(
+                        -1, 2
+                    )
+                )
+
+        # Convert all the rings to XY in one go
+        xy = self.convert_to_xy_array("Obstacles", np.concatenate(rings), scale_factor)
+        bounds = np.cumsum([len(ring) for ring in rings])[:-1]
+        self.obstacles_list = np.split(xy, bounds)
 
         return self.obstacles_list
 
@@ -177,20 +186,15 @@ class FenceToYAML:
     # Compute map size and shift to positive quadrant
     # ----------------------------------------------------
     def compute_size_and_shift(self, padding=1):
-        all_points = [p for boundary in self.obstacles_list for p in boundary]
-        xs = [p[0] for p in all_points]
-        ys = [p[1] for p in all_points]
-
-        min_x, max_x = min(xs), max(xs)
-        min_y, max_y = min(ys), max(ys)
+        all_points = np.concatenate(self.obstacles_list)
+        min_x, min_y = all_points.min(axis=0)
+        max_x, max_y = all_points.max(axis=0)
 
         size_x = int(round(max_x - min_x + padding))
         size_y = int(round(max_y - min_y + padding))
 
-        shifted_obstacles_list = []
-        for boundary in self.obstacles_list:
-            shifted_boundary = [[x - min_x / 2, y - min_y / 2] for x, y in boundary]
-            shifted_obstacles_list.append(shifted_boundary)
+        shift = np.array([min_x / 2, min_y / 2])
+        shifted_obstacles_list = [boundary - shift for boundary in self.obstacles_list]
 
         return size_x, size_y, shifted_obstacles_list
 
@@ -236,7 +240,9 @@ class FenceToYAML:
         yaml_lines.append("\nobstacles:")
 
         for boundary in shifted_obstacles_list:
-            formatted_points = ",".join([f"[{x:.2f},{y:.2f}]" for x, y in boundary])
+            formatted_points = ",".join(
+                [f"[{x:.2f},{y:.2f}]" for x, y in boundary.tolist()]
+            )
             yaml_lines.append(f"  - [{formatted_points}]")
 
         yaml_lines.append(f"origin: {self.origin}")
@@ -248,6 +254,60 @@ class FenceToYAML:
         return self.origin, yaml_text
 
 
+def fence_geometry_hash(fence_coordinates, labels):
+    """Returns a hash of the geometry and the labels of the given fences that
+    changes whenever the YAML generated from them would change.
+    """
+    digest = hashlib.sha1()
+    for ring, label in zip(fence_coordinates, labels):
+        ring = np.ascontiguousarray(ring, dtype=np.float64).reshape(-1, 2)
+        digest.update(len(ring).to_bytes(8, "little"))
+        digest.update(ring.tobytes())
+        digest.update(repr(label).encode("utf-8"))
+    return digest.hexdigest()
+
+
+_cached_yaml = None
+_cached_yaml_key = None
+_cached_yaml_lock = Lock()
+
+
+def fence_to_yaml(fence_coordinates, labels, convert=None):
+    """Converts the given fences to the obstacle YAML of the simulator,
+    reusing the result of the previous call if the geometry of the fences did
+    not change. This way re-sending an unchanged fence costs only a hash.
+
+    Parameters:
+        fence_coordinates: the fences, as lists of latitude-longitude pairs
+        labels: the labels of the fences; the outer fence is labelled as
+            ``"outer"``
+        convert: function to call with the fences and the labels to perform
+            the conversion when the result is not cached; defaults to
+            converting in the current process
+
+    Returns:
+        the origin of the cartesian frame and the YAML text
+    """
+    global _cached_yaml, _cached_yaml_key
+
+    key = fence_geometry_hash(fence_coordinates, labels)
+    with _cached_yaml_lock:
+        if _cached_yaml is not None and _cached_yaml_key == key:
+            return _cached_yaml
+
+    if convert is None:
+        fence_yaml = FenceToYAML(fence_coordinates=fence_coordinates, labels=labels)
+        fence_yaml.process_fences()
+        result = fence_yaml.generate_yaml()
+    else:
+        result = convert(fence_coordinates, labels)
+
+    with _cached_yaml_lock:
+        _cached_yaml, _cached_yaml_key = result, key
+
+    return result
+
+
 # fence_yaml = FenceToYAML(
 #     fence_coordinates=[
 #         [
@@ -2,9 +2,10 @@
 
 from appdirs import AppDirs
 from collections import defaultdict
+from functools import partial
 from inspect import isawaitable, isasyncgen
 from os import environ
-from trio import BrokenResourceError, move_on_after, sleep
+from trio import BrokenResourceError, move_on_after, sleep, to_thread
 from typing import (
     Any,
     Iterable,
@@ -57,6 +58,7 @@ from .registries import (
 from .version import __version__ as server_version
 from .swarm import *
 from flockwave.server.ext.mavlink.automission import AutoMissionManager
+from flockwave.server.ext.mavlink.mission_upload import FleetMissionUploader
 from flockwave.server.ext.mavlink.enums import MAVCommand
 from typing import List
 import subprocess
@@ -697,6 +699,72 @@ class SkybrushServer(DaemonApp):
         except ValueError:
             return None  # or raise Exception, or use a default
 
+    def _create_auto_mission(
+        self, missions: list[dict[str, Any]]
+    ) -> List[tuple[MAVCommand, dict[str, int]]]:
+        """Converts the waypoints of a mission received from a client into
+        mission items that can be uploaded to a MAVLink UAV.
+
+        Raises:
+            RuntimeError: if the mission contains an unknown command
+        """
+        points_coordinate = []
+        for index, mission in enumerate(missions):
+            command = self.get_mav_command(mission["commandId"])
+            if command is None:
+                raise RuntimeError("No such Command")
+            if index == 0 or command == MAVCommand.NAV_VTOL_TAKEOFF:
+                points_coordinate.append(
+                    [
+                        GPSCoordinate(
+                            mission["lat"], mission["long"], 0, mission["alt"], 0
+                        ),
+                        command,
+                    ]
+                )
+            points_coordinate.append(
+                [
+                    GPSCoordinate(mission["lat"], mission["long"], 0, mission["alt"], 0),
+                    command,
+                ]
+            )
+        return self.convert_to_missioncmd(points_coordinate)
+
+    def _upload_missions_to_fleet(
+        self,
+        missions_by_uav_id: dict[str, list[dict[str, Any]]],
+        response: FlockwaveResponse,
+        sender: Client,
+    ) -> FlockwaveResponse:
+        """Starts uploading missions to multiple UAVs concurrently and adds the
+        receipt of the upload operation to the given response.
+
+        The client is notified about the progress of the uploads and the
+        outcome of the upload of each UAV in ASYNC-RESP notifications that
+        refer to the receipt.
+        """
+        missions = {}
+        for uav_id, mission in missions_by_uav_id.items():
+            uav = self.find_uav_by_id(uav_id, response)
+            if uav is None:
+                continue
+            try:
+                missions[uav] = self._create_auto_mission(mission)
+            except RuntimeError as ex:
+                response.add_error(uav_id, ex)
+
+        uploader = FleetMissionUploader()
+        cmd_manager = self.command_execution_manager
+        receipt = cmd_manager.new(client_to_notify=sender.id)
+        response.body["receipt"] = receipt.id
+
+        self.run_in_background(uploader.run, missions)
+        response.when_sent(
+            cmd_manager.mark_as_clients_notified, receipt.id, uploader.updates()
+        )
+
+        return response
+
     async def upload_mission(
         self, message: FlockwaveMessage, sender: Client, *, id_property: str = "id"
     ) -> FlockwaveMessage:
@@ -706,6 +774,13 @@ class SkybrushServer(DaemonApp):
         parameters = dict(message.body)
         uav: Optional[UAV] = None
         error: Optional[str] = None
+
+        if "missions" in parameters:
+            # Upload to multiple UAVs at once, tracked as a single operation
+            return self._upload_missions_to_fleet(
+                parameters.pop("missions"), response, sender
+            )
+
         # AutoMissionManager
         uav_id = parameters.pop("uav_id")
         result = False
@@ -714,32 +789,10 @@ class SkybrushServer(DaemonApp):
             if uav is None:
                 raise RuntimeError("no such UAV")
             missions = parameters.pop("mission")
+            points_mission = self._create_auto_mission(missions)
+            # No need to clear the mission first; the upload replaces it, or
+            # is skipped if the drone has the same mission already
             manager = AutoMissionManager.for_uav(uav)
-            await manager.clear_mission()
-            points_coordinate = []
-            for index, mission in enumerate(missions):
-                print(mission)
-                command = self.get_mav_command(mission["commandId"])
-                if command is None:
-                    raise RuntimeError("No such Command")
-                if index == 0 or command == MAVCommand.NAV_VTOL_TAKEOFF:
-                    points_coordinate.append(
-                        [
-                            GPSCoordinate(
-                                mission["lat"], mission["long"], 0, mission["alt"], 0
-                            ),
-                            command,
-                        ]
-                    )
-                points_coordinate.append(
-                    [
-                        GPSCoordinate(
-                            mission["lat"], mission["long"], 0, mission["alt"], 0
-                        ),
-                        command,
-                    ]
-                )
-            points_mission = self.convert_to_missioncmd(points_coordinate)
             await manager.upload_AutoMission(points_mission)
             result = True
         except RuntimeError as ex:
@@ -1246,6 +1299,33 @@ class SkybrushServer(DaemonApp):
                 if uav:
                     result = await uav.driver._skip_waypoint(uav, skip)
 
+        if msg == "streammission":
+            # Paths of the latest plan that do not fit into the mission storage
+            # of the autopilot are fed to the UAVs a window of waypoints at a
+            # time instead of being uploaded in one go
+            from .planning import plan_store
+
+            plan = plan_store.latest
+            window = int(parameters.pop("window", 100))
+            paths = dict(zip(plan.uav_ids, plan.paths)) if plan else {}
+            result = []
+            for id in selectedIds:
+                uav = self.find_uav_by_id(id)
+                path = paths.get(str(id))
+                if path is None or len(path) == 0:
+                    # Planner could not generate a path for this UAV
+                    continue
+                if uav and hasattr(uav, "stream_mission"):
+                    self.run_in_background(
+                        partial(
+                            uav.stream_mission,
+                            path,
+                            plan.altitude or 0.0,
+                            window_size=window,
+                        )
+                    )
+                    result.append(id)
+
         if msg == "download":
             from .socket.globalVariable import (
                 update_mission,
@@ -1369,6 +1449,187 @@ class SkybrushServer(DaemonApp):
             global outer_boundary
             return outer_boundary
 
+        def set_inner_fences(fences):
+            global inner_fences
+            inner_fences = fences
+
+        def get_inner_fences():
+            return globals().get("inner_fences", [])
+
+        def get_router():
+            # Obstacle-aware router of the transit legs; None if the fence has
+            # no no-fly zones. The router is cached per fence, so this is
+            # cheap after the fence was received.
+            from .planning.routing import get_transit_router
+
+            obstacles = get_inner_fences()
+            if not obstacles:
+                return None
+            boundary = [(lon, lat) for lat, lon in get_outer_boundary() or ()]
+            return get_transit_router(obstacles, boundary or None)
+
+        def publish_plan(
+            kind, paths, uav_ids=None, altitude=0.0, areas=(), swath_width=None
+        ):
+            # Keep the plan in memory so the plan_export extension can
+            # generate KML / CSV files from it lazily, on demand
+            from .planning import plan_store
+            from .planning.coverage import analyze_coverage
+            from .planning.simplify import encode_path, simplify_paths
+            from .planning.timing import estimate_mission_time
+
+            # Collinear and near-duplicate waypoints are removed within a
+            # tolerance that the client may set per plan, in metres; zero
+            # turns the simplification off
+            tolerance = float(parameters.get("simplify", 1.0) or 0.0)
+            if tolerance > 0:
+                simplified = simplify_paths(paths, tolerance)
+                paths = simplified.paths
+                response.body["simplification"] = simplified.json()
+
+            # Connectors between strips and the legs from and to the home
+            # positions are routed around the no-fly zones of the fence
+            router = get_router()
+            if router is not None:
+                homes = get_uav_positions(uav_ids) if uav_ids else []
+                paths = [
+                    router.route_transit(
+                        router.route_path(path),
+                        homes[index] if index < len(homes) else None,
+                    )
+                    for index, path in enumerate(paths)
+                ]
+
+            plan = plan_store.add(
+                kind,
+                paths,
+                uav_ids,
+                areas=areas,
+                swath_width=swath_width,
+                altitude=altitude,
+            )
+            response.body["plan"] = plan.id
+
+            # How much of the search area the camera footprints of the paths
+            # actually cover, and where the gaps are
+            if plan.areas and swath_width:
+                response.body["coverage"] = analyze_coverage(
+                    plan.paths, plan.areas, swath_width
+                ).json()
+
+            # Estimated flight time of each UAV, including the climb to the
+            # mission altitude and the transit from its current position
+            estimate = estimate_mission_time(
+                plan.paths,
+                homes=get_uav_positions(uav_ids) if uav_ids else None,
+                altitude=float(altitude or 0.0),
+            )
+            response.body["estimate"] = estimate.json()
+
+            # Delta-encoded paths are much shorter in JSON for dense paths
+            if parameters.get("encoding") == "delta":
+                response.body["encoding"] = "delta"
+                return [encode_path(path) for path in plan.paths]
+            return [path.tolist() for path in plan.paths]
+
+        def get_uav_positions(uav_ids):
+            # Current longitude-latitude pairs of the given UAVs, or None for
+            # UAVs that are not known or have no position yet
+            positions = []
+            for uav_id in uav_ids:
+                uav = self.find_uav_by_id(str(uav_id))
+                position = uav.status.position if uav else None
+                positions.append(
+                    (position.lon, position.lat)
+                    if position is not None and (position.lat or position.lon)
+                    else None
+                )
+            return positions
+
+        def create_uav_orderer(uav_ids):
+            # Returns a function that reorders the UAVs of each group such that
+            # the total transit from their live positions to the entry points
+            # of the planned paths of the group is minimal, and the list that
+            # collects the transit distance saved in each group. Positions are
+            # taken here because the function is called from a worker thread
+            from .planning.assign import assign_paths
+
+            positions = dict(zip(uav_ids, get_uav_positions(uav_ids)))
+            savings = []
+
+            def order_uavs(paths, groups):
+                ordered, start = [], 0
+                for group in groups:
+                    assignment = assign_paths(
+                        paths[start : start + len(group)],
+                        [positions.get(uav_id) for uav_id in group],
+                    )
+                    order = assignment.order_uavs(group)
+                    if order is None:
+                        ordered.append(group)
+                    else:
+                        ordered.append(order)
+                        savings.append(assignment.saved)
+                    start += len(group)
+                return ordered
+
+            return order_uavs, savings
+
+        def reassign_path_of(uav_id):
+            # Hand over the unflown part of the path of a UAV that dropped out
+            # to the nearest remaining UAVs of the latest plan; only the new
+            # waypoint suffixes are sent back to the client
+            from .planning import plan_store
+            from .planning.replan import estimate_progress, reassign_remainder
+            from .planning.timing import FlightModel
+            from .socket.globalVariable import add_removed_uav_id, get_removed_uav_ids
+
+            uav_id = str(uav_id)
+            add_removed_uav_id(uav_id)
+            plan = plan_store.latest
+            uav_ids = plan.uav_ids[: plan.num_paths] if plan else []
+            if uav_id not in uav_ids:
+                return None
+
+            positions = get_uav_positions(uav_ids)
+            progress = [
+                estimate_progress(path, position) if position is not None else 0
+                for path, position in zip(plan.paths, positions)
+            ]
+            removed = get_removed_uav_ids()
+            reassignment = reassign_remainder(
+                plan.paths,
+                uav_ids.index(uav_id),
+                progress,
+                positions=positions,
+                model=FlightModel(),
+                excluded=[
+                    index
+                    for index, other_id in enumerate(uav_ids)
+                    if other_id in removed
+                ],
+            )
+            if reassignment.is_empty:
+                return None
+
+            updated = plan_store.add(
+                plan.kind,
+                reassignment.apply(plan.paths),
+                plan.uav_ids,
+                areas=plan.areas,
+                swath_width=plan.swath_width,
+                altitude=plan.altitude,
+            )
+            response.body["plan"] = updated.id
+            return {
+                uav_ids[index]: {
+                    "start": len(plan.paths[index]),
+                    "waypoints": suffix.tolist(),
+                    "eta": reassignment.completion_times[index],
+                }
+                for index, suffix in reassignment.suffixes.items()
+            }
+
         msg = parameters["message"].lower()
         # print("mgs", msg)
         if msg == "master":
@@ -1379,7 +1640,11 @@ class SkybrushServer(DaemonApp):
             result = master(0)
 
         if msg == "coverage":
+            from .planning.progress import search_progress
+
             result = get_coverage_time()
+            if search_progress.active:
+                response.body["progress"] = search_progress.json()
 
         if msg == "start":
             result = start_socket()
@@ -1430,10 +1695,7 @@ class SkybrushServer(DaemonApp):
             result = disperse_socket()
 
         if msg == "search":
-            from .geofence_validator import (
-                Fence,
-                SearchAreaValidator,
-            )
+            from .geofence_validator import SearchAreaValidator, get_fence
 
             stop_socket()
             await sleep(2)
@@ -1447,18 +1709,31 @@ class SkybrushServer(DaemonApp):
             points = [[float(lon), float(lat)] for lon, lat in points]
             for num in points:
                 num.reverse()
-            fence = Fence(get_outer_boundary(), label="outer")
+            fence = get_fence(get_outer_boundary(), label="outer")
             # validator = FenceValidator(get_outer_boundary(), label="outer")
             search_validator = SearchAreaValidator(fence)
-            if search_validator.are_points_with_coverage_inside(points, coverage):
+            check = search_validator.check_coverage(points, coverage)
+            if check.all_inside:
+                from .planning.coverage import square_area
+                from .swarm import compute_camera_footprint
+
+                if len(points) == 1:
+                    areas = [square_area(points[0], coverage)]
+                else:
+                    areas = [[(lon, lat) for lat, lon in points]]
+                swath, _ = compute_camera_footprint(camAlt, zoomLevel)
+
                 # if validator.are_points_all_inside(points):
-                path, time_min = search_socket(
-                    points, camAlt, overlap, zoomLevel, coverage, ids
+                path, _ = await to_thread.run_sync(
+                    search_socket, points, camAlt, overlap, zoomLevel, coverage, ids
                 )
                 print("path", len(path))
-                result = path
-                response.body["time"] = time_min
+                result = publish_plan("search", path, ids, camAlt, areas, swath)
+                response.body["time"] = round(
+                    response.body["estimate"]["makespan"] / 60, 2
+                )
             else:
+                response.body["violation"] = check.max_violation
                 result = False
 
         if msg == "aggregate":
@@ -1500,7 +1775,7 @@ class SkybrushServer(DaemonApp):
             result = specific_bot_goal_socket(parameters["ids"], parameters["goal"])
 
         if msg == "goal":
-            from .geofence_validator import Fence, GoalFenceValidator
+            from .geofence_validator import GoalFenceValidator, get_fence
 
             stop_socket()
             await sleep(2)
@@ -1510,7 +1785,7 @@ class SkybrushServer(DaemonApp):
             for num in goal_num:
                 num.reverse()
 
-            fence = Fence(get_outer_boundary(), label="outer")
+            fence = get_fence(get_outer_boundary(), label="outer")
             goal_validator = GoalFenceValidator(fence)
             if goal_validator.are_points_all_inside(goal_num):
                 print(parameters["ids"], len(parameters["ids"]), "!!!")
@@ -1533,6 +1808,9 @@ class SkybrushServer(DaemonApp):
             await sleep(2)
 
             result = mavlink_remove(uav)
+            reassigned = reassign_path_of(uav)
+            if reassigned:
+                response.body["reassigned"] = reassigned
             result = True
 
         if msg == "add_link":
@@ -1542,11 +1820,17 @@ class SkybrushServer(DaemonApp):
             stop_socket()
             await sleep(2)
 
+            from .socket.globalVariable import discard_removed_uav_id
+
+            discard_removed_uav_id(uav)
             result = mavlink_add(uav)
 
         if msg == "remove_uav":
-
-            result = bot_remove(int(parameters.get("ids")[0]))
+            removed_uav = int(parameters.get("ids")[0])
+            result = bot_remove(removed_uav)
+            reassigned = reassign_path_of(removed_uav)
+            if reassigned:
+                response.body["reassigned"] = reassigned
 
         if msg == "landing":
             stop_socket()
@@ -1555,7 +1839,7 @@ class SkybrushServer(DaemonApp):
             result = land_socket()
 
         if msg == "navigate":
-            from .geofence_validator import Fence, SearchAreaValidator
+            from .geofence_validator import SearchAreaValidator, get_fence
 
             stop_socket()
             await sleep(2)
@@ -1568,15 +1852,27 @@ class SkybrushServer(DaemonApp):
             nav_coords = [
                 [float(lat), float(lon)] for lon, lat in (parameters.get("coords"))
             ]
-            fence = Fence(get_outer_boundary(), label="outer")
+            fence = get_fence(get_outer_boundary(), label="outer")
             search_validator = SearchAreaValidator(fence)
-            if search_validator.are_points_with_coverage_inside(nav_coords, coverage):
-
-                path = navigate(
-                    center_latlon, camAlt, overlap, zoomLevel, coverage, ids
+            check = search_validator.check_coverage(nav_coords, coverage)
+            if check.all_inside:
+                from .planning.coverage import square_area
+                from .swarm import compute_camera_footprint
+
+                swath, _ = compute_camera_footprint(camAlt, zoomLevel)
+                path = await to_thread.run_sync(
+                    navigate, center_latlon, camAlt, overlap, zoomLevel, coverage, ids
+                )
+                result = publish_plan(
+                    "navigate",
+                    path,
+                    ids,
+                    camAlt,
+                    [square_area(nav_coords[0], coverage)],
+                    swath,
                 )
-                result = path
             else:
+                response.body["violation"] = check.max_violation
                 result = False
         if msg == "loiter":
             stop_socket()
@@ -1609,7 +1905,7 @@ class SkybrushServer(DaemonApp):
             result = await landing_main(landingMission, len(selectedIds), uavs)
 
         if msg == "groupsplit":
-            from .geofence_validator import Fence, SearchAreaValidator
+            from .geofence_validator import SearchAreaValidator, get_fence
 
             stop_socket()
             await sleep(2)
@@ -1642,21 +1938,42 @@ class SkybrushServer(DaemonApp):
             print("clean_points", clean_points)
             # validator = FenceValidator(get_outer_boundary(), label="outer")
             # if validator.are_points_all_inside(clean_points):
-            fence = Fence(get_outer_boundary(), label="outer")
+            fence = get_fence(get_outer_boundary(), label="outer")
             search_validator = SearchAreaValidator(fence)
-            if search_validator.are_points_with_coverage_inside(clean_points, coverage):
-                from .swarm import compute_grid_spacing
+            check = search_validator.check_coverage(clean_points, coverage)
+            if check.all_inside:
+                from .planning.coverage import square_area
+                from .swarm import compute_camera_footprint, compute_grid_spacing
 
                 gridSpacing = compute_grid_spacing(camAlt, zoomLevel, overlap)
                 print("gridSpacing!!!!!!!!", gridSpacing)
-                result = splitmission(
-                    center_latlon=center_latlon,
-                    uavs=selectedIds,
-                    coverage=coverage,
-                    gridspace=gridSpacing,
-                    featureType=featureType,
+
+                # splitmission() reorders its input in place, so the search
+                # areas are taken before planning
+                if featureType == "points":
+                    areas = [square_area(point, coverage) for point in clean_points]
+                else:
+                    areas = [
+                        [(float(lon), float(lat)) for lat, lon in polygon]
+                        for polygon in center_latlon
+                    ]
+                swath, _ = compute_camera_footprint(camAlt, zoomLevel)
+                path = await to_thread.run_sync(
+                    partial(
+                        splitmission,
+                        center_latlon=center_latlon,
+                        uavs=selectedIds,
+                        coverage=coverage,
+                        gridspace=gridSpacing,
+                        featureType=featureType,
+                    )
                 )
+                # The swarm master splits the areas itself and is told only the
+                # number of UAVs, so the paths cannot be reassigned to other
+                # UAVs here; the plan keeps the order of the planner
+                result = publish_plan("split", path, selectedIds, camAlt, areas, swath)
             else:
+                response.body["violation"] = check.max_violation
                 result = False
 
         if msg == "spificsplit":
@@ -1683,10 +2000,37 @@ class SkybrushServer(DaemonApp):
             # search_validator = SearchAreaValidator(fence)
             # if search_validator.are_points_with_coverage_inside(latlon, coverage):
             # print("%%%%%%%")
-            from .swarm import compute_grid_spacing
+            from .planning.coverage import square_area
+            from .swarm import compute_camera_footprint, compute_grid_spacing
 
             gridSpacing = compute_grid_spacing(camAlt, zoomLevel, overlap)
-            result = specificsplit(latlon, uavs, gridSpacing, coverage, featureType)
+            swath, _ = compute_camera_footprint(camAlt, zoomLevel)
+            # Each group flies its own area, so paths are only matched to UAVs
+            # within the same group. The UAVs are reordered before the groups
+            # are sent to the swarm master so it flies the same assignment
+            order_uavs, savings = create_uav_orderer(
+                [uav for group in uavs for uav in group]
+            )
+            path, uavs = await to_thread.run_sync(
+                partial(
+                    specificsplit,
+                    latlon,
+                    uavs,
+                    gridSpacing,
+                    coverage,
+                    featureType,
+                    order_uavs=order_uavs,
+                )
+            )
+            response.body["transitSaved"] = round(sum(savings), 1)
+            result = publish_plan(
+                "specificsplit",
+                path,
+                [uav for group in uavs for uav in group],
+                camAlt,
+                [square_area(center, coverage) for center in latlon],
+                swath,
+            )
             # else:
             #     result = False
 
@@ -1708,8 +2052,10 @@ class SkybrushServer(DaemonApp):
             response.body["angle"] = self.bearing
 
         if msg == "fence":
-            from .YamlCreation import FenceToYAML
+            from .geofence_validator import clear_fence_cache
+            from .planning.jobs import run_job
             from .swarm_autoscript import run_server_exe, is_server_running
+            from .YamlCreation import fence_to_yaml
 
             if not hasattr(self, "ip"):
                 self.ip = self.get_interface_mapping()
@@ -1742,11 +2088,30 @@ class SkybrushServer(DaemonApp):
             # outer_index = label.index("outer")
             # outer_boundary = coords[label.index("outer")]
             set_outer_boundary(coords[label.index("outer")])
-            fence_yaml = FenceToYAML(fence_coordinates=coords, labels=label)
-            obstacle_list = fence_yaml.process_fences()  # generate XY points
-            print(obstacle_list)
-            generated_origin, yaml_text = fence_yaml.generate_yaml()
+            set_inner_fences(
+                [
+                    [(lon, lat) for lat, lon in ring]
+                    for ring, ring_label in zip(coords, label)
+                    if ring_label != "outer"
+                ]
+            )
+            clear_fence_cache()
+            # Re-sending an unchanged fence reuses the YAML generated for it
+            # the last time
+            generated_origin, yaml_text = await to_thread.run_sync(
+                partial(
+                    fence_to_yaml,
+                    coords,
+                    label,
+                    convert=partial(run_job, "fence_to_yaml"),
+                )
+            )
             # print("YAML TEXT", yaml_text)
+
+            # The visibility graph of the no-fly zones is built now so that
+            # the next plan does not have to wait for it
+            if get_inner_fences():
+                await to_thread.run_sync(get_router)
             result = generate_origin(generated_origin)
             if not is_server_running("copter_swarm.exe"):
                 run_server_exe(server_address=self.ip, sim_enable=sim_enabler)
@@ -1790,7 +2155,6 @@ class SkybrushServer(DaemonApp):
                 result = False
 
         if msg == "endsimulation":
-
             from .simulation_autoscript import stop_simulation
 
             self.sim_enbled = False
@@ -1908,9 +2272,7 @@ class SkybrushServer(DaemonApp):
         transport: Any = parameters.get("transport")
 
         if message_type == "UAV-MOTOR":
-
             for uav_id in uav_ids:
-
                 uav = self.find_uav_by_id(uav_id, response)
                 if uav:
                     self.uavs_home[uav_id] = [
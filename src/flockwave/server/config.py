@@ -72,6 +72,8 @@ EXTENSIONS = {
     },
     "missions": {},
     "motion_capture": {"enabled": "avoid", "frame_rate": 10},
+    "plan_export": {},
+    "planner_pool": {},
     "rc": {"enabled": "avoid"},
     "rc_udp": {"enabled": False},
     "rtk": {
@@ -87,6 +89,7 @@ EXTENSIONS = {
         "use_high_precision": True,  # set to false if the rover cannot handle high-precision MSM RTK messages
         # "exclude_serial_ports": ["*ttyAMA*"
     },
+    "search_progress": {},
     "show": {
         "default_start_method": "rc"  # set to "auto" if you typically start shows automatically and not via a remote controller
     },
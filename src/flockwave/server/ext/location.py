@@ -37,6 +37,12 @@ Location.UNKNOWN = Location()
 
 _log: Optional[Logger] = None
 
+location_changed_signal: Any = None
+"""Signal that this extension emits in order to notify subscribers when the
+location of the server may have changed. The sender of the signal is the new
+location.
+"""
+
 _location_candidates: dict[str, tuple[float, Location]] = {}
 """Location candidates submitted by other extensions, along with the priorities."""
 
@@ -116,6 +122,7 @@ def provide_location(key: str, location: Location, priority: int = 0) -> None:
     if priority >= _location_priority:
         # Best location will change, invalidate the cached location
         _location = None
+        _notify_location_changed()
 
 
 def _log_current_location() -> None:
@@ -132,6 +139,14 @@ def _log_current_location() -> None:
             )
 
 
+def _notify_location_changed() -> None:
+    """Notifies the subscribers of the location change signal about the
+    current location of the server.
+    """
+    if location_changed_signal is not None:
+        location_changed_signal.send(get_location())
+
+
 def _reset() -> None:
     """Resets the internal state of the extension by clearing all location
     candidates and invalidating the chosen location object.
@@ -181,9 +196,10 @@ def _extract_fallback_location_from_configuration(obj: Any) -> Location:
 
 
 def load(app, configuration: dict[str, Any], log: Logger):
-    global _fallback_location, _log
+    global _fallback_location, _log, location_changed_signal
 
     _log = log
+    location_changed_signal = app.import_api("signals").get("location:changed")
     _fallback_location = _extract_fallback_location_from_configuration(
         configuration.get("fixed")
     )
@@ -191,10 +207,11 @@ def load(app, configuration: dict[str, Any], log: Logger):
 
 
 def unload():
-    global _log
+    global _log, location_changed_signal
 
     _reset()
     _log = None
+    location_changed_signal = None
 
 
 def get_current_location(ext, message, sender, hub):
@@ -231,6 +248,7 @@ def set_location(ext, message, sender, hub):
         location = Location(position=position, accuracy=0)
 
         _fallback_location = location
+        _notify_location_changed()
 
         return {"location": _fallback_location.position}
     else:
@@ -257,7 +275,7 @@ async def run(app, configuration, logger):
         await sleep_forever()
 
 
-dependencies = ()
+dependencies = ("signals",)
 description = "Provides the physical location of the server in geodetic coordinates for other extensions"
 exports = {
     "get_location": get_location,
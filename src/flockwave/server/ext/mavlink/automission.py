@@ -3,11 +3,11 @@
 from functools import partial
 
 from flockwave.gps.vectors import GPSCoordinate
-from sympy.codegen import Print
 from trio import fail_after, TooSlowError
-from typing import Callable, Optional, Union, List
+from typing import Any, Callable, Optional, Sequence, List
 from flockwave.logger import Logger
 from .enums import MAVFrame, MAVMissionResult, MAVMissionType
+from .mission_cache import MissionCache, MissionRecord, get_mission_item_digest
 from .types import (
     MAVLinkMessage,
     MAVLinkMessageSpecification,
@@ -16,7 +16,55 @@ from .types import (
 )
 from .utils import mavlink_nav_command_to_gps_coordinate,mavlink_nav_command_to_gps_coordinate_with_frame
 
-__all__ = ("AutoMissionManager",)
+__all__ = ("AutoMissionManager", "MissionItem", "encode_mission_items")
+
+
+MissionItem = tuple[int, dict[str, Any]]
+"""Type specification for a single mission item to upload: a MAVLink command
+and the parameters of the command that differ from the defaults.
+"""
+
+
+def encode_mission_items(
+    items: Sequence[MissionItem],
+    mission_type: MAVMissionType = MAVMissionType.MISSION,
+    *,
+    frame: MAVFrame = MAVFrame.GLOBAL_RELATIVE_ALT,
+) -> list[MAVLinkMessageSpecification]:
+    """Encodes the given mission items into ``MISSION_ITEM_INT`` message
+    specifications that can be sent to a drone as-is when it requests them
+    during a mission upload.
+
+    Parameters:
+        items: the mission items to encode; each item is a pair consisting of
+            a MAVLink command and the parameters of the command that differ
+            from the defaults
+        mission_type: type of the mission that the items belong to
+        frame: the default coordinate frame of the items
+
+    Returns:
+        the encoded mission items, in the same order as the input
+    """
+    result = []
+    for index, (command, kwds) in enumerate(items):
+        params = {
+            "seq": index,
+            "command": command,
+            "mission_type": mission_type,
+            "param1": 0,
+            "param2": 0,
+            "param3": 0,
+            "param4": 0,
+            "x": 0,
+            "y": 0,
+            "z": 0,
+            "frame": frame,
+            "current": 0,
+            "autocontinue": 0,
+        }
+        params.update(kwds)
+        result.append(spec.mission_item_int(**params))
+    return result
 
 
 class AutoMissionManager:
@@ -35,17 +83,35 @@ class AutoMissionManager:
     _log: Optional[Logger]
     """Logger that the manager object can use to log messages."""
 
+    _cache: Optional[MissionCache]
+    """Cache of the missions that the drone has last confirmed; used to skip
+    uploads that would not change anything on the drone. ``None`` if every
+    upload should be performed in full.
+    """
+
+    _last_ack: Optional[MAVLinkMessage]
+    """The last accepted MISSION_ACK message received from the drone."""
+
     @classmethod
-    def for_uav(cls, uav):
-        """Constructs a MAVFTP connection object to the given UAV."""
+    def for_uav(cls, uav, *, use_cache: bool = True):
+        """Constructs a MAVFTP connection object to the given UAV.
+
+        Parameters:
+            uav: the UAV to construct the manager for
+            use_cache: whether the manager should use the mission cache of the
+                UAV to skip uploads that would not change anything
+        """
         sender = partial(uav.driver.send_packet, target=uav)
         log = uav.driver.log
-        return cls(sender, log=log)
+        cache = uav.mission_cache if use_cache else None
+        return cls(sender, log=log, cache=cache)
 
     def __init__(
         self,
         sender: Callable,
         log: Optional[Logger] = None,
+        *,
+        cache: Optional[MissionCache] = None,
     ):
         """Constructor.
 
@@ -53,9 +119,15 @@ class AutoMissionManager:
             sender: a function that can be called to send a MAVLink message and
                 wait for an appropriate reply
             log: optional logger to use for logging messages
+            cache: optional cache of the missions that the drone has last
+                confirmed; when given, uploads that would not change the
+                mission on the drone are skipped and small changes are
+                written with partial mission writes
         """
         self._sender = sender
         self._log = log
+        self._cache = cache
+        self._last_ack = None
 
     async def get_automission_areas(self) -> List[List[float]]:
         """Returns the configured areas of the geofence from the MAVLink
@@ -143,145 +215,265 @@ class AutoMissionManager:
 
     async def set_automission_areas(
         self,
-        areas: List[float],
+        areas: Sequence[MissionItem],
+    ) -> None:
+        """Uploads the given mission items to the MAVLink connection.
+
+        Parameters:
+            areas: the mission items to upload
+
+        Raises:
+            TooSlowError: if the UAV failed to respond in time
+        """
+        await self.upload_encoded_mission(encode_mission_items(areas))
+
+    async def upload_AutoMission(
+        self,
+        areas: Sequence[MissionItem],
+        *,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+    ) -> None:
+        """Uploads the given mission items to the MAVLink connection.
+
+        Parameters:
+            areas: the mission items to upload
+            on_progress: optional function that is called with the number of
+                items that the drone has already confirmed and the total
+                number of items whenever the drone requests a new item
+
+        Raises:
+            TooSlowError: if the UAV failed to respond in time
+        """
+        await self.upload_encoded_mission(
+            encode_mission_items(areas), on_progress=on_progress
+        )
+
+    async def upload_encoded_mission(
+        self,
+        items: Sequence[MAVLinkMessageSpecification],
+        *,
+        mission_type: MAVMissionType = MAVMissionType.MISSION,
+        on_progress: Optional[Callable[[int, int], None]] = None,
     ) -> None:
-        """Uploads the given geofence polygons and circles to the MAVLink
+        """Uploads the given mission items, already encoded into MAVLink
+        message specifications with `encode_mission_items()`, to the MAVLink
         connection.
 
+        When the manager has a mission cache, the upload is skipped if the
+        drone already has the same items, and only the changed items are
+        rewritten if the change affects a small contiguous range of items.
+
         Parameters:
-            areas: the polygons and circles to upload
+            items: the encoded mission items to upload
+            mission_type: type of the mission that the items belong to
+            on_progress: optional function that is called with the number of
+                items that the drone has already confirmed and the total
+                number of items whenever the drone requests a new item
 
         Raises:
             TooSlowError: if the UAV failed to respond in time
         """
-        # GPSCoordinate
-        items = areas
+        digests = [get_mission_item_digest(item) for item in items]
+        current = None
+        if self._cache is not None:
+            try:
+                current = await self._get_current_mission(mission_type, digests)
+            except (RuntimeError, TooSlowError):
+                # Could not determine what the drone has; upload in full
+                pass
+
+        if current is not None and list(current.digests) == digests:
+            if self._log:
+                self._log.debug(
+                    f"Mission of type {mission_type} is unchanged, skipping upload"
+                )
+            if on_progress:
+                on_progress(len(items), len(items))
+            return
+
+        if self._cache is not None:
+            # Forget the cached mission; if the upload fails halfway, we do
+            # not know what the drone has
+            self._cache.invalidate(mission_type)
+
+        changed_range = (
+            current.get_changed_range(digests)
+            if current is not None and mission_type == MAVMissionType.MISSION
+            else None
+        )
+        uploaded = False
+        if changed_range is not None:
+            start, end = changed_range
+            try:
+                await self._upload_items(
+                    items,
+                    spec.mission_write_partial_list(
+                        start_index=start, end_index=end, mission_type=mission_type
+                    ),
+                    mission_type,
+                    start=start,
+                    end=end,
+                    on_progress=on_progress,
+                )
+                uploaded = True
+            except (RuntimeError, TooSlowError):
+                # Partial writes are rejected or ignored by the autopilot, fall
+                # back to a full upload
+                pass
+
+        if not uploaded:
+            await self._upload_items(
+                items,
+                spec.mission_count(count=len(items), mission_type=mission_type),
+                mission_type,
+                on_progress=on_progress,
+            )
+
+        if self._cache is not None:
+            self._cache.update(mission_type, digests, self._get_last_opaque_id())
 
-        num_items = len(items)
+    async def clear_mission(self):
         mission_type = MAVMissionType.MISSION
+        reply = await self._send_and_wait(
+            mission_type,
+            spec.mission_clear_all(mission_type=mission_type),
+            spec.mission_ack(mission_type=mission_type),
+        )
+        if self._cache is not None:
+            self._cache.update(mission_type, (), self._get_last_opaque_id())
+        return reply
 
-        index, finished = None, False
-        while not finished:
-            if index is None:
-                # We need to let the drone know how many items there will be
-                message = spec.mission_count(count=num_items, mission_type=mission_type)
-                should_resend = True
-            else:
-                # We need to send the item with the given index to the drone
-                command, kwds = items[index]
-                params = {
-                    "seq": index,
-                    "command": command,
-                    "mission_type": mission_type,
-                    "param1": 0,
-                    "param2": 0,
-                    "param3": 0,
-                    "param4": 0,
-                    "x": 0,
-                    "y": 0,
-                    "z": 0,
-                    "frame": MAVFrame.GLOBAL_RELATIVE_ALT,
-                    "current": 0,
-                    "autocontinue": 0,
-                }
-                params.update(kwds)
-                message = spec.mission_item_int(**params)
-                should_resend = False
+    async def _get_current_mission(
+        self, mission_type: MAVMissionType, digests: Sequence[str]
+    ) -> Optional[MissionRecord]:
+        """Returns the mission of the given type that the drone currently
+        has, as far as it can be determined cheaply.
 
-            # Drone must respond with requesting the next item (or asking
-            # to repeat the current one), or by sending an ACK or NAK. We should
-            # _not_ attempt to re-send geofence items; it is the responsiblity
-            # of the drone to request them again if they got lost.
-            #
-            # TODO(ntamas): we could also receive MISSION_REQUEST_INT here,
-            # we need to handle both!
-            expected_reply = spec.mission_request(mission_type=mission_type)
-            # We have different policies for the initial message that
-            # initiates the upload and the subsequent messages that are
-            # responding to the requests from the drone.
-            #
-            # For the initial message, we attempt to re-send it in case it
-            # got lost. For subsequent messages, we never re-send it (it is
-            # the responsibility of the drone to request them again if our
-            # reply got lost), but we assume that the upload timed out if
-            # we haven't received an ACK or the next request from the drone
-            # in five seconds.
-            reply = await self._send_and_wait(
+        The cached mission is used if the drone reports the same number of
+        items and the same opaque mission identifier. Otherwise, including
+        the case when the autopilot does not support opaque identifiers, the
+        items are downloaded and their digests are cached if the drone has the
+        same number of items as the mission to upload. When the number of
+        items differs, there is no point in downloading them as the mission has
+        to be uploaded in full anyway.
+
+        Parameters:
+            mission_type: type of the mission to query
+            digests: the digests of the items of the mission that we are about
+                to upload
+
+        Returns:
+            the current mission of the drone, or ``None`` if it is not known
+
+        Raises:
+            RuntimeError: if the drone rejected the download
+            TooSlowError: if the UAV failed to respond in time
+        """
+        assert self._cache is not None
+
+        reply = await self._send_and_wait(
+            mission_type,
+            spec.mission_request_list(mission_type=mission_type),
+            spec.mission_count(mission_type=mission_type),
+        )
+        count = reply.count
+        opaque_id = getattr(reply, "opaque_id", 0) or 0
+
+        # Without an opaque identifier we cannot tell whether someone else has
+        # uploaded a different mission with the same number of items since
+        # our last upload, so the cached mission is not trusted in that case
+        record = self._cache.get(mission_type)
+        if (
+            record is not None
+            and record.count == count
+            and opaque_id
+            and record.opaque_id == opaque_id
+        ):
+            await self._send_final_ack(mission_type)
+            return record
+
+        if count != len(digests):
+            await self._send_final_ack(mission_type)
+            return None
+
+        current = []
+        for index in range(count):
+            item = await self._send_and_wait(
                 mission_type,
-                message,
-                expected_reply,
-                timeout=1.5 if should_resend else 5,
-                retries=5 if should_resend else 0,
+                spec.mission_request_int(seq=index, mission_type=mission_type),
+                spec.mission_item_int(seq=index, mission_type=mission_type),
+                timeout=0.25,
             )
-            if reply is None:
-                # Final ACK received
-                finished = True
-            else:
-                # Drone requested another item
-                index = reply.seq
-                # if index is None:
-                #     index = 0
-                # else:
-                #     index = index + 1
-                #     if num_items == index:
-                #         finished = True
+            current.append(get_mission_item_digest(item))
+        await self._send_final_ack(mission_type)
 
-    async def upload_AutoMission(
+        if mission_type == MAVMissionType.MISSION and current:
+            # The first item of a mission is the home position, which the
+            # autopilot overwrites with its own
+            current[0] = digests[0]
+
+        return self._cache.update(mission_type, current, opaque_id)
+
+    def _get_last_opaque_id(self) -> int:
+        """Returns the opaque mission identifier from the last accepted
+        MISSION_ACK message, or zero if the autopilot does not support opaque
+        identifiers.
+        """
+        return getattr(self._last_ack, "opaque_id", 0) or 0
+
+    async def _upload_items(
         self,
-        areas: List[float],
+        items: Sequence[MAVLinkMessageSpecification],
+        message: MAVLinkMessageSpecification,
+        mission_type: MAVMissionType,
+        *,
+        start: int = 0,
+        end: Optional[int] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None,
     ) -> None:
-        """Uploads the given geofence polygons and circles to the MAVLink
-        connection.
+        """Sends the message that initiates a full or partial mission upload to
+        the drone and then sends the mission items that the drone requests
+        until the drone acknowledges the upload.
 
         Parameters:
-            areas: the polygons and circles to upload
+            items: the encoded mission items
+            message: the MISSION_COUNT or MISSION_WRITE_PARTIAL_LIST message
+                that initiates the upload
+            mission_type: type of the mission that the items belong to
+            start: index of the first item that the drone may request
+            end: index of the last item that the drone may request; ``None``
+                means the last item
+            on_progress: optional function that is called with the number of
+                items that the drone has already confirmed and the total
+                number of items whenever the drone requests a new item
 
         Raises:
+            RuntimeError: if the drone rejected the upload or requested an
+                item outside the given range
             TooSlowError: if the UAV failed to respond in time
         """
-        # GPSCoordinate
-        items = areas
-
-        num_items = len(items)
-        mission_type = MAVMissionType.MISSION
+        if end is None:
+            end = len(items) - 1
+        num_items = end - start + 1
 
         index, finished = None, False
         while not finished:
-            print(index,finished)
             if index is None:
-                # We need to let the drone know how many items there will be
-                message = spec.mission_count(count=num_items, mission_type=mission_type)
+                # We need to let the drone know which items will be sent
                 should_resend = True
             else:
                 # We need to send the item with the given index to the drone
-                command, kwds = items[index]
-                params = {
-                    "seq": index,
-                    "command": command,
-                    "mission_type": mission_type,
-                    "param1": 0,
-                    "param2": 0,
-                    "param3": 0,
-                    "param4": 0,
-                    "x": 0,
-                    "y": 0,
-                    "z": 0,
-                    "frame": MAVFrame.GLOBAL_RELATIVE_ALT,
-                    "current": 0,
-                    "autocontinue": 0,
-                }
-                params.update(kwds)
-                message = spec.mission_item_int(**params)
+                message = items[index]
                 should_resend = False
 
             # Drone must respond with requesting the next item (or asking
             # to repeat the current one), or by sending an ACK or NAK. We should
-            # _not_ attempt to re-send geofence items; it is the responsiblity
-            # of the drone to request them again if they got lost.
-            #
-            # TODO(ntamas): we could also receive MISSION_REQUEST_INT here,
-            # we need to handle both!
+            # _not_ attempt to re-send mission items; it is the responsiblity
+            # of the drone to request them again if they got lost. The drone
+            # may request the items with MISSION_REQUEST or MISSION_REQUEST_INT;
+            # `_send_and_wait()` accepts both.
             expected_reply = spec.mission_request(mission_type=mission_type)
+
             # We have different policies for the initial message that
             # initiates the upload and the subsequent messages that are
             # responding to the requests from the drone.
@@ -302,25 +494,17 @@ class AutoMissionManager:
             if reply is None:
                 # Final ACK received
                 finished = True
+                if on_progress:
+                    on_progress(num_items, num_items)
             else:
                 # Drone requested another item
                 index = reply.seq
-                # if index is None:
-                #     index = 0
-                # else:
-                #     index = index + 1
-                #     if num_items == index:
-                #         finished = True
-
-
-    async def clear_mission(self):
-        mission_type = MAVMissionType.MISSION
-        reply = await self._send_and_wait(
-            mission_type,
-            spec.mission_clear_all(mission_type=mission_type),
-            spec.mission_ack(mission_type=mission_type),
-        )
-        return reply
+                if index < start or index > end:
+                    raise RuntimeError(
+                        f"Drone requested non-existent mission item {index}"
+                    )
+                if on_progress:
+                    on_progress(index - start, num_items)
 
     async def _send_and_wait(
         self,
@@ -359,17 +543,24 @@ class AutoMissionManager:
                 "response": expected_reply,
                 "ack": spec.mission_ack(mission_type=mission_type),
             }
+            if expected_reply[0] == "MISSION_REQUEST":
+                # Newer autopilots request mission items with
+                # MISSION_REQUEST_INT instead; accept both
+                replies["response_int"] = spec.mission_request_int(
+                    mission_type=mission_type
+                )
 
         while True:
             try:
                 with fail_after(timeout):
                     key, response = await self._sender(message, wait_for_one_of=replies)
-                    if key == "response":
+                    if key != "ack":
                         # Got the response that we expected
                         return response
                     else:
                         # Got an ACK. Check whether it has an error code.
                         if response.type == MAVMissionResult.ACCEPTED:
+                            self._last_ack = response
                             return None
                         else:
                             raise RuntimeError(
@@ -0,0 +1,560 @@
+"""Benchmarks of the hot paths of the inbound MAVLink message processing.
+
+The benchmarks replay synthetic traffic of a fleet of UAVs without opening
+any connections. Run them with::
+
+    python -m flockwave.server.ext.mavlink.benchmark
+"""
+
+from __future__ import annotations
+
+import sys
+
+from dataclasses import dataclass
+from random import Random
+from time import perf_counter
+from typing import Any, Optional, Sequence
+
+from .dispatch import MessageHandlerTable
+from .matchers import MessageMatcherIndex
+
+__all__ = (
+    "InboundBenchmarkResult",
+    "MatcherBenchmarkResult",
+    "benchmark_inbound_dispatch",
+    "benchmark_matchers",
+)
+
+
+#: Message IDs of the message types used in the synthetic traffic
+_MESSAGE_IDS = {
+    "HEARTBEAT": 0,
+    "SYS_STATUS": 1,
+    "GPS_RAW_INT": 24,
+    "ATTITUDE": 30,
+    "GLOBAL_POSITION_INT": 33,
+    "MISSION_CURRENT": 42,
+    "MISSION_REQUEST": 40,
+    "VFR_HUD": 74,
+    "RADIO_STATUS": 109,
+    "PARAM_VALUE": 22,
+    "TIMESYNC": 111,
+}
+
+
+class _Message:
+    """Minimal stand-in for a decoded MAVLink message."""
+
+    def __init__(self, type: str, system_id: int, component_id: int = 1, **fields):
+        self._type = type
+        self._system_id = system_id
+        self._component_id = component_id
+        self._msg_id = _MESSAGE_IDS.get(type, -1)
+        self.__dict__.update(fields)
+
+    def get_msgId(self) -> int:
+        return self._msg_id
+
+    def get_srcComponent(self) -> int:
+        return self._component_id
+
+    def get_srcSystem(self) -> int:
+        return self._system_id
+
+    def get_type(self) -> str:
+        return self._type
+
+
+class _Future:
+    """Minimal stand-in for the futures of the MAVLink network."""
+
+    __slots__ = ("_done", "result")
+
+    def __init__(self):
+        self._done = False
+        self.result = None
+
+    def cancel(self) -> None:
+        self._done = True
+
+    def done(self) -> bool:
+        return self._done
+
+    def set_result(self, value: Any) -> None:
+        self._done = True
+        self.result = value
+
+
+class _LinearMatchers:
+    """The matcher storage used by the MAVLink network before the matchers
+    were indexed: one list of matchers per message type, scanned for every
+    inbound message of that type.
+    """
+
+    def __init__(self):
+        self._matchers: dict[str, list] = {}
+
+    def add(self, type, params, system_id, future):
+        item = (system_id, params, future)
+        self._matchers.setdefault(type, []).append(item)
+        return type, item
+
+    def remove(self, handle) -> None:
+        type, item = handle
+        matchers = self._matchers[type]
+        matchers.pop(matchers.index(item))
+
+    def dispatch(self, type, system_id, message) -> int:
+        resolved = 0
+        for expected_system_id, params, future in self._matchers.get(type, ()):
+            if expected_system_id is not None and system_id != expected_system_id:
+                continue
+            if future.done():
+                continue
+            elif callable(params):
+                matched = params(message)
+            elif params is None:
+                matched = True
+            else:
+                matched = all(
+                    getattr(message, name, None) == value
+                    for name, value in params.items()
+                )
+            if matched:
+                future.set_result(message)
+                resolved += 1
+        return resolved
+
+
+@dataclass(frozen=True)
+class MatcherBenchmarkResult:
+    """Result of the benchmark of the response matchers."""
+
+    num_uavs: int
+    """Number of simulated UAVs."""
+
+    pending_per_uav: int
+    """Number of requests waiting for a response from each UAV."""
+
+    legacy_rate: float
+    """Number of inbound messages dispatched per second with the linear
+    matcher lists.
+    """
+
+    indexed_rate: float
+    """Number of inbound messages dispatched per second with the indexed
+    matchers.
+    """
+
+    legacy_churn: float
+    """Time needed to register and remove all the matchers with the linear
+    matcher lists, in seconds.
+    """
+
+    indexed_churn: float
+    """Time needed to register and remove all the matchers with the indexed
+    matchers, in seconds.
+    """
+
+    @property
+    def speedup(self) -> float:
+        """Ratio of the dispatch rates of the indexed and the linear
+        matchers.
+        """
+        return self.indexed_rate / self.legacy_rate if self.legacy_rate else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.num_uavs} UAVs x {self.pending_per_uav} pending requests: "
+            f"{self.legacy_rate:,.0f} -> {self.indexed_rate:,.0f} msg/s "
+            f"({self.speedup:.1f}x), register+remove "
+            f"{self.legacy_churn * 1000:.1f} -> {self.indexed_churn * 1000:.1f} ms"
+        )
+
+
+def _fleet_traffic(
+    num_uavs: int, pending_per_uav: int, num_messages: int, rng: Random
+) -> list[_Message]:
+    """Generates the inbound traffic of a fleet-wide parameter fetch and
+    mission upload: telemetry interleaved with parameter values and mission
+    item requests, most of which do not match any pending request.
+    """
+    messages = []
+    for _ in range(num_messages):
+        system_id = rng.randint(1, num_uavs)
+        kind = rng.random()
+        if kind < 0.4:
+            messages.append(
+                _Message("GLOBAL_POSITION_INT", system_id, lat=0, lon=0, relative_alt=0)
+            )
+        elif kind < 0.8:
+            index = rng.randrange(pending_per_uav * 2)
+            messages.append(
+                _Message(
+                    "PARAM_VALUE", system_id, param_id=f"PARAM_{index}", param_value=0
+                )
+            )
+        else:
+            messages.append(
+                _Message(
+                    "MISSION_REQUEST",
+                    system_id,
+                    seq=rng.randrange(pending_per_uav * 2),
+                    mission_type=0,
+                )
+            )
+    return messages
+
+
+def _pending_requests(num_uavs: int, pending_per_uav: int) -> list[tuple]:
+    requests = []
+    for system_id in range(1, num_uavs + 1):
+        for index in range(pending_per_uav):
+            if index % 2:
+                requests.append(
+                    (
+                        "MISSION_REQUEST",
+                        {"seq": index, "mission_type": 0},
+                        system_id,
+                    )
+                )
+            else:
+                requests.append(
+                    ("PARAM_VALUE", {"param_id": f"PARAM_{index}"}, system_id)
+                )
+    return requests
+
+
+def _run_matchers(
+    factory, requests: Sequence[tuple], messages: Sequence[_Message], rng: Random
+) -> tuple[float, float]:
+    matchers = factory()
+
+    # Registration and removal in random order, as the requests time out or
+    # get their responses
+    started_at = perf_counter()
+    handles = [matchers.add(*request, _Future()) for request in requests]
+    order = list(range(len(handles)))
+    rng.shuffle(order)
+    for index in order:
+        matchers.remove(handles[index])
+    churn = perf_counter() - started_at
+
+    # Dispatching with all the requests pending. Resolved futures stay
+    # registered, like between the resolution and the removal in the
+    # network, so each round sees the same number of matchers
+    for request in requests:
+        matchers.add(*request, _Future())
+    started_at = perf_counter()
+    for message in messages:
+        matchers.dispatch(message.get_type(), message.get_srcSystem(), message)
+    elapsed = perf_counter() - started_at
+
+    return len(messages) / elapsed if elapsed > 0 else float("inf"), churn
+
+
+def benchmark_matchers(
+    num_uavs: int = 50,
+    pending_per_uav: int = 20,
+    *,
+    num_messages: int = 20000,
+    repeat: int = 3,
+    seed: int = 42,
+) -> MatcherBenchmarkResult:
+    """Measures how many inbound messages per second the response matchers
+    of a MAVLink network can dispatch while each UAV of a fleet has several
+    pending requests, with the linear matcher lists and with the indexed
+    matchers.
+
+    Parameters:
+        num_uavs: the number of simulated UAVs
+        pending_per_uav: the number of requests waiting for a response from
+            each UAV
+        num_messages: the number of inbound messages to replay
+        repeat: the number of timed runs; the best one is reported
+        seed: seed of the random number generator for the traffic
+
+    Returns:
+        the measured dispatch rates and registration costs
+    """
+    rng = Random(seed)
+    requests = _pending_requests(num_uavs, pending_per_uav)
+    messages = _fleet_traffic(num_uavs, pending_per_uav, num_messages, rng)
+
+    results = {}
+    for name, factory in (
+        ("legacy", _LinearMatchers),
+        ("indexed", MessageMatcherIndex),
+    ):
+        runs = [
+            _run_matchers(factory, requests, messages, Random(seed))
+            for _ in range(max(repeat, 1))
+        ]
+        results[name] = (
+            max(rate for rate, _ in runs),
+            min(churn for _, churn in runs),
+        )
+
+    return MatcherBenchmarkResult(
+        num_uavs=num_uavs,
+        pending_per_uav=pending_per_uav,
+        legacy_rate=results["legacy"][0],
+        indexed_rate=results["indexed"][0],
+        legacy_churn=results["legacy"][1],
+        indexed_churn=results["indexed"][1],
+    )
+
+
+@dataclass(frozen=True)
+class InboundBenchmarkResult:
+    """Result of the benchmark of the routing of inbound messages to their
+    handlers.
+    """
+
+    num_uavs: int
+    """Number of simulated UAVs."""
+
+    legacy_rate: float
+    """Number of inbound messages routed per second with the handlers looked
+    up by message type name.
+    """
+
+    indexed_rate: float
+    """Number of inbound messages routed per second with the handlers looked
+    up by numeric message ID.
+    """
+
+    @property
+    def speedup(self) -> float:
+        """Ratio of the routing rates with the numeric and the string lookup."""
+        return self.indexed_rate / self.legacy_rate if self.legacy_rate else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"{self.num_uavs} UAVs, inbound routing: "
+            f"{self.legacy_rate:,.0f} -> {self.indexed_rate:,.0f} msg/s "
+            f"({self.speedup:.1f}x)"
+        )
+
+
+class _UAV:
+    """Minimal stand-in for a MAVLink UAV, counting the handled messages."""
+
+    __slots__ = ("handled",)
+
+    def __init__(self):
+        self.handled = 0
+
+    def handle_message(self, message: Any) -> None:
+        self.handled += 1
+
+
+class _InboundLoop:
+    """Replica of the per-message work of the inbound message loop of a
+    MAVLink network, without the I/O.
+    """
+
+    #: Message types that are forwarded to the UAV that sent them
+    forwarded = (
+        "GLOBAL_POSITION_INT",
+        "GPS_RAW_INT",
+        "MISSION_CURRENT",
+        "RADIO_STATUS",
+        "SYS_STATUS",
+        "VFR_HUD",
+    )
+
+    #: Message types that are handled by the network itself
+    ignored = ("MISSION_REQUEST", "PARAM_VALUE", "TIMESYNC")
+
+    def __init__(self):
+        self.matchers = MessageMatcherIndex()
+        self.uavs: dict[int, _UAV] = {}
+        self.uav_addresses: dict[_UAV, Any] = {}
+
+    def find_uav(self, message: Any, address: Any) -> Optional[_UAV]:
+        system_id = message.get_srcSystem()
+        if system_id == 0:
+            return None
+        uav = self.uavs.get(system_id)
+        if not uav:
+            uav = self.uavs[system_id] = _UAV()
+        self.uav_addresses[uav] = address
+        return uav
+
+    def _forward(self, message: Any, *, connection_id: str, address: Any) -> None:
+        uav = self.find_uav(message, address)
+        if uav:
+            uav.handle_message(message)
+
+    def _ignore(self, message: Any, *, connection_id: str, address: Any) -> None:
+        pass
+
+    def run_legacy(self, traffic: Sequence[tuple[str, tuple[Any, Any]]]) -> None:
+        """Routes the given traffic the way the network did before the
+        handlers were looked up by numeric message ID.
+        """
+        handlers = dict.fromkeys(self.forwarded, self._forward)
+        handlers.update(dict.fromkeys(self.ignored, self._ignore))
+        for connection_id, (message, address) in traffic:
+            src_component = message.get_srcComponent()
+            type = message.get_type()
+            if not (
+                src_component == 1 or (src_component == 240 and type == "RADIO_STATUS")
+            ):
+                continue
+            self.matchers.dispatch(type, message.get_srcSystem(), message)
+            handler = handlers.get(type)
+            if handler:
+                handler(message, connection_id=connection_id, address=address)
+            else:
+                handlers[type] = self._ignore
+
+    def run_indexed(self, traffic: Sequence[tuple[str, tuple[Any, Any]]]) -> None:
+        """Routes the given traffic the way the network does it now."""
+        table = MessageHandlerTable(
+            dict.fromkeys(self.ignored),
+            dict.fromkeys(self.forwarded, _UAV.handle_message),
+        )
+        get_handler = table.get
+        get_uav = self.uavs.get
+        uav_addresses = self.uav_addresses
+        dispatch_to_matchers = self.matchers.dispatch
+        radio_status_id = _MESSAGE_IDS["RADIO_STATUS"]
+
+        for connection_id, (message, address) in traffic:
+            src_component = message.get_srcComponent()
+            msgid = message.get_msgId()
+            if src_component != 1 and (
+                src_component != 240 or msgid != radio_status_id
+            ):
+                continue
+            type, handler, expects_uav = get_handler(msgid) or table.resolve(message)
+            system_id = message.get_srcSystem()
+            dispatch_to_matchers(type, system_id, message)
+            if handler is None:
+                continue
+            if expects_uav:
+                uav = get_uav(system_id)
+                if uav is not None:
+                    uav_addresses[uav] = address
+                else:
+                    uav = self.find_uav(message, address)
+                if uav:
+                    handler(uav, message)
+            else:
+                handler(message, connection_id=connection_id, address=address)
+
+
+def _inbound_traffic(
+    num_uavs: int, num_messages: int, rng: Random
+) -> list[tuple[str, tuple[_Message, Any]]]:
+    """Generates the inbound telemetry of a fleet on a single UDP link, with
+    the typical mix of stream rates, a few messages from non-autopilot
+    components and a few responses to pending requests.
+    """
+    types = (
+        ("GLOBAL_POSITION_INT", 8),
+        ("ATTITUDE", 8),
+        ("VFR_HUD", 4),
+        ("GPS_RAW_INT", 2),
+        ("SYS_STATUS", 2),
+        ("MISSION_CURRENT", 1),
+        ("HEARTBEAT", 1),
+        ("PARAM_VALUE", 1),
+        ("TIMESYNC", 1),
+    )
+    names = [name for name, _ in types]
+    weights = [weight for _, weight in types]
+    addresses = {
+        system_id: (f"192.168.0.{system_id}", 14550)
+        for system_id in range(1, num_uavs + 1)
+    }
+
+    traffic = []
+    for type in rng.choices(names, weights, k=num_messages):
+        system_id = rng.randint(1, num_uavs)
+        kind = rng.random()
+        if kind < 0.02:
+            message = _Message("RADIO_STATUS", system_id, 240)
+        elif kind < 0.05:
+            # Gimbal, companion computer etc.
+            message = _Message(type, system_id, 154)
+        else:
+            message = _Message(type, system_id)
+        traffic.append(("udp", (message, addresses[system_id])))
+    return traffic
+
+
+def benchmark_inbound_dispatch(
+    num_uavs: int = 50,
+    *,
+    num_messages: int = 50000,
+    repeat: int = 3,
+    seed: int = 42,
+) -> InboundBenchmarkResult:
+    """Measures how many inbound messages per second the inbound message loop
+    of a MAVLink network can route to their handlers and UAVs when replaying
+    the telemetry of a fleet, with the handlers looked up by message type
+    name and by numeric message ID.
+
+    Parameters:
+        num_uavs: the number of simulated UAVs
+        num_messages: the number of inbound messages to replay
+        repeat: the number of timed runs; the best one is reported
+        seed: seed of the random number generator for the traffic
+
+    Returns:
+        the measured routing rates
+    """
+    traffic = _inbound_traffic(num_uavs, num_messages, Random(seed))
+
+    # The two variants are timed alternately so both see the same noise
+    rates = {"legacy": 0.0, "indexed": 0.0}
+    for _ in range(max(repeat, 1)):
+        for name in rates:
+            loop = _InboundLoop()
+            run = getattr(loop, f"run_{name}")
+            started_at = perf_counter()
+            run(traffic)
+            elapsed = perf_counter() - started_at
+            rate = len(traffic) / elapsed if elapsed > 0 else float("inf")
+            rates[name] = max(rates[name], rate)
+
+    return InboundBenchmarkResult(
+        num_uavs=num_uavs, legacy_rate=rates["legacy"], indexed_rate=rates["indexed"]
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import click
+
+    @click.command()
+    @click.option("-n", "--uavs", type=int, default=50, help="Number of UAVs")
+    @click.option(
+        "-p",
+        "--pending",
+        type=int,
+        default=20,
+        help="Number of pending requests per UAV",
+    )
+    @click.option(
+        "-m",
+        "--messages",
+        type=int,
+        default=20000,
+        help="Number of inbound messages to replay",
+    )
+    @click.option("-r", "--repeat", type=int, default=3, help="Number of timed runs")
+    def cli(uavs, pending, messages, repeat):
+        result = benchmark_matchers(uavs, pending, num_messages=messages, repeat=repeat)
+        click.echo(str(result))
+        result = benchmark_inbound_dispatch(uavs, num_messages=messages, repeat=repeat)
+        click.echo(str(result))
+        return 0
+
+    return cli.main(args=argv, standalone_mode=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
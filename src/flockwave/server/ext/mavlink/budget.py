@@ -0,0 +1,449 @@
+"""Bandwidth management for the telemetry streams of the drones in a single
+MAVLink network.
+
+Telemetry radios like the 57600 baud SiK modems have a hard limit on the number
+of bytes they can carry per second, and this limit is shared between all the
+drones in the network. Requesting the same message rates from every drone
+saturates the link once the fleet grows large enough, which shows up as
+increasing latency and packet loss for _all_ messages, including the ones
+that we need most. The classes in this module measure the inbound traffic on
+the links of a network and re-negotiate the telemetry stream rates of the
+drones so that the total stays within a configured budget.
+"""
+
+from __future__ import annotations
+
+from collections import defaultdict
+from dataclasses import dataclass
+from trio import current_time, sleep
+from trio_util import periodic
+from typing import ClassVar, Optional, Sequence, TYPE_CHECKING
+
+from .enums import MAVMessageType
+
+__all__ = (
+    "DEFAULT_STREAM_RATES",
+    "LinkBudgetConfiguration",
+    "LinkBudgetManager",
+    "TelemetryStream",
+    "allocate_stream_rates",
+)
+
+if TYPE_CHECKING:
+    from .driver import MAVLinkUAV
+    from .network import MAVLinkNetwork
+    from .types import MAVLinkMessage
+
+
+#: Default rates of the telemetry streams that we request from the drones,
+#: in Hz, when the link budget of the network is not managed
+DEFAULT_STREAM_RATES: dict[int, float] = {
+    MAVMessageType.SYS_STATUS: 1,
+    MAVMessageType.GPS_RAW_INT: 1,
+    MAVMessageType.GLOBAL_POSITION_INT: 2,
+}
+
+#: Typical sizes of MAVLink 2 frames of the most common telemetry messages on
+#: the wire, including the header and the checksum
+_FRAME_SIZES: dict[int, int] = {
+    MAVMessageType.HEARTBEAT: 21,
+    MAVMessageType.SYS_STATUS: 43,
+    MAVMessageType.GPS_RAW_INT: 64,
+    MAVMessageType.GLOBAL_POSITION_INT: 40,
+}
+
+#: Frame size to assume for messages not listed in _FRAME_SIZES
+_DEFAULT_FRAME_SIZE = 48
+
+#: Number of bytes per second that each drone needs for its heartbeats. The
+#: heartbeat rate is not negotiable so this is always reserved from the budget
+#: of the drone.
+_HEARTBEAT_BYTES_PER_SECOND = _FRAME_SIZES[MAVMessageType.HEARTBEAT]
+
+#: Relative change in the rate of at least one stream that warrants sending a
+#: new set of stream rates to a drone
+_RATE_CHANGE_THRESHOLD = 0.2
+
+#: Value of the ``txbuf`` field of RADIO_STATUS messages below which we treat
+#: the radio link as congested. SiK radios report the free space in their
+#: transmit buffer here as a percentage.
+_TXBUF_CONGESTION_THRESHOLD = 40
+
+
+@dataclass(frozen=True)
+class TelemetryStream:
+    """Specification of a single telemetry stream whose rate is negotiated with
+    the drones.
+    """
+
+    message_id: int
+    """Numeric MAVLink message ID of the stream."""
+
+    rate: float
+    """Desired rate of the stream, in Hz."""
+
+    min_rate: float
+    """Minimum rate of the stream, in Hz, that is guaranteed even if the
+    link is over-subscribed.
+    """
+
+    size: int = _DEFAULT_FRAME_SIZE
+    """Estimated size of a single frame of the stream on the wire, in bytes."""
+
+    @classmethod
+    def create(
+        cls, message_id: int, rate: float, min_rate: Optional[float] = None
+    ) -> TelemetryStream:
+        """Creates a telemetry stream specification, looking up the frame size
+        of the message from the table of known frame sizes.
+
+        Parameters:
+            message_id: numeric MAVLink message ID of the stream
+            rate: desired rate of the stream, in Hz
+            min_rate: minimum rate of the stream, in Hz; `None` means that it is
+                the same as the desired rate
+        """
+        rate = max(float(rate), 0.0)
+        min_rate = rate if min_rate is None else min(max(float(min_rate), 0.0), rate)
+        return cls(
+            message_id=int(message_id),
+            rate=rate,
+            min_rate=min_rate,
+            size=_FRAME_SIZES.get(message_id, _DEFAULT_FRAME_SIZE),
+        )
+
+    @classmethod
+    def from_json(cls, obj) -> TelemetryStream:
+        """Constructs a telemetry stream specification from its JSON
+        representation.
+        """
+        message = obj["message"]
+        if isinstance(message, str):
+            message_id = MAVMessageType[message.upper()].value
+        else:
+            message_id = int(message)
+
+        result = cls.create(message_id, obj.get("rate", 1), obj.get("min_rate"))
+        if "size" in obj:
+            size = int(obj["size"])
+            if size <= 0:
+                raise ValueError("frame size must be positive")
+            result = cls(result.message_id, result.rate, result.min_rate, size)
+
+        return result
+
+    @property
+    def json(self):
+        """Returns the JSON representation of the stream specification."""
+        try:
+            message = MAVMessageType(self.message_id).name
+        except ValueError:
+            message = self.message_id
+
+        return {
+            "message": message,
+            "rate": self.rate,
+            "min_rate": self.min_rate,
+            "size": self.size,
+        }
+
+
+#: Default telemetry streams of the link budget manager, in priority order
+_DEFAULT_STREAMS = (
+    TelemetryStream.create(MAVMessageType.GLOBAL_POSITION_INT, 2, 1),
+    # Keep SYS_STATUS above 0.2 Hz; the driver re-configures the streams of
+    # drones that have not sent a SYS_STATUS message for five seconds
+    TelemetryStream.create(MAVMessageType.SYS_STATUS, 1, 0.5),
+    TelemetryStream.create(MAVMessageType.GPS_RAW_INT, 1, 0.2),
+)
+
+
+@dataclass(frozen=True)
+class LinkBudgetConfiguration:
+    """Configuration of the link budget manager of a single MAVLink network."""
+
+    capacity: float = 0
+    """Total capacity of the links of the network, in bytes per second. Zero
+    means that the link budget of the network is not managed.
+    """
+
+    utilization: float = 0.7
+    """Fraction of the capacity that the drones of the network are allowed
+    to use, leaving the rest for commands, retransmissions and bursts.
+    """
+
+    streams: tuple[TelemetryStream, ...] = _DEFAULT_STREAMS
+    """Telemetry streams whose rates are negotiated with the drones, in
+    decreasing order of priority.
+    """
+
+    DISABLED: ClassVar[LinkBudgetConfiguration]
+    """Special instance to denote the case when the link budget of the network
+    is not managed.
+    """
+
+    @classmethod
+    def from_json(cls, obj):
+        """Constructs a link budget configuration from its JSON representation."""
+        capacity = max(float(obj.get("capacity", 0)), 0.0)
+        utilization = min(max(float(obj.get("utilization", 0.7)), 0.05), 1.0)
+        if "streams" in obj:
+            streams = tuple(TelemetryStream.from_json(item) for item in obj["streams"])
+        else:
+            streams = _DEFAULT_STREAMS
+
+        return cls(capacity=capacity, utilization=utilization, streams=streams)
+
+    @property
+    def enabled(self) -> bool:
+        """Returns whether the link budget of the network is managed."""
+        return self.capacity > 0 and bool(self.streams)
+
+    @property
+    def json(self):
+        """Returns the JSON representation of the link budget configuration."""
+        return {
+            "capacity": self.capacity,
+            "utilization": self.utilization,
+            "streams": [stream.json for stream in self.streams],
+        }
+
+
+LinkBudgetConfiguration.DISABLED = LinkBudgetConfiguration()
+
+
+def allocate_stream_rates(
+    budget: float, streams: Sequence[TelemetryStream]
+) -> dict[int, float]:
+    """Distributes the given bandwidth budget of a single drone among its
+    telemetry streams.
+
+    The minimum rates of the streams are always granted, even if they do not
+    fit in the budget. The remaining budget is then used to raise the rates of
+    the streams towards their desired rates, in the order they were given, so
+    high-priority streams reach their desired rates before lower-priority
+    streams get anything above their minimum.
+
+    Parameters:
+        budget: the budget of the drone for its negotiated telemetry streams,
+            in bytes per second
+        streams: the telemetry streams of the drone, in decreasing order of
+            priority
+
+    Returns:
+        a dictionary mapping the message IDs of the streams to their allocated
+        rates, in Hz
+    """
+    result = {stream.message_id: stream.min_rate for stream in streams}
+    remaining = budget - sum(stream.min_rate * stream.size for stream in streams)
+
+    for stream in streams:
+        if remaining <= 0:
+            break
+
+        extra = min(stream.rate - stream.min_rate, remaining / stream.size)
+        if extra > 0:
+            result[stream.message_id] += extra
+            remaining -= extra * stream.size
+
+    # Round the rates to avoid requesting intervals with spurious precision
+    return {message_id: round(rate, 2) for message_id, rate in result.items()}
+
+
+def _rates_differ(current: dict[int, float], desired: dict[int, float]) -> bool:
+    """Returns whether the rate of at least one stream in the desired stream
+    rates differs from the current one significantly.
+    """
+    for message_id, rate in desired.items():
+        current_rate = current.get(message_id)
+        if current_rate is None:
+            return True
+        if abs(rate - current_rate) > _RATE_CHANGE_THRESHOLD * max(rate, current_rate):
+            return True
+    return False
+
+
+class LinkBudgetManager:
+    """Class that measures the inbound traffic of a single MAVLink network and
+    re-negotiates the rates of the telemetry streams of its drones to keep
+    the traffic within the budget of the network.
+    """
+
+    _bytes_by_connection: defaultdict[str, int]
+    """Number of bytes received on each connection since the last update."""
+
+    _bytes_by_system_id: defaultdict[int, int]
+    """Number of bytes received from each system ID since the last update."""
+
+    _min_txbuf: Optional[int]
+    """Smallest ``txbuf`` value seen in RADIO_STATUS messages since the last
+    update; `None` if no RADIO_STATUS message was received.
+    """
+
+    _scale: float
+    """Multiplier of the configured budget, adjusted dynamically based on the
+    congestion reports of the radios.
+    """
+
+    def __init__(
+        self,
+        network: "MAVLinkNetwork",
+        config: LinkBudgetConfiguration = LinkBudgetConfiguration.DISABLED,
+        *,
+        interval: float = 5,
+    ):
+        """Constructor.
+
+        Parameters:
+            network: the network whose link budget this object manages
+            config: the configuration of the link budget
+            interval: number of seconds between consecutive updates of the
+                measured traffic and the stream rates
+        """
+        self._config = config
+        self._interval = interval
+        self._network = network
+
+        self._bytes_by_connection = defaultdict(int)
+        self._bytes_by_system_id = defaultdict(int)
+        self._min_txbuf = None
+        self._scale = 1.0
+
+        self.bytes_per_second_by_connection: dict[str, float] = {}
+        self.bytes_per_second_by_system_id: dict[int, float] = {}
+        self.stream_rates = allocate_stream_rates(
+            self.budget_per_uav(1), config.streams
+        )
+
+    @property
+    def config(self) -> LinkBudgetConfiguration:
+        """The configuration of the link budget."""
+        return self._config
+
+    @property
+    def enabled(self) -> bool:
+        """Returns whether the link budget of the network is managed."""
+        return self._config.enabled
+
+    @property
+    def scale(self) -> float:
+        """Multiplier of the configured budget, adjusted dynamically based on
+        the congestion reports of the radios in the network.
+        """
+        return self._scale
+
+    def budget_per_uav(self, num_uavs: int) -> float:
+        """Returns the number of bytes per second that a single drone may use
+        for its telemetry if the given number of drones share the link.
+        """
+        config = self._config
+        budget = config.capacity * config.utilization * self._scale
+        return budget / max(num_uavs, 1)
+
+    def notify_message(self, connection_id: str, system_id: int, size: int) -> None:
+        """Notifies the manager that a MAVLink message of the given size was
+        received on the given connection from the given system ID.
+
+        This function is called for every inbound message so it must be fast.
+        """
+        self._bytes_by_connection[connection_id] += size
+        self._bytes_by_system_id[system_id] += size
+
+    def notify_radio_status(self, message: MAVLinkMessage) -> None:
+        """Notifies the manager that a RADIO_STATUS message was received from
+        one of the radios in the network.
+        """
+        txbuf = message.txbuf
+        if self._min_txbuf is None or txbuf < self._min_txbuf:
+            self._min_txbuf = txbuf
+
+    async def run(self) -> None:
+        """Background task that measures the traffic of the network regularly
+        and updates the telemetry stream rates of its drones as needed.
+        """
+        if not self.enabled:
+            return
+
+        log = self._network.log
+        while True:
+            try:
+                await self._run()
+            except Exception:
+                if log:
+                    log.exception(
+                        "Link budget manager stopped unexpectedly, restarting..."
+                    )
+                await sleep(0.5)
+
+    async def _run(self) -> None:
+        last_updated_at = current_time()
+        async for _ in periodic(self._interval):
+            now = current_time()
+            self._update_measurements(now - last_updated_at)
+            last_updated_at = now
+
+            uavs = [uav for uav in self._network.uavs() if uav.is_connected]
+            for uav, rates in self._allocate(uavs):
+                if _rates_differ(uav.stream_rates, rates):
+                    uav.set_stream_rates(rates)
+
+    def _allocate(
+        self, uavs: Sequence["MAVLinkUAV"]
+    ) -> list[tuple["MAVLinkUAV", dict[int, float]]]:
+        """Calculates the telemetry stream rates of the given drones that keep
+        the traffic of the network within the budget.
+
+        Traffic from a drone that is not accounted for by its negotiated
+        streams (status texts, mission and parameter transfers etc.) is
+        deducted from the budget of that drone.
+        """
+        streams = self._config.streams
+        share = self.budget_per_uav(len(uavs))
+        measured = self.bytes_per_second_by_system_id
+        result = []
+
+        for uav in uavs:
+            current = uav.stream_rates
+            expected = _HEARTBEAT_BYTES_PER_SECOND + sum(
+                current.get(stream.message_id, 0) * stream.size for stream in streams
+            )
+            unmanaged = max(measured.get(uav.system_id, expected) - expected, 0.0)
+            budget = share - _HEARTBEAT_BYTES_PER_SECOND - unmanaged
+            result.append((uav, allocate_stream_rates(budget, streams)))
+
+        self.stream_rates = allocate_stream_rates(
+            share - _HEARTBEAT_BYTES_PER_SECOND, streams
+        )
+        return result
+
+    def _update_measurements(self, dt: float) -> None:
+        """Updates the measured traffic of the connections and the drones and
+        adjusts the scale of the budget if the link is congested.
+
+        The scale follows an additive increase / multiplicative decrease
+        scheme: it is cut back quickly when the radios report that their
+        buffers are filling up or when the measured traffic exceeds the
+        capacity, and it recovers slowly otherwise.
+        """
+        if dt <= 0:
+            return
+
+        self.bytes_per_second_by_connection = {
+            key: value / dt for key, value in self._bytes_by_connection.items()
+        }
+        self.bytes_per_second_by_system_id = {
+            key: value / dt for key, value in self._bytes_by_system_id.items()
+        }
+        self._bytes_by_connection.clear()
+        self._bytes_by_system_id.clear()
+
+        min_txbuf, self._min_txbuf = self._min_txbuf, None
+        load = max(self.bytes_per_second_by_connection.values(), default=0.0)
+        capacity = self._config.capacity
+
+        if (
+            min_txbuf is not None and min_txbuf < _TXBUF_CONGESTION_THRESHOLD
+        ) or load > capacity:
+            self._scale = max(self._scale * 0.75, 0.25)
+        elif load < capacity * self._config.utilization:
+            self._scale = min(self._scale + 0.05, 1.0)
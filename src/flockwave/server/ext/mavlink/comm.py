@@ -20,6 +20,7 @@ from flockwave.server.comm import NO_BROADCAST_ADDRESS, CommunicationManager
 
 from .enums import MAVComponent
 from .signing import MAVLinkSigningConfiguration
+from .recorder import FlightRecorder, Writer
 from .types import MAVLinkMessage, MAVLinkMessageSpecification
 
 
@@ -133,6 +134,7 @@ def create_communication_manager(
     system_id: int = 255,
     signing: MAVLinkSigningConfiguration = MAVLinkSigningConfiguration.DISABLED,
     use_broadcast_rate_limiting: bool = False,
+    recorder: Optional[FlightRecorder] = None,
 ) -> CommunicationManager[MAVLinkMessageSpecification, Any]:
     """Creates a communication manager instance for a single network managed
     by the extension.
@@ -149,6 +151,8 @@ def create_communication_manager(
             rate limiting problems if there are any. Typically you can leave
             this setting at `False` unless you see lots of lost broadcast
             packets.
+        recorder: flight recorder that records the raw MAVLink frames
+            received on the connections of the communication manager
     """
     # Create a dictionary to cache link IDs to existing connections so we can
     # keep on using the same link ID for the same connection even if it is
@@ -159,6 +163,7 @@ def create_communication_manager(
         signing=signing,
         link_ids=link_ids,
         system_id=system_id,
+        recorder=recorder,
     )
 
     if packet_loss > 0:
@@ -208,6 +213,7 @@ def create_mavlink_message_channel(
     system_id: int = 255,
     link_ids: Optional[dict[Connection, int]] = None,
     signing: MAVLinkSigningConfiguration = MAVLinkSigningConfiguration.DISABLED,
+    recorder: Optional[FlightRecorder] = None,
 ) -> MessageChannel[tuple[MAVLinkMessage, str]]:
     """Creates a bidirectional Trio-style channel that reads data from and
     writes data to the given connection, and does the parsing of MAVLink
@@ -226,6 +232,8 @@ def create_mavlink_message_channel(
             unsigned links
         signing: specifies whether outbound messages should be signed and
             inbound messages should be checked for a valid signature
+        recorder: flight recorder that records the raw MAVLink frames received
+            on the channel
     """
     if link_ids is not None:
         link_id = link_ids.get(connection, -1)
@@ -238,13 +246,15 @@ def create_mavlink_message_channel(
         dialect, system_id, link_id=link_id, signing=signing
     )
 
+    record = recorder.create_writer(connection) if recorder else None
+
     if isinstance(connection, StreamConnectionBase):
         channel = _create_stream_based_mavlink_message_channel(
-            connection, log, mavlink_factory=mavlink_factory
+            connection, log, mavlink_factory=mavlink_factory, record=record
         )
     else:
         channel = _create_datagram_based_mavlink_message_channel(
-            connection, log, mavlink_factory=mavlink_factory
+            connection, log, mavlink_factory=mavlink_factory, record=record
         )
 
     if signing.enabled:
@@ -260,7 +270,11 @@ def create_mavlink_message_channel(
 
 
 def _create_stream_based_mavlink_message_channel(
-    connection: Connection, log: Logger, *, mavlink_factory: MAVLinkFactory
+    connection: Connection,
+    log: Logger,
+    *,
+    mavlink_factory: MAVLinkFactory,
+    record: Optional[Writer] = None,
 ) -> MessageChannel[tuple[MAVLinkMessage, str]]:
     """Creates a bidirectional Trio-style channel that reads data from and
     writes data to the given stream-based connection, and does the parsing
@@ -289,6 +303,8 @@ def _create_stream_based_mavlink_message_channel(
         # Parse the MAVLink messages from the buffer. mavlink.parse_buffer()
         # may occasionally return None so make sure we handle that gracefully.
         messages = mavlink.parse_buffer(data) or ()
+        if record and messages:
+            record(messages, "")
         return [(message, "") for message in messages]
 
     def encoder(spec_and_address: tuple[MAVLinkMessageSpecification, Any]) -> bytes:
@@ -311,7 +327,11 @@ def _create_stream_based_mavlink_message_channel(
 
 
 def _create_datagram_based_mavlink_message_channel(
-    connection: Connection, log: Logger, *, mavlink_factory: MAVLinkFactory
+    connection: Connection,
+    log: Logger,
+    *,
+    mavlink_factory: MAVLinkFactory,
+    record: Optional[Writer] = None,
 ) -> MessageChannel[tuple[MAVLinkMessage, str]]:
     """Creates a bidirectional Trio-style channel that reads data from and
     writes data to the given datagram-based connection, and does the parsing
@@ -344,6 +364,8 @@ def _create_datagram_based_mavlink_message_channel(
 
         mavlink = mavlink_by_address[address]
         messages = mavlink.parse_buffer(data) or ()
+        if record and messages:
+            record(messages, address)
 
         return [(message, address) for message in messages]
 
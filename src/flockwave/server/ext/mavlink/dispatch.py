@@ -0,0 +1,116 @@
+"""Lookup table used by the inbound MAVLink message loop of a MAVLink
+network to route messages to their handlers.
+
+The table is a dictionary so the inbound loop can query it with a plain
+``dict.get()`` call for every message; the slow path that fills the table is
+implemented as a method.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from .types import MAVLinkMessage
+
+__all__ = ("MessageHandlerTable",)
+
+
+HandlerEntry = tuple[str, Optional[Callable[..., None]], bool]
+"""Entry of a message handler table: the type name of the message, the handler
+of the message (``None`` if the message is to be ignored) and whether the
+handler has to be called with the UAV that sent the message instead of the
+connection ID and the address of the sender.
+"""
+
+
+class MessageHandlerTable(dict[int, HandlerEntry]):
+    """Table of the handlers of inbound MAVLink messages, keyed by numeric
+    MAVLink message ID.
+
+    Handlers are registered by message type name; each message type is
+    resolved to its numeric message ID by `resolve()` when the first message
+    of that type arrives, so all subsequent messages of the same type are
+    routed with a single integer lookup.
+    """
+
+    _handlers: dict[str, Optional[Callable[..., None]]]
+    """Dictionary mapping message type names to network-level handlers that
+    are called with the message, the connection ID and the address of the
+    sender.
+    """
+
+    _on_unknown: Optional[Callable[[MAVLinkMessage], None]]
+    """Function to call with the first message of each type that has no
+    handler in the table.
+    """
+
+    _uav_handlers: dict[str, Callable[[Any, MAVLinkMessage], None]]
+    """Dictionary mapping message type names to handlers that are called with
+    the UAV that sent the message and the message itself.
+    """
+
+    def __init__(
+        self,
+        handlers: Optional[dict[str, Optional[Callable[..., None]]]] = None,
+        uav_handlers: Optional[dict[str, Callable[[Any, MAVLinkMessage], None]]] = None,
+        *,
+        on_unknown: Optional[Callable[[MAVLinkMessage], None]] = None,
+    ):
+        """Constructor.
+
+        Parameters:
+            handlers: dictionary mapping message type names to handlers that
+                are called with the message and the ``connection_id`` and
+                ``address`` keyword arguments. ``None`` handlers mark message
+                types that are known but ignored.
+            uav_handlers: dictionary mapping message type names to handlers
+                that are called with the UAV that sent the message and the
+                message itself
+            on_unknown: function to call with the first message of each type
+                that has no handler in the table. Messages of such types are
+                ignored afterwards.
+        """
+        super().__init__()
+        self._handlers = dict(handlers or {})
+        self._on_unknown = on_unknown
+        self._uav_handlers = dict(uav_handlers or {})
+
+    def lookup(self, message: MAVLinkMessage) -> HandlerEntry:
+        """Returns the handler entry corresponding to the given message.
+
+        Parameters:
+            message: the message to look up
+
+        Returns:
+            the type name of the message, the handler of the message (``None``
+            if the message should be ignored) and whether the handler expects
+            the UAV that sent the message
+        """
+        entry = self.get(message.get_msgId())
+        return entry if entry is not None else self.resolve(message)
+
+    def resolve(self, message: MAVLinkMessage) -> HandlerEntry:
+        """Resolves the handler of the type of the given message by its type
+        name and stores it in the table under the message ID of the message.
+
+        Parameters:
+            message: the message whose type is to be resolved
+
+        Returns:
+            the handler entry of the message; see `lookup()`
+        """
+        type = message.get_type()
+
+        uav_handler = self._uav_handlers.get(type)
+        if uav_handler is not None:
+            entry = (type, uav_handler, True)
+        elif type in self._handlers:
+            entry = (type, self._handlers[type], False)
+        else:
+            entry = (type, None, False)
+            if self._on_unknown:
+                self._on_unknown(message)
+
+        self[message.get_msgId()] = entry
+        return entry
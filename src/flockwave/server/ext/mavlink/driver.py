@@ -10,6 +10,7 @@ from datetime import datetime, timezone
 from functools import partial
 from logging import Logger
 from math import inf, isfinite
+from pathlib import Path
 from time import monotonic
 from trio import fail_after, move_on_after, sleep, TooSlowError
 from typing import Any, AsyncIterator, Callable, Optional, Union
@@ -37,7 +38,7 @@ from flockwave.server.model.transport import TransportOptions
 from flockwave.server.model.uav import VersionInfo, UAVBase, UAVDriver
 from flockwave.server.utils import color_to_rgb8_triplet, to_uppercase_string
 from flockwave.spec.errors import FlockwaveErrorCode
-from flockwave.server.ext.location import get_location
+from flockwave.server.planning.progress import search_progress
 from flockwave.server.show import (
     get_altitude_reference_from_show_specification,
     get_coordinate_system_from_show_specification,
@@ -51,6 +52,7 @@ from flockwave.server.show.formats import SkybrushBinaryShowFile
 
 from .accelerometer import AccelerometerCalibration
 from .autopilots import ArduPilot, Autopilot, UnknownAutopilot
+from .budget import DEFAULT_STREAM_RATES
 from .comm import Channel
 from .compass import CompassCalibration
 from .enums import (
@@ -72,9 +74,12 @@ from .enums import (
 )
 from .ftp import MAVFTP
 from .log_download import MAVLinkLogDownloader
+from .mission_cache import MissionCache
+from .mission_feeder import MAVLinkMissionFeeder
 from .packets import create_led_control_packet, DroneShowExecutionStage, DroneShowStatus
 from .types import MAVLinkMessage, PacketBroadcasterFn, PacketSenderFn, spec
 from .utils import (
+    BandwidthLimiter,
     can_communicate_infer_from_heartbeat,
     log_id_for_uav,
     mavlink_version_number_to_semver,
@@ -124,6 +129,10 @@ class MAVLinkDriver(UAVDriver["MAVLinkUAV"]):
             whenever it wants to broadcast a packet. The function must be
             called with the packet to send. May be `None` if broadcasting
             is not supported.
+        gcs_position: the position of the ground station, used to calculate
+            the distance and the bearing of the UAVs from the ground station;
+            `None` if unknown. Kept up-to-date by the extension when the
+            location of the server changes.
         send_packet: a function that should be called by the driver whenever it
             wants to send a packet. The function must be called with the packet
             to send, and a pair formed by the medium via which the packet
@@ -132,6 +141,7 @@ class MAVLinkDriver(UAVDriver["MAVLinkUAV"]):
 
     broadcast_packet: PacketBroadcasterFn
     create_device_tree_mutator: Callable[[], DeviceTreeMutator]
+    gcs_position: Optional[GPSCoordinate]
     log: Logger
     mandatory_custom_mode: Optional[int]
     run_in_background: Callable[[Callable], None]
@@ -139,6 +149,12 @@ class MAVLinkDriver(UAVDriver["MAVLinkUAV"]):
     gps_fix_hysteresis: float = 0.0
     """GPS fix hysteresis time, in seconds."""
 
+    log_cache_dir: Optional[Path] = None
+    """Directory where partially downloaded flight logs are stored so the
+    downloads can be resumed after a reconnection; ``None`` if downloads
+    cannot be resumed.
+    """
+
     def __init__(self, app=None):
         """Constructor.
 
@@ -151,7 +167,9 @@ class MAVLinkDriver(UAVDriver["MAVLinkUAV"]):
 
         self.broadcast_packet = None  # type: ignore
         self.create_device_tree_mutator = None  # type: ignore
+        self.gcs_position = None
         self.log = None  # type: ignore
+        self.log_cache_dir = None
         self.mandatory_custom_mode = None
         self.run_in_background = None  # type: ignore
         self.send_packet = None  # type: ignore
@@ -1111,6 +1129,12 @@ class MAVLinkUAV(UAVBase):
     driver: MAVLinkDriver
     notify_updated: Callable[[], None]
     send_log_message_to_gcs: Callable[[str], None]
+
+    log_download_limiter: Optional[BandwidthLimiter] = None
+    """Bandwidth limiter shared by the log downloads of all the drones in the
+    network of the drone; ``None`` if the bandwidth is not limited.
+    """
+
     _accelerometer_calibration: Optional[AccelerometerCalibration] = None
     """Accelerometer calibration status of the drone, constructed lazily.
 
@@ -1147,6 +1171,19 @@ class MAVLinkUAV(UAVBase):
     ensure that the log downloader object is created on-demand.
     """
 
+    _mission_cache: Optional[MissionCache] = None
+    """Cache of the missions, geofences and rally points that the drone has
+    last confirmed, constructed lazily.
+
+    Use the `mission_cache` getter to access this property; this will ensure
+    that the cache is created on-demand.
+    """
+
+    _mission_feeder: Optional[MAVLinkMissionFeeder] = None
+    """Feeder that streams a long path to the drone in windows of waypoints;
+    `None` if no path is being streamed.
+    """
+
     _network_id = ""
     """Stores the MAVLink network ID of the drone (not part of the MAVLink
     messages; used by us to track which MAVLink network of ours the
@@ -1208,6 +1245,10 @@ class MAVLinkUAV(UAVBase):
         #: in seconds
         self._scheduled_takeoff_time_gps_time_of_week = None
 
+        #: Rates of the telemetry streams that we request from the drone, in Hz,
+        #: keyed by MAVLink message IDs
+        self._stream_rates = dict(DEFAULT_STREAM_RATES)
+
         #: Current velocity of the drone in NED coordinate system, m/sec
         self._velocity = VelocityNED()
 
@@ -1723,6 +1764,9 @@ class MAVLinkUAV(UAVBase):
             self._position.lon = message.lon / 1e7
             self._position.amsl = message.alt / 1e3
             self._position.ahl = message.relative_alt / 1e3
+            search_progress.update(
+                self.id, self._position.lon, self._position.lat, self._position.ahl
+            )
         else:
             # Some drones, such as the Parrot Bebop 2, use 2^31-1 as latitude
             # and longitude to indicate that no GPS fix has been obtained yet,
@@ -1740,19 +1784,11 @@ class MAVLinkUAV(UAVBase):
         else:
             heading = 0
 
-        location = None
-
-        if callable(get_location):
-            for _ in range(3):
-                location = get_location()
-                if location is None or location.position is None:
-                    continue
-
-        self.update_status(
-            position=self._position,
-            velocity=self._velocity,
-            heading=heading,
-            gcsLocation=location.position,
+        self.update_position(
+            self._position,
+            self._velocity,
+            heading,
+            gcs_position=self.driver.gcs_position,
         )
         self.notify_updated()
 
@@ -1803,6 +1839,11 @@ class MAVLinkUAV(UAVBase):
     def handle_message_mag_cal_report(self, message: MAVLinkMessage):
         self.compass_calibration.handle_message_mag_cal_report(message)
 
+    def handle_message_mission_current(self, message: MAVLinkMessage):
+        feeder = self._mission_feeder
+        if feeder is not None:
+            feeder.notify_mission_current(message.seq)
+
     def handle_message_radio_status(self, message: MAVLinkMessage):
         # Limitations:
         # - Currently we do not account for multiple connections; we always
@@ -1884,6 +1925,15 @@ class MAVLinkUAV(UAVBase):
         """The MAVLink version supported by this UAV."""
         return self._mavlink_version
 
+    @property
+    def mission_cache(self) -> MissionCache:
+        """Cache of the missions, geofences and rally points that the drone
+        has last confirmed.
+        """
+        if self._mission_cache is None:
+            self._mission_cache = MissionCache()
+        return self._mission_cache
+
     @property
     def network_id(self) -> str:
         """The network ID of the UAV."""
@@ -1894,6 +1944,26 @@ class MAVLinkUAV(UAVBase):
         """The system ID of the UAV."""
         return self._system_id
 
+    @property
+    def stream_rates(self) -> dict[int, float]:
+        """The rates of the telemetry streams that we request from the UAV, in
+        Hz, keyed by MAVLink message IDs.
+        """
+        return self._stream_rates
+
+    def set_stream_rates(self, rates: dict[int, float]) -> None:
+        """Updates the rates of the telemetry streams that we request from the
+        UAV and re-configures the data streams of the UAV if it is connected.
+
+        Parameters:
+            rates: the new rates of the telemetry streams, in Hz, keyed by
+                MAVLink message IDs. Streams not included here keep their
+                current rates.
+        """
+        self._stream_rates.update(rates)
+        if self.is_connected:
+            self._configure_data_streams_soon(force=True)
+
     def notify_disconnection(self) -> None:
         """Notifies the UAV state object that we have detected that it has been
         disconnected from the network. In other words, the heartbeats from the
@@ -2056,6 +2126,33 @@ class MAVLinkUAV(UAVBase):
         )
         await self.driver.send_packet(message, self, channel=channel)
 
+    async def stream_mission(self, path, altitude: float, **kwds) -> None:
+        """Streams a path that may be longer than what the autopilot can hold
+        as its mission to the drone, keeping a window of the next few
+        waypoints uploaded as the mission of the drone. Any path that is
+        being streamed to the drone is cancelled first.
+
+        Returns when the last window of the path was uploaded.
+
+        Parameters:
+            path: the waypoints of the path, as longitude-latitude pairs
+            altitude: the altitude of the waypoints, relative to the home
+                position, in metres
+
+        Keyword arguments are forwarded to the constructor of
+        MAVLinkMissionFeeder_.
+        """
+        feeder = MAVLinkMissionFeeder(self, path, altitude, **kwds)
+        if self._mission_feeder is not None:
+            self._mission_feeder.cancel()
+
+        self._mission_feeder = feeder
+        try:
+            await feeder.run()
+        finally:
+            if self._mission_feeder is feeder:
+                self._mission_feeder = None
+
     async def takeoff_to_relative_altitude(
         self, altitude: float = 2.5, *, channel: str = Channel.PRIMARY
     ) -> None:
@@ -2293,18 +2390,12 @@ class MAVLinkUAV(UAVBase):
         """Configures the intervals of the messages that we want to receive from
         the UAV using the newer `SET_MESSAGE_INTERVAL` MAVLink command.
         """
-        stream_rates = [
-            (MAVMessageType.SYS_STATUS, 1),
-            (MAVMessageType.GPS_RAW_INT, 1),
-            (MAVMessageType.GLOBAL_POSITION_INT, 2),
-        ]
-
-        for message_id, interval_hz in stream_rates:
+        for message_id, interval_hz in list(self._stream_rates.items()):
             success = await self.driver.send_command_long(
                 self,
                 MAVCommand.SET_MESSAGE_INTERVAL,
                 param1=message_id,
-                param2=1000000 / interval_hz,
+                param2=1000000 / interval_hz if interval_hz > 0 else -1,
             )
 
             if not success:
@@ -2325,12 +2416,20 @@ class MAVLinkUAV(UAVBase):
             target=self,
         )
 
+        # Legacy streams accept integer rates only and group multiple messages
+        # together so we cannot go below 1 Hz
+        rates = self._stream_rates
+
         # EXTENDED_STATUS: we need SYS_STATUS from it for the general status
         # flags and GPS_RAW_INT for the GPS fix info.
         await self.driver.send_packet(
             spec.request_data_stream(
                 req_stream_id=MAVDataStream.EXTENDED_STATUS,
-                req_message_rate=1,
+                req_message_rate=max(
+                    round(rates.get(MAVMessageType.SYS_STATUS, 1)),
+                    round(rates.get(MAVMessageType.GPS_RAW_INT, 1)),
+                    1,
+                ),
                 start_stop=1,
             ),
             target=self,
@@ -2340,7 +2439,9 @@ class MAVLinkUAV(UAVBase):
         await self.driver.send_packet(
             spec.request_data_stream(
                 req_stream_id=MAVDataStream.POSITION,
-                req_message_rate=2,
+                req_message_rate=max(
+                    round(rates.get(MAVMessageType.GLOBAL_POSITION_INT, 2)), 1
+                ),
                 start_stop=1,
             ),
             target=self,
@@ -2386,6 +2487,11 @@ class MAVLinkUAV(UAVBase):
         # Reset our internal state object of the compass calibration procedure
         self.compass_calibration.reset()
 
+        # The missions may have been modified while we were not watching;
+        # they will be downloaded and compared again before the next upload
+        if self._mission_cache is not None:
+            self._mission_cache.invalidate()
+
     async def _request_autopilot_capabilities(self) -> None:
         """Sends a request to the autopilot to send its capabilities via MAVLink
         in a separate packet.
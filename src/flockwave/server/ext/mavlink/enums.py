@@ -71,6 +71,7 @@ class MAVCommand(IntEnum):
     PREFLIGHT_REBOOT_SHUTDOWN = 246
     COMPONENT_ARM_DISARM = 400
     SET_MESSAGE_INTERVAL = 511
+    REQUEST_MESSAGE = 512
     REQUEST_PROTOCOL_VERSION = 519
     REQUEST_AUTOPILOT_CAPABILITIES = 520
     REQUEST_CAMERA_INFORMATION = 521
@@ -175,6 +176,7 @@ class MAVMessageType(IntEnum):
     COMMAND_LONG = 76
     COMMAND_ACK = 77
     SET_POSITION_TARGET_GLOBAL_INT = 86
+    RADIO_STATUS = 109
     AUTOPILOT_VERSION = 148
     MAG_CAL_PROGRESS = 191  # ArduPilot-specific
     MAG_CAL_REPORT = 192
@@ -9,12 +9,14 @@ from logging import Logger
 from typing import cast, Optional, TYPE_CHECKING
 
 from flockwave.server.ext.base import UAVExtension
+from flockwave.server.ext.location import get_location
 from flockwave.server.registries.errors import RegistryFull
 from flockwave.server.utils import optional_int, overridden
 
 from .driver import MAVLinkDriver, MAVLinkUAV
 from .errors import InvalidSigningKeyError
 from .network import MAVLinkNetwork
+from .recorder import FlightRecorder
 from .tasks import check_uavs_alive
 from .types import (
     MAVLinkMessage,
@@ -27,6 +29,7 @@ from flockwave.server.model import UAV
 
 if TYPE_CHECKING:
     from flockwave.server.app import SkybrushServer
+    from flockwave.server.ext.location import Location
     from flockwave.server.ext.rc import RCState
     from flockwave.server.ext.show.clock import ShowClock
 
@@ -82,6 +85,7 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
         driver.create_device_tree_mutator = self.create_device_tree_mutation_context
         driver.gps_fix_hysteresis = float(configuration.get("gps_fix_hysteresis", 0.0))
         driver.log = self.log
+        driver.log_cache_dir = self.get_cache_dir() / "logs"
         driver.mandatory_custom_mode = optional_int(configuration.get("custom_mode"))
         driver.run_in_background = self.run_in_background
         driver.send_packet = self._send_packet
@@ -99,6 +103,9 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
         status_summary_signal = signals.get("mavlink:status_summary")
         rtk_packet_fragments_signal = signals.get("mavlink:rtk_fragments")
 
+        # Create the flight recorder if needed
+        recorder = self._create_flight_recorder(configuration.get("recorder"))
+
         # Create self._uavs only here and not in the constructor; this is to
         # ensure that we cannot accidentally register a UAV when the extension
         # is not running yet
@@ -113,16 +120,20 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
             "rtk_packet_fragments_signal": rtk_packet_fragments_signal,
             "supervisor": app.supervise,
             "use_connection": app.connection_registry.use,
+            "recorder": recorder,
         }
 
         # Create a cleanup context and run the extension
         with ExitStack() as stack:
             stack.enter_context(overridden(self, _uavs=uavs, _networks=networks))
+            if recorder:
+                stack.enter_context(recorder)
 
             # Connect the signals to our signal handlers
             stack.enter_context(
                 signals.use(
                     {
+                        "location:changed": self._on_location_changed,
                         "rc:changed": self._on_rc_channels_changed,
                         "rtk:packet": self._on_rtk_correction_packet,
                         "show:clock_changed": self._on_show_clock_changed,
@@ -132,6 +143,10 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
                 )
             )
 
+            # Start from the current location of the server; the handler of
+            # the location change signal keeps it up-to-date afterwards
+            self._on_location_changed(get_location())
+
             # Forward the current start configuration for the drones in this network.
             # Note that this can be called only if self._networks has been set
             # up so we cannot do it outside the exit stack
@@ -148,6 +163,11 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
                     for network in networks.values():
                         nursery.start_soon(partial(network.run, **kwds))
 
+                    # Flush the recorded frames periodically even if the
+                    # traffic stops
+                    if recorder:
+                        nursery.start_soon(recorder.run)
+
                     # Create an additional task that periodically checks whether the UAVs
                     # registered in the extension are still alive, and that sends
                     # status summary signals to interested consumers (typically
@@ -178,6 +198,41 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
         for network in self._networks.values():
             await network.broadcast_packet(spec, channel)
 
+    def _create_flight_recorder(self, configuration) -> Optional[FlightRecorder]:
+        """Creates the flight recorder that records the raw MAVLink traffic
+        of the networks, based on the given configuration.
+
+        Parameters:
+            configuration: the ``recorder`` section of the configuration of
+                the extension
+
+        Returns:
+            the flight recorder or ``None`` if recording is disabled
+        """
+        if not configuration or not configuration.get("enabled"):
+            return None
+
+        folder = str(configuration.get("folder", "")) or str(
+            self.get_data_dir() / "recordings"
+        )
+        self.log.info(f"Recording MAVLink traffic in '{folder}'")
+
+        try:
+            return FlightRecorder(
+                folder,
+                segment_size=int(
+                    float(configuration.get("segment_size", 64)) * 1024 * 1024
+                ),
+                segment_duration=float(configuration.get("segment_duration", 3600)),
+                max_segments=int(configuration.get("keep", 0)),
+                log=self.log,
+            )
+        except ValueError:
+            self.log.warning(
+                "Invalid flight recorder configuration, recording disabled"
+            )
+            return None
+
     def _get_network_specifications_from_configuration(
         self, configuration
     ) -> dict[str, MAVLinkNetworkSpecification]:
@@ -257,6 +312,10 @@ class MAVLinkDronesExtension(UAVExtension[MAVLinkDriver]):
 
         return result
 
+    def _on_location_changed(self, sender: "Location") -> None:
+        """Handles the event when the location of the server changed."""
+        self._driver.gcs_position = sender.position
+
     def _on_rc_channels_changed(self, sender: "RCState"):
         """Handles the event when the RC channel values changed."""
         if not self._networks:
@@ -529,6 +588,76 @@ schema = {
                             },
                         },
                     },
+                    "link_budget": {
+                        "type": "object",
+                        "title": "Telemetry link budget",
+                        "properties": {
+                            "capacity": {
+                                "type": "number",
+                                "title": "Link capacity (bytes/s)",
+                                "description": (
+                                    "Number of bytes per second that the links of this "
+                                    "network can carry, shared by all the drones in the "
+                                    "network. A 57600 baud radio can carry about 5000 "
+                                    "bytes per second. When set to a positive value, the "
+                                    "telemetry stream rates of the drones are negotiated "
+                                    "dynamically to fit in this budget. Zero disables "
+                                    "the rate negotiation."
+                                ),
+                                "minimum": 0,
+                                "default": 0,
+                                "propertyOrder": -1000,
+                            },
+                            "utilization": {
+                                "type": "number",
+                                "title": "Target utilization",
+                                "description": (
+                                    "Fraction of the link capacity that telemetry "
+                                    "streams may use; the rest is left for commands "
+                                    "and bursty traffic."
+                                ),
+                                "minimum": 0.05,
+                                "maximum": 1,
+                                "default": 0.7,
+                                "propertyOrder": -500,
+                            },
+                            "streams": {
+                                "type": "array",
+                                "format": "table",
+                                "title": "Telemetry streams",
+                                "description": (
+                                    "Telemetry streams whose rates are negotiated with "
+                                    "the drones, in decreasing order of priority. "
+                                    "Minimum rates are always granted; the rest of the "
+                                    "budget is distributed in priority order."
+                                ),
+                                "items": {
+                                    "type": "object",
+                                    "properties": {
+                                        "message": {
+                                            "type": "string",
+                                            "title": "Message",
+                                            "enum": [
+                                                "GLOBAL_POSITION_INT",
+                                                "GPS_RAW_INT",
+                                                "SYS_STATUS",
+                                            ],
+                                        },
+                                        "rate": {
+                                            "type": "number",
+                                            "title": "Desired rate (Hz)",
+                                            "minimum": 0,
+                                        },
+                                        "min_rate": {
+                                            "type": "number",
+                                            "title": "Minimum rate (Hz)",
+                                            "minimum": 0,
+                                        },
+                                    },
+                                },
+                            },
+                        },
+                    },
                     "signing": {
                         "type": "object",
                         "title": "Message signing",
@@ -582,6 +711,18 @@ schema = {
                         "default": ["client", "server"],
                         "uniqueItems": True,
                     },
+                    "log_download_rate": {
+                        "type": "number",
+                        "title": "Log download rate limit (bytes/s)",
+                        "description": (
+                            "Maximum number of bytes per second that flight log "
+                            "downloads may use in this network, shared by all the "
+                            "drones that are downloading logs at the same time. "
+                            "Zero means no limit."
+                        ),
+                        "minimum": 0,
+                        "default": 0,
+                    },
                     "use_broadcast_rate_limiting": {
                         "type": "boolean",
                         "title": "Apply rate limiting on broadcast messages",
@@ -607,6 +748,52 @@ schema = {
             ),
             "propertyOrder": 0,
         },
+        "recorder": {
+            "type": "object",
+            "title": "Flight recorder",
+            "description": (
+                "Records the raw MAVLink traffic received from the drones for "
+                "later analysis and replay."
+            ),
+            "properties": {
+                "enabled": {
+                    "type": "boolean",
+                    "title": "Record MAVLink traffic",
+                    "default": False,
+                    "format": "checkbox",
+                    "propertyOrder": -1000,
+                },
+                "folder": {
+                    "type": "string",
+                    "title": "Folder",
+                    "description": (
+                        "Folder to store the recordings in. Leave empty to use "
+                        "the data folder of the server."
+                    ),
+                    "default": "",
+                },
+                "segment_size": {
+                    "type": "number",
+                    "title": "Maximum segment size (MB)",
+                    "minimum": 1,
+                    "default": 64,
+                },
+                "segment_duration": {
+                    "type": "number",
+                    "title": "Maximum segment duration (seconds)",
+                    "minimum": 1,
+                    "default": 3600,
+                },
+                "keep": {
+                    "type": "integer",
+                    "title": "Number of segments to keep",
+                    "description": "Zero means to keep all segments.",
+                    "minimum": 0,
+                    "default": 0,
+                },
+            },
+            "propertyOrder": 6000,
+        },
         "custom_mode": {
             "type": "integer",
             "minimum": 0,
@@ -9,7 +9,16 @@ from itertools import cycle, islice
 from pathlib import PurePosixPath
 from random import randint
 from struct import Struct
-from trio import fail_after, move_on_after, TooSlowError, wrap_file
+from trio import (
+    CancelScope,
+    Semaphore,
+    current_time,
+    fail_after,
+    move_on_after,
+    open_nursery,
+    TooSlowError,
+    wrap_file,
+)
 from typing import (
     AsyncIterable,
     AsyncIterator,
@@ -26,7 +35,7 @@ from flockwave.server.show.utils import crc32_mavftp as crc32
 
 from .types import MAVLinkMessage, spec
 
-__all__ = ("MAVFTP",)
+__all__ = ("MAVFTP", "MAVFTPStatistics")
 
 
 #: Type specification for FTP paths that are accepted by MAVFTP
@@ -35,6 +44,20 @@ FTPPath = Union[str, bytes]
 #: Maximum number of bytes allowed in a single read/write operation
 _MAVFTP_CHUNK_SIZE = 239
 
+#: Initial, minimum and maximum number of seconds to wait for a reply before
+#: re-sending a MAVFTP request
+_INITIAL_RETRANSMISSION_TIMEOUT = 0.5
+_MIN_RETRANSMISSION_TIMEOUT = 0.1
+_MAX_RETRANSMISSION_TIMEOUT = 2.0
+
+#: Maximum number of seconds to keep on re-sending a single MAVFTP request
+_MAX_WAIT_TIME = 60
+
+#: Default number of write operations that may be in flight at the same time
+#: during an upload. ArduPilot queues at most five MAVFTP requests so we stay
+#: below that.
+_DEFAULT_WINDOW_SIZE = 4
+
 
 class MAVFTPOpCode(IntEnum):
     """Opcodes for the MAVFTP sub-protocol of MAVLink."""
@@ -172,6 +195,8 @@ class MAVFTPMessage:
     offset: int = 0
     data: bytes = b""
     size: Optional[int] = None
+    req_opcode: int = 0
+    burst_complete: bool = False
 
     @classmethod
     def decode(cls, payload: bytes, expected_seq_no: Optional[int] = None):
@@ -206,6 +231,8 @@ class MAVFTPMessage:
                 offset=offset,
                 data=bytes(data[:size]),
                 size=size,
+                req_opcode=req_opcode,
+                burst_complete=bool(burst_complete),
             )
         else:
             raise SequenceNumberMismatch()
@@ -240,7 +267,13 @@ class MAVFTPMessage:
         size = self.size if self.size is not None else len(self.data)
         return (
             _MAVFTPMessageStruct.pack(
-                seq_no, self.session_id, self.opcode, size, 0, 0, self.offset
+                seq_no,
+                self.session_id,
+                self.opcode,
+                size,
+                self.req_opcode,
+                int(self.burst_complete),
+                self.offset,
             )
             + self.data
         )
@@ -278,6 +311,114 @@ class MAVFTPMessage:
             raise ValueError("Message is not an error")
 
 
+@dataclass
+class MAVFTPStatistics:
+    """Counters describing the traffic of a single MAVFTP connection."""
+
+    requests: int = 0
+    """Number of MAVFTP requests sent, not counting re-sent requests."""
+
+    retries: int = 0
+    """Number of requests that had to be re-sent because no reply arrived in
+    time.
+    """
+
+    gaps: int = 0
+    """Number of byte ranges that were lost from burst reads and had to be
+    re-requested with ordinary reads.
+    """
+
+    bytes_read: int = 0
+    """Number of bytes downloaded from the UAV."""
+
+    bytes_written: int = 0
+    """Number of bytes uploaded to the UAV."""
+
+    transfer_time: float = 0.0
+    """Number of seconds spent with downloading and uploading files."""
+
+    round_trip_time: Optional[float] = None
+    """Smoothed round-trip time of MAVFTP requests, in seconds; `None` if
+    it was not measured yet.
+    """
+
+    @property
+    def throughput(self) -> float:
+        """Average number of bytes transferred per second while downloading
+        or uploading files.
+        """
+        if self.transfer_time > 0:
+            return (self.bytes_read + self.bytes_written) / self.transfer_time
+        else:
+            return 0.0
+
+
+class _BurstReadCollector:
+    """Message matcher that collects the replies to a single BURST_READ_FILE
+    request.
+
+    The UAV answers a burst read request with a stream of ACK messages, the last
+    one of which has its ``burst_complete`` flag set, or with a NAK when it
+    reaches the end of the file. The matcher returns `True` when the burst is
+    over. It also pushes the deadline of the given cancel scope further every
+    time a reply arrives so the caller waits until the link goes quiet instead
+    of waiting for a fixed amount of time.
+    """
+
+    chunks: dict[int, bytes]
+    """The chunks received so far, keyed by their offsets."""
+
+    eof: bool
+    """Whether the UAV reported that the end of the file was reached."""
+
+    error: Optional[MAVFTPMessage]
+    """The NAK received from the UAV if it is not an end-of-file marker."""
+
+    def __init__(self, session_id: int, scope: CancelScope, timeout: float):
+        """Constructor.
+
+        Parameters:
+            session_id: the session ID of the burst read request
+            scope: the cancel scope that the caller waits for the replies in
+            timeout: the number of seconds to wait after each reply for the
+                next one
+        """
+        self.chunks = {}
+        self.eof = False
+        self.error = None
+
+        self._scope = scope
+        self._session_id = session_id
+        self._timeout = timeout
+
+    def __call__(self, message: MAVLinkMessage) -> bool:
+        payload = message.payload
+        if len(payload) < _MAVFTPMessageStruct.size:
+            return False
+
+        reply = MAVFTPMessage.decode(payload)
+        if (
+            reply.req_opcode != MAVFTPOpCode.BURST_READ_FILE
+            or reply.session_id != self._session_id
+        ):
+            return False
+
+        self._scope.deadline = current_time() + self._timeout
+
+        if reply.is_ack:
+            if reply.data:
+                self.chunks[reply.offset] = reply.data
+            return reply.burst_complete
+        elif reply.is_nak:
+            if reply.data and reply.data[0] == MAVFTPErrorCode.EOF:
+                self.eof = True
+            else:
+                self.error = reply
+            return True
+        else:
+            return False
+
+
 class MAVFTPSession:
     """Class representing a single reading or writing session over a MAVFTP
     connection.
@@ -304,6 +445,11 @@ class MAVFTPSession:
         self._session_id = session_id
         self._sender = sender
 
+    @property
+    def session_id(self) -> int:
+        """The session ID of the session."""
+        return self._session_id
+
     async def aclose(self) -> None:
         """Closes the session. The session object should not be used after
         calling this method.
@@ -396,6 +542,14 @@ class MAVFTP:
     _closing: bool
     """Stores whether the MAVFTP connection is being closed."""
 
+    _retransmission_timeout: float
+    """Number of seconds to wait for a reply before re-sending a request,
+    derived from the measured round-trip times.
+    """
+
+    _rtt_variance: float
+    """Smoothed mean deviation of the measured round-trip times."""
+
     _sender: Callable[[MAVFTPMessage], Awaitable[None]]
     """A function that can be called to send a MAVFTP message associated to
     this MAVFTP object.
@@ -404,20 +558,55 @@ class MAVFTP:
     _seq: Iterator[int]
     """An iterator yielding sequence numbers for the connection."""
 
+    _statistics: MAVFTPStatistics
+    """Counters describing the traffic of the connection."""
+
+    _supports_burst_read: bool
+    """Whether the UAV is assumed to support burst reads. Cleared when the
+    UAV rejects a burst read request.
+    """
+
+    _window_size: int
+    """Maximum number of write operations in flight during uploads."""
+
     @classmethod
     def for_uav(cls, uav):
         """Constructs a MAVFTP connection object to the given UAV."""
         sender = partial(uav.driver.send_packet, target=uav)
         return cls(sender)
 
-    def __init__(self, sender: Callable[[MAVFTPMessage], Awaitable[None]]):
-        """Constructor."""
+    def __init__(
+        self,
+        sender: Callable[[MAVFTPMessage], Awaitable[None]],
+        *,
+        window_size: int = _DEFAULT_WINDOW_SIZE,
+    ):
+        """Constructor.
+
+        Parameters:
+            sender: function that sends a MAVLink message to the UAV and
+                optionally waits for a matching reply
+            window_size: maximum number of write operations that may be in
+                flight at the same time during uploads
+        """
         self._closed = False
         self._closing = False
 
         self._path = PurePosixPath("/")
         self._seq = islice(cycle(range(65536)), randint(0, 65535), None)
         self._sender = sender
+        self._retransmission_timeout = _INITIAL_RETRANSMISSION_TIMEOUT
+        self._rtt_variance = 0.0
+        self._statistics = MAVFTPStatistics()
+        self._supports_burst_read = True
+        self._window_size = max(int(window_size), 1)
+
+    @property
+    def statistics(self) -> MAVFTPStatistics:
+        """Counters describing the traffic of the connection, including the
+        throughput of the file transfers and the number of retries.
+        """
+        return self._statistics
 
     async def aclose(self) -> None:
         """Closes the MAVFTP connection and instructs the PixHawk to close
@@ -450,6 +639,10 @@ class MAVFTP:
     async def get(self, remote_path: FTPPath, fp=None) -> Optional[bytes]:
         """Downloads a file at a given remote path.
 
+        The file is downloaded with burst reads if the UAV supports them. Chunks
+        lost from a burst are re-requested individually. Otherwise, the file is
+        read one chunk at a time.
+
         Parameters:
             path: remote path where the file is located
             fp: optional async file-like object to write the downloaded file to.
@@ -467,30 +660,19 @@ class MAVFTP:
             await self.get(remote_path, wrap_file(buffer))
             return buffer.getvalue()
 
-        message = MAVFTPMessage(MAVFTPOpCode.OPEN_FILE_RO, data=remote_path)
-        reply = await self._send_and_wait(message)
-
-        async with self._open_session(reply.session_id) as session:
-            offset = 0
-            got_eof = False
-            while not got_eof:
-                bytes_requested = _MAVFTP_CHUNK_SIZE
-                try:
-                    chunk = await session.read(offset=offset, size=bytes_requested)
-                except OperationNotAcknowledgedError as ex:
-                    if ex.code == MAVFTPErrorCode.EOF:
-                        chunk = b""
-                    else:
-                        raise
-
-                if chunk:
-                    await fp.write(chunk)
-                    offset += len(chunk)
-                else:
-                    got_eof = True
-
-                if len(chunk) < bytes_requested:
-                    got_eof = True
+        started_at = current_time()
+        try:
+            message = MAVFTPMessage(MAVFTPOpCode.OPEN_FILE_RO, data=remote_path)
+            reply = await self._send_and_wait(message)
+
+            async with self._open_session(reply.session_id) as session:
+                offset = 0
+                if self._supports_burst_read:
+                    offset = await self._read_in_bursts(session, fp)
+                if offset is not None:
+                    await self._read_range(session, fp, offset)
+        finally:
+            self._statistics.transfer_time += current_time() - started_at
 
     async def ls(self, path: FTPPath = ".") -> AsyncIterable[ListingEntry]:
         """Lists the contents of a directory on the PixHawk.
@@ -546,6 +728,10 @@ class MAVFTP:
                 raw bytes object
             remote_path: remote folder where the file should be uploaded
             parents: whether to create any parent directories automatically
+
+        Up to `window_size` chunks of the file are written at the same time;
+        each chunk is acknowledged and re-sent on its own so a lost packet
+        delays only its own chunk.
         """
         if isinstance(fp, bytes):
             fp = wrap_file(BytesIO(fp))
@@ -557,19 +743,15 @@ class MAVFTP:
                 parents=True,
             )
 
-        message = MAVFTPMessage(MAVFTPOpCode.CREATE_FILE, data=remote_path)
-        reply = await self._send_and_wait(message)
+        started_at = current_time()
+        try:
+            message = MAVFTPMessage(MAVFTPOpCode.CREATE_FILE, data=remote_path)
+            reply = await self._send_and_wait(message)
 
-        expected_crc = 0
-        async with self._open_session(reply.session_id) as session:
-            offset = 0
-            while True:
-                data = await fp.read(_MAVFTP_CHUNK_SIZE)
-                if data:
-                    offset += await session.write(data=data, offset=offset)
-                    expected_crc = crc32(data, expected_crc)
-                else:
-                    break
+            async with self._open_session(reply.session_id) as session:
+                expected_crc = await self._write_pipelined(session, fp)
+        finally:
+            self._statistics.transfer_time += current_time() - started_at
 
         observed_crc = await self.crc32(remote_path)
         if observed_crc != expected_crc:
@@ -585,6 +767,72 @@ class MAVFTP:
         message = MAVFTPMessage(MAVFTPOpCode.REMOVE_FILE, data=path)
         await self._send_and_wait(message)
 
+    def _back_off(self) -> None:
+        """Doubles the retransmission timeout after a request timed out."""
+        self._retransmission_timeout = min(
+            self._retransmission_timeout * 2, _MAX_RETRANSMISSION_TIMEOUT
+        )
+
+    async def _burst_read(
+        self,
+        session_id: int,
+        offset: int,
+        *,
+        retries: int = 10,
+    ) -> Optional[_BurstReadCollector]:
+        """Sends a burst read request in the given session and collects the
+        replies until the burst is over or the link goes quiet.
+
+        Parameters:
+            session_id: the ID of the session to read from
+            offset: the offset to start reading from
+            retries: maximum number of times the request is re-sent if no
+                reply arrives at all
+
+        Returns:
+            the collected replies, or `None` if the UAV does not support burst
+            reads
+
+        Raises:
+            TooSlowError: if the UAV failed to respond in time
+        """
+        message = MAVFTPMessage(
+            MAVFTPOpCode.BURST_READ_FILE,
+            session_id=session_id,
+            offset=offset,
+            size=_MAVFTP_CHUNK_SIZE,
+        )
+        self._statistics.requests += 1
+
+        while True:
+            encoded_message = message.encode(next(self._seq)).ljust(251, b"\x00")
+            timeout = self._retransmission_timeout
+            with CancelScope(deadline=current_time() + timeout) as scope:
+                collector = _BurstReadCollector(session_id, scope, timeout)
+                await self._sender(
+                    spec.file_transfer_protocol(
+                        target_network=0, payload=encoded_message
+                    ),
+                    wait_for_response=spec.file_transfer_protocol(collector),
+                )
+
+            if collector.chunks or collector.eof or collector.error:
+                break
+            elif retries > 0:
+                retries -= 1
+                self._statistics.retries += 1
+                self._back_off()
+            else:
+                raise TooSlowError("No response received for MAVFTP burst in time")
+
+        error = collector.error
+        if error is not None:
+            if error.error_code == MAVFTPErrorCode.UNKNOWN_COMMAND:
+                return None
+            error.raise_error()
+
+        return collector
+
     @asynccontextmanager
     async def _open_session(self, session_id: int) -> AsyncIterator[MAVFTPSession]:
         """Context manager that creates a new MAVFTP session for file uploads or
@@ -594,6 +842,124 @@ class MAVFTP:
         async with aclosing(session):
             yield session
 
+    async def _read_in_bursts(self, session: MAVFTPSession, fp) -> Optional[int]:
+        """Downloads the file open in the given session with burst reads and
+        writes it into the given file-like object.
+
+        Byte ranges missing from a burst are re-requested with ordinary reads
+        before the rest of the burst is written so the file is written
+        sequentially.
+
+        Returns:
+            `None` if the whole file was downloaded, or the offset to continue
+            from with ordinary reads if the UAV does not support burst reads
+        """
+        offset = 0
+        while True:
+            burst = await self._burst_read(session.session_id, offset)
+            if burst is None:
+                self._supports_burst_read = False
+                return offset
+
+            for chunk_offset, chunk in sorted(burst.chunks.items()):
+                end = chunk_offset + len(chunk)
+                if end <= offset:
+                    continue
+
+                if chunk_offset > offset:
+                    self._statistics.gaps += 1
+                    offset = await self._read_range(session, fp, offset, chunk_offset)
+                    if offset < chunk_offset:
+                        raise MAVFTPError("Unexpected end of file in MAVFTP download")
+
+                await fp.write(chunk[offset - chunk_offset :])
+                self._statistics.bytes_read += end - offset
+                offset = end
+
+            if burst.eof:
+                # The chunks right before the end of the file might have been
+                # lost so we read until we get an EOF from the UAV
+                await self._read_range(session, fp, offset)
+                return None
+
+    async def _read_range(
+        self, session: MAVFTPSession, fp, offset: int, end: Optional[int] = None
+    ) -> int:
+        """Reads the file open in the given session one chunk at a time and
+        writes it into the given file-like object.
+
+        Parameters:
+            session: the session to read from
+            fp: the async file-like object to write the data to
+            offset: the offset to start reading from
+            end: the offset to stop reading at; `None` means to read until the
+                end of the file
+
+        Returns:
+            the offset where the reading stopped
+        """
+        while end is None or offset < end:
+            bytes_requested = (
+                _MAVFTP_CHUNK_SIZE
+                if end is None
+                else min(_MAVFTP_CHUNK_SIZE, end - offset)
+            )
+            try:
+                chunk = await session.read(offset=offset, size=bytes_requested)
+            except OperationNotAcknowledgedError as ex:
+                if ex.code == MAVFTPErrorCode.EOF:
+                    chunk = b""
+                else:
+                    raise
+
+            if chunk:
+                await fp.write(chunk)
+                offset += len(chunk)
+                self._statistics.bytes_read += len(chunk)
+
+            if len(chunk) < bytes_requested:
+                break
+
+        return offset
+
+    async def _write_pipelined(self, session: MAVFTPSession, fp) -> int:
+        """Writes the contents of the given file-like object in the given
+        session, keeping at most `window_size` write operations in flight.
+
+        Returns:
+            the CRC32 checksum of the data that was written
+        """
+        crc = 0
+        errors: list[Exception] = []
+        offset = 0
+        window = Semaphore(self._window_size)
+
+        async def write(data: bytes, offset: int) -> None:
+            try:
+                await session.write(data=data, offset=offset)
+                self._statistics.bytes_written += len(data)
+            except Exception as ex:
+                errors.append(ex)
+                nursery.cancel_scope.cancel()
+            finally:
+                window.release()
+
+        async with open_nursery() as nursery:
+            while True:
+                data = await fp.read(_MAVFTP_CHUNK_SIZE)
+                if not data:
+                    break
+
+                crc = crc32(data, crc)
+                await window.acquire()
+                nursery.start_soon(write, data, offset)
+                offset += len(data)
+
+        if errors:
+            raise errors[0]
+
+        return crc
+
     def _parents_of(self, path: FTPPath) -> Iterable[FTPPath]:
         path_as_str = path if isinstance(path, str) else path.decode("utf-8")
         for parent_path in reversed(PurePosixPath(path_as_str).parents):
@@ -616,7 +982,7 @@ class MAVFTP:
         self,
         message: MAVFTPMessage,
         *,
-        timeout: float = 0.1,
+        timeout: Optional[float] = None,
         retries: int = 600,
         allow_nak: bool = False,
     ) -> MAVFTPMessage:
@@ -628,8 +994,10 @@ class MAVFTP:
             expected_reply: message matcher that matches messages that we expect
                 from the connection as a reply to the original message
             timeout: maximum number of seconds to wait before attempting to
-                re-send the message
-            retries: maximum number of retries before giving up
+                re-send the message; `None` means to derive it from the
+                round-trip times measured on the connection, similarly to TCP
+            retries: maximum number of retries before giving up. We also give
+                up when no reply arrived for a minute.
 
         Returns:
             the FTP message sent by the UAV in response
@@ -641,10 +1009,17 @@ class MAVFTP:
         encoded_message = message.encode(next(self._seq)).ljust(251, b"\x00")
         expected_seq_no = next(self._seq)
         sender = self._sender
+        self._statistics.requests += 1
+
+        started_at = current_time()
+        give_up_at = started_at + _MAX_WAIT_TIME
+        retried = False
 
         while True:
             try:
-                with fail_after(timeout):
+                with fail_after(
+                    self._retransmission_timeout if timeout is None else timeout
+                ):
                     reply = await sender(
                         spec.file_transfer_protocol(
                             target_network=0, payload=encoded_message
@@ -654,12 +1029,20 @@ class MAVFTP:
                         ),
                     )
             except TooSlowError:
-                if retries > 0:
+                if retries > 0 and current_time() < give_up_at:
                     retries -= 1
+                    retried = True
+                    self._statistics.retries += 1
+                    self._back_off()
                     continue
                 else:
                     break
 
+            # Replies to re-sent requests are ambiguous so they are not used
+            # to estimate the round-trip time (Karn's algorithm)
+            if not retried:
+                self._update_round_trip_time(current_time() - started_at)
+
             reply = MAVFTPMessage.decode(reply.payload)
             if reply.is_ack:
                 return reply
@@ -673,5 +1056,24 @@ class MAVFTP:
 
         raise TooSlowError("No response received for MAVFTP packet in time")
 
+    def _update_round_trip_time(self, sample: float) -> None:
+        """Updates the smoothed round-trip time and the retransmission
+        timeout of the connection with a new round-trip time measurement, using
+        the estimator of TCP (RFC 6298).
+        """
+        rtt = self._statistics.round_trip_time
+        if rtt is None:
+            rtt = sample
+            self._rtt_variance = sample / 2
+        else:
+            self._rtt_variance = 0.75 * self._rtt_variance + 0.25 * abs(rtt - sample)
+            rtt = 0.875 * rtt + 0.125 * sample
+
+        self._statistics.round_trip_time = rtt
+        self._retransmission_timeout = min(
+            max(rtt + 4 * self._rtt_variance, _MIN_RETRANSMISSION_TIMEOUT),
+            _MAX_RETRANSMISSION_TIMEOUT,
+        )
+
     def _to_ftp_path(self, posix_path: PurePosixPath) -> bytes:
         return (str(posix_path)[1:] or ".").encode("utf-8")
@@ -19,7 +19,9 @@ from flockwave.server.model.geofence import (
     GeofenceStatus,
 )
 
+from .automission import AutoMissionManager, encode_mission_items
 from .enums import MAVCommand, MAVFrame, MAVMissionResult, MAVMissionType
+from .mission_cache import MissionCache
 from .types import (
     MAVLinkMessage,
     MAVLinkMessageSpecification,
@@ -61,17 +63,24 @@ class GeofenceManager:
     _log: Optional[Logger]
     """Logger that the manager object can use to log messages."""
 
+    _cache: Optional[MissionCache]
+    """Cache of the geofences that the drone has last confirmed; used to skip
+    uploads that would not change anything on the drone.
+    """
+
     @classmethod
     def for_uav(cls, uav):
         """Constructs a MAVFTP connection object to the given UAV."""
         sender = partial(uav.driver.send_packet, target=uav)
         log = uav.driver.log
-        return cls(sender, log=log)
+        return cls(sender, log=log, cache=uav.mission_cache)
 
     def __init__(
         self,
         sender: Callable,
         log: Optional[Logger] = None,
+        *,
+        cache: Optional[MissionCache] = None,
     ):
         """Constructor.
 
@@ -79,9 +88,13 @@ class GeofenceManager:
             sender: a function that can be called to send a MAVLink message and
                 wait for an appropriate reply
             log: optional logger to use for logging messages
+            cache: optional cache of the geofences that the drone has last
+                confirmed; when given, uploads that would not change the
+                geofence on the drone are skipped
         """
         self._sender = sender
         self._log = log
+        self._cache = cache
 
     async def get_geofence_areas(
         self, status: Optional[GeofenceStatus] = None
@@ -256,67 +269,12 @@ class GeofenceManager:
         if not items:
             return
 
-        num_items = len(items)
         mission_type = MAVMissionType.FENCE
-        index, finished = None, False
-        while not finished:
-            if index is None:
-                # We need to let the drone know how many items there will be
-                message = spec.mission_count(count=num_items, mission_type=mission_type)
-                should_resend = True
-            else:
-                # We need to send the item with the given index to the drone
-                command, kwds = items[index]
-                params = {
-                    "seq": index,
-                    "command": command,
-                    "mission_type": mission_type,
-                    "param1": 0,
-                    "param2": 0,
-                    "param3": 0,
-                    "param4": 0,
-                    "x": 0,
-                    "y": 0,
-                    "z": 0,
-                    "frame": MAVFrame.GLOBAL,
-                    "current": 0,
-                    "autocontinue": 0,
-                }
-                params.update(kwds)
-                message = spec.mission_item_int(**params)
-                should_resend = False
-
-            # Drone must respond with requesting the next item (or asking
-            # to repeat the current one), or by sending an ACK or NAK. We should
-            # _not_ attempt to re-send geofence items; it is the responsiblity
-            # of the drone to request them again if they got lost.
-            #
-            # TODO(ntamas): we could also receive MISSION_REQUEST_INT here,
-            # we need to handle both!
-            expected_reply = spec.mission_request(mission_type=mission_type)
-            # We have different policies for the initial message that
-            # initiates the upload and the subsequent messages that are
-            # responding to the requests from the drone.
-            #
-            # For the initial message, we attempt to re-send it in case it
-            # got lost. For subsequent messages, we never re-send it (it is
-            # the responsibility of the drone to request them again if our
-            # reply got lost), but we assume that the upload timed out if
-            # we haven't received an ACK or the next request from the drone
-            # in five seconds.
-            reply = await self._send_and_wait(
-                mission_type,
-                message,
-                expected_reply,
-                timeout=1.5 if should_resend else 5,
-                retries=5 if should_resend else 0,
-            )
-            if reply is None:
-                # Final ACK received
-                finished = True
-            else:
-                # Drone requested another item
-                index = reply.seq
+        manager = AutoMissionManager(self._sender, log=self._log, cache=self._cache)
+        await manager.upload_encoded_mission(
+            encode_mission_items(items, mission_type, frame=MAVFrame.GLOBAL),
+            mission_type=mission_type,
+        )
 
     async def _send_and_wait(
         self,
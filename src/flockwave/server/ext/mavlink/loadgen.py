@@ -0,0 +1,1312 @@
+"""Load generator that drives a running server with the MAVLink traffic of a
+fleet of simulated vehicles or with a replayed telemetry log, and measures
+how the server copes with it.
+
+The generator either synthesizes N vehicles that stream HEARTBEAT,
+GLOBAL_POSITION_INT, SYS_STATUS and GPS_RAW_INT messages at configurable
+rates, or replays a MAVLink telemetry log (``.tlog``), optionally duplicated
+under several system IDs. Simulated vehicles answer the command, parameter
+and mission protocols so the server can complete its usual handshakes and
+mission uploads against them.
+
+The generator connects to the JSON-over-TCP channel of the server as a
+client and reports:
+
+- the number of UAV-INF updates that the server delivered to the client per
+  second and the number of MAVLink messages it sent back to the vehicles;
+
+- the latency between sending a GLOBAL_POSITION_INT message and receiving
+  the corresponding UAV-INF update. Each position message carries a marker
+  in its relative altitude that identifies the vehicle and the message, so
+  the latency can be measured without knowing how the server names the
+  UAVs;
+
+- the round-trip time of SYS-PING messages, which is dominated by the time
+  the server needs to get around to the message in its event loop when it
+  is busy, and the scheduling lag of the generator itself, which tells
+  whether the numbers are limited by the generator instead of the server.
+
+Run the generator headless against a server listening on the default UDP
+port with::
+
+    python -m flockwave.server.ext.mavlink.loadgen -n 100 -d 60
+
+or let the server connect to the generator over TCP (e.g., with a
+``tcp://localhost:5760`` connection in the configuration of the server)
+with ``--tcp 5760``.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+
+from dataclasses import dataclass, field
+from importlib import import_module
+from itertools import count
+from math import cos, radians, sin, tau
+from pathlib import Path
+from struct import Struct
+from typing import Any, Callable, Iterator, Optional, Sequence, Union
+
+import trio
+
+from .enums import (
+    GPSFixType,
+    MAVAutopilot,
+    MAVCommand,
+    MAVMissionResult,
+    MAVModeFlag,
+    MAVParamType,
+    MAVProtocolCapability,
+    MAVResult,
+    MAVState,
+    MAVType,
+)
+
+__all__ = (
+    "LoadGenerator",
+    "LoadReport",
+    "SimulatedVehicle",
+    "decode_latency_marker",
+    "encode_latency_marker",
+    "iter_tlog",
+    "percentile",
+    "rewrite_system_id",
+)
+
+
+#: Default rates of the telemetry streams of a simulated vehicle, in Hz
+DEFAULT_RATES = {
+    "HEARTBEAT": 1.0,
+    "GLOBAL_POSITION_INT": 10.0,
+    "SYS_STATUS": 2.0,
+    "GPS_RAW_INT": 2.0,
+}
+
+#: Message IDs of the telemetry streams, used to interpret the
+#: SET_MESSAGE_INTERVAL commands sent by the server
+_STREAM_IDS = {
+    0: "HEARTBEAT",
+    1: "SYS_STATUS",
+    24: "GPS_RAW_INT",
+    33: "GLOBAL_POSITION_INT",
+}
+
+#: Message ID of the AUTOPILOT_VERSION message
+_AUTOPILOT_VERSION = 148
+
+#: Capabilities advertised by the simulated vehicles
+_CAPABILITIES = (
+    MAVProtocolCapability.MISSION_FLOAT
+    | MAVProtocolCapability.PARAM_FLOAT
+    | MAVProtocolCapability.COMMAND_INT
+    | MAVProtocolCapability.MAVLINK2
+    | MAVProtocolCapability.MISSION_FENCE
+)
+
+#: Number of distinct latency markers per vehicle
+_MARKER_SLOTS = 1000
+
+#: Offset added to the latency markers so the vehicles appear airborne, in
+#: millimetres
+_MARKER_BASE = 100000
+
+#: Format of the timestamps preceding the MAVLink frames in a telemetry log
+_TLOG_TIMESTAMP = Struct(">Q")
+
+
+def encode_latency_marker(system_id: int, slot: int) -> int:
+    """Encodes the system ID of a simulated vehicle and the index of one of
+    its position messages into a relative altitude.
+
+    Parameters:
+        system_id: the MAVLink system ID of the vehicle, between 1 and 255
+        slot: the index of the message, modulo the number of markers per
+            vehicle
+
+    Returns:
+        the relative altitude to send in the message, in millimetres
+    """
+    return _MARKER_BASE + system_id * _MARKER_SLOTS + slot % _MARKER_SLOTS
+
+
+def decode_latency_marker(altitude: Any) -> Optional[tuple[int, int]]:
+    """Decodes a latency marker from the altitude above home of a UAV, as
+    reported in the ``position`` field of its status in a UAV-INF message.
+
+    Parameters:
+        altitude: the altitude above home, in millimetres
+
+    Returns:
+        the system ID of the vehicle and the index of the position message,
+        or ``None`` if the altitude does not hold a marker
+    """
+    if not isinstance(altitude, (int, float)):
+        return None
+    system_id, slot = divmod(int(round(altitude)) - _MARKER_BASE, _MARKER_SLOTS)
+    return (system_id, slot) if 0 < system_id < 256 else None
+
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Returns the given percentile of a sequence of values, using linear
+    interpolation between the closest ranks.
+
+    Parameters:
+        values: the values
+        q: the percentile to return, between 0 and 100
+
+    Returns:
+        the percentile, or ``None`` if the sequence is empty
+    """
+    if not values:
+        return None
+
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * min(max(q, 0.0), 100.0) / 100.0
+    index = int(position)
+    if index + 1 >= len(ordered):
+        return ordered[-1]
+    fraction = position - index
+    return ordered[index] + (ordered[index + 1] - ordered[index]) * fraction
+
+
+def _x25_crc(data: bytes, crc: int = 0xFFFF) -> int:
+    """Computes the X.25 checksum used by MAVLink frames."""
+    for byte in data:
+        tmp = byte ^ (crc & 0xFF)
+        tmp = (tmp ^ (tmp << 4)) & 0xFF
+        crc = ((crc >> 8) ^ (tmp << 8) ^ (tmp << 3) ^ (tmp >> 4)) & 0xFFFF
+    return crc
+
+
+def _frame_length(data: bytes, offset: int) -> Optional[int]:
+    """Returns the length of the MAVLink frame starting at the given offset,
+    or ``None`` if there is no complete frame header there.
+    """
+    magic = data[offset]
+    if magic == 0xFD:
+        if offset + 3 > len(data):
+            return None
+        length = data[offset + 1] + 12
+        if data[offset + 2] & 0x01:
+            # Signed frame
+            length += 13
+        return length
+    elif magic == 0xFE:
+        if offset + 2 > len(data):
+            return None
+        return data[offset + 1] + 8
+    else:
+        return None
+
+
+def iter_tlog(data: bytes) -> Iterator[tuple[int, bytes]]:
+    """Iterates over the MAVLink frames of a telemetry log.
+
+    A telemetry log consists of MAVLink frames, each preceded by a big-endian
+    timestamp in microseconds since the UNIX epoch. Garbage between the
+    frames is skipped; an incomplete frame at the end of the log is ignored.
+
+    Parameters:
+        data: the contents of the log
+
+    Yields:
+        the timestamp of each frame, in microseconds, and the raw frame
+    """
+    offset, size = 0, len(data)
+    while offset + _TLOG_TIMESTAMP.size < size:
+        start = offset + _TLOG_TIMESTAMP.size
+        length = _frame_length(data, start)
+        if length is None:
+            offset += 1
+            continue
+        if start + length > size:
+            break
+
+        (timestamp,) = _TLOG_TIMESTAMP.unpack_from(data, offset)
+        yield timestamp, data[start : start + length]
+        offset = start + length
+
+
+def _frame_system_id(frame: bytes) -> int:
+    """Returns the system ID of the sender of a raw MAVLink frame."""
+    return frame[5] if frame[0] == 0xFD else frame[3]
+
+
+def _frame_message_id(frame: bytes) -> int:
+    """Returns the message ID of a raw MAVLink frame."""
+    if frame[0] == 0xFD:
+        return frame[7] | (frame[8] << 8) | (frame[9] << 16)
+    else:
+        return frame[5]
+
+
+def rewrite_system_id(
+    frame: bytes, system_id: int, crc_extras: Callable[[int], Optional[int]]
+) -> Optional[bytes]:
+    """Returns a copy of a raw MAVLink frame with a different sender system ID
+    and an updated checksum.
+
+    Parameters:
+        frame: the frame to rewrite
+        system_id: the new system ID
+        crc_extras: function that returns the CRC seed of a message ID, or
+            ``None`` for unknown message IDs
+
+    Returns:
+        the rewritten frame, or ``None`` if the frame cannot be rewritten
+        because it is signed or its message ID is unknown
+    """
+    is_v2 = frame[0] == 0xFD
+    if is_v2 and frame[2] & 0x01:
+        return None
+
+    crc_extra = crc_extras(_frame_message_id(frame))
+    if crc_extra is None:
+        return None
+
+    result = bytearray(frame)
+    result[5 if is_v2 else 3] = system_id
+    crc = _x25_crc(bytes([crc_extra]), _x25_crc(result[1:-2]))
+    result[-2] = crc & 0xFF
+    result[-1] = crc >> 8
+    return bytes(result)
+
+
+def _decode_name(value: Union[str, bytes]) -> str:
+    """Decodes a fixed-length string field of a MAVLink message."""
+    if isinstance(value, bytes):
+        value = value.split(b"\x00", 1)[0].decode("ascii", errors="replace")
+    return value.rstrip("\x00")
+
+
+class _Outbox(list[bytes]):
+    """File-like object that collects the frames written by a MAVLink
+    encoder.
+    """
+
+    def write(self, data: bytes) -> None:
+        self.append(bytes(data))
+
+
+@dataclass
+class _MissionUpload:
+    """State of a mission upload from the server to a simulated vehicle."""
+
+    mission_type: int
+    count: int
+    items: list[tuple] = field(default_factory=list)
+
+
+class SimulatedVehicle:
+    """Simulated MAVLink vehicle that streams telemetry while flying in a
+    circle and answers the command, parameter and mission protocols.
+
+    Outbound frames are collected in the `outbox` of the vehicle; the caller
+    is responsible for sending them.
+    """
+
+    intervals: dict[str, float]
+    """Dictionary mapping the names of the telemetry streams of the vehicle
+    to their intervals, in seconds.
+    """
+
+    missions: dict[int, list[tuple]]
+    """Dictionary mapping MAVLink mission types to the items uploaded to the
+    vehicle, in the order of the fields of MISSION_ITEM_INT from ``frame``
+    to ``z``.
+    """
+
+    outbox: _Outbox
+    """Frames produced by the vehicle that are waiting to be sent."""
+
+    params: dict[str, float]
+    """The parameters of the vehicle."""
+
+    position_sent_at: list[Optional[float]]
+    """Times when the GLOBAL_POSITION_INT messages were sent, indexed by the
+    latency markers that they carry.
+    """
+
+    system_id: int
+    """The MAVLink system ID of the vehicle."""
+
+    def __init__(
+        self,
+        system_id: int,
+        dialect: Any,
+        *,
+        rates: Optional[dict[str, float]] = None,
+        origin: tuple[float, float] = (47.4979, 19.0402),
+        radius: float = 50.0,
+        honor_message_intervals: bool = False,
+        mission_request_int: bool = True,
+    ):
+        """Constructor.
+
+        Parameters:
+            system_id: the MAVLink system ID of the vehicle
+            dialect: the module of the MAVLink dialect to use
+            rates: dictionary mapping the names of the telemetry streams to
+                their rates in Hz; streams with zero rates are not sent
+            origin: the latitude and longitude of the centre of the circle
+                that the vehicle flies around
+            radius: the radius of the circle, in metres
+            honor_message_intervals: whether the vehicle adjusts its rates
+                according to the SET_MESSAGE_INTERVAL commands of the server
+            mission_request_int: whether the vehicle requests mission items
+                with MISSION_REQUEST_INT (like current autopilots do) instead
+                of MISSION_REQUEST during uploads
+        """
+        self.system_id = system_id
+        self.outbox = _Outbox()
+        self.intervals = {
+            name: 1.0 / rate
+            for name, rate in {**DEFAULT_RATES, **(rates or {})}.items()
+            if rate > 0
+        }
+        self.missions = {}
+        self.params = {
+            "SYSID_THISMAV": float(system_id),
+            "SHOW_MODE_BOOT": 0.0,
+            "WPNAV_SPEED": 500.0,
+            "RTL_ALT": 1500.0,
+        }
+        self.position_sent_at = [None] * _MARKER_SLOTS
+
+        self._honor_message_intervals = honor_message_intervals
+        self._mission_request_int = mission_request_int
+        self._next_due: dict[str, float] = {}
+        self._origin = origin
+        self._radius = radius
+        self._phase = (system_id * 0.618) % 1.0 * tau
+        self._position_counter = 0
+        self._started_at = 0.0
+        self._upload: Optional[_MissionUpload] = None
+
+        self._mav = dialect.MAVLink(self.outbox, srcSystem=system_id, srcComponent=1)
+        self._parser = dialect.MAVLink(None, srcSystem=255, srcComponent=190)
+        self._parser.robust_parsing = True
+
+        self._handlers = {
+            "COMMAND_LONG": self._handle_command_long,
+            "MISSION_CLEAR_ALL": self._handle_mission_clear_all,
+            "MISSION_COUNT": self._handle_mission_count,
+            "MISSION_ITEM": self._handle_mission_item,
+            "MISSION_ITEM_INT": self._handle_mission_item,
+            "MISSION_REQUEST": self._handle_mission_request,
+            "MISSION_REQUEST_INT": self._handle_mission_request,
+            "MISSION_REQUEST_LIST": self._handle_mission_request_list,
+            "MISSION_SET_CURRENT": self._handle_mission_set_current,
+            "PARAM_REQUEST_LIST": self._handle_param_request_list,
+            "PARAM_REQUEST_READ": self._handle_param_request_read,
+            "PARAM_SET": self._handle_param_set,
+        }
+
+    @property
+    def next_deadline(self) -> float:
+        """The time when the next telemetry message of the vehicle is due."""
+        return min(self._next_due.values(), default=float("inf"))
+
+    def start(self, now: float) -> None:
+        """Starts the telemetry streams of the vehicle.
+
+        The first messages of the streams are spread over their intervals so
+        that the vehicles of a fleet started at the same time do not send
+        their messages in lockstep.
+
+        Parameters:
+            now: the current time
+        """
+        self._started_at = now
+        offset = self._phase / tau
+        self._next_due = {
+            name: now + interval * offset for name, interval in self.intervals.items()
+        }
+
+    def feed(self, data: bytes, now: float) -> int:
+        """Feeds raw bytes received from the server into the vehicle.
+
+        Parameters:
+            data: the received bytes
+            now: the current time
+
+        Returns:
+            the number of messages decoded from the bytes
+        """
+        messages = self._parser.parse_buffer(data) or ()
+        for message in messages:
+            self.handle_message(message, now)
+        return len(messages)
+
+    def handle_message(self, message: Any, now: float) -> None:
+        """Handles a single MAVLink message sent by the server.
+
+        Parameters:
+            message: the message
+            now: the current time
+        """
+        target = getattr(message, "target_system", 0)
+        if target and target != self.system_id:
+            return
+
+        handler = self._handlers.get(message.get_type())
+        if handler:
+            handler(message, now)
+
+    def tick(self, now: float, slack: float = 0.0) -> int:
+        """Sends the telemetry messages of the vehicle that are due.
+
+        Parameters:
+            now: the current time
+            slack: messages that are due within this many seconds from now
+                are also sent
+
+        Returns:
+            the number of messages sent
+        """
+        sent = 0
+        horizon = now + slack
+        for name, due in self._next_due.items():
+            if due > horizon:
+                continue
+
+            getattr(self, f"_send_{name.lower()}")(now)
+            sent += 1
+
+            interval = self.intervals[name]
+            due += interval
+            # Do not try to catch up with messages that we could not send in
+            # time; this would only produce bursts
+            self._next_due[name] = due if due > now else now + interval
+
+        return sent
+
+    def _set_interval(self, name: str, interval: Optional[float], now: float) -> None:
+        if interval is None or interval <= 0:
+            self.intervals.pop(name, None)
+            self._next_due.pop(name, None)
+        else:
+            self.intervals[name] = interval
+            self._next_due[name] = now + interval
+
+    def _send_heartbeat(self, now: float) -> None:
+        self._mav.heartbeat_send(
+            type=MAVType.QUADROTOR,
+            autopilot=MAVAutopilot.ARDUPILOTMEGA,
+            base_mode=MAVModeFlag.CUSTOM_MODE_ENABLED | MAVModeFlag.SAFETY_ARMED,
+            custom_mode=5,
+            system_status=MAVState.ACTIVE,
+        )
+
+    def _send_global_position_int(self, now: float) -> None:
+        elapsed = now - self._started_at
+        lat, lon, heading, vn, ve = self._get_position(elapsed)
+        slot = self._position_counter % _MARKER_SLOTS
+        self._position_counter += 1
+        relative_alt = encode_latency_marker(self.system_id, slot)
+
+        self.position_sent_at[slot] = now
+        self._mav.global_position_int_send(
+            time_boot_ms=int(elapsed * 1000) & 0xFFFFFFFF,
+            lat=lat,
+            lon=lon,
+            alt=relative_alt + 120000,
+            relative_alt=relative_alt,
+            vx=vn,
+            vy=ve,
+            vz=0,
+            hdg=heading,
+        )
+
+    def _send_gps_raw_int(self, now: float) -> None:
+        lat, lon, heading, vn, ve = self._get_position(now - self._started_at)
+        self._mav.gps_raw_int_send(
+            time_usec=int(now * 1e6),
+            fix_type=GPSFixType.RTK_FIXED,
+            lat=lat,
+            lon=lon,
+            alt=220000,
+            eph=70,
+            epv=120,
+            vel=int(round((vn * vn + ve * ve) ** 0.5)),
+            cog=heading,
+            satellites_visible=18,
+        )
+
+    def _send_sys_status(self, now: float) -> None:
+        self._mav.sys_status_send(
+            onboard_control_sensors_present=0,
+            onboard_control_sensors_enabled=0,
+            onboard_control_sensors_health=0,
+            load=250,
+            voltage_battery=16200,
+            current_battery=1200,
+            battery_remaining=87,
+            drop_rate_comm=0,
+            errors_comm=0,
+            errors_count1=0,
+            errors_count2=0,
+            errors_count3=0,
+            errors_count4=0,
+        )
+
+    def _get_position(self, elapsed: float) -> tuple[int, int, int, int, int]:
+        """Returns the position of the vehicle on its circle at the given
+        time, as the latitude and longitude in 1e-7 degrees, the heading in
+        centidegrees and the north and east velocities in cm/s.
+        """
+        speed = 5.0
+        omega = speed / self._radius
+        angle = self._phase + omega * elapsed
+        north, east = self._radius * cos(angle), self._radius * sin(angle)
+
+        # Spread the circles of the vehicles on a grid
+        row, column = divmod(self.system_id, 16)
+        north += row * 3 * self._radius
+        east += column * 3 * self._radius
+
+        lat0, lon0 = self._origin
+        lat = lat0 + north / 111320.0
+        lon = lon0 + east / (111320.0 * cos(radians(lat0)))
+        vn, ve = -speed * sin(angle), speed * cos(angle)
+        heading = (angle + tau / 4) % tau / tau * 36000
+
+        return (
+            int(round(lat * 1e7)),
+            int(round(lon * 1e7)),
+            int(heading) % 36000,
+            int(round(vn * 100)),
+            int(round(ve * 100)),
+        )
+
+    def _handle_command_long(self, message: Any, now: float) -> None:
+        command = message.command
+        result = MAVResult.ACCEPTED
+
+        if command == MAVCommand.SET_MESSAGE_INTERVAL:
+            name = _STREAM_IDS.get(int(message.param1))
+            if name is None:
+                result = MAVResult.UNSUPPORTED
+            elif self._honor_message_intervals:
+                interval = message.param2
+                if interval == 0:
+                    rate = DEFAULT_RATES.get(name, 0)
+                    self._set_interval(name, 1.0 / rate if rate else None, now)
+                else:
+                    self._set_interval(
+                        name, interval / 1e6 if interval > 0 else None, now
+                    )
+        elif command == MAVCommand.REQUEST_AUTOPILOT_CAPABILITIES or (
+            command == MAVCommand.REQUEST_MESSAGE
+            and int(message.param1) == _AUTOPILOT_VERSION
+        ):
+            self._send_autopilot_version()
+
+        self._mav.command_ack_send(
+            command=command,
+            result=result,
+            target_system=message.get_srcSystem(),
+            target_component=message.get_srcComponent(),
+        )
+
+    def _send_autopilot_version(self) -> None:
+        self._mav.autopilot_version_send(
+            capabilities=_CAPABILITIES,
+            flight_sw_version=(4 << 24) | (3 << 16) | (7 << 8) | 255,
+            middleware_sw_version=0,
+            os_sw_version=0,
+            board_version=0,
+            flight_custom_version=[0] * 8,
+            middleware_custom_version=[0] * 8,
+            os_custom_version=[0] * 8,
+            vendor_id=0,
+            product_id=0,
+            uid=self.system_id,
+        )
+
+    def _send_param(self, name: str) -> None:
+        names = list(self.params)
+        self._mav.param_value_send(
+            param_id=name.encode("ascii")[:16],
+            param_value=self.params[name],
+            param_type=MAVParamType.REAL32,
+            param_count=len(names),
+            param_index=names.index(name),
+        )
+
+    def _handle_param_request_list(self, message: Any, now: float) -> None:
+        for name in self.params:
+            self._send_param(name)
+
+    def _handle_param_request_read(self, message: Any, now: float) -> None:
+        if message.param_index >= 0:
+            names = list(self.params)
+            if message.param_index < len(names):
+                self._send_param(names[message.param_index])
+            return
+
+        name = _decode_name(message.param_id)
+        if name:
+            # Unknown parameters are created on the fly so that the server
+            # does not have to time out on them
+            self.params.setdefault(name, 0.0)
+            self._send_param(name)
+
+    def _handle_param_set(self, message: Any, now: float) -> None:
+        name = _decode_name(message.param_id)
+        if name:
+            self.params[name] = float(message.param_value)
+            self._send_param(name)
+
+    def _ack_mission(self, message: Any, mission_type: int, result: int) -> None:
+        self._mav.mission_ack_send(
+            target_system=message.get_srcSystem(),
+            target_component=message.get_srcComponent(),
+            type=result,
+            mission_type=mission_type,
+        )
+
+    def _request_mission_item(self, message: Any, seq: int, mission_type: int) -> None:
+        send = (
+            self._mav.mission_request_int_send
+            if self._mission_request_int
+            else self._mav.mission_request_send
+        )
+        send(
+            target_system=message.get_srcSystem(),
+            target_component=message.get_srcComponent(),
+            seq=seq,
+            mission_type=mission_type,
+        )
+
+    def _handle_mission_clear_all(self, message: Any, now: float) -> None:
+        mission_type = getattr(message, "mission_type", 0)
+        self.missions.pop(mission_type, None)
+        self._ack_mission(message, mission_type, MAVMissionResult.ACCEPTED)
+
+    def _handle_mission_count(self, message: Any, now: float) -> None:
+        mission_type = getattr(message, "mission_type", 0)
+        if message.count == 0:
+            self._upload = None
+            self.missions[mission_type] = []
+            self._ack_mission(message, mission_type, MAVMissionResult.ACCEPTED)
+        else:
+            self._upload = _MissionUpload(mission_type, message.count)
+            self._request_mission_item(message, 0, mission_type)
+
+    def _handle_mission_item(self, message: Any, now: float) -> None:
+        upload = self._upload
+        mission_type = getattr(message, "mission_type", 0)
+        if upload is None or upload.mission_type != mission_type:
+            return
+
+        if message.seq == len(upload.items):
+            x, y = message.x, message.y
+            if message.get_type() == "MISSION_ITEM":
+                x, y = int(round(x * 1e7)), int(round(y * 1e7))
+            upload.items.append(
+                (
+                    message.frame,
+                    message.command,
+                    message.current,
+                    message.autocontinue,
+                    message.param1,
+                    message.param2,
+                    message.param3,
+                    message.param4,
+                    x,
+                    y,
+                    message.z,
+                )
+            )
+
+        if len(upload.items) < upload.count:
+            self._request_mission_item(message, len(upload.items), mission_type)
+        else:
+            self.missions[mission_type] = upload.items
+            self._upload = None
+            self._ack_mission(message, mission_type, MAVMissionResult.ACCEPTED)
+
+    def _handle_mission_request(self, message: Any, now: float) -> None:
+        mission_type = getattr(message, "mission_type", 0)
+        items = self.missions.get(mission_type, ())
+        if message.seq < len(items):
+            self._mav.mission_item_int_send(
+                message.get_srcSystem(),
+                message.get_srcComponent(),
+                message.seq,
+                *items[message.seq],
+                mission_type=mission_type,
+            )
+        else:
+            self._ack_mission(message, mission_type, MAVMissionResult.INVALID_SEQUENCE)
+
+    def _handle_mission_request_list(self, message: Any, now: float) -> None:
+        mission_type = getattr(message, "mission_type", 0)
+        self._mav.mission_count_send(
+            target_system=message.get_srcSystem(),
+            target_component=message.get_srcComponent(),
+            count=len(self.missions.get(mission_type, ())),
+            mission_type=mission_type,
+        )
+
+    def _handle_mission_set_current(self, message: Any, now: float) -> None:
+        self._mav.mission_current_send(seq=message.seq)
+
+
+@dataclass
+class LoadReport:
+    """Measurements collected by a load generator run."""
+
+    duration: float = 0.0
+    """Duration of the run, in seconds."""
+
+    num_uavs: int = 0
+    """Number of simulated or replayed vehicles."""
+
+    messages_sent: int = 0
+    """Number of MAVLink messages sent to the server."""
+
+    messages_received: int = 0
+    """Number of MAVLink messages received from the server."""
+
+    status_updates: int = 0
+    """Number of UAV status objects received in UAV-INF messages."""
+
+    latencies: list[float] = field(default_factory=list)
+    """Latencies between sending a position and receiving it in a UAV-INF
+    message, in seconds.
+    """
+
+    ping_rtts: list[float] = field(default_factory=list)
+    """Round-trip times of the SYS-PING messages, in seconds."""
+
+    generator_lags: list[float] = field(default_factory=list)
+    """Scheduling lags of the event loop of the generator, in seconds."""
+
+    def _rate(self, count: int) -> float:
+        return count / self.duration if self.duration > 0 else 0.0
+
+    def _summarize(self, values: Sequence[float]) -> dict[str, Optional[float]]:
+        result = {}
+        for name, q in (("p50", 50), ("p95", 95), ("p99", 99), ("max", 100)):
+            value = percentile(values, q)
+            result[name] = round(value * 1000, 3) if value is not None else None
+        return result
+
+    def json(self) -> dict[str, Any]:
+        """Returns a JSON representation of the report. Durations are in
+        milliseconds.
+        """
+        return {
+            "duration": round(self.duration, 3),
+            "uavs": self.num_uavs,
+            "sentRate": round(self._rate(self.messages_sent), 1),
+            "receivedRate": round(self._rate(self.messages_received), 1),
+            "statusUpdateRate": round(self._rate(self.status_updates), 1),
+            "latency": self._summarize(self.latencies),
+            "pingRoundTrip": self._summarize(self.ping_rtts),
+            "generatorLag": self._summarize(self.generator_lags),
+        }
+
+    def __str__(self) -> str:
+        data = self.json()
+
+        def format_summary(summary: dict[str, Optional[float]]) -> str:
+            if summary["p50"] is None:
+                return "n/a"
+            return ", ".join(f"{key} {value:.1f} ms" for key, value in summary.items())
+
+        return "\n".join(
+            (
+                f"{self.num_uavs} UAVs, {self.duration:.1f} s",
+                f"  MAVLink sent:       {data['sentRate']:.0f} msg/s",
+                f"  MAVLink received:   {data['receivedRate']:.0f} msg/s",
+                f"  UAV status updates: {data['statusUpdateRate']:.0f} /s",
+                f"  Position latency:   {format_summary(data['latency'])}",
+                f"  SYS-PING roundtrip: {format_summary(data['pingRoundTrip'])}",
+                f"  Generator lag:      {format_summary(data['generatorLag'])}",
+            )
+        )
+
+
+class LoadGenerator:
+    """Drives a running server with simulated or replayed MAVLink traffic and
+    measures its response through its JSON-over-TCP client channel.
+    """
+
+    report: LoadReport
+    """The measurements of the current or last run."""
+
+    vehicles: dict[int, SimulatedVehicle]
+    """The simulated vehicles, keyed by system ID."""
+
+    def __init__(
+        self,
+        num_uavs: int = 10,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 14550,
+        tcp_port: Optional[int] = None,
+        client_port: Optional[int] = 5001,
+        dialect: str = "ardupilotmega",
+        first_system_id: int = 1,
+        rates: Optional[dict[str, float]] = None,
+        honor_message_intervals: bool = False,
+        mission_request_int: bool = True,
+        replay: Optional[Union[str, Path]] = None,
+        speed: float = 1.0,
+        loop: bool = False,
+    ):
+        """Constructor.
+
+        Parameters:
+            num_uavs: the number of vehicles to simulate, or the number of
+                copies of the replayed log to send under different system IDs
+            host: the host of the server
+            port: the UDP port of the server that the vehicles send their
+                messages to
+            tcp_port: when given, the generator listens on this TCP port and
+                the server is expected to connect to it instead of the
+                vehicles sending UDP packets to the server
+            client_port: the port of the JSON-over-TCP channel of the server;
+                ``None`` turns off the measurements that need a client
+                connection
+            dialect: the name of the MAVLink dialect to use
+            first_system_id: the system ID of the first vehicle
+            rates: dictionary mapping the names of the telemetry streams of
+                the simulated vehicles to their rates in Hz
+            honor_message_intervals: whether the simulated vehicles adjust
+                their rates according to the SET_MESSAGE_INTERVAL commands of
+                the server
+            mission_request_int: whether the simulated vehicles request
+                mission items with MISSION_REQUEST_INT instead of
+                MISSION_REQUEST
+            replay: path of a telemetry log to replay instead of simulating
+                vehicles
+            speed: playback speed of the replayed log
+            loop: whether to restart the replay at the end of the log
+        """
+        if first_system_id < 1 or first_system_id + num_uavs > 255:
+            raise ValueError("system IDs must be between 1 and 254")
+
+        self._dialect = import_module(
+            f"flockwave.protocols.mavlink.dialects.v20.{dialect}"
+        )
+        self._host = host
+        self._port = port
+        self._tcp_port = tcp_port
+        self._client_port = client_port
+        self._speed = speed
+        self._loop = loop
+        self._num_uavs = num_uavs
+
+        system_ids = range(first_system_id, first_system_id + num_uavs)
+        if replay is None:
+            self._frames = None
+            self.vehicles = {
+                system_id: SimulatedVehicle(
+                    system_id,
+                    self._dialect,
+                    rates=rates,
+                    honor_message_intervals=honor_message_intervals,
+                    mission_request_int=mission_request_int,
+                )
+                for system_id in system_ids
+            }
+        else:
+            self._frames = self._load_replay(Path(replay), list(system_ids))
+            self.vehicles = {}
+
+        self.report = LoadReport(num_uavs=num_uavs)
+        self._senders: dict[int, Callable[[bytes], Any]] = {}
+        self._streams: list[trio.abc.Stream] = []
+
+    def _load_replay(
+        self, path: Path, system_ids: list[int]
+    ) -> list[tuple[float, int, bytes]]:
+        """Loads a telemetry log and prepares the frames to replay, with one
+        copy of the frames of the first system in the log for each system ID.
+
+        Returns:
+            the time of each frame relative to the start of the log, in
+            seconds, the system ID of the frame and the frame itself
+        """
+        mavlink_map = self._dialect.mavlink_map
+
+        def crc_extras(msgid: int) -> Optional[int]:
+            cls = mavlink_map.get(msgid)
+            return cls.crc_extra if cls else None
+
+        frames = list(iter_tlog(path.read_bytes()))
+        if not frames:
+            return []
+
+        start = frames[0][0]
+        source = None
+        result = []
+        for timestamp, frame in frames:
+            sender = _frame_system_id(frame)
+            if source is None and sender not in (0, 255):
+                source = sender
+            if sender != source:
+                continue
+
+            t = (timestamp - start) / 1e6
+            for system_id in system_ids:
+                copy = (
+                    frame
+                    if system_id == source
+                    else rewrite_system_id(frame, system_id, crc_extras)
+                )
+                if copy is not None:
+                    result.append((t, system_id, copy))
+
+        return result
+
+    async def run(self, duration: Optional[float] = None) -> LoadReport:
+        """Runs the load generator.
+
+        Parameters:
+            duration: the duration of the run, in seconds; ``None`` means to
+                run until cancelled or until the end of the replayed log
+
+        Returns:
+            the measurements of the run
+        """
+        self.report = report = LoadReport(num_uavs=self._num_uavs)
+        started_at = trio.current_time()
+
+        try:
+            with trio.move_on_after(duration if duration is not None else float("inf")):
+                async with trio.open_nursery() as nursery:
+                    await self._open_transports(nursery)
+                    nursery.start_soon(self._measure_generator_lag)
+                    if self._client_port is not None:
+                        nursery.start_soon(self._monitor_server)
+
+                    if self._frames is None:
+                        await self._run_vehicles()
+                    else:
+                        await self._run_replay()
+
+                    nursery.cancel_scope.cancel()
+        finally:
+            report.duration = trio.current_time() - started_at
+
+        return report
+
+    async def _open_transports(self, nursery: trio.Nursery) -> None:
+        if self._frames is None:
+            system_ids = list(self.vehicles)
+        else:
+            system_ids = sorted({system_id for _, system_id, _ in self._frames})
+
+        if self._tcp_port is not None:
+            await nursery.start(
+                trio.serve_tcp, self._serve_tcp_connection, self._tcp_port
+            )
+            for system_id in system_ids:
+                self._senders[system_id] = self._send_to_tcp_streams
+        else:
+            for system_id in system_ids:
+                sock = trio.socket.socket(trio.socket.AF_INET, trio.socket.SOCK_DGRAM)
+                await sock.bind(("0.0.0.0", 0))
+                await sock.connect((self._host, self._port))
+                self._senders[system_id] = sock.send
+                nursery.start_soon(self._receive_udp, system_id, sock)
+
+    async def _serve_tcp_connection(self, stream: trio.abc.Stream) -> None:
+        self._streams.append(stream)
+        try:
+            async for data in stream:
+                self._handle_inbound(data, None)
+                for vehicle in self.vehicles.values():
+                    await self._flush(vehicle)
+        except trio.BrokenResourceError:
+            pass
+        finally:
+            self._streams.remove(stream)
+
+    async def _send_to_tcp_streams(self, data: bytes) -> None:
+        for stream in list(self._streams):
+            try:
+                await stream.send_all(data)
+            except (trio.BrokenResourceError, trio.ClosedResourceError):
+                pass
+
+    async def _receive_udp(self, system_id: int, sock: trio.socket.SocketType) -> None:
+        while True:
+            try:
+                data = await sock.recv(65536)
+            except ConnectionRefusedError:
+                # Server is not running (yet)
+                await trio.sleep(0.5)
+            else:
+                self._handle_inbound(data, system_id)
+                await self._flush(self.vehicles.get(system_id))
+
+    def _handle_inbound(self, data: bytes, system_id: Optional[int]) -> None:
+        """Handles raw bytes received from the server on the connection of the
+        given vehicle, or on a shared TCP connection if the system ID is
+        ``None``.
+        """
+        now = trio.current_time()
+        if system_id is not None:
+            vehicle = self.vehicles.get(system_id)
+            if vehicle:
+                self.report.messages_received += vehicle.feed(data, now)
+            return
+
+        # Shared connection; decode once and route the messages by their
+        # target system
+        if not self.vehicles:
+            return
+
+        parser = next(iter(self.vehicles.values()))._parser
+        for message in parser.parse_buffer(data) or ():
+            self.report.messages_received += 1
+            target = getattr(message, "target_system", 0)
+            if target:
+                vehicle = self.vehicles.get(target)
+                if vehicle:
+                    vehicle.handle_message(message, now)
+            else:
+                for vehicle in self.vehicles.values():
+                    vehicle.handle_message(message, now)
+
+    async def _flush(self, vehicle: Optional[SimulatedVehicle]) -> None:
+        if vehicle is None or not vehicle.outbox:
+            return
+
+        send = self._senders[vehicle.system_id]
+        frames = vehicle.outbox[:]
+        vehicle.outbox.clear()
+        self.report.messages_sent += len(frames)
+        if send == self._send_to_tcp_streams:
+            await send(b"".join(frames))
+        else:
+            for frame in frames:
+                try:
+                    await send(frame)
+                except OSError:
+                    pass
+
+    async def _run_vehicles(self) -> None:
+        now = trio.current_time()
+        for vehicle in self.vehicles.values():
+            vehicle.start(now)
+
+        while True:
+            deadline = min(vehicle.next_deadline for vehicle in self.vehicles.values())
+            await trio.sleep_until(deadline)
+
+            # Coalesce the messages that are due within a millisecond into a
+            # single wakeup
+            now = trio.current_time()
+            for vehicle in self.vehicles.values():
+                if vehicle.next_deadline <= now + 0.001:
+                    vehicle.tick(now, 0.001)
+                    await self._flush(vehicle)
+
+    async def _run_replay(self) -> None:
+        assert self._frames is not None
+        if not self._frames:
+            return
+
+        while True:
+            started_at = trio.current_time()
+            for t, system_id, frame in self._frames:
+                await trio.sleep_until(started_at + t / self._speed)
+                try:
+                    await self._senders[system_id](frame)
+                except OSError:
+                    pass
+                self.report.messages_sent += 1
+
+            if not self._loop:
+                break
+
+    async def _measure_generator_lag(self, interval: float = 0.01) -> None:
+        lags = self.report.generator_lags
+        while True:
+            expected = trio.current_time() + interval
+            await trio.sleep_until(expected)
+            lags.append(max(trio.current_time() - expected, 0.0))
+
+    async def _monitor_server(self, ping_interval: float = 1.0) -> None:
+        """Connects to the JSON-over-TCP channel of the server, sends SYS-PING
+        messages periodically and processes the UAV-INF messages of the
+        server.
+        """
+        assert self._client_port is not None
+
+        while True:
+            try:
+                stream = await trio.open_tcp_stream(self._host, self._client_port)
+            except OSError:
+                await trio.sleep(1)
+                continue
+
+            pings: dict[str, float] = {}
+            try:
+                async with stream, trio.open_nursery() as nursery:
+                    nursery.start_soon(self._send_pings, stream, pings, ping_interval)
+                    buffer = b""
+                    async for data in stream:
+                        now = trio.current_time()
+                        buffer += data
+                        *lines, buffer = buffer.split(b"\n")
+                        for line in lines:
+                            if line.strip():
+                                self._handle_client_message(line, pings, now)
+                    nursery.cancel_scope.cancel()
+            except (OSError, trio.BrokenResourceError):
+                pass
+
+            await trio.sleep(1)
+
+    async def _send_pings(
+        self, stream: trio.abc.Stream, pings: dict[str, float], interval: float
+    ) -> None:
+        """Sends SYS-PING messages periodically on the given client
+        connection and records the time when each message was sent.
+        """
+        for index in count():
+            message_id = f"loadgen-ping-{index}"
+            pings[message_id] = trio.current_time()
+            message = {
+                "$fw.version": "1.0",
+                "id": message_id,
+                "body": {"type": "SYS-PING"},
+            }
+            await stream.send_all(json.dumps(message).encode("utf-8") + b"\n")
+            await trio.sleep(interval)
+
+    def _handle_client_message(
+        self, line: bytes, pings: dict[str, float], now: float
+    ) -> None:
+        try:
+            message = json.loads(line)
+        except ValueError:
+            return
+
+        refs = message.get("refs")
+        if refs is not None:
+            sent_at = pings.pop(refs, None)
+            if sent_at is not None:
+                self.report.ping_rtts.append(now - sent_at)
+            return
+
+        body = message.get("body") or {}
+        if body.get("type") != "UAV-INF":
+            return
+
+        for status in (body.get("status") or {}).values():
+            self.report.status_updates += 1
+            position = status.get("position")
+            if not position or len(position) < 4:
+                continue
+
+            marker = decode_latency_marker(position[3])
+            vehicle = self.vehicles.get(marker[0]) if marker else None
+            if vehicle is None:
+                continue
+
+            sent_at = vehicle.position_sent_at[marker[1]]
+            if sent_at is not None:
+                # Each marker is counted only once; subsequent status updates
+                # of the same UAV without a new position would skew the
+                # measurement otherwise
+                vehicle.position_sent_at[marker[1]] = None
+                self.report.latencies.append(now - sent_at)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import click
+
+    @click.command()
+    @click.option("-n", "--uavs", type=int, default=10, help="Number of UAVs")
+    @click.option(
+        "-d", "--duration", type=float, default=30.0, help="Duration, in seconds"
+    )
+    @click.option("--host", default="127.0.0.1", help="Host of the server")
+    @click.option(
+        "-p", "--port", type=int, default=14550, help="UDP port of the server"
+    )
+    @click.option(
+        "--tcp",
+        "tcp_port",
+        type=int,
+        default=None,
+        help="Listen on this TCP port for the server instead of using UDP",
+    )
+    @click.option(
+        "--client-port",
+        type=int,
+        default=5001,
+        help="Port of the JSON-over-TCP channel of the server; 0 to disable",
+    )
+    @click.option(
+        "--rate",
+        "rates",
+        multiple=True,
+        metavar="MESSAGE=HZ",
+        help="Rate of a telemetry stream, e.g. GLOBAL_POSITION_INT=10",
+    )
+    @click.option(
+        "--honor-intervals",
+        is_flag=True,
+        help="Let the server adjust the rates of the simulated vehicles",
+    )
+    @click.option(
+        "--replay",
+        type=click.Path(exists=True, dir_okay=False),
+        default=None,
+        help="Replay this telemetry log instead of simulating vehicles",
+    )
+    @click.option("--speed", type=float, default=1.0, help="Replay speed")
+    @click.option("--loop", is_flag=True, help="Loop the replayed log")
+    @click.option("--json", "as_json", is_flag=True, help="Print the report as JSON")
+    def cli(
+        uavs,
+        duration,
+        host,
+        port,
+        tcp_port,
+        client_port,
+        rates,
+        honor_intervals,
+        replay,
+        speed,
+        loop,
+        as_json,
+    ):
+        parsed_rates = {}
+        for spec in rates:
+            name, _, rate = spec.partition("=")
+            parsed_rates[name.strip().upper()] = float(rate)
+
+        generator = LoadGenerator(
+            uavs,
+            host=host,
+            port=port,
+            tcp_port=tcp_port,
+            client_port=client_port or None,
+            rates=parsed_rates,
+            honor_message_intervals=honor_intervals,
+            replay=replay,
+            speed=speed,
+            loop=loop,
+        )
+        report = trio.run(generator.run, duration)
+        click.echo(json.dumps(report.json()) if as_json else str(report))
+        return 0
+
+    return cli.main(args=argv, standalone_mode=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
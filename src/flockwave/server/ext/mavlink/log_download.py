@@ -1,15 +1,21 @@
 """Implementation of downloading logs via a MAVLink connection."""
 
+import json
+
+from collections import deque
 from functools import partial
+from pathlib import Path
+from tempfile import TemporaryFile
 from trio import (
     current_time,
     fail_after,
     move_on_after,
     open_memory_channel,
     TooSlowError,
+    WouldBlock,
 )
 from trio.abc import ReceiveChannel, SendChannel
-from typing import AsyncIterator, Callable, Optional, Union
+from typing import AsyncIterator, BinaryIO, Callable, Optional, Union
 
 from flockwave.concurrency import aclosing, Future
 from flockwave.logger import Logger
@@ -21,9 +27,13 @@ from .types import (
     MAVLinkMessageSpecification,
     spec,
 )
-from .utils import ChunkAssembler
+from .utils import BandwidthLimiter, ChunkAssembler
+
+__all__ = ("MAVLinkLogDownloader", "PartialLogFile")
 
-__all__ = ("MAVLinkLogDownloader",)
+
+LOG_DATA_SIZE = 90
+"""Maximum number of bytes in a single ``LOG_DATA`` message."""
 
 
 def create_log_metadata_from_mavlink_message(
@@ -39,11 +49,166 @@ def create_log_metadata_from_mavlink_message(
     )
 
 
+def _format_data_rate(bytes_per_second: float) -> str:
+    """Formats a data transfer rate in a human-readable manner."""
+    if bytes_per_second >= 1048576:
+        return f"{bytes_per_second / 1048576:.1f} MB/s"
+    elif bytes_per_second >= 1024:
+        return f"{bytes_per_second / 1024:.1f} KB/s"
+    else:
+        return f"{bytes_per_second:.0f} B/s"
+
+
+class PartialLogFile:
+    """A log that is being downloaded into a file on the disk.
+
+    When the file is placed in a cache directory, the byte ranges that were
+    already written to it are recorded in a JSON file next to it so an
+    interrupted download can be resumed later, even after a restart of the
+    server. Without a cache directory, the log is downloaded into an anonymous
+    temporary file that cannot be resumed.
+    """
+
+    _fp: BinaryIO
+    """The file that the log is written into."""
+
+    _num_received: int
+    """Number of bytes at the start of the log that were already written into
+    the file.
+    """
+
+    _path: Optional[Path]
+    """Path of the file; ``None`` if the file is an anonymous temporary file."""
+
+    @classmethod
+    def open(
+        cls, metadata: FlightLogMetadata, directory: Optional[Path] = None
+    ) -> "PartialLogFile":
+        """Opens the file of a partially downloaded log, or creates a new one
+        if the log was not downloaded earlier.
+
+        Parameters:
+            metadata: the metadata of the log; its ID, size and timestamp are
+                used to decide whether an earlier partial download belongs to
+                the same log
+            directory: the directory that the partially downloaded logs are
+                stored in; ``None`` to download the log into an anonymous
+                temporary file
+        """
+        if directory is None:
+            return cls(TemporaryFile(), None, 0)
+
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / (
+            f"{metadata.id}-{metadata.size}-{metadata.timestamp or 0}.bin"
+        )
+        num_received = cls._load_num_received(path)
+        fp = open(path, "r+b" if num_received else "w+b")
+        fp.seek(num_received)
+        fp.truncate()
+
+        return cls(fp, path, num_received)
+
+    @staticmethod
+    def _load_num_received(path: Path) -> int:
+        """Returns the number of bytes at the start of the file at the given
+        path that were already downloaded, based on the range map stored in
+        the JSON file next to it.
+        """
+        try:
+            state = json.loads(path.with_suffix(".json").read_text())
+            start, end = state["ranges"][0]
+            size = path.stat().st_size
+        except Exception:
+            return 0
+
+        return min(int(end), size) if start == 0 else 0
+
+    def __init__(self, fp: BinaryIO, path: Optional[Path], num_received: int):
+        """Constructor.
+
+        Do not call this function directly; use `PartialLogFile.open()`
+        instead.
+        """
+        self._fp = fp
+        self._num_received = num_received
+        self._path = path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def num_received(self) -> int:
+        """Returns the number of bytes at the start of the log that were
+        already written into the file.
+        """
+        return self._num_received
+
+    def close(self) -> None:
+        """Saves the range map of the file and closes it. The file can be
+        reopened later with `PartialLogFile.open()` to resume the download.
+        """
+        if not self._fp.closed:
+            self.save()
+            self._fp.close()
+
+    def discard(self) -> None:
+        """Closes the file and removes it from the disk along with its range
+        map.
+        """
+        self._fp.close()
+        if self._path is not None:
+            self._path.with_suffix(".json").unlink(missing_ok=True)
+            self._path.unlink(missing_ok=True)
+
+    def read(self) -> bytes:
+        """Returns the entire contents of the file."""
+        self._fp.seek(0)
+        try:
+            return self._fp.read(self._num_received)
+        finally:
+            self._fp.seek(self._num_received)
+
+    def save(self) -> None:
+        """Flushes the file and saves its range map so the download can be
+        resumed later.
+        """
+        self._fp.flush()
+        if self._path is None:
+            return
+
+        state_path = self._path.with_suffix(".json")
+        tmp_path = self._path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps({"ranges": [[0, self._num_received]]}))
+        tmp_path.replace(state_path)
+
+    def write(self, data: bytes) -> None:
+        """Appends the given data to the end of the downloaded part of the
+        log.
+        """
+        self._fp.write(data)
+        self._num_received += len(data)
+
+
 class MAVLinkLogDownloader:
     """Object that can be used to download logs from a MAVLink drone via a
     MAVLink connection.
     """
 
+    _cache_dir: Optional[Path] = None
+    """Directory where partially downloaded logs are stored so the downloads
+    can be resumed if the connection to the drone is interrupted; ``None`` if
+    logs are downloaded into anonymous temporary files.
+    """
+
+    _limiter: Optional[BandwidthLimiter] = None
+    """Bandwidth limiter shared by the log downloaders of all the drones in
+    the same network; ``None`` if the bandwidth is not limited.
+    """
+
     _sender: Callable
     """A function that can be called to send a MAVLink message over the
     connection associated to this MAVFTP object.
@@ -71,9 +236,36 @@ class MAVLinkLogDownloader:
         """Constructs a MAVFTP connection object to the given UAV."""
         sender = partial(uav.driver.send_packet, target=uav)
         log = uav.driver.log
-        return cls(sender, log=log)
+        cache_dir = uav.driver.log_cache_dir
+        return cls(
+            sender,
+            log=log,
+            cache_dir=cache_dir / uav.id if cache_dir else None,
+            limiter=uav.log_download_limiter,
+        )
+
+    def __init__(
+        self,
+        sender: Callable,
+        log: Optional[Logger] = None,
+        *,
+        cache_dir: Optional[Path] = None,
+        limiter: Optional[BandwidthLimiter] = None,
+    ):
+        """Constructor.
 
-    def __init__(self, sender: Callable, log: Optional[Logger] = None):
+        Parameters:
+            sender: function that can be called to send a MAVLink message to
+                the drone
+            log: logger that the downloader can use to log messages
+            cache_dir: directory where partially downloaded logs are stored
+                so the downloads can be resumed later; ``None`` to download
+                logs into anonymous temporary files
+            limiter: bandwidth limiter shared by all the drones in the same
+                network; ``None`` if the bandwidth is not limited
+        """
+        self._cache_dir = cache_dir
+        self._limiter = limiter if limiter and limiter.enabled else None
         self._sender = sender
         self._log = log
         self._retries = 5
@@ -126,7 +318,12 @@ class MAVLinkLogDownloader:
 
     def handle_message_log_data(self, message: MAVLinkMessage):
         if self._message_channel:
-            self._message_channel.send_nowait(message)  # type: ignore
+            try:
+                self._message_channel.send_nowait(message)  # type: ignore
+            except WouldBlock:
+                # The download task cannot keep up; the missing data will be
+                # requested again when the task notices the gap
+                pass
 
     def handle_message_log_entry(self, message: MAVLinkMessage):
         if self._message_channel:
@@ -141,8 +338,16 @@ class MAVLinkLogDownloader:
         # wifi module also take care of other things while doing the download.
         # Requesting the entire log at once has caused timeout problems with
         # mavesp8266. The strategy adopted here is identical to what
-        # QGroundControl is doing
-        MAX_CHUNK_SIZE = 512 * 90
+        # QGroundControl is doing. When the bandwidth is limited, we request
+        # at most one second worth of data at once so the downloads of
+        # different drones are interleaved more finely.
+        MAX_CHUNK_SIZE = 512 * LOG_DATA_SIZE
+        if self._limiter:
+            max_chunk_size = min(
+                MAX_CHUNK_SIZE, max(int(self._limiter.rate), LOG_DATA_SIZE)
+            )
+        else:
+            max_chunk_size = MAX_CHUNK_SIZE
 
         try:
             # Get the size of the log first and create a chunk assembler
@@ -154,48 +359,74 @@ class MAVLinkLogDownloader:
             if metadata.size is None:
                 raise RuntimeError("unknown log size")
 
-            chunks = ChunkAssembler(metadata.size)
-            log_data: list[bytes] = []
-            while not chunks.done:
-                next_range = chunks.get_next_range(max_size=MAX_CHUNK_SIZE)
-                response: Optional[MAVLinkMessage] = await self._send_and_wait(
-                    spec.log_request_data(
-                        id=log_id, ofs=next_range.offset, count=next_range.size
-                    ),
-                    spec.log_data(),
-                )
+            with PartialLogFile.open(metadata, self._cache_dir) as log_file:
+                if log_file.num_received and self._log:
+                    self._log.info(
+                        f"Resuming download of log {log_id} from byte "
+                        f"{log_file.num_received}"
+                    )
 
-                # Process the response, and start processing any other LOG_DATA messages
-                # that we receive via the channel
-                while response is not None:
-                    if response.get_type() == "LOG_DATA":
-                        if response.id != log_id:
-                            # ignore
-                            pass
+                chunks = ChunkAssembler(metadata.size, log_file.num_received)
 
-                        to_flush = chunks.add_chunk(
-                            response.ofs, bytes(response.data[: response.count])
-                        )
-                        if to_flush:
-                            log_data.append(to_flush)
+                # Samples of the number of bytes received so far, used to
+                # calculate the transfer rate over the last few seconds
+                samples = deque([(last_progress_at, chunks.num_flushed)])
 
-                    response = None
-                    if not chunks.done_with(next_range):
-                        with move_on_after(3):
-                            response = await rx.receive()
-
-                    now = current_time()
-                    if now - last_progress_at > 0.1:
-                        yield Progress(
-                            percentage=round(chunks.percentage),
-                            message="Downloading log...",
-                        )
-                        last_progress_at = current_time()
+                while not chunks.done:
+                    next_range = chunks.get_next_range(max_size=max_chunk_size)
+                    if self._limiter:
+                        await self._limiter.acquire(next_range.size)
+
+                    response: Optional[MAVLinkMessage] = await self._send_and_wait(
+                        spec.log_request_data(
+                            id=log_id, ofs=next_range.offset, count=next_range.size
+                        ),
+                        spec.log_data(),
+                    )
+
+                    # Process the response, and start processing any other
+                    # LOG_DATA messages that we receive via the channel
+                    while response is not None:
+                        if response.get_type() == "LOG_DATA" and response.id == log_id:
+                            to_flush = chunks.add_chunk(
+                                response.ofs, bytes(response.data[: response.count])
+                            )
+                            if to_flush:
+                                log_file.write(to_flush)
+
+                        response = None
+                        if not chunks.done_with(next_range):
+                            with move_on_after(3):
+                                response = await rx.receive()
+
+                        now = current_time()
+                        if now - last_progress_at > 0.1:
+                            received = chunks.num_flushed_and_queued
+                            samples.append((now, received))
+                            while now - samples[0][0] > 2 and len(samples) > 2:
+                                samples.popleft()
+
+                            start_time, start_received = samples[0]
+                            rate = (received - start_received) / (now - start_time)
+                            yield Progress(
+                                percentage=round(chunks.percentage),
+                                message=(
+                                    "Downloading log... " + _format_data_rate(rate)
+                                ),
+                            )
+                            last_progress_at = current_time()
+
+                    # Record the progress so far in case the download is
+                    # interrupted
+                    log_file.save()
+
+                body = log_file.read()
+                log_file.discard()
 
         finally:
             await self._sender(spec.log_request_end())
 
-        yield FlightLog.create_from_metadata(metadata, body=b"".join(log_data))
+        yield FlightLog.create_from_metadata(metadata, body=body)
 
     async def _get_log_list_inner(
         self, rx: ReceiveChannel[MAVLinkMessage]
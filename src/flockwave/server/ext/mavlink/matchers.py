@@ -0,0 +1,196 @@
+"""Index of the pending MAVLink response matchers of a MAVLink network."""
+
+from __future__ import annotations
+
+from itertools import count
+from operator import attrgetter
+from typing import Any, Callable, Iterator, Optional, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from flockwave.concurrency import Future
+
+    from .types import MAVLinkMessage, MAVLinkMessageMatcher
+
+__all__ = ("MessageMatcherIndex", "compile_matcher")
+
+
+MatcherKey = tuple[str, Optional[int]]
+"""Key of a group of matchers: a MAVLink message type and a system ID, or
+``None`` for matchers that accept messages from any system.
+"""
+
+
+def _match_all(message: MAVLinkMessage) -> bool:
+    return True
+
+
+def compile_matcher(
+    params: MAVLinkMessageMatcher,
+) -> Callable[[MAVLinkMessage], bool]:
+    """Turns a MAVLink message matching criterion into a predicate that can
+    be evaluated quickly for every inbound message.
+
+    Parameters:
+        params: ``None`` to match all messages, a dictionary mapping field
+            names to the values that the fields of the message must be equal
+            to, or a callable that is returned as is
+
+    Returns:
+        a callable that takes a MAVLink message and returns whether it
+        matches the criterion
+    """
+    if params is None:
+        return _match_all
+    if callable(params):
+        return params
+    if not params:
+        return _match_all
+
+    names = tuple(params)
+    values = tuple(params.values())
+
+    if len(names) == 1:
+        (name,), (value,) = names, values
+
+        def match_one(message: MAVLinkMessage) -> bool:
+            return getattr(message, name, None) == value
+
+        return match_one
+
+    getter = attrgetter(*names)
+
+    def match_many(message: MAVLinkMessage) -> bool:
+        try:
+            return getter(message) == values
+        except AttributeError:
+            # Missing fields are treated as None
+            return all(
+                getattr(message, name, None) == value
+                for name, value in zip(names, values)
+            )
+
+    return match_many
+
+
+class MessageMatcherIndex:
+    """Pending matchers of MAVLink messages, each with a future that is
+    resolved with the first matching message, indexed by message type and
+    system ID.
+
+    Registering and removing a matcher takes constant time, and dispatching
+    an inbound message only looks at the matchers of its own type that wait
+    for its system ID or for any system ID.
+    """
+
+    _counter: Iterator[int]
+    """Counter that generates unique keys for the registered matchers."""
+
+    _matchers: dict[
+        MatcherKey, dict[int, tuple[Callable[[MAVLinkMessage], bool], Future]]
+    ]
+    """Dictionary mapping message types and system IDs to the matchers
+    registered for them, in the order of registration.
+    """
+
+    _types: dict[str, int]
+    """Number of matchers registered for each message type."""
+
+    def __init__(self):
+        """Constructor."""
+        self._counter = count()
+        self._matchers = {}
+        self._types = {}
+
+    def __len__(self) -> int:
+        return sum(self._types.values())
+
+    def add(
+        self,
+        type: str,
+        params: MAVLinkMessageMatcher,
+        system_id: Optional[int],
+        future: Future,
+    ) -> tuple[MatcherKey, int]:
+        """Registers a new matcher.
+
+        Parameters:
+            type: the type of the MAVLink message to match
+            params: the matching criterion; see `compile_matcher()`
+            system_id: the system ID that the message must come from; ``None``
+                means any system ID
+            future: the future to resolve with the first matching message
+
+        Returns:
+            a handle that can be passed to `remove()` to remove the matcher
+        """
+        key = (type, system_id)
+        token = next(self._counter)
+        group = self._matchers.get(key)
+        if group is None:
+            group = self._matchers[key] = {}
+        group[token] = (compile_matcher(params), future)
+        self._types[type] = self._types.get(type, 0) + 1
+        return key, token
+
+    def remove(self, handle: tuple[MatcherKey, int]) -> None:
+        """Removes a matcher registered with `add()`.
+
+        Parameters:
+            handle: the handle returned from `add()`
+        """
+        key, token = handle
+        group = self._matchers.get(key)
+        if group is None or group.pop(token, None) is None:
+            return
+
+        if not group:
+            del self._matchers[key]
+
+        type = key[0]
+        remaining = self._types[type] - 1
+        if remaining:
+            self._types[type] = remaining
+        else:
+            del self._types[type]
+
+    def cancel_all(self) -> None:
+        """Cancels the futures of all the registered matchers."""
+        for group in self._matchers.values():
+            for _, future in group.values():
+                future.cancel()
+
+    def dispatch(self, type: str, system_id: int, message: Any) -> int:
+        """Resolves the futures of all the matchers that match the given
+        message.
+
+        Parameters:
+            type: the type of the message
+            system_id: the system ID of the sender of the message
+            message: the message
+
+        Returns:
+            the number of futures resolved
+        """
+        if type not in self._types:
+            return 0
+
+        resolved = 0
+        for key in ((type, system_id), (type, None)):
+            group = self._matchers.get(key)
+            if not group:
+                continue
+
+            # The futures may remove their matchers while we are iterating
+            for predicate, future in list(group.values()):
+                if future.done():
+                    # This may happen if we get multiple matching messages in
+                    # quick succession before the task waiting for the result
+                    # gets a chance of responding to them; in this case, we
+                    # have to ignore the message, otherwise we would be
+                    # resolving the future twice
+                    continue
+                if predicate(message):
+                    future.set_result(message)
+                    resolved += 1
+
+        return resolved
@@ -0,0 +1,164 @@
+"""Bookkeeping of the missions, geofences and rally points that were last
+confirmed by MAVLink drones, used to skip uploads whose content did not
+change.
+"""
+
+from dataclasses import dataclass
+from hashlib import sha1
+from struct import pack, unpack
+from typing import Optional, Sequence, Union
+
+from .enums import MAVMissionType
+from .types import MAVLinkMessage, MAVLinkMessageSpecification
+
+__all__ = ("MissionCache", "MissionRecord", "get_mission_item_digest")
+
+
+_FLOAT_FIELDS = ("param1", "param2", "param3", "param4", "z")
+"""Fields of a mission item that are transferred as single-precision floats."""
+
+_INT_FIELDS = ("command", "frame", "x", "y", "autocontinue")
+"""Fields of a mission item that are transferred as integers."""
+
+
+def _to_float32(value: float) -> float:
+    """Rounds the given value to single precision, the same way as it is
+    transferred over the wire.
+    """
+    return unpack("<f", pack("<f", float(value)))[0]
+
+
+def get_mission_item_digest(
+    item: Union[MAVLinkMessage, MAVLinkMessageSpecification],
+) -> str:
+    """Returns a digest of a single mission item that is identical for the
+    encoded item that we send to a drone and the item that the drone sends back
+    when the mission is downloaded.
+
+    Parameters:
+        item: a ``MISSION_ITEM_INT`` message received from a drone, or the
+            specification of a ``MISSION_ITEM_INT`` message to send to a drone
+
+    Returns:
+        the digest of the mission item
+    """
+    if isinstance(item, tuple):
+        fields = item[1]
+        values = [int(fields.get(name, 0)) for name in _INT_FIELDS]
+        values.extend(_to_float32(fields.get(name, 0)) for name in _FLOAT_FIELDS)
+    else:
+        values = [int(getattr(item, name, 0)) for name in _INT_FIELDS]
+        values.extend(_to_float32(getattr(item, name, 0)) for name in _FLOAT_FIELDS)
+    return sha1(repr(values).encode("ascii")).hexdigest()
+
+
+@dataclass(frozen=True)
+class MissionRecord:
+    """The content of a mission, geofence or rally point list that a drone
+    has confirmed.
+    """
+
+    digests: tuple[str, ...]
+    """The digests of the items, in the order of their sequence numbers."""
+
+    opaque_id: int = 0
+    """Opaque identifier that the autopilot assigned to this content; zero if
+    the autopilot does not support opaque identifiers.
+    """
+
+    @property
+    def checksum(self) -> str:
+        """Returns a checksum of the entire content."""
+        return sha1("".join(self.digests).encode("ascii")).hexdigest()
+
+    @property
+    def count(self) -> int:
+        """Returns the number of items."""
+        return len(self.digests)
+
+    def get_changed_range(
+        self, digests: Sequence[str], max_fraction: float = 0.5
+    ) -> Optional[tuple[int, int]]:
+        """Returns the smallest contiguous range of items that has to be
+        rewritten to turn this content into the content with the given item
+        digests, if it is small enough to be worth a partial write.
+
+        Parameters:
+            digests: the digests of the items of the new content
+            max_fraction: maximum size of the range, relative to the number of
+                items
+
+        Returns:
+            the index of the first and the last item to rewrite (both
+            inclusive), or ``None`` if the number of items differs, if nothing
+            changed or if the range is too large
+        """
+        if len(digests) != self.count:
+            return None
+
+        changed = [
+            index
+            for index, (old, new) in enumerate(zip(self.digests, digests))
+            if old != new
+        ]
+        if not changed:
+            return None
+
+        start, end = changed[0], changed[-1]
+        if end - start + 1 > max_fraction * self.count:
+            return None
+
+        return start, end
+
+
+class MissionCache:
+    """Object that keeps track of the missions, geofences and rally points
+    that were last confirmed by a single drone.
+
+    Entries are keyed by MAVLink mission types. An entry is removed when an
+    upload starts and added again when the drone confirms the upload, so a
+    failed or interrupted upload never leaves a stale entry behind.
+    """
+
+    _records: dict[int, MissionRecord]
+
+    def __init__(self):
+        """Constructor."""
+        self._records = {}
+
+    def get(self, mission_type: MAVMissionType) -> Optional[MissionRecord]:
+        """Returns the content of the given type that was last confirmed by the
+        drone, or ``None`` if it is not known.
+        """
+        return self._records.get(mission_type)
+
+    def invalidate(self, mission_type: Optional[MAVMissionType] = None) -> None:
+        """Forgets the content of the given type, or all the contents if no
+        type is given.
+        """
+        if mission_type is None:
+            self._records.clear()
+        else:
+            self._records.pop(mission_type, None)
+
+    def update(
+        self,
+        mission_type: MAVMissionType,
+        digests: Sequence[str],
+        opaque_id: int = 0,
+    ) -> MissionRecord:
+        """Records the content of the given type that the drone has confirmed.
+
+        Parameters:
+            mission_type: the type of the content
+            digests: the digests of the items of the content
+            opaque_id: the opaque identifier that the autopilot assigned to
+                the content; zero if the autopilot does not support opaque
+                identifiers
+
+        Returns:
+            the new record
+        """
+        record = MissionRecord(tuple(digests), int(opaque_id or 0))
+        self._records[mission_type] = record
+        return record
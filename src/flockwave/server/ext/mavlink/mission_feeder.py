@@ -0,0 +1,67 @@
+"""Streaming of long waypoint paths to MAVLink-based UAVs."""
+
+from typing import Sequence, TYPE_CHECKING
+
+import numpy as np
+
+from flockwave.server.tasks.mission_feeder import MissionFeederBase
+
+from .automission import AutoMissionManager
+from .enums import MAVCommand, MAVMissionType
+from .utils import HEARTBEAT_TIMEOUT
+
+if TYPE_CHECKING:
+    from .driver import MAVLinkUAV
+
+__all__ = ("MAVLinkMissionFeeder",)
+
+
+class MAVLinkMissionFeeder(MissionFeederBase):
+    """Mission feeder that uploads the windows of the path as the mission of
+    a MAVLink-based UAV.
+
+    The first item of a MAVLink mission is the home position, so the
+    waypoints of a window occupy mission items 1, 2, 3 and so on.
+    """
+
+    def __init__(
+        self, uav: "MAVLinkUAV", path: Sequence[Sequence[float]], altitude, **kwds
+    ):
+        """Constructor.
+
+        Parameters:
+            uav: the UAV to feed the path to
+            path: the waypoints of the path, as longitude-latitude pairs
+            altitude: the altitude of the waypoints, relative to the home
+                position, in metres
+
+        Keyword arguments are forwarded to the constructor of the base class.
+        """
+        kwds.setdefault("timeout", HEARTBEAT_TIMEOUT)
+        super().__init__(path, altitude, log=uav.driver.log, **kwds)
+        self._uav = uav
+        # Consecutive windows rarely have anything in common so there is no
+        # point in comparing them with what the drone has
+        self._manager = AutoMissionManager.for_uav(uav, use_cache=False)
+
+    def notify_mission_current(self, seq: int) -> None:
+        """Handles the sequence number of the current mission item reported
+        by the UAV in a MISSION_CURRENT message.
+        """
+        self.notify_current(seq - 1)
+
+    async def _upload_window(self, waypoints: np.ndarray, altitude: float) -> None:
+        items = [
+            (
+                MAVCommand.NAV_WAYPOINT,
+                {"x": lat, "y": lon, "z": altitude, "autocontinue": 1},
+            )
+            for lat, lon in waypoints.tolist()
+        ]
+        # The home position is overwritten by the autopilot anyway; the first
+        # waypoint is repeated there, the same way as for uploaded missions
+        self._uav.mission_cache.invalidate(MAVMissionType.MISSION)
+        await self._manager.upload_AutoMission([items[0], *items])
+
+    async def _set_current_waypoint(self, index: int) -> None:
+        await self._uav.driver._skip_waypoint(self._uav, index + 1)
@@ -0,0 +1,181 @@
+"""Concurrent upload of missions to multiple MAVLink drones."""
+
+from collections import defaultdict
+from contextlib import closing
+from functools import partial
+from math import inf
+from trio import CapacityLimiter, TooSlowError, open_nursery
+from typing import Any, AsyncIterator, Callable, Optional, Sequence, Union
+
+from flockwave.server.model.commands import Progress
+from flockwave.server.tasks import ProgressReporter
+
+from .automission import AutoMissionManager, MissionItem, encode_mission_items
+from .types import MAVLinkMessageSpecification
+
+__all__ = ("FleetMissionUploader",)
+
+
+class FleetMissionUploader:
+    """Uploads missions to multiple MAVLink drones concurrently and reports
+    the progress of the uploads as a single operation.
+
+    The mission items of all the drones are encoded into MAVLink messages
+    before the first upload starts so the uploads only have to look up the
+    items that the drones request. The number of concurrent uploads is
+    limited in each MAVLink network separately such that the uploads do not
+    saturate the links that the drones of the same network share.
+
+    The typical usage pattern is to run `run()` in a background task and to
+    forward the items yielded by `updates()` to the client that requested the
+    upload.
+    """
+
+    _clear: bool
+    """Whether to clear the existing mission of each drone before the upload."""
+
+    _manager_factory: Callable[[Any], AutoMissionManager]
+    """Function that creates a mission manager for a single drone."""
+
+    _max_uploads_per_network: int
+    """Maximum number of concurrent uploads in a single MAVLink network."""
+
+    _progress: dict[str, float]
+    """Progress of the upload of each drone, in percents, keyed by drone IDs."""
+
+    _reporter: ProgressReporter
+    """Progress reporter that aggregates the progress of the uploads."""
+
+    _results: dict[str, Optional[str]]
+    """Outcome of the upload of each drone that has finished already, keyed by
+    drone IDs. Values are error messages or ``None`` if the upload succeeded.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_uploads_per_network: int = 4,
+        clear: bool = False,
+        manager_factory: Callable[[Any], AutoMissionManager] = (
+            AutoMissionManager.for_uav
+        ),
+    ):
+        """Constructor.
+
+        Parameters:
+            max_uploads_per_network: maximum number of uploads that may run
+                concurrently in the same MAVLink network
+            clear: whether to clear the existing mission of each drone before
+                uploading the new one. Not needed in general as the upload
+                replaces the existing mission anyway; clearing the mission
+                also prevents the upload from being skipped when the drone
+                has the same mission already
+            manager_factory: function that creates a mission manager for a
+                single drone
+        """
+        self._clear = bool(clear)
+        self._manager_factory = manager_factory
+        self._max_uploads_per_network = max(int(max_uploads_per_network), 1)
+        self._progress = {}
+        self._reporter = ProgressReporter()
+        self._results = {}
+
+    @property
+    def results(self) -> dict[str, Optional[str]]:
+        """Returns the outcome of the upload of each drone that has finished
+        already, keyed by drone IDs. Values are error messages or ``None`` if
+        the upload succeeded.
+        """
+        return dict(self._results)
+
+    async def run(
+        self, missions: dict[Any, Sequence[MissionItem]]
+    ) -> dict[str, Optional[str]]:
+        """Uploads the given missions to the corresponding drones.
+
+        Failed uploads do not interrupt the uploads to the other drones; their
+        errors are reported in the returned dictionary instead.
+
+        Parameters:
+            missions: dictionary mapping drones to the mission items to upload
+                to them
+
+        Returns:
+            the outcome of the upload of each drone, keyed by drone IDs.
+            Values are error messages or ``None`` if the upload succeeded.
+        """
+        encoded = [
+            (uav, encode_mission_items(items)) for uav, items in missions.items()
+        ]
+        limiters: defaultdict[str, CapacityLimiter] = defaultdict(
+            lambda: CapacityLimiter(self._max_uploads_per_network)
+        )
+
+        self._progress = {uav.id: 0.0 for uav, _ in encoded}
+        self._results.clear()
+
+        with closing(self._reporter):
+            self._notify()
+            async with open_nursery() as nursery:
+                for uav, items in encoded:
+                    nursery.start_soon(
+                        self._upload, uav, items, limiters[uav.network_id]
+                    )
+
+        return self.results
+
+    async def updates(
+        self, timeout: float = inf
+    ) -> AsyncIterator[Union[Progress, dict[str, Optional[str]]]]:
+        """Async generator that yields `Progress` objects while the uploads
+        are running, followed by the outcome of the upload of each drone when
+        all the uploads have finished.
+
+        Parameters:
+            timeout: maximum number of seconds to wait between consecutive
+                progress updates
+        """
+        async for progress in self._reporter.updates(timeout=timeout):
+            yield progress
+        yield self.results
+
+    def _notify(self) -> None:
+        """Posts the aggregated progress of the uploads to the progress
+        reporter.
+        """
+        num_uavs = len(self._progress)
+        percentage = sum(self._progress.values()) / num_uavs if num_uavs else 100
+        self._reporter.notify(
+            percentage=int(percentage),
+            message=f"Uploaded missions to {len(self._results)}/{num_uavs} drones",
+        )
+
+    def _on_progress(self, uav_id: str, num_done: int, num_items: int) -> None:
+        """Handler called when a drone requests a new mission item during the
+        upload.
+        """
+        self._progress[uav_id] = 100 * num_done / num_items if num_items else 100
+        self._notify()
+
+    async def _upload(
+        self,
+        uav: Any,
+        items: Sequence[MAVLinkMessageSpecification],
+        limiter: CapacityLimiter,
+    ) -> None:
+        """Uploads the given encoded mission items to a single drone."""
+        async with limiter:
+            manager = self._manager_factory(uav)
+            try:
+                if self._clear:
+                    await manager.clear_mission()
+                await manager.upload_encoded_mission(
+                    items, on_progress=partial(self._on_progress, uav.id)
+                )
+            except (RuntimeError, TooSlowError) as ex:
+                self._results[uav.id] = str(ex) or ex.__class__.__name__
+            else:
+                self._results[uav.id] = None
+
+        self._progress[uav.id] = 100.0
+        self._notify()
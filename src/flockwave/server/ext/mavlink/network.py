@@ -32,16 +32,20 @@ from flockwave.concurrency import Future, race
 from flockwave.networking import find_interfaces_with_address
 from flockwave.server.comm import CommunicationManager
 from flockwave.server.model import ConnectionPurpose
-from flockwave.server.utils import nop, overridden
+from flockwave.server.utils import overridden
+from .budget import LinkBudgetConfiguration, LinkBudgetManager
 from .comm import (
     create_communication_manager,
     Channel,
     MAVLinkMessage,
 )
+from .dispatch import MessageHandlerTable
 from .driver import MAVLinkDriver, MAVLinkUAV
 from .enums import MAVAutopilot, MAVComponent, MAVMessageType, MAVState, MAVType
 from .led_lights import MAVLinkLEDLightConfigurationManager
+from .matchers import MessageMatcherIndex
 from .packets import DroneShowStatus
+from .recorder import FlightRecorder
 from .rtk import RTKCorrectionPacketEncoder
 from .signing import MAVLinkSigningConfiguration
 from .takeoff import ScheduledTakeoffManager
@@ -52,6 +56,7 @@ from .types import (
     spec,
 )
 from .utils import (
+    BandwidthLimiter,
     flockwave_severity_from_mavlink_severity,
     python_log_level_from_mavlink_severity,
     log_id_from_message,
@@ -73,9 +78,6 @@ HEARTBEAT_SPEC = (
 )
 
 
-Matchers = dict[str, list[tuple[Optional[int], MAVLinkMessageMatcher, Future]]]
-
-
 class MAVLinkNetwork:
     """Representation of a MAVLink network."""
 
@@ -96,12 +98,12 @@ class MAVLinkNetwork:
     Skybrush.
     """
 
-    _matchers: Matchers
-    """Dictionary mapping MAVLink message types to lists of tuples consisting
-    of an optional MAVLink system ID, a MAVLink message matching criterion and a
-    future that will be resolved when a MAVLink message matching the criterion
-    is received from the given MAVLink system ID (or any system ID if no
-    system ID was specified).
+    _matchers: MessageMatcherIndex
+    """Index of the MAVLink message matching criteria that we are waiting for,
+    keyed by MAVLink message type and an optional MAVLink system ID. Each
+    criterion has a future that will be resolved when a MAVLink message
+    matching the criterion is received from the given MAVLink system ID (or
+    any system ID if no system ID was specified).
     """
 
     _routing: dict[str, list[int]]
@@ -139,6 +141,8 @@ class MAVLinkNetwork:
             spec.id,
             system_id=spec.system_id,
             id_formatter=spec.id_format.format,
+            link_budget=spec.link_budget,
+            log_download_rate=spec.log_download_rate,
             packet_loss=spec.packet_loss,
             statustext_targets=spec.statustext_targets,
             routing=spec.routing,
@@ -159,6 +163,8 @@ class MAVLinkNetwork:
         *,
         system_id: int = 254,
         id_formatter: Callable[[int, str], str] = "{0}".format,
+        link_budget: LinkBudgetConfiguration = LinkBudgetConfiguration.DISABLED,
+        log_download_rate: float = 0,
         packet_loss: float = 0,
         statustext_targets: Optional[frozenset[str]] = None,
         routing: Optional[dict[str, list[int]]] = None,
@@ -178,6 +184,13 @@ class MAVLinkNetwork:
             id_formatter: function that can be called with a MAVLink system ID
                 and the network ID, and that must return a string that will be
                 used for the drone with the given system ID on the network
+            link_budget: specifies the bandwidth available for the telemetry
+                streams of the drones in the network; the rates of the streams
+                are negotiated dynamically with the drones to fit in the
+                budget if it is enabled
+            log_download_rate: maximum number of bytes per second that flight
+                log downloads may use in the network, shared by all the drones;
+                zero means no limit
             packet_loss: when larger than zero, simulates packet loss on the
                 network by randomly dropping received and sent MAVLink messages
             statustext_targets: specifies where to forward MAVLink status text
@@ -205,6 +218,8 @@ class MAVLinkNetwork:
         self._led_light_configuration_manager = MAVLinkLEDLightConfigurationManager(
             self
         )
+        self._link_budget_manager = LinkBudgetManager(self, link_budget)
+        self._log_download_limiter = BandwidthLimiter(log_download_rate)
         self._packet_loss = max(float(packet_loss), 0.0)
         self._routing = routing or {}
         self._scheduled_takeoff_manager = ScheduledTakeoffManager(self)
@@ -268,14 +283,12 @@ class MAVLinkNetwork:
                         pass
 
         future = Future()
-        item = (system_id, params, future)
-        matchers = self._matchers[type_str]
-
-        matchers.append(item)
+        matchers = self._matchers
+        handle = matchers.add(type_str, params, system_id, future)
         try:
             yield future
         finally:
-            matchers.pop(matchers.index(item))
+            matchers.remove(handle)
 
     @property
     def id(self) -> str:
@@ -291,6 +304,7 @@ class MAVLinkNetwork:
         rtk_packet_fragments_signal,
         supervisor,
         use_connection,
+        recorder: Optional[FlightRecorder] = None,
     ):
         """Starts the network manager.
 
@@ -309,6 +323,8 @@ class MAVLinkNetwork:
             use_connection: context manager that must be entered when the
                 network manager wishes to register a connection in the
                 application
+            recorder: flight recorder that records the raw MAVLink frames
+                received by the network; ``None`` if recording is disabled
             get_location: returns the location of server it self
         """
         if len(self._connections) > 1:
@@ -351,6 +367,7 @@ class MAVLinkNetwork:
                 system_id=self._system_id,
                 signing=self._signing,
                 use_broadcast_rate_limiting=self._use_broadcast_rate_limiting,
+                recorder=recorder,
             )
 
             # Warn the user about the simulated packet loss setting
@@ -374,14 +391,16 @@ class MAVLinkNetwork:
             # fails
             for connection, name in zip(self._connections, connection_names):
                 manager.add(connection, name=name)
+                if recorder:
+                    recorder.add_connection(connection, name)
 
             # Register the connection aliases
             self._register_connection_aliases(manager, connection_names, stack, log=log)
 
-            # Set up a dictionary that will map from MAVLink message types that
-            # we are waiting for to lists of corresponding (predicate, future)
-            # pairs
-            matchers: Matchers = defaultdict(list)
+            # Set up an index that will map from MAVLink message types and
+            # system IDs that we are waiting for to the corresponding
+            # (predicate, future) pairs
+            matchers = MessageMatcherIndex()
 
             # Override some of our properties with the values we were called with
             stack.enter_context(
@@ -402,6 +421,7 @@ class MAVLinkNetwork:
                 # broadcasting the current light configuration to the drones
                 nursery.start_soon(self._scheduled_takeoff_manager.run)
                 nursery.start_soon(self._led_light_configuration_manager.run)
+                nursery.start_soon(self._link_budget_manager.run)
 
                 # Start the communication manager
                 try:
@@ -412,9 +432,7 @@ class MAVLinkNetwork:
                         tasks=[self._generate_heartbeats],
                     )
                 finally:
-                    for matcher in matchers.values():
-                        for _, _, future in matcher:
-                            future.cancel()
+                    matchers.cancel_all()
 
                 # Cancel all tasks in this nursery as we are about to shut down
                 nursery.cancel_scope.cancel()
@@ -619,6 +637,12 @@ class MAVLinkNetwork:
         self._uavs[system_id] = uav = self.driver.create_uav(uav_id)
         uav.assign_to_network_and_system_id(self.id, system_id)
 
+        if self._log_download_limiter.enabled:
+            uav.log_download_limiter = self._log_download_limiter
+
+        if self._link_budget_manager.enabled:
+            uav.set_stream_rates(self._link_budget_manager.stream_rates)
+
         self.register_uav(uav)
 
         return uav
@@ -666,50 +690,70 @@ class MAVLinkNetwork:
         Parameters:
             channel: a Trio receive channel that yields inbound MAVLink messages.
         """
-        handlers = {
-            "AUTOPILOT_VERSION": self._handle_message_autopilot_version,
-            "BAD_DATA": nop,
-            "COMMAND_ACK": nop,
-            "COMMAND_LONG": self._handle_message_command_long,
-            "DATA16": self._handle_message_data16,
-            "FENCE_STATUS": nop,
-            "FILE_TRANSFER_PROTOCOL": nop,
-            "GLOBAL_POSITION_INT": self._handle_message_global_position_int,
-            "GPS_GLOBAL_ORIGIN": nop,
-            "GPS_RAW_INT": self._handle_message_gps_raw_int,
-            "HEARTBEAT": self._handle_message_heartbeat,
-            "HOME_POSITION": nop,
-            "HWSTATUS": nop,
-            "LOCAL_POSITION_NED": nop,  # maybe later?
-            "LOG_DATA": self._handle_message_log_data,
-            "LOG_ENTRY": self._handle_message_log_entry,
-            "MAG_CAL_PROGRESS": self._handle_message_mag_cal_progress,
-            "MAG_CAL_REPORT": self._handle_message_mag_cal_report,
-            "MEMINFO": nop,
-            "MISSION_ACK": nop,  # used for mission and geofence download / upload
-            "MISSION_COUNT": nop,  # used for mission and geofence download / upload
-            "MISSION_CURRENT": nop,  # maybe later?
-            "MISSION_ITEM_INT": nop,  # used for mission and geofence download / upload
-            "MISSION_REQUEST": nop,  # used for mission and geofence download / upload
-            "MISSION_REQUEST_INT": nop,  # used for mission and geofence download / upload
-            "MISSION_ITEM": nop,  # used for mission and geofence download / upload
-            "NAV_CONTROLLER_OUTPUT": nop,
-            "PARAM_VALUE": nop,
-            "POSITION_TARGET_GLOBAL_INT": nop,
-            "POWER_STATUS": nop,
-            "RADIO_STATUS": self._handle_message_radio_status,
-            "STATUSTEXT": self._handle_message_statustext,
-            "SYS_STATUS": self._handle_message_sys_status,
-            "TIMESYNC": self._handle_message_timesync,
-            "V2_EXTENSION": self._handle_message_v2_extension,
-            "VFR_HUD": self._vfr_hud,
-            "WIND": self._wind,
-            "MISSION_STRIKE": nop,
-            "RPM": self._handle_print_msg,
-        }
+        handlers = MessageHandlerTable(
+            {
+                "BAD_DATA": None,
+                "COMMAND_ACK": None,
+                "DATA16": self._handle_message_data16,
+                "FENCE_STATUS": None,
+                "FILE_TRANSFER_PROTOCOL": None,
+                "GPS_GLOBAL_ORIGIN": None,
+                "HEARTBEAT": self._handle_message_heartbeat,
+                "HOME_POSITION": None,
+                "HWSTATUS": None,
+                "LOCAL_POSITION_NED": None,  # maybe later?
+                "MEMINFO": None,
+                "MISSION_ACK": None,  # used for mission and geofence download / upload
+                "MISSION_COUNT": None,  # used for mission and geofence download / upload
+                "MISSION_ITEM_INT": None,  # used for mission and geofence download / upload
+                "MISSION_REQUEST": None,  # used for mission and geofence download / upload
+                "MISSION_REQUEST_INT": None,  # used for mission and geofence download / upload
+                "MISSION_ITEM": None,  # used for mission and geofence download / upload
+                "NAV_CONTROLLER_OUTPUT": None,
+                "PARAM_VALUE": None,
+                "POSITION_TARGET_GLOBAL_INT": None,
+                "POWER_STATUS": None,
+                "STATUSTEXT": self._handle_message_statustext,
+                "TIMESYNC": self._handle_message_timesync,
+                "V2_EXTENSION": self._handle_message_v2_extension,
+                "MISSION_STRIKE": None,
+                "RPM": self._handle_print_msg,
+            },
+            # Messages that are simply forwarded to the UAV that sent them
+            {
+                "AUTOPILOT_VERSION": MAVLinkUAV.handle_message_autopilot_version,
+                "COMMAND_LONG": MAVLinkUAV.handle_message_command_long,
+                "GLOBAL_POSITION_INT": MAVLinkUAV.handle_message_global_position_int,
+                "GPS_RAW_INT": MAVLinkUAV.handle_message_gps_raw_int,
+                "LOG_DATA": MAVLinkUAV.handle_message_log_data,
+                "LOG_ENTRY": MAVLinkUAV.handle_message_log_entry,
+                "MAG_CAL_PROGRESS": MAVLinkUAV.handle_message_mag_cal_progress,
+                "MAG_CAL_REPORT": MAVLinkUAV.handle_message_mag_cal_report,
+                "MISSION_CURRENT": MAVLinkUAV.handle_message_mission_current,
+                "RADIO_STATUS": MAVLinkUAV.handle_message_radio_status,
+                "SYS_STATUS": MAVLinkUAV.handle_message_sys_status,
+                "VFR_HUD": MAVLinkUAV.handle_vfr_hud,
+                "WIND": MAVLinkUAV.handle_update_wind,
+            },
+            on_unknown=self._warn_unhandled_message,
+        )
+        get_handler = handlers.get
+        get_uav = self._uavs.get
+        uav_addresses = self._uav_addresses
+        dispatch_to_matchers = self._matchers.dispatch
 
         autopilot_component_id = MAVComponent.AUTOPILOT1
         udp_bridge_id = MAVComponent.UDP_BRIDGE
+        radio_status_id = MAVMessageType.RADIO_STATUS
+
+        # Measure the inbound traffic only if the link budget of the network
+        # is managed
+        link_budget_manager = self._link_budget_manager
+        if link_budget_manager.enabled:
+            account_for_message = link_budget_manager.notify_message
+            notify_radio_status = link_budget_manager.notify_radio_status
+        else:
+            account_for_message = notify_radio_status = None
 
         # Many third-party MAVLink-based drones do not respond to broadcast
         # messages sent to them with an IP address of 255.255.255.255 as they
@@ -730,15 +774,26 @@ class MAVLinkNetwork:
             # mavesp8266 uses the correct system ID and component ID = 0xf0
             # (MAV_COMP_ID_UDP_BRIDGE)
 
-            # Get the source component and the message type
+            # Determine whether we should process this message, based on the
+            # source component and the numeric message ID only
             src_component = message.get_srcComponent()
-            type = message.get_type()
+            msgid = message.get_msgId()
+
+            # Account for the message in the link budget. This needs to happen
+            # before filtering because all messages consume bandwidth, and
+            # RADIO_STATUS messages from SiK radios are filtered below.
+            if account_for_message:
+                account_for_message(
+                    connection_id,
+                    message.get_srcSystem(),
+                    len(message.get_msgbuf()),
+                )
+                if msgid == radio_status_id:
+                    notify_radio_status(message)
 
-            # Determine whether we should process this message
-            should_process = src_component == autopilot_component_id or (
-                src_component == udp_bridge_id and type == "RADIO_STATUS"
-            )
-            if not should_process:
+            if src_component != autopilot_component_id and (
+                src_component != udp_bridge_id or msgid != radio_status_id
+            ):
                 continue
 
             # Update the broadcast address to a subnet-specific one if needed
@@ -748,77 +803,38 @@ class MAVLinkNetwork:
                 )
                 broadcast_address_updated[connection_id] = True
 
+            type, handler, expects_uav = get_handler(msgid) or handlers.resolve(message)
+            system_id = message.get_srcSystem()
+
             # Resolve all futures that are waiting for this message
-            for system_id, params, future in self._matchers[type]:
-                # Check system ID early on and skip if it does not match
-                if system_id is not None and message.get_srcSystem() != system_id:
-                    continue
-
-                if future.done():
-                    # This may happen if we get multiple matching messages in
-                    # quick succession before the task waiting for the result
-                    # gets a chance of responding to them; in this case, we
-                    # have to ignore the message, otherwise we would be resolving
-                    # the future twice
-                    continue
-                elif callable(params):
-                    matched = params(message)
-                elif params is None:
-                    matched = True
-                else:
-                    matched = all(
-                        getattr(message, param_name, None) == param_value
-                        for param_name, param_value in params.items()
-                    )
-                if matched:
-                    future.set_result(message)
+            dispatch_to_matchers(type, system_id, message)
 
             # Call the message handler if we have one
-            handler = handlers.get(type)
-            if handler:
-                try:
+            if handler is None:
+                continue
+
+            try:
+                if expects_uav:
+                    uav = get_uav(system_id)
+                    if uav is not None:
+                        # TODO(ntamas): protect from address hijacking!
+                        uav_addresses[uav] = address
+                    else:
+                        uav = self._find_uav_from_message(message, address)
+                    if uav:
+                        handler(uav, message)
+                else:
                     handler(message, connection_id=connection_id, address=address)
-                except Exception:
-                    self.log.exception(
-                        f"Error while handling MAVLink message of type {type}"
-                    )
-            else:
-                self.log.warning(
-                    f"Unhandled MAVLink message type: {type}",
-                    extra=self._log_extra_from_message(message),
+            except Exception:
+                self.log.exception(
+                    f"Error while handling MAVLink message of type {type}"
                 )
-                handlers[type] = nop
-
-    def _handle_message_autopilot_version(
-        self, message: MAVLinkMessage, *, connection_id: str, address: Any
-    ):
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_message_autopilot_version(message)
-
-    def _handle_message_command_long(
-        self, message: MAVLinkMessage, *, connection_id: str, address: Any
-    ):
-        """Handles an incoming MAVLink COMMAND_LONG message."""
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_message_command_long(message)
-
-    def _vfr_hud(self, message: MAVLinkMessage, *, connection_id: str, address: Any):
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_vfr_hud(message)
 
     def _handle_print_msg(
         self, message: MAVLinkMessage, *, connection_id: str, address: Any
     ):
         print(message)
 
-    def _wind(self, message: MAVLinkMessage, *, connection_id: str, address: Any):
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_update_wind(message)
-
     def _handle_message_data16(
         self, message: MAVLinkMessage, *, connection_id: str, address: Any
     ):
@@ -827,20 +843,6 @@ class MAVLinkNetwork:
             if uav:
                 uav.handle_message_drone_show_status(message)
 
-    def _handle_message_global_position_int(
-        self, message: MAVLinkMessage, *, connection_id: str, address: Any
-    ):
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_message_global_position_int(message)
-
-    def _handle_message_gps_raw_int(
-        self, message: MAVLinkMessage, *, connection_id: str, address: Any
-    ):
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_message_gps_raw_int(message)
-
     def _handle_message_heartbeat(
         self, message: MAVLinkMessage, *, connection_id: str, address: Any
     ):
@@ -863,46 +865,6 @@ class MAVLinkNetwork:
     #     if uav:
     #         uav.handle_message_home_position(message)
 
-    def _handle_message_log_data(
-        self, message: MAVLinkMessage, *, connection_id: str, address: Any
-    ):
-        """Handles an incoming MAVLink LOG_DATA message."""
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_message_log_data(message)
-
-    def _handle_message_log_entry(
-        self, message: MAVLinkMessage, *, connection_id: str, address: Any
-    ):
-        """Handles an incoming MAVLink LOG_ENTRY message."""
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_message_log_entry(message)
-
-    def _handle_message_mag_cal_progress(
-        self, message: MAVLinkMessage, *, connection_id: str, address: Any
-    ):
-        """Handles an incoming MAVLink MAG_CAL_PROGRESS message."""
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_message_mag_cal_progress(message)
-
-    def _handle_message_mag_cal_report(
-        self, message: MAVLinkMessage, *, connection_id: str, address: Any
-    ):
-        """Handles an incoming MAVLink MAG_CAL_REPORT message."""
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_message_mag_cal_report(message)
-
-    def _handle_message_radio_status(
-        self, message: MAVLinkMessage, *, connection_id: str, address: Any
-    ):
-        """Handles an incoming MAVLink RADIO_STATUS message."""
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_message_radio_status(message)
-
     def _handle_message_statustext(
         self, message: MAVLinkMessage, *, connection_id: str, address: Any
     ):
@@ -935,13 +897,6 @@ class MAVLinkNetwork:
                         ),
                     )
 
-    def _handle_message_sys_status(
-        self, message: MAVLinkMessage, *, connection_id: str, address: Any
-    ):
-        uav = self._find_uav_from_message(message, address)
-        if uav:
-            uav.handle_message_sys_status(message)
-
     def _handle_message_timesync(
         self, message: MAVLinkMessage, *, connection_id: str, address: Any
     ):
@@ -977,6 +932,15 @@ class MAVLinkNetwork:
     def _log_extra_from_message(self, message: MAVLinkMessage) -> dict[str, Any]:
         return {"id": log_id_from_message(message, self.id)}
 
+    def _warn_unhandled_message(self, message: MAVLinkMessage) -> None:
+        """Logs a warning about the first inbound MAVLink message of a type
+        that has no handler.
+        """
+        self.log.warning(
+            f"Unhandled MAVLink message type: {message.get_type()}",
+            extra=self._log_extra_from_message(message),
+        )
+
     def _register_connection_aliases(
         self,
         manager: CommunicationManager,
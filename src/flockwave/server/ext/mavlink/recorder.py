@@ -0,0 +1,742 @@
+"""Flight recorder that stores the raw MAVLink traffic received by the MAVLink
+networks, and the corresponding replay and query API.
+
+The recording is split into segments. Each segment consists of three files
+that share the same name but differ in their extensions:
+
+- ``.bin``: the raw MAVLink frames, each preceded by a small header that
+  holds the monotonic timestamp of its arrival in nanoseconds, the index of
+  the connection and address that it came from and its length;
+
+- ``.idx``: an index with a fixed-size entry for each frame that holds the
+  timestamp, the offset of the frame in the ``.bin`` file, the MAVLink
+  message ID and the system ID of the sender;
+
+- ``.json``: metadata of the segment, i.e. the offset between the
+  monotonic clock and the system clock and the table of the connections and
+  addresses that the frames were received from.
+
+Both binary files are append-only. Frames are recorded straight from the
+parser of the MAVLink channels into memory buffers that are written to the
+disk about once a second, so the recorder can be left on in production; the
+cost is a few microseconds per frame. The recorder turns itself off when the
+disk fails (e.g., when it is full or removed) so the failure never affects
+the processing of the telemetry. Queries map
+the segments into memory and locate the requested time window with a
+binary search on the index, so they never load whole files.
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+
+from contextlib import ExitStack
+from dataclasses import dataclass
+from functools import partial
+from mmap import ACCESS_READ, mmap
+from pathlib import Path
+from struct import Struct
+from time import monotonic_ns, time_ns
+from trio import sleep
+from typing import (
+    Any,
+    Callable,
+    Container,
+    Iterator,
+    Optional,
+    Sequence,
+    TYPE_CHECKING,
+    Union,
+)
+
+if TYPE_CHECKING:
+    from flockwave.connections import Connection
+    from flockwave.logger import Logger
+
+    from .types import MAVLinkMessage
+
+__all__ = (
+    "FlightRecorder",
+    "FlightRecording",
+    "RecordedFrame",
+)
+
+
+#: Magic bytes at the start of the frame files of a recording
+_FRAMES_MAGIC = b"FWMAVREC"
+
+#: Magic bytes at the start of the index files of a recording
+_INDEX_MAGIC = b"FWMAVIDX"
+
+#: Version number of the file format
+_VERSION = 1
+
+#: Header of the binary files of a segment: magic bytes and version number
+_FILE_HEADER = Struct("<8sH6x")
+
+#: Header of each frame in a frame file: monotonic timestamp in nanoseconds,
+#: endpoint index and frame length
+_FRAME_HEADER = Struct("<qHH")
+
+#: Entry of an index file: monotonic timestamp in nanoseconds, offset of the
+#: frame header in the frame file, message ID and system ID
+_INDEX_ENTRY = Struct("<qIIB3x")
+
+#: Size of the frame buffer above which the frames are flushed to the disk
+#: even if the flush interval has not elapsed yet
+_MAX_BUFFER_SIZE = 256 * 1024
+
+#: Number of nanoseconds in a second
+_NS = 1000000000
+
+Writer = Callable[[Sequence["MAVLinkMessage"], Any], None]
+"""Function that records the messages parsed from a chunk of data received
+on a connection, from the given address.
+"""
+
+
+def _format_address(address: Any) -> str:
+    """Returns a string representation of the address of a MAVLink message
+    channel.
+    """
+    if isinstance(address, tuple) and len(address) >= 2:
+        host, port = address[:2]
+        return f"[{host}]:{port}" if ":" in str(host) else f"{host}:{port}"
+    return str(address) if address is not None else ""
+
+
+@dataclass(frozen=True)
+class RecordedFrame:
+    """A single MAVLink frame from a recording."""
+
+    timestamp: float
+    """The time when the frame was received, as a UNIX timestamp."""
+
+    connection_id: str
+    """The name of the connection that the frame was received on."""
+
+    address: str
+    """The address that the frame was received from; empty for stream-based
+    connections.
+    """
+
+    system_id: int
+    """The MAVLink system ID of the sender of the frame."""
+
+    message_id: int
+    """The MAVLink message ID of the frame."""
+
+    data: bytes
+    """The raw frame."""
+
+
+class FlightRecorder:
+    """Flight recorder that appends the raw MAVLink frames received by the
+    MAVLink networks to a segmented recording.
+
+    The recorder must be opened before use; it can also be used as a context
+    manager. Buffered frames are flushed to the disk when new frames arrive
+    and the flush interval has elapsed; `run()` should also be running in a
+    background task to flush them when the traffic stops.
+
+    Errors while writing the recording are logged and turn the recorder off
+    instead of being propagated to the MAVLink parser that feeds the frames
+    to the recorder.
+    """
+
+    directory: Path
+    """The directory that the segments of the recording are stored in."""
+
+    flush_interval: float
+    """Number of seconds after which buffered frames are flushed to the
+    disk.
+    """
+
+    max_segments: int
+    """Maximum number of segments to keep; older segments are deleted when a
+    new segment is started. Zero means to keep all segments.
+    """
+
+    segment_duration: float
+    """Maximum duration of a segment, in seconds."""
+
+    segment_size: int
+    """Maximum size of the frame file of a segment, in bytes."""
+
+    _connection_ids: dict[Connection, str]
+    """Names of the connections that the recorder was told about."""
+
+    _endpoints: dict[tuple[str, Any], int]
+    """Dictionary mapping connection names and addresses to their indices in
+    the endpoint table of the current segment.
+    """
+
+    _log: Optional[Logger]
+    """Logger that the recorder uses to report errors."""
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        *,
+        segment_size: int = 64 * 1024 * 1024,
+        segment_duration: float = 3600,
+        max_segments: int = 0,
+        flush_interval: float = 1.0,
+        log: Optional[Logger] = None,
+    ):
+        """Constructor.
+
+        Parameters:
+            directory: the directory to store the segments of the recording in
+            segment_size: maximum size of the frame file of a segment, in bytes
+            segment_duration: maximum duration of a segment, in seconds
+            max_segments: maximum number of segments to keep; zero means to
+                keep all segments
+            flush_interval: number of seconds after which buffered frames are
+                flushed to the disk
+            log: optional logger to report errors on
+        """
+        self.directory = Path(directory)
+        self.flush_interval = flush_interval
+        self.max_segments = max(int(max_segments), 0)
+        self.segment_duration = segment_duration
+        self.segment_size = min(int(segment_size), 0xFFFFFFFF)
+
+        self._connection_ids = {}
+        self._endpoints = {}
+        self._frame_buffer = bytearray()
+        self._frames = None
+        self._index = None
+        self._index_buffer = bytearray()
+        self._log = log
+        self._metadata = None
+        self._metadata_path = None
+        self._next_flush = 0
+        self._last_segment_name = 0
+        self._segment_deadline = 0
+        self._size = 0
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb) -> None:
+        self.close()
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the recorder is open."""
+        return self._frames is not None
+
+    def add_connection(self, connection: Connection, name: str) -> None:
+        """Registers the name of a connection whose frames will be recorded.
+
+        Parameters:
+            connection: the connection
+            name: the name of the connection in the recording
+        """
+        self._connection_ids[connection] = name
+
+    def create_writer(self, connection: Connection) -> Writer:
+        """Returns a function that records the messages parsed from the data
+        received on the given connection.
+
+        Parameters:
+            connection: the connection; its name must have been registered
+                with `add_connection()` earlier, otherwise a generic name is
+                used
+
+        Returns:
+            a function that can be called with a list of parsed MAVLink
+            messages and the address that they were received from
+        """
+        connection_id = self._connection_ids.get(connection)
+        if connection_id is None:
+            connection_id = f"#{len(self._connection_ids)}"
+            self._connection_ids[connection] = connection_id
+        return partial(self.record, connection_id)
+
+    def open(self) -> None:
+        """Opens the recorder and starts a new segment."""
+        if not self.is_open:
+            try:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._start_segment()
+            except OSError as ex:
+                self._disable(ex)
+
+    def close(self) -> None:
+        """Closes the current segment of the recorder."""
+        if self.is_open:
+            try:
+                self._finish_segment()
+            except OSError as ex:
+                self._disable(ex)
+
+    def flush(self) -> None:
+        """Flushes the buffered frames to the disk."""
+        try:
+            self._flush()
+        except OSError as ex:
+            self._disable(ex)
+
+    async def run(self) -> None:
+        """Background task that flushes the buffered frames to the disk
+        periodically, even if no new frames arrive.
+        """
+        while True:
+            await sleep(self.flush_interval)
+            if self._frame_buffer:
+                self.flush()
+
+    def _flush(self) -> None:
+        if self._frames is not None and self._index is not None:
+            # Frames go first so the index never refers to missing frames
+            self._frames.write(self._frame_buffer)
+            self._frames.flush()
+            self._index.write(self._index_buffer)
+            self._index.flush()
+        self._frame_buffer.clear()
+        self._index_buffer.clear()
+        self._next_flush = monotonic_ns() + int(self.flush_interval * _NS)
+
+    def record(
+        self, connection_id: str, messages: Sequence[MAVLinkMessage], address: Any
+    ) -> None:
+        """Records the messages parsed from a chunk of data received on a
+        connection. Does nothing if the recorder is not open.
+
+        Parameters:
+            connection_id: the name of the connection
+            messages: the parsed messages
+            address: the address that the messages were received from
+        """
+        if not messages or self._frames is None or self._index is None:
+            return
+
+        try:
+            self._record(connection_id, messages, address)
+        except OSError as ex:
+            self._disable(ex)
+
+    def _record(
+        self, connection_id: str, messages: Sequence[MAVLinkMessage], address: Any
+    ) -> None:
+        now = monotonic_ns()
+        endpoint = self._endpoints.get((connection_id, address))
+        if endpoint is None:
+            endpoint = self._add_endpoint(connection_id, address)
+
+        offset = self._size
+        frames, entries = self._frame_buffer, self._index_buffer
+        pack_header, pack_entry = _FRAME_HEADER.pack, _INDEX_ENTRY.pack
+        for message in messages:
+            frame = message.get_msgbuf()
+            length = len(frame)
+            frames += pack_header(now, endpoint, length)
+            frames += frame
+            entries += pack_entry(
+                now, offset, message.get_msgId(), message.get_srcSystem()
+            )
+            offset += _FRAME_HEADER.size + length
+
+        self._size = offset
+
+        if offset >= self.segment_size or now >= self._segment_deadline:
+            self._finish_segment()
+            self._start_segment()
+        elif now >= self._next_flush or len(frames) >= _MAX_BUFFER_SIZE:
+            self._flush()
+
+    def _add_endpoint(self, connection_id: str, address: Any) -> int:
+        assert self._metadata is not None
+
+        endpoints = self._metadata["endpoints"]
+        if len(endpoints) >= 0xFFFF:
+            # Endpoint table is full; start a new segment with an empty one
+            self._finish_segment()
+            self._start_segment()
+            endpoints = self._metadata["endpoints"]
+
+        index = self._endpoints[connection_id, address] = len(endpoints)
+        endpoints.append([connection_id, _format_address(address)])
+        self._write_metadata()
+        return index
+
+    def _start_segment(self) -> None:
+        now = monotonic_ns()
+        offset = time_ns() - now
+
+        # Segment names must increase even if the system clock jumps backwards
+        timestamp = max((now + offset) // 1000, self._last_segment_name + 1)
+        while (self.directory / f"rec-{timestamp:016d}.json").exists():
+            timestamp += 1
+        self._last_segment_name = timestamp
+
+        stem = f"rec-{timestamp:016d}"
+        frames_path = self.directory / f"{stem}.bin"
+        index_path = self.directory / f"{stem}.idx"
+        self._metadata_path = self.directory / f"{stem}.json"
+
+        self._frames = open(frames_path, "wb")
+        self._index = open(index_path, "wb")
+        self._frames.write(_FILE_HEADER.pack(_FRAMES_MAGIC, _VERSION))
+        self._index.write(_FILE_HEADER.pack(_INDEX_MAGIC, _VERSION))
+        self._size = _FILE_HEADER.size
+
+        self._endpoints = {}
+        self._metadata = {
+            "version": _VERSION,
+            "clockOffset": offset,
+            "start": now,
+            "end": None,
+            "endpoints": [],
+        }
+        self._write_metadata()
+
+        self._segment_deadline = now + int(self.segment_duration * _NS)
+        self._flush()
+        self._remove_old_segments()
+
+    def _finish_segment(self) -> None:
+        assert self._frames is not None and self._index is not None
+
+        self._flush()
+        self._frames.close()
+        self._index.close()
+        self._frames = self._index = None
+
+        if self._metadata is not None:
+            self._metadata["end"] = monotonic_ns()
+            self._write_metadata()
+
+        self._metadata = self._metadata_path = None
+        self._endpoints = {}
+
+    def _disable(self, ex: OSError) -> None:
+        """Turns off the recorder after an error while writing the recording.
+
+        The recorder stays off until it is opened again.
+        """
+        if self._log:
+            self._log.error(f"Flight recorder failed, recording disabled: {ex}")
+
+        for fp in (self._frames, self._index):
+            if fp is not None:
+                try:
+                    fp.close()
+                except OSError:
+                    # Buffered data could not be written; nothing to do
+                    pass
+
+        self._frames = self._index = None
+        self._metadata = self._metadata_path = None
+        self._endpoints = {}
+        self._frame_buffer.clear()
+        self._index_buffer.clear()
+
+    def _remove_old_segments(self) -> None:
+        if not self.max_segments:
+            return
+
+        current = self._metadata_path.stem if self._metadata_path else None
+        stems = sorted(
+            path.stem
+            for path in self.directory.glob("rec-*.json")
+            if path.stem != current
+        )
+        for stem in stems[: max(len(stems) - self.max_segments + 1, 0)]:
+            for extension in (".bin", ".idx", ".json"):
+                (self.directory / f"{stem}{extension}").unlink(missing_ok=True)
+
+    def _write_metadata(self) -> None:
+        if self._metadata_path is None:
+            return
+
+        # Write to a temporary file first so readers never see a partial file
+        tmp_path = self._metadata_path.with_suffix(".json.tmp")
+        tmp_path.write_text(json.dumps(self._metadata))
+        tmp_path.replace(self._metadata_path)
+
+
+class _Timestamps:
+    """Read-only sequence view of the timestamps in a memory-mapped index file
+    as UNIX timestamps in microseconds, used for binary searches.
+    """
+
+    def __init__(self, data: mmap, count: int, clock_offset: int):
+        self._data = data
+        self._count = count
+        self._clock_offset = clock_offset
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, index: int) -> int:
+        timestamp = _INDEX_ENTRY.unpack_from(
+            self._data, _FILE_HEADER.size + index * _INDEX_ENTRY.size
+        )[0]
+        return _to_microseconds(timestamp, self._clock_offset)
+
+
+def _to_microseconds(timestamp: int, clock_offset: int) -> int:
+    """Converts a monotonic timestamp of a segment in nanoseconds to a UNIX
+    timestamp in microseconds.
+    """
+    return (timestamp + clock_offset + 500) // 1000
+
+
+class _Segment:
+    """A single segment of a recording, opened for reading."""
+
+    def __init__(self, stem: Path):
+        metadata = json.loads(stem.with_suffix(".json").read_text())
+        self.clock_offset: int = metadata["clockOffset"]
+        self.endpoints: list[tuple[str, str]] = [
+            tuple(endpoint) for endpoint in metadata["endpoints"]
+        ]
+        self.start: int = _to_microseconds(metadata["start"], self.clock_offset)
+        self.end: Optional[int] = (
+            _to_microseconds(metadata["end"], self.clock_offset)
+            if metadata["end"] is not None
+            else None
+        )
+
+        self._frames_path = stem.with_suffix(".bin")
+        self._index_path = stem.with_suffix(".idx")
+
+    def frames(
+        self,
+        start: Optional[int],
+        end: Optional[int],
+        system_ids: Optional[Container[int]],
+        message_ids: Optional[Container[int]],
+    ) -> Iterator[RecordedFrame]:
+        """Iterates over the frames of the segment between the given UNIX
+        timestamps in microseconds, optionally filtered by system and message
+        ID.
+        """
+        with ExitStack() as stack:
+            index_file = stack.enter_context(open(self._index_path, "rb"))
+            frames_file = stack.enter_context(open(self._frames_path, "rb"))
+
+            index_size = _size_of(index_file)
+            count = max(index_size - _FILE_HEADER.size, 0) // _INDEX_ENTRY.size
+            if count == 0:
+                return
+
+            index = stack.enter_context(
+                mmap(index_file.fileno(), 0, access=ACCESS_READ)
+            )
+            frames = stack.enter_context(
+                mmap(frames_file.fileno(), 0, access=ACCESS_READ)
+            )
+            _check_header(index, _INDEX_MAGIC)
+            _check_header(frames, _FRAMES_MAGIC)
+
+            clock_offset = self.clock_offset
+            timestamps = _Timestamps(index, count, clock_offset)
+            first = 0 if start is None else _bisect_left(timestamps, start)
+            last = count if end is None else _bisect_left(timestamps, end)
+
+            # The frame file may lag behind the index if the recorder is still
+            # writing it
+            frames_size = len(frames)
+            endpoints = self.endpoints
+            unpack_entry = _INDEX_ENTRY.unpack_from
+            unpack_header = _FRAME_HEADER.unpack_from
+            position = _FILE_HEADER.size + first * _INDEX_ENTRY.size
+
+            for _ in range(first, last):
+                timestamp, offset, message_id, system_id = unpack_entry(index, position)
+                position += _INDEX_ENTRY.size
+
+                if system_ids is not None and system_id not in system_ids:
+                    continue
+                if message_ids is not None and message_id not in message_ids:
+                    continue
+
+                if offset + _FRAME_HEADER.size > frames_size:
+                    break
+                _, endpoint, length = unpack_header(frames, offset)
+                offset += _FRAME_HEADER.size
+                if offset + length > frames_size:
+                    break
+
+                connection_id, address = (
+                    endpoints[endpoint] if endpoint < len(endpoints) else ("", "")
+                )
+                yield RecordedFrame(
+                    timestamp=_to_microseconds(timestamp, clock_offset) / 1000000,
+                    connection_id=connection_id,
+                    address=address,
+                    system_id=system_id,
+                    message_id=message_id,
+                    data=frames[offset : offset + length],
+                )
+
+
+def _bisect_left(values: Sequence[int], value: int) -> int:
+    low, high = 0, len(values)
+    while low < high:
+        mid = (low + high) // 2
+        if values[mid] < value:
+            low = mid + 1
+        else:
+            high = mid
+    return low
+
+
+def _check_header(data: mmap, magic: bytes) -> None:
+    if len(data) < _FILE_HEADER.size:
+        raise ValueError("truncated recording file")
+    actual_magic, version = _FILE_HEADER.unpack_from(data, 0)
+    if actual_magic != magic:
+        raise ValueError("not a MAVLink recording file")
+    if version != _VERSION:
+        raise ValueError(f"unsupported recording version: {version}")
+
+
+def _size_of(fp) -> int:
+    fp.seek(0, 2)
+    return fp.tell()
+
+
+class FlightRecording:
+    """A recording made by a flight recorder, opened for reading.
+
+    The recording may be read while the recorder is still writing it; frames
+    that have not been flushed to the disk yet are not visible.
+    """
+
+    directory: Path
+    """The directory that the segments of the recording are stored in."""
+
+    def __init__(self, directory: Union[str, Path]):
+        """Constructor.
+
+        Parameters:
+            directory: the directory that the segments of the recording are
+                stored in
+        """
+        self.directory = Path(directory)
+
+    @property
+    def segments(self) -> list[Path]:
+        """The paths of the segments of the recording without extensions, in
+        chronological order.
+        """
+        return [
+            path.with_suffix("")
+            for path in sorted(self.directory.glob("rec-*.json"))
+            if path.with_suffix(".idx").exists()
+        ]
+
+    def frames(
+        self,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        *,
+        system_id: Optional[Union[int, Container[int]]] = None,
+        message_id: Optional[Union[int, Container[int]]] = None,
+    ) -> Iterator[RecordedFrame]:
+        """Iterates over the frames of the recording in chronological order.
+
+        Parameters:
+            start: the start of the time window to return, as a UNIX
+                timestamp; ``None`` means the start of the recording
+            end: the end of the time window to return, as a UNIX timestamp,
+                exclusive; ``None`` means the end of the recording
+            system_id: the system ID or system IDs of the UAVs whose frames
+                are to be returned; ``None`` means all UAVs
+            message_id: the message ID or message IDs of the frames to
+                return; ``None`` means all message IDs
+
+        Yields:
+            the matching frames of the recording
+        """
+        system_ids = {system_id} if isinstance(system_id, int) else system_id
+        message_ids = {message_id} if isinstance(message_id, int) else message_id
+        start_us = None if start is None else round(start * 1000000)
+        end_us = None if end is None else round(end * 1000000)
+
+        for stem in self.segments:
+            try:
+                segment = _Segment(stem)
+            except (OSError, ValueError, KeyError):
+                # Segment was deleted or is being created right now
+                continue
+
+            if end_us is not None and segment.start >= end_us:
+                break
+            if start_us is not None and segment.end is not None:
+                if segment.end < start_us:
+                    continue
+
+            yield from segment.frames(start_us, end_us, system_ids, message_ids)
+
+    def export_tlog(self, path: Union[str, Path], **kwds) -> int:
+        """Exports frames of the recording into a MAVLink telemetry log that
+        can be opened by common ground station software.
+
+        Parameters:
+            path: the path of the telemetry log to write
+            kwds: keyword arguments to pass to `frames()` to select the frames
+                to export
+
+        Returns:
+            the number of frames exported
+        """
+        timestamp = Struct(">Q")
+        count = 0
+        with open(path, "wb") as fp:
+            for frame in self.frames(**kwds):
+                fp.write(timestamp.pack(int(frame.timestamp * 1000000)))
+                fp.write(frame.data)
+                count += 1
+        return count
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import click
+
+    from collections import Counter
+
+    @click.command()
+    @click.argument(
+        "directory", type=click.Path(exists=True, file_okay=False, path_type=Path)
+    )
+    @click.option(
+        "-s", "--system-id", type=int, multiple=True, help="System ID to select"
+    )
+    @click.option("--start", type=float, default=None, help="Start UNIX timestamp")
+    @click.option("--end", type=float, default=None, help="End UNIX timestamp")
+    @click.option(
+        "-o",
+        "--output",
+        type=click.Path(dir_okay=False, path_type=Path),
+        default=None,
+        help="Export the selected frames into this telemetry log",
+    )
+    def cli(directory, system_id, start, end, output):
+        recording = FlightRecording(directory)
+        kwds = {"start": start, "end": end, "system_id": set(system_id) or None}
+
+        if output:
+            count = recording.export_tlog(output, **kwds)
+            click.echo(f"Exported {count} frames to {output}")
+            return 0
+
+        counts = Counter(
+            (frame.system_id, frame.message_id) for frame in recording.frames(**kwds)
+        )
+        for (system_id, message_id), count in sorted(counts.items()):
+            click.echo(f"{system_id:5d} {message_id:7d} {count:10d}")
+        return 0
+
+    return cli.main(args=argv, standalone_mode=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -7,6 +7,7 @@ from typing import Optional
 
 from .driver import MAVLinkUAV
 from .enums import MAVMessageType
+from .utils import HEARTBEAT_TIMEOUT
 
 __all__ = ("check_uavs_alive",)
 
@@ -16,7 +17,12 @@ def _create_state_summary() -> list[Optional[int]]:
 
 
 async def check_uavs_alive(
-    uavs: list[MAVLinkUAV], signal, log, *, delay: float = 0.5, timeout: float = 5
+    uavs: list[MAVLinkUAV],
+    signal,
+    log,
+    *,
+    delay: float = 0.5,
+    timeout: float = HEARTBEAT_TIMEOUT,
 ) -> None:
     """Worker task that runs in the background and checks whether we are
     receiving heartbeats for all the UAVs in the given UAV array. Updates the
@@ -13,6 +13,7 @@ from typing import (
     Union,
 )
 
+from .budget import LinkBudgetConfiguration
 from .signing import MAVLinkSigningConfiguration
 
 __all__ = (
@@ -142,6 +143,16 @@ class MAVLinkNetworkSpecification:
     forward the messages to the connected clients in SYS-MSG messages.
     """
 
+    link_budget: LinkBudgetConfiguration = LinkBudgetConfiguration.DISABLED
+    """Specifies the bandwidth available for the telemetry streams of the
+    drones in this network and how it should be shared between the streams.
+    """
+
+    log_download_rate: float = 0
+    """Maximum number of bytes per second that flight log downloads may use in
+    this network, shared by all the drones; zero means no limit.
+    """
+
     packet_loss: float = 0
     """Whether to simulate packet loss in this network by randomly dropping
     received and sent messages. Zero means the normal behaviour, otherwise
@@ -176,6 +187,12 @@ class MAVLinkNetworkSpecification:
         if "connections" in obj:
             result.connections = obj["connections"]
 
+        if "link_budget" in obj and isinstance(obj["link_budget"], dict):
+            result.link_budget = LinkBudgetConfiguration.from_json(obj["link_budget"])
+
+        if "log_download_rate" in obj:
+            result.log_download_rate = float(obj["log_download_rate"])
+
         if "packet_loss" in obj:
             result.packet_loss = float(obj["packet_loss"])
 
@@ -210,6 +227,8 @@ class MAVLinkNetworkSpecification:
             "id_offset": self.id_offset,
             "system_id": self.system_id,
             "connections": self.connections,
+            "link_budget": self.link_budget.json,
+            "log_download_rate": self.log_download_rate,
             "packet_loss": self.packet_loss,
             "routing": self.routing,
             "signing": self.signing,
@@ -1,5 +1,6 @@
 from heapq import heappush, heappop
 from logging import ERROR, WARNING, INFO, DEBUG
+from trio import Lock, current_time, sleep_until
 from typing import NamedTuple, Optional, Union
 
 from flockwave.gps.vectors import GPSCoordinate
@@ -9,6 +10,8 @@ from .enums import MAVFrame, MAVParamType, MAVState
 from .types import MAVLinkMessage
 
 __all__ = (
+    "BandwidthLimiter",
+    "HEARTBEAT_TIMEOUT",
     "can_communicate_infer_from_heartbeat",
     "decode_param_from_wire_representation",
     "encode_param_to_wire_representation",
@@ -20,6 +23,11 @@ __all__ = (
 )
 
 
+HEARTBEAT_TIMEOUT = 5.0
+"""Number of seconds after the last heartbeat of a UAV after which the UAV is
+considered disconnected.
+"""
+
 _mavlink_severity_to_python_log_level = [
     ERROR,
     ERROR,
@@ -269,11 +277,18 @@ class ChunkAssembler:
     because there are gaps in front of them.
     """
 
-    def __init__(self, size: int):
-        """Constructor."""
+    def __init__(self, size: int, offset: int = 0):
+        """Constructor.
+
+        Parameters:
+            size: the expected size of the file
+            offset: number of bytes at the start of the file that were
+                already received and flushed earlier, e.g., in an interrupted
+                download that is now being resumed
+        """
         self._size = size
         self._pending = []
-        self._num_flushed = 0
+        self._num_flushed = max(min(offset, size), 0)
         self._num_pending = 0
 
     def add_chunk(self, offset: int, data: bytes) -> Optional[bytes]:
@@ -388,3 +403,65 @@ class ChunkAssembler:
         flushed to disk or sitting in the queue, rounded to one decimal digit.
         """
         return round(100.0 * (self._num_flushed + self._num_pending) / self._size, 1)
+
+
+class BandwidthLimiter:
+    """Helper object that limits the rate at which multiple concurrent tasks
+    may request bulk data over a shared link.
+
+    Each task must acquire the number of bytes it is about to request before
+    sending the request. Requests are granted in the order they were made. A
+    request is granted immediately if the link has been idle; otherwise the
+    task is suspended until the bytes granted earlier have had enough time to
+    pass through the link at the configured rate.
+    """
+
+    _available_at: float
+    """Timestamp when the link is expected to become idle again."""
+
+    _lock: Lock
+    """Lock that ensures that requests are granted in the order they were made."""
+
+    _rate: float
+    """Maximum number of bytes per second; zero or negative if unlimited."""
+
+    def __init__(self, rate: float = 0):
+        """Constructor.
+
+        Parameters:
+            rate: the maximum number of bytes per second that the tasks using
+                this limiter may request together; zero or negative if the
+                rate is unlimited
+        """
+        self._available_at = 0.0
+        self._lock = Lock()
+        self._rate = float(rate)
+
+    @property
+    def enabled(self) -> bool:
+        """Returns whether the limiter limits the bandwidth at all."""
+        return self._rate > 0
+
+    @property
+    def rate(self) -> float:
+        """Returns the maximum number of bytes per second; zero or negative if
+        the rate is unlimited.
+        """
+        return self._rate
+
+    async def acquire(self, size: int) -> None:
+        """Waits until the given number of bytes may be requested over the
+        link without exceeding the rate limit.
+
+        Parameters:
+            size: the number of bytes that the caller is about to request
+        """
+        if self._rate <= 0:
+            return
+
+        async with self._lock:
+            if self._available_at > current_time():
+                await sleep_until(self._available_at)
+            self._available_at = max(self._available_at, current_time()) + (
+                size / self._rate
+            )
@@ -0,0 +1,145 @@
+"""Extension that provides HTTP endpoints for exporting the search and split
+plans generated by the server as KML or CSV files.
+
+Plans are kept in memory by the planners; the KML and CSV representations are
+generated lazily when a client requests them. Optionally, the extension can
+also archive every new plan into a folder on the disk from a background worker
+thread so that file I/O stays off the critical path of the planners.
+"""
+
+from contextlib import ExitStack
+from functools import partial
+from logging import Logger
+from quart import abort, Response
+from trio import open_memory_channel, sleep_forever, to_thread
+from trio.abc import SendChannel
+from typing import Optional
+
+from flockwave.server.planning import (
+    Plan,
+    path_to_csv,
+    path_to_kml,
+    plan_store,
+    save_plan_files,
+)
+from flockwave.server.utils import overridden
+from flockwave.server.utils.quart import make_blueprint
+
+app = None
+log: Optional[Logger] = None
+
+blueprint = make_blueprint("plan_export", __name__)
+
+
+def _get_path_or_abort(plan_id: str, index: int):
+    try:
+        plan = plan_store.find_by_id(plan_id)
+        return plan.get_path(index - 1)
+    except (KeyError, IndexError):
+        abort(404)
+
+
+@blueprint.route("/")
+async def list_plans():
+    """Request handler that returns the metadata of the plans that are
+    currently stored in memory.
+    """
+    return {"plans": [plan.json() for plan in plan_store]}
+
+
+@blueprint.route("/<plan_id>/<int:index>.kml")
+async def get_kml(plan_id: str, index: int):
+    """Request handler that returns the path of a single UAV from the given
+    plan as a KML document.
+
+    Parameters:
+        plan_id: ID of the plan, or ``latest`` for the most recent plan
+        index: the one-based index of the path within the plan
+    """
+    path = _get_path_or_abort(plan_id, index)
+    return Response(
+        path_to_kml(path, name=f"Drone path {index}"),
+        mimetype="application/vnd.google-earth.kml+xml",
+    )
+
+
+@blueprint.route("/<plan_id>/<int:index>.csv")
+async def get_csv(plan_id: str, index: int):
+    """Request handler that returns the path of a single UAV from the given
+    plan as a CSV document.
+
+    Parameters:
+        plan_id: ID of the plan, or ``latest`` for the most recent plan
+        index: the one-based index of the path within the plan
+    """
+    path = _get_path_or_abort(plan_id, index)
+    return Response(path_to_csv(path), mimetype="text/csv")
+
+
+async def archive_plans(queue, directory: str) -> None:
+    """Background task that saves the plans arriving on the given queue into
+    the given directory.
+    """
+    async with queue:
+        async for plan in queue:
+            try:
+                await to_thread.run_sync(save_plan_files, plan, directory)
+            except Exception:
+                if log:
+                    log.exception(f"Failed to archive plan {plan.id}")
+
+
+def _on_plan_added(queue: SendChannel, sender, plan: Plan) -> None:
+    try:
+        queue.send_nowait(plan)
+    except Exception:
+        if log:
+            log.warning(f"Archiver is busy, plan {plan.id} was not archived")
+
+
+async def run(app, configuration, logger):
+    """Background task that is active while the extension is loaded."""
+    route = configuration.get("route", "/plans")
+    directory = configuration.get("directory")
+
+    http_server = app.import_api("http_server")
+    with ExitStack() as stack:
+        stack.enter_context(overridden(globals(), app=app, log=logger))
+        stack.enter_context(http_server.mounted(blueprint, path=route))
+
+        if directory:
+            tx, rx = open_memory_channel(16)
+            stack.enter_context(
+                plan_store.added.connected_to(
+                    partial(_on_plan_added, tx), sender=plan_store
+                )
+            )
+            await archive_plans(rx, directory)
+        else:
+            await sleep_forever()
+
+
+dependencies = ("http_server",)
+description = "HTTP endpoints for exporting search and split plans"
+schema = {
+    "properties": {
+        "route": {
+            "type": "string",
+            "title": "URL root",
+            "description": (
+                "URL where the extension is mounted within the HTTP namespace "
+                "of the server"
+            ),
+            "default": "/plans",
+        },
+        "directory": {
+            "type": "string",
+            "title": "Archive directory",
+            "description": (
+                "Directory where every new plan is saved as KML and CSV files "
+                "in the background. Leave empty to disable archiving."
+            ),
+            "default": "",
+        },
+    }
+}
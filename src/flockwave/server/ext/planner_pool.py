@@ -0,0 +1,83 @@
+"""Extension that runs the search and split planners of the server in a pool
+of pre-warmed worker processes.
+
+The workers are started when the extension is loaded and import the geometry
+stack up front, so planning requests neither block the event loop nor pay
+the import cost of shapely and SciPy. Paths are returned from the workers
+through shared memory.
+"""
+
+from functools import partial
+from logging import Logger
+from os import cpu_count
+from trio import sleep_forever, to_thread
+from typing import Optional
+
+from flockwave.server.planning.jobs import use_planner_pool
+from flockwave.server.planning.pool import PlannerPool
+
+_pool: Optional[PlannerPool] = None
+
+
+def get_metrics():
+    """Returns the current load metrics of the planner pool, or ``None`` if
+    the pool is not running.
+    """
+    return _pool.get_metrics() if _pool else None
+
+
+def handle_stats_request(message, sender, hub):
+    metrics = get_metrics()
+    return {"metrics": metrics.json() if metrics else None}
+
+
+async def run(app, configuration, logger: Logger):
+    """Background task that is active while the extension is loaded."""
+    global _pool
+
+    workers = configuration.get("workers") or max(min((cpu_count() or 2) - 1, 4), 1)
+    start_method = configuration.get("start_method", "forkserver")
+
+    pool = PlannerPool(workers=workers, start_method=start_method)
+    await to_thread.run_sync(pool.start)
+    logger.info(
+        f"Planner pool started with {workers} worker(s) using {pool.start_method}"
+    )
+
+    handlers = {"X-PLN-STATS": handle_stats_request}
+
+    _pool = pool
+    try:
+        with use_planner_pool(pool), app.message_hub.use_message_handlers(handlers):
+            await sleep_forever()
+    finally:
+        _pool = None
+        await to_thread.run_sync(partial(pool.shutdown, wait=True))
+
+
+description = "Runs the search and split planners in pre-warmed worker processes"
+exports = {"get_metrics": get_metrics}
+schema = {
+    "properties": {
+        "workers": {
+            "type": "integer",
+            "title": "Number of workers",
+            "description": (
+                "Number of worker processes. Zero means one less than the "
+                "number of CPU cores, at most four."
+            ),
+            "minimum": 0,
+            "default": 0,
+        },
+        "start_method": {
+            "type": "string",
+            "title": "Start method",
+            "description": (
+                "Method used to start the worker processes. Falls back to "
+                "'spawn' on platforms where the forkserver is not available."
+            ),
+            "enum": ["forkserver", "spawn"],
+            "default": "forkserver",
+        },
+    }
+}
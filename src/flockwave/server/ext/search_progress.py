@@ -0,0 +1,77 @@
+"""Extension that tracks the progress of the search mission being flown from
+the positions reported by the UAVs, and periodically sends the coverage
+reached so far, the remaining area and the estimated time to completion of
+each UAV to the connected clients.
+
+The positions themselves are fed into the tracker by the UAV drivers; this
+extension starts tracking every new plan that has a search area, and takes
+care of the throttled notifications.
+"""
+
+from contextlib import ExitStack
+from logging import Logger
+from trio import sleep
+
+from flockwave.server.planning import Plan, plan_store
+from flockwave.server.planning.progress import search_progress
+
+
+def _on_plan_added(sender, plan: Plan) -> None:
+    search_progress.start(plan)
+
+
+def handle_progress_request(message, sender, hub):
+    return {"progress": search_progress.json()}
+
+
+async def run(app, configuration, logger: Logger):
+    """Background task that is active while the extension is loaded."""
+    interval = max(float(configuration.get("interval", 1)), 0.1)
+
+    handlers = {"X-SEARCH-PROGRESS": handle_progress_request}
+
+    with ExitStack() as stack:
+        stack.enter_context(
+            plan_store.added.connected_to(_on_plan_added, sender=plan_store)
+        )
+        stack.enter_context(app.message_hub.use_message_handlers(handlers))
+        stack.callback(search_progress.stop)
+
+        last_sent_version = search_progress.version
+        while True:
+            await sleep(interval)
+
+            if not search_progress.active:
+                continue
+            if search_progress.version == last_sent_version:
+                continue
+
+            last_sent_version = search_progress.version
+            try:
+                body = {
+                    "type": "X-SEARCH-PROGRESS",
+                    "progress": search_progress.json(),
+                }
+            except Exception:
+                logger.exception("Failed to compute the progress of the search")
+            else:
+                app.message_hub.enqueue_broadcast_message(
+                    app.message_hub.create_notification(body)
+                )
+
+
+description = "Live tracking of the area covered by the UAVs during a search"
+schema = {
+    "properties": {
+        "interval": {
+            "type": "number",
+            "title": "Update interval",
+            "description": (
+                "Minimum number of seconds between consecutive progress "
+                "notifications sent to the clients"
+            ),
+            "minimum": 0.1,
+            "default": 1,
+        },
+    }
+}
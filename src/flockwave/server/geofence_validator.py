@@ -1,6 +1,12 @@
+from dataclasses import dataclass
 from shapely.geometry import Point, Polygon
 from shapely.prepared import prep
-import math
+from typing import Optional
+
+import numpy as np
+import shapely
+
+from .planning.geodesy import LocalFrame
 
 
 # -----------------------------
@@ -20,12 +26,98 @@ class Fence:
         self.polygon = prep(polygon)
         self.label = label or "fence"
 
+        self._geometry = polygon
+        self._frame = None
+        self._local_polygon = None
+        self._local_boundary = None
+
     def contains_point(self, lat, lon):
         """
         Check if a point is inside or on the boundary of the fence.
         """
         return self.polygon.covers(Point(lon, lat))
 
+    @property
+    def is_empty(self) -> bool:
+        """Whether the fence has no area (e.g. no fence was defined yet)."""
+        return self._geometry.is_empty
+
+    @property
+    def frame(self) -> LocalFrame:
+        """The local metric frame of the fence, centred on its centroid."""
+        if self._frame is None:
+            self._project()
+        return self._frame
+
+    @property
+    def local_polygon(self):
+        """The fence polygon projected into its local metric frame, prepared
+        for repeated predicate evaluations.
+        """
+        if self._local_polygon is None:
+            self._project()
+        return self._local_polygon
+
+    @property
+    def local_boundary(self):
+        """The boundary of the fence in its local metric frame, prepared for
+        repeated distance queries.
+        """
+        if self._local_boundary is None:
+            self._project()
+        return self._local_boundary
+
+    def _project(self):
+        """Projects the fence into its local metric frame and prepares the
+        projected geometries. Called once, on first use.
+        """
+        centroid = self._geometry.centroid
+        frame = LocalFrame(centroid.y, centroid.x)
+
+        def to_local(coords):
+            x, y = frame.to_local(coords[:, 1], coords[:, 0])
+            return np.column_stack((x, y))
+
+        local_polygon = shapely.transform(self._geometry, to_local)
+        local_boundary = local_polygon.boundary
+        shapely.prepare(local_polygon)
+        shapely.prepare(local_boundary)
+
+        self._frame = frame
+        self._local_polygon = local_polygon
+        self._local_boundary = local_boundary
+
+
+_cached_fence: Optional[Fence] = None
+_cached_fence_key = None
+
+
+def get_fence(fence_coords, label=None) -> Fence:
+    """Returns a fence for the given coordinates, reusing the fence that was
+    constructed in the previous call if the coordinates and the label did not
+    change. This way the projected and prepared geometry of the fence is
+    computed only once for every fence that the GCS sends.
+
+    :param fence_coords: List of (lat, lon) tuples
+    """
+    global _cached_fence, _cached_fence_key
+
+    key = (tuple(tuple(float(x) for x in point) for point in fence_coords), label)
+    if _cached_fence is None or _cached_fence_key != key:
+        _cached_fence = Fence(fence_coords, label=label)
+        _cached_fence_key = key
+
+    return _cached_fence
+
+
+def clear_fence_cache() -> None:
+    """Forgets the fence cached by `get_fence()`; called when a new fence
+    arrives from the GCS.
+    """
+    global _cached_fence, _cached_fence_key
+    _cached_fence = None
+    _cached_fence_key = None
+
 
 # -----------------------------
 # Goal validator (simple point checks)
@@ -51,41 +143,86 @@ class GoalFenceValidator:
 # -----------------------------
 # Search / coverage validator (area-aware)
 # -----------------------------
+@dataclass(frozen=True)
+class CoverageCheckResult:
+    """Result of a batch coverage check against a fence."""
+
+    inside: np.ndarray
+    """Whether the coverage disk of each point is fully inside the fence."""
+
+    violation: np.ndarray
+    """How far the coverage disk of each point extends beyond the fence, in
+    meters; zero for points that passed the check.
+    """
+
+    @property
+    def all_inside(self) -> bool:
+        """Whether all the coverage disks are fully inside the fence."""
+        return bool(self.inside.all())
+
+    @property
+    def max_violation(self) -> float:
+        """The largest violation among all the points, in meters."""
+        return float(self.violation.max()) if len(self.violation) else 0.0
+
+
 class SearchAreaValidator:
     def __init__(self, fence: Fence):
         self.fence = fence
 
-    def _offset_point(self, lat, lon, dx_m, dy_m):
+    def check_coverage(self, points, coverage_diameter_m, quad_segs=16):
         """
-        Offset a lat/lon point by meters.
-        dx_m: east (+) / west (-)
-        dy_m: north (+) / south (-)
+        Check whether the coverage disks of the given points are fully inside
+        the fence, all points at once.
+
+        The fence and the points are projected into the local metric frame of
+        the fence, each point is buffered by the coverage radius and all the
+        disks are tested against the prepared fence in a single vectorized
+        predicate call. The buffered disks are polygons inscribed in the true
+        circles, so the exact distance of each centre from the fence boundary
+        is also taken into account; a disk that pokes out of the fence by any
+        amount is therefore rejected, even between the vertices of the
+        polygonal approximation.
+
+        :param points: list of (lat, lon)
+        :param coverage_diameter_m: coverage diameter in meters
+        :param quad_segs: number of segments per quarter circle in the
+            buffered disks
+        :return: a `CoverageCheckResult` with one entry per point
         """
-        meters_per_deg_lat = 111_320
-        meters_per_deg_lon = meters_per_deg_lat * math.cos(math.radians(lat))
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        num_points = len(points)
+        if self.fence.is_empty:
+            return CoverageCheckResult(
+                inside=np.zeros(num_points, dtype=bool),
+                violation=np.full(num_points, np.inf),
+            )
+
+        radius = coverage_diameter_m / 2
+        x, y = self.fence.frame.to_local(points[:, 0], points[:, 1])
+        centers = shapely.points(x, y)
+
+        centers_inside = shapely.covers(self.fence.local_polygon, centers)
+        distances = shapely.distance(self.fence.local_boundary, centers)
+        violation = np.where(
+            centers_inside, np.maximum(radius - distances, 0.0), radius + distances
+        )
 
-        new_lat = lat + (dy_m / meters_per_deg_lat)
-        new_lon = lon + (dx_m / meters_per_deg_lon)
+        if radius > 0:
+            disks = shapely.buffer(centers, radius, quad_segs=quad_segs)
+            inside = shapely.covers(self.fence.local_polygon, disks)
+        else:
+            inside = centers_inside
 
-        return new_lat, new_lon
+        return CoverageCheckResult(
+            inside=inside & (violation <= 0), violation=violation
+        )
 
     def is_point_with_coverage_inside(self, point, coverage_area_m):
         """
         Check if a point and its coverage area (diameter in meters) are fully inside the fence.
         """
-        lat, lon = point
-        radius = coverage_area_m / 2
-
-        # Points to check: center + top/bottom/left/right edges
-        check_points = [
-            (lat, lon),  # center
-            self._offset_point(lat, lon, 0, radius),  # top
-            self._offset_point(lat, lon, 0, -radius),  # bottom
-            self._offset_point(lat, lon, radius, 0),  # right
-            self._offset_point(lat, lon, -radius, 0),  # left
-        ]
-
-        return all(self.fence.contains_point(p[0], p[1]) for p in check_points)
+        return bool(self.check_coverage([point], coverage_area_m).inside[0])
 
     def are_points_with_coverage_inside(self, points, coverage_diameter_m):
         """
@@ -95,9 +232,7 @@ class SearchAreaValidator:
         :param coverage_diameter_m: coverage diameter in meters
         :return: True if all points are valid
         """
-        return all(
-            self.is_point_with_coverage_inside(p, coverage_diameter_m) for p in points
-        )
+        return self.check_coverage(points, coverage_diameter_m).all_inside
 
 
 # -----------------------------
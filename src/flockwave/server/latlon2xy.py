@@ -1,5 +1,4 @@
 import math, csv, os
-from scipy import interpolate
 
 
 def destination_location(homeLattitude, homeLongitude, distance, bearing):
@@ -72,6 +71,9 @@ def geoToCart(origin, endDistance, geoLocation):
     # Array of (latitude, longitude)
     x_lon, y_lat = [lEnd[1], origin[1], rEnd[1]], [lEnd[0], origin[0], rEnd[0]]
 
+    # SciPy is imported lazily as it is slow to import
+    from scipy import interpolate
+
     # Latitude interpolation function
     f_lat = interpolate.interp1d(y_lat, y_cart)
 
@@ -106,6 +108,9 @@ def cartToGeo(origin, endDistance, cartLocation):
     # Array of (latitude, longitude)
     x_lon, y_lat = [lEnd[1], origin[1], rEnd[1]], [lEnd[0], origin[0], rEnd[0]]
 
+    # SciPy is imported lazily as it is slow to import
+    from scipy import interpolate
+
     # Latitude interpolation function
     f_lat = interpolate.interp1d(y_cart, y_lat)
 
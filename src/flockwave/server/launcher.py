@@ -45,6 +45,12 @@ from .version import __version__
     default="fancy",
     help="Specify the style of the logging output",
 )
+@click.option(
+    "--profile-startup",
+    is_flag=True,
+    default=False,
+    help="Print a breakdown of the time spent on importing the server and exit",
+)
 @click.version_option(version=__version__)
 def start(
     config: str,
@@ -52,8 +58,20 @@ def start(
     debug: bool = False,
     quiet: bool = False,
     log_style: str = "fancy",
+    profile_startup: bool = False,
 ):
     """Start the Skybrush server."""
+    if profile_startup:
+        from .utils.startup import format_import_time_report, measure_import_times
+
+        module = "flockwave.server.app"
+        try:
+            records = measure_import_times(module)
+        except RuntimeError as ex:
+            raise click.ClickException(str(ex)) from None
+        click.echo(format_import_time_report(records, module))
+        return
+
     # Set up the logging format
     logger.install(
         level=logging.DEBUG if debug else logging.WARN if quiet else logging.INFO,
@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from abc import ABCMeta, abstractproperty
+from math import atan2, cos, degrees, pi, sin, sqrt
 from typing import (
     Any,
     Callable,
@@ -436,32 +437,68 @@ class UAVBase(UAV):
     def distance_bearing(
         self, homeLattitude, homeLongitude, destinationLattitude, destinationLongitude
     ) -> list[float]:
-        import math
-
         R = 6371e3  # Radius of earth in metres
-        rlat1 = homeLattitude * (math.pi / 180)
-        rlat2 = destinationLattitude * (math.pi / 180)
-        rlon1 = homeLongitude * (math.pi / 180)
-        rlon2 = destinationLongitude * (math.pi / 180)
-        dlat = (destinationLattitude - homeLattitude) * (math.pi / 180)
-        dlon = (destinationLongitude - homeLongitude) * (math.pi / 180)
+        rlat1 = homeLattitude * (pi / 180)
+        rlat2 = destinationLattitude * (pi / 180)
+        dlat = (destinationLattitude - homeLattitude) * (pi / 180)
+        dlon = (destinationLongitude - homeLongitude) * (pi / 180)
+        cos_rlat1 = cos(rlat1)
+        cos_rlat2 = cos(rlat2)
         # haversine formula to find distance
-        a = (math.sin(dlat / 2) * math.sin(dlat / 2)) + (
-            math.cos(rlat1)
-            * math.cos(rlat2)
-            * (math.sin(dlon / 2) * math.sin(dlon / 2))
+        sin_half_dlat = sin(dlat / 2)
+        sin_half_dlon = sin(dlon / 2)
+        a = sin_half_dlat * sin_half_dlat + (
+            cos_rlat1 * cos_rlat2 * sin_half_dlon * sin_half_dlon
         )
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+        c = 2 * atan2(sqrt(a), sqrt(1 - a))
         distance = R * c  # distance in metres
         # formula for bearing
-        y = math.sin(rlon2 - rlon1) * math.cos(rlat2)
-        x = math.cos(rlat1) * math.sin(rlat2) - math.sin(rlat1) * math.cos(
-            rlat2
-        ) * math.cos(rlon2 - rlon1)
-        bearing = math.atan2(y, x)  # bearing in radians
-        bearingDegrees = bearing * (180 / math.pi)
-        out = [distance, bearingDegrees]
-        return out
+        y = sin(dlon) * cos_rlat2
+        x = cos_rlat1 * sin(rlat2) - sin(rlat1) * cos_rlat2 * cos(dlon)
+        bearing = atan2(y, x)  # bearing in radians
+        return [distance, degrees(bearing)]
+
+    def update_position(
+        self,
+        position: GPSCoordinate,
+        velocity: VelocityNED,
+        heading: float,
+        *,
+        gcs_position: Optional[GPSCoordinate] = None,
+    ) -> None:
+        """Updates the position, the velocity and the heading of the UAV in its
+        status information.
+
+        This is a faster equivalent of calling `update_status()` with the
+        ``position``, ``velocity``, ``heading`` and ``gcsLocation`` arguments,
+        meant for telemetry handlers that are called several times per second
+        for each UAV. The position and the velocity are copied into the status
+        information; no new objects are created.
+
+        Parameters:
+            position: the global (GPS) position of the UAV
+            velocity: the global (NED) velocity of the UAV
+            heading: the heading of the UAV, in degrees
+            gcs_position: the position of the ground station; when given, the
+                distance and the bearing of the UAV from the ground station are
+                also updated
+        """
+        status = self._status
+
+        gimbal_bearing = self._gimabl.bearing
+        if gimbal_bearing is not None:
+            status.gimbalHeading = gimbal_bearing
+
+        status.position.update_from(position, precision=7)
+        if gcs_position is not None:
+            status.distance, status.bearing = self.distance_bearing(
+                gcs_position.lat, gcs_position.lon, position.lat, position.lon
+            )
+
+        # Heading is rounded to 2 digits, the same way as in update_status()
+        status.heading = round(heading % 360, 2)
+        status.velocity.update_from(velocity, precision=2)
+        status.update_timestamp()
 
     def update_status(
         self,
@@ -1,7 +1,4 @@
 import numpy as np
-import simplekml
-import csv
-import os
 from shapely.geometry import (
     Polygon,
     MultiPolygon,
@@ -15,7 +12,9 @@ from shapely.errors import TopologicalError
 from functools import cmp_to_key
 from math import atan2, degrees, radians, cos, sin
 from .latlon2xy import geoToCart, cartToGeo
-import matplotlib.pyplot as plt
+from .logger import log as base_log
+
+log = base_log.getChild("planning")
 
 
 class PolygonAutoSplit:
@@ -181,19 +180,6 @@ class PolygonAutoSplit:
             if obstacles_latlon_list
             else [[] for _ in polygon_latlon_list]
         )
-        self.path = []
-        self.output_dir = os.path.join(os.getcwd(), "group_split")
-        os.makedirs(self.output_dir, exist_ok=True)
-        if os.path.exists(self.output_dir):
-            for filename in os.listdir(self.output_dir):
-                file_path = os.path.join(self.output_dir, filename)
-                try:
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                except Exception as e:
-                    print(f"⚠️ Failed to delete {file_path}. Reason: {e}")
         # Assign drones to polygons fairly
         self.drone_assignments = self.split_drones_among_polygons(
             self.num_drones, len(self.polygon_latlon_list)
@@ -338,68 +324,32 @@ class PolygonAutoSplit:
                 drone_id += 1
         return self.drone_paths
 
-    def save_paths(self):
+    def to_geo_paths(self):
+        """Converts the generated paths of the drones to geodetic coordinates.
+
+        Paths that turned out to be empty are returned as empty arrays so the
+        i-th path still belongs to the i-th drone.
+
+        Returns:
+            one NumPy array of longitude-latitude pairs for each drone
+        """
         if not self.drone_paths:
             raise RuntimeError(
                 "No drone paths generated yet. Call generate_paths() first."
             )
 
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
-
-        drone_id = 1
-        polygon_idx = 0
-        drones_in_poly = self.drone_assignments[polygon_idx]
-        path1 = []
-        for path in self.drone_paths:
-            if drone_id > sum(self.drone_assignments[: polygon_idx + 1]):
-                polygon_idx += 1
-                drones_in_poly = self.drone_assignments[polygon_idx]
-
-            if not path:
-                print(f"⚠️ No path for drone {drone_id}, skipping file save.")
-                drone_id += 1
+        result = []
+        for drone_id, path in enumerate(self.drone_paths, start=1):
+            if len(path) == 0:
+                log.warning(f"No path was generated for drone {drone_id}")
+                result.append(np.empty((0, 2)))
                 continue
 
-            # Convert Cartesian points to GPS (lat, lon)
-            gps_coords = [cartToGeo(self.origin_gps, self.endDistance, p) for p in path]
-            # print("gps_coords", gps_coords)
-            kml = simplekml.Kml()
-
-            # Prepare coords for KML in (lon, lat) order
-            coords = [(lon, lat) for lat, lon in gps_coords]
-
-            linestring = kml.newlinestring(name=f"Drone path {drone_id}")
-            linestring.coords = coords
-            linestring.altitudemode = simplekml.AltitudeMode.clamptoground
-            linestring.style.linestyle.color = simplekml.Color.red
-            linestring.style.linestyle.width = 3
-
-            # Add numbered points (waypoints)
-            for idx, (lon, lat) in enumerate(coords, start=1):
-                pnt = kml.newpoint(name=str(idx), coords=[(lon, lat)])
-                pnt.style.labelstyle.color = simplekml.Color.blue
-                pnt.style.iconstyle.color = simplekml.Color.yellow
-                pnt.style.iconstyle.scale = 1.0
-                path1.append((float(lon), float(lat)))
-
-            kml_path = os.path.join(self.output_dir, f"search-drone-{drone_id}.kml")
-            kml.save(kml_path)
-            # print(f"✅ Saved KML for drone {drone_id} to {kml_path}")
-            self.path.append(path1)
-            # Save CSV with (lat, lon)
-            # csv_path = os.path.join(self.output_dir, f"grid_{drone_id}.csv")
-            # with open(csv_path, "w", newline="") as f:
-            #     writer = csv.writer(f)
-            #     # writer.writerow(['lat', 'lon'])
-            #     for lat, lon in gps_coords:
-            #         x, y = geoToCart(self.origin_gps, 500000, [lat, lon])
-            #         writer.writerow([x / 2, y / 2])
-            # print(f"✅ Saved CSV for drone {drone_id} to {csv_path}")
-
-            drone_id += 1
-
-        return self.path
+            path = np.asarray(path, dtype=np.float64)
+            lat, lon = cartToGeo(self.origin_gps, self.endDistance, path.T)
+            result.append(np.column_stack((lon, lat)))
+
+        return result
 
 
 # planner = PolygonAutoSplit(
@@ -434,4 +384,4 @@ class PolygonAutoSplit:
 # )
 
 # planner.generate_paths()
-# planner.save_paths()
+# planner.to_geo_paths()
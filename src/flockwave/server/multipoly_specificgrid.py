@@ -1,7 +1,4 @@
 import numpy as np
-import simplekml
-import csv
-import os
 from shapely.geometry import (
     Polygon,
     MultiPolygon,
@@ -14,7 +11,6 @@ from shapely.geometry import (
 from shapely.errors import TopologicalError
 from functools import cmp_to_key
 from math import atan2, degrees, radians, cos, sin
-import matplotlib.pyplot as plt
 from .latlon2xy import geoToCart, cartToGeo
 
 
@@ -183,18 +179,6 @@ class PolygonSpecificSplit:
             else [[] for _ in polygon_latlon_list]
         )
 
-        self.output_dir = os.path.join(os.getcwd(), "group_split")
-        os.makedirs(self.output_dir, exist_ok=True)
-        if os.path.exists(self.output_dir):
-            for filename in os.listdir(self.output_dir):
-                file_path = os.path.join(self.output_dir, filename)
-                try:
-                    if os.path.isfile(file_path) or os.path.islink(file_path):
-                        os.unlink(file_path)
-                    elif os.path.isdir(file_path):
-                        shutil.rmtree(file_path)
-                except Exception as e:
-                    print(f"⚠️ Failed to delete {file_path}. Reason: {e}")
         if isinstance(grid_spacing, (list, tuple)):
             if len(grid_spacing) != len(polygon_latlon_list):
                 raise ValueError(
@@ -375,49 +359,30 @@ class PolygonSpecificSplit:
         self.drone_paths = ordered_paths
         return self.drone_paths
 
-    def save_paths(self):
+    def to_geo_paths(self):
+        """Converts the generated paths of the drones to geodetic coordinates.
+
+        Paths that turned out to be empty are omitted from the result.
+
+        Returns:
+            one NumPy array of longitude-latitude pairs for each drone
+        """
         if not self.drone_paths:
             raise RuntimeError(
                 "No drone paths generated yet. Call generate_paths() first."
             )
 
-        if not os.path.exists(self.output_dir):
-            os.makedirs(self.output_dir)
-
+        result = []
         for drone_id, path in enumerate(self.drone_paths, start=1):
-            if not path:
-                print(f"⚠️ No path for drone {drone_id}, skipping save.")
+            if len(path) == 0:
+                print(f"⚠️ No path for drone {drone_id}, skipping.")
                 continue
 
-            gps_coords = [cartToGeo(self.origin_gps, self.endDistance, p) for p in path]
-            kml = simplekml.Kml()
-
-            coords = [(lon, lat) for lat, lon in gps_coords]
-
-            linestring = kml.newlinestring(name=f"Drone path {drone_id}")
-            linestring.coords = coords
-            linestring.altitudemode = simplekml.AltitudeMode.clamptoground
-            linestring.style.linestyle.color = simplekml.Color.red
-            linestring.style.linestyle.width = 3
-
-            for idx, (lon, lat) in enumerate(coords, start=1):
-                pnt = kml.newpoint(name=str(idx), coords=[(lon, lat)])
-                pnt.style.labelstyle.color = simplekml.Color.blue
-                pnt.style.iconstyle.color = simplekml.Color.yellow
-                pnt.style.iconstyle.scale = 1.0
-
-            kml_path = os.path.join(self.output_dir, f"search-drone-{drone_id}.kml")
-            kml.save(kml_path)
-            # print(f"✅ Saved KML for drone {drone_id} to {kml_path}")
+            path = np.asarray(path, dtype=np.float64)
+            lat, lon = cartToGeo(self.origin_gps, self.endDistance, path.T)
+            result.append(np.column_stack((lon, lat)))
 
-            # csv_path = os.path.join(self.output_dir, f"grid_{drone_id}.csv")
-            # with open(csv_path, "w", newline="") as f:
-            #     writer = csv.writer(f)
-            #     # writer.writerow(['lat', 'lon'])
-            #     for lat, lon in gps_coords:
-            #         x, y = geoToCart(self.origin_gps, 500000, [lat, lon])
-            #         writer.writerow([x / 2, y / 2])
-            # print(f"✅ Saved CSV for drone {drone_id} to {csv_path}")
+        return result
 
 
 # polygon_list = [
@@ -450,4 +415,4 @@ class PolygonSpecificSplit:
 # )
 
 # paths = planner.generate_paths()
-# planner.save_paths()
+# planner.to_geo_paths()
@@ -0,0 +1,16 @@
+"""Package containing the in-memory representation of the plans generated by
+the search and split planners, along with helper functions that operate on
+them.
+"""
+
+from .export import path_to_csv, path_to_kml, save_plan_files
+from .store import Plan, PlanStore, plan_store
+
+__all__ = (
+    "Plan",
+    "PlanStore",
+    "path_to_csv",
+    "path_to_kml",
+    "plan_store",
+    "save_plan_files",
+)
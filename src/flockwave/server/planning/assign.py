@@ -0,0 +1,176 @@
+"""Assignment of the paths of a plan to UAVs based on their current
+positions.
+
+The planners produce paths in a fixed order that does not depend on where
+the UAVs are. This module matches paths to UAVs such that the total transit
+distance from the current position of each UAV to the entry point of its
+path is minimal, using the Hungarian algorithm.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional, Sequence, TypeVar
+
+import numpy as np
+
+from .geodesy import LocalFrame
+
+__all__ = ("PathAssignment", "assign_paths")
+
+T = TypeVar("T")
+
+
+@dataclass
+class PathAssignment:
+    """Result of assigning the paths of a plan to UAVs."""
+
+    path_indices: list[Optional[int]] = field(default_factory=list)
+    """For each UAV, the index of the path assigned to it, or ``None`` if the
+    UAV did not receive a path.
+    """
+
+    reversed: list[bool] = field(default_factory=list)
+    """For each UAV, whether its path should be flown in reverse order because
+    the last waypoint of the path is closer to the UAV than the first one.
+    """
+
+    transit: float = 0.0
+    """Total transit distance of the UAVs to the entry points of their paths
+    with the optimal assignment, in metres. Only UAVs with known positions are
+    taken into account.
+    """
+
+    naive_transit: float = 0.0
+    """Total transit distance of the UAVs to the entry points of their paths
+    if the paths were assigned to the UAVs in the order they were planned,
+    in metres.
+    """
+
+    @property
+    def saved(self) -> float:
+        """Transit distance saved by the optimal assignment, in metres."""
+        return max(self.naive_transit - self.transit, 0.0)
+
+    def apply(self, paths: Sequence[np.ndarray]) -> list[np.ndarray]:
+        """Returns the paths reordered such that the i-th path belongs to the
+        i-th UAV. UAVs that did not receive a path get an empty path.
+        """
+        result = []
+        for index, reverse in zip(self.path_indices, self.reversed):
+            if index is None:
+                result.append(np.empty((0, 2), dtype=np.float64))
+            else:
+                path = np.asarray(paths[index], dtype=np.float64)
+                result.append(path[::-1] if reverse else path)
+        return result
+
+    def order_uavs(self, uav_ids: Sequence[T]) -> Optional[list[T]]:
+        """Returns the given UAVs reordered such that the i-th UAV is the one
+        that flies the i-th path as planned. This is the form of the
+        assignment that dispatchers need when they hand out the paths to the
+        UAVs in the order the UAVs are listed.
+
+        Parameters:
+            uav_ids: the IDs of the UAVs, in the order they were passed to
+                `assign_paths()`
+
+        Returns:
+            the reordered UAV IDs, or ``None`` if the assignment cannot be
+            expressed this way because not every UAV received a different
+            planned path, or because some paths are to be flown in reverse
+        """
+        num_uavs = len(uav_ids)
+        if len(self.path_indices) != num_uavs or any(self.reversed):
+            return None
+        assigned = sorted(index for index in self.path_indices if index is not None)
+        if assigned != list(range(num_uavs)):
+            return None
+
+        result = list(uav_ids)
+        for uav_id, index in zip(uav_ids, self.path_indices):
+            result[index] = uav_id
+        return result
+
+
+def assign_paths(
+    paths: Sequence[np.ndarray],
+    positions: Sequence[Optional[Sequence[float]]],
+    *,
+    allow_reverse: bool = False,
+) -> PathAssignment:
+    """Assigns the given paths to UAVs such that the total transit distance
+    from the UAVs to the entry points of their paths is minimal.
+
+    Parameters:
+        paths: the paths to assign, as longitude-latitude pairs
+        positions: the current longitude and latitude of each UAV, or ``None``
+            for UAVs whose position is not known. UAVs with unknown positions
+            receive the paths that are left over after the others were
+            assigned.
+        allow_reverse: whether paths may be flown from their last waypoint
+            if that is closer to the UAV
+
+    Returns:
+        the assignment, with one entry per UAV
+    """
+    from scipy.optimize import linear_sum_assignment
+
+    paths = [np.asarray(path, dtype=np.float64).reshape(-1, 2) for path in paths]
+    num_uavs = len(positions)
+    result = PathAssignment(path_indices=[None] * num_uavs, reversed=[False] * num_uavs)
+
+    usable = [index for index, path in enumerate(paths) if len(path)]
+    if not usable or not num_uavs:
+        return result
+
+    known = [index for index, pos in enumerate(positions) if pos is not None]
+    if known:
+        origin = positions[known[0]]
+    else:
+        origin = paths[usable[0]][0]
+    frame = LocalFrame(origin[1], origin[0])
+
+    def to_local(lonlat):
+        lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack(frame.to_local(lonlat[:, 1], lonlat[:, 0]))
+
+    firsts = to_local([paths[index][0] for index in usable])
+    lasts = to_local([paths[index][-1] for index in usable])
+
+    # Cost matrix of transit distances
+    to_first = np.zeros((num_uavs, len(usable)))
+    to_last = np.zeros((num_uavs, len(usable)))
+    if known:
+        uav_xy = to_local([positions[index] for index in known])
+        to_first[known] = np.hypot(*(uav_xy[:, None, :] - firsts[None, :, :]).T).T
+        to_last[known] = np.hypot(*(uav_xy[:, None, :] - lasts[None, :, :]).T).T
+
+    if allow_reverse:
+        reverse = to_last < to_first
+        cost = np.minimum(to_first, to_last)
+    else:
+        reverse = np.zeros_like(to_first, dtype=bool)
+        cost = to_first
+
+    # Rows of UAVs with unknown positions get a constant cost that is higher
+    # than any real transit. This does not influence the choices of the others
+    # but keeps leftover paths for them if there are more UAVs than paths.
+    unknown = [index for index in range(num_uavs) if positions[index] is None]
+    if unknown:
+        cost[unknown] = cost.max() + 1.0
+
+    rows, cols = linear_sum_assignment(cost)
+    known_set = set(known)
+    for row, col in zip(rows, cols):
+        result.path_indices[row] = usable[col]
+        result.reversed[row] = bool(reverse[row, col])
+        if row in known_set:
+            result.transit += float(cost[row, col])
+
+    # Baseline: the k-th usable path goes to the k-th UAV, as planned
+    for row in range(min(num_uavs, len(usable))):
+        if row in known_set:
+            result.naive_transit += float(to_first[row, row])
+
+    return result
@@ -0,0 +1,598 @@
+"""Reproducible benchmark and regression suite for the search and split
+planners of the server.
+
+The planners are run on synthetic convex, concave and holed polygons and on
+rectangular search areas, placed around a fixed location. For each case the
+suite records the wall time, the peak memory allocated by Python, the number
+of waypoints generated and the fraction of the target area that is covered by
+the swaths of the generated paths. The results can be stored as a baseline
+and later runs can be compared against it to detect regressions.
+
+The suite runs headless, does not use the network and writes files only into
+a temporary directory. Run it with::
+
+    python -m flockwave.server.planning.benchmark --suite quick --baseline FILE
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import tracemalloc
+
+from contextlib import redirect_stdout
+from dataclasses import dataclass
+from io import StringIO
+from itertools import product
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from time import perf_counter
+from typing import Any, Callable, Iterable, Optional, Sequence
+
+import numpy as np
+
+from .geodesy import LocalFrame
+
+__all__ = (
+    "BenchmarkCase",
+    "BenchmarkResult",
+    "Regression",
+    "compare_to_baseline",
+    "get_suite",
+    "load_baseline",
+    "run_case",
+    "run_suite",
+    "save_baseline",
+)
+
+
+CENTER = (47.4735, 19.0625)
+"""Latitude and longitude of the point around which the synthetic areas are
+placed.
+"""
+
+PLANNERS = (
+    "search_grid",
+    "navigate",
+    "polygon_search",
+    "polygon_split",
+    "specific_split",
+    "vtol_grid",
+    "fence_to_yaml",
+)
+"""Names of the planners covered by the suite."""
+
+SHAPES = ("square", "convex", "concave", "holed")
+"""Names of the synthetic areas. ``square`` is used by the planners that work
+on a rectangular area around a centre point.
+"""
+
+_RECTANGULAR_PLANNERS = ("search_grid", "navigate", "vtol_grid")
+
+
+@dataclass(frozen=True)
+class BenchmarkCase:
+    """A single planner invocation of the benchmark suite."""
+
+    planner: str
+    """Name of the planner; one of `PLANNERS`."""
+
+    shape: str
+    """Name of the synthetic area; one of `SHAPES`."""
+
+    scale: float
+    """Size of the area, in metres."""
+
+    spacing: float
+    """Distance between the rows of the search pattern, in metres."""
+
+    num_drones: int
+    """Number of drones to plan for."""
+
+    @property
+    def name(self) -> str:
+        """Unique name of the case, used as its key in baselines."""
+        return (
+            f"{self.planner}/{self.shape}/{self.scale:g}m/"
+            f"{self.spacing:g}m/{self.num_drones}"
+        )
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    """Measurements of a single benchmark case."""
+
+    name: str
+    """Name of the case."""
+
+    time: float
+    """Best wall time of the planner over all repetitions, in seconds."""
+
+    peak_memory: int
+    """Peak memory allocated by Python while planning, in bytes."""
+
+    waypoints: int
+    """Total number of waypoints in the generated paths."""
+
+    coverage: Optional[float]
+    """Fraction of the target area covered by the swaths of the generated
+    paths; ``None`` for planners that do not produce paths.
+    """
+
+    def json(self) -> dict[str, Any]:
+        return {
+            "time": round(self.time, 6),
+            "peakMemory": self.peak_memory,
+            "waypoints": self.waypoints,
+            "coverage": None if self.coverage is None else round(self.coverage, 4),
+        }
+
+
+@dataclass(frozen=True)
+class Regression:
+    """A measurement of a benchmark case that got worse than its baseline."""
+
+    name: str
+    """Name of the case."""
+
+    metric: str
+    """Name of the metric that regressed."""
+
+    baseline: float
+    """Value of the metric in the baseline."""
+
+    value: float
+    """Value of the metric in the current run."""
+
+    def __str__(self) -> str:
+        return (
+            f"{self.name}: {self.metric} regressed from {self.baseline:g} "
+            f"to {self.value:g}"
+        )
+
+
+######################################################################
+# Synthetic areas
+
+
+def _local_outline(shape: str, scale: float) -> tuple[np.ndarray, list[np.ndarray]]:
+    """Returns the outline and the holes of a synthetic area in a local
+    metric frame centred on the area.
+    """
+    h = scale / 2
+    if shape == "square":
+        outline = np.array([(-h, -h), (h, -h), (h, h), (-h, h)])
+        return outline, []
+    if shape == "convex":
+        angles = np.radians(np.arange(0, 360, 60) + 15)
+        return np.column_stack((h * np.cos(angles), h * np.sin(angles))), []
+    if shape == "concave":
+        # L-shaped area: the square without its north-eastern quarter
+        outline = np.array([(-h, -h), (h, -h), (h, 0), (0, 0), (0, h), (-h, h)])
+        return outline, []
+    if shape == "holed":
+        q = scale / 8
+        outline = np.array([(-h, -h), (h, -h), (h, h), (-h, h)])
+        hole = np.array([(-q, -q), (-q, q), (q, q), (q, -q)])
+        return outline, [hole]
+    raise ValueError(f"Unknown shape: {shape!r}")
+
+
+def _to_lat_lon(frame: LocalFrame, xy: np.ndarray) -> list[list[float]]:
+    lat, lon = frame.to_geo(xy[:, 0], xy[:, 1])
+    return np.column_stack((lat, lon)).tolist()
+
+
+######################################################################
+# Planner invocations
+
+
+def _run_planner(case: BenchmarkCase, frame: LocalFrame, workdir: Path) -> list:
+    """Runs the planner of the given case and returns the generated paths as
+    longitude-latitude arrays.
+    """
+    lat, lon = CENTER
+    outline, holes = _local_outline(case.shape, case.scale)
+    polygon = _to_lat_lon(frame, outline)
+    obstacles = [_to_lat_lon(frame, hole) for hole in holes]
+
+    if case.planner == "search_grid":
+        from flockwave.server.search import SearchGridGenerator
+
+        return SearchGridGenerator(
+            None, lat, lon, case.num_drones, case.spacing, case.scale
+        ).generate_grids()
+
+    if case.planner == "navigate":
+        from flockwave.server.navigate import NavigationGridGenerator
+
+        return NavigationGridGenerator(
+            None, lat, lon, case.num_drones, case.spacing, case.scale
+        ).navigate_grid()
+
+    if case.planner == "vtol_grid":
+        # GridFormation() writes its output into fixed directories, so the
+        # benchmark runs the same pattern generation directly
+        from .grid import rectangular_lawnmower
+
+        gap = 50
+        strip_height = (case.scale - (case.num_drones - 1) * gap) / case.num_drones
+        return rectangular_lawnmower(
+            CENTER,
+            case.scale,
+            case.scale,
+            case.spacing,
+            case.num_drones,
+            strip_height=strip_height,
+            turn_extension=250,
+        )
+
+    if case.planner == "polygon_search":
+        from flockwave.server.search import PolygonSearchGrid
+
+        planner = PolygonSearchGrid(
+            polygon_latlon=polygon,
+            origin_gps=CENTER,
+            endDistance=500000,
+            num_drones=case.num_drones,
+            grid_spacing=case.spacing,
+            rotation_angle=90,
+            obstacles_latlon=obstacles,
+        )
+        planner.generate_paths()
+        return planner.to_geo_paths()
+
+    if case.planner == "polygon_split":
+        from flockwave.server.multipoly_grid import PolygonAutoSplit
+
+        planner = PolygonAutoSplit(
+            polygon_latlon_list=[polygon],
+            origin_gps=CENTER,
+            endDistance=500000,
+            num_drones=case.num_drones,
+            grid_spacing=case.spacing,
+            rotation_angle=90,
+            obstacles_latlon_list=[obstacles],
+        )
+        planner.generate_paths()
+        return planner.to_geo_paths()
+
+    if case.planner == "specific_split":
+        from flockwave.server.multipoly_specificgrid import PolygonSpecificSplit
+
+        planner = PolygonSpecificSplit(
+            polygon_latlon_list=[polygon],
+            origin_gps=CENTER,
+            endDistance=500000,
+            num_drones=case.num_drones,
+            grid_spacing=case.spacing,
+            rotation_angle=90,
+            obstacles_latlon_list=[obstacles],
+            drone_assignments=[list(range(1, case.num_drones + 1))],
+        )
+        planner.generate_paths()
+        return planner.to_geo_paths()
+
+    if case.planner == "fence_to_yaml":
+        from flockwave.server.YamlCreation import FenceToYAML
+
+        fence_yaml = FenceToYAML(
+            fence_coordinates=[polygon, *obstacles],
+            labels=["outer"] + [None] * len(obstacles),
+        )
+        fence_yaml.process_fences()
+        fence_yaml.generate_yaml(filename=str(workdir / "rectangles.yaml"))
+        return []
+
+    raise ValueError(f"Unknown planner: {case.planner!r}")
+
+
+def _coverage_ratio(
+    case: BenchmarkCase, frame: LocalFrame, paths: Sequence[np.ndarray]
+) -> Optional[float]:
+    """Returns the fraction of the target area of the case that lies within
+    half a row spacing of any of the generated paths.
+    """
+    if case.planner == "fence_to_yaml":
+        return None
+
+    from shapely import LineString, MultiLineString, Point, Polygon, union_all
+
+    outline, holes = _local_outline(case.shape, case.scale)
+    target = Polygon(outline, holes)
+
+    lines = []
+    for path in paths:
+        path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+        if len(path) == 0:
+            continue
+        xy = np.column_stack(frame.to_local(path[:, 1], path[:, 0]))
+        lines.append(LineString(xy) if len(xy) > 1 else Point(xy[0]))
+    if not lines:
+        return 0.0
+
+    swaths = union_all(
+        [
+            MultiLineString([line]).buffer(case.spacing / 2, cap_style="flat")
+            if isinstance(line, LineString)
+            else line.buffer(case.spacing / 2)
+            for line in lines
+        ]
+    )
+    return float(swaths.intersection(target).area / target.area)
+
+
+######################################################################
+# Running the suite
+
+
+def run_case(case: BenchmarkCase, *, repeat: int = 3) -> BenchmarkResult:
+    """Runs a single benchmark case.
+
+    The planner is run once to warm up, so that one-off costs like imports
+    are not attributed to the case. It is then run ``repeat`` times and the
+    best of these times is reported. Finally, it is run once more with memory
+    tracing enabled to measure its peak memory usage.
+
+    Parameters:
+        case: the case to run
+        repeat: the number of timed runs
+
+    Returns:
+        the measurements of the case
+    """
+    frame = LocalFrame(*CENTER)
+
+    with TemporaryDirectory() as workdir, redirect_stdout(StringIO()):
+        _run_planner(case, frame, Path(workdir))
+
+        best = float("inf")
+        for _ in range(max(int(repeat), 1)):
+            started_at = perf_counter()
+            _run_planner(case, frame, Path(workdir))
+            best = min(best, perf_counter() - started_at)
+
+        tracemalloc.start()
+        try:
+            paths = _run_planner(case, frame, Path(workdir))
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return BenchmarkResult(
+        name=case.name,
+        time=best,
+        peak_memory=peak_memory,
+        waypoints=sum(len(path) for path in paths),
+        coverage=_coverage_ratio(case, frame, paths),
+    )
+
+
+def get_suite(name: str = "quick") -> list[BenchmarkCase]:
+    """Returns the cases of a predefined benchmark suite.
+
+    The ``quick`` suite covers every planner and area shape at a single,
+    moderate size and takes a few seconds. The ``full`` suite sweeps areas
+    between 100 m and 5 km, row spacings between 5 and 50 m and 1 to 50
+    drones; combinations where the strips of the drones would be narrower
+    than the row spacing are left out.
+
+    Raises:
+        ValueError: if there is no suite with the given name
+    """
+    if name == "quick":
+        scales, spacings, drones = (500,), (25,), (1, 4)
+    elif name == "full":
+        scales, spacings, drones = (100, 1000, 5000), (5, 20, 50), (1, 8, 50)
+    else:
+        raise ValueError(f"Unknown benchmark suite: {name!r}")
+
+    cases = []
+    for planner, shape, scale, spacing, num_drones in product(
+        PLANNERS, SHAPES, scales, spacings, drones
+    ):
+        if (shape == "square") != (planner in _RECTANGULAR_PLANNERS):
+            continue
+        if planner == "fence_to_yaml" and (num_drones > 1 or spacing != spacings[0]):
+            continue
+        if planner == "vtol_grid" and scale <= (num_drones - 1) * 50 + spacing:
+            continue
+        if scale < num_drones * spacing:
+            continue
+        cases.append(BenchmarkCase(planner, shape, scale, spacing, num_drones))
+    return cases
+
+
+def run_suite(
+    cases: Iterable[BenchmarkCase],
+    *,
+    repeat: int = 3,
+    on_result: Optional[Callable[[BenchmarkResult], None]] = None,
+) -> list[BenchmarkResult]:
+    """Runs all the given benchmark cases in order.
+
+    Parameters:
+        cases: the cases to run
+        repeat: the number of timed runs of each case
+        on_result: optional function to call with the result of each case as
+            soon as it is available
+
+    Returns:
+        the results of the cases
+    """
+    results = []
+    for case in cases:
+        result = run_case(case, repeat=repeat)
+        if on_result:
+            on_result(result)
+        results.append(result)
+    return results
+
+
+######################################################################
+# Baselines
+
+
+def save_baseline(results: Iterable[BenchmarkResult], path: Path) -> None:
+    """Saves the given benchmark results as a baseline into a JSON file."""
+    data = {"version": 1, "results": {r.name: r.json() for r in results}}
+    Path(path).write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
+
+
+def load_baseline(path: Path) -> dict[str, BenchmarkResult]:
+    """Loads a baseline saved with `save_baseline()`.
+
+    Returns:
+        the results in the baseline, keyed by the names of the cases
+    """
+    data = json.loads(Path(path).read_text())
+    return {
+        name: BenchmarkResult(
+            name=name,
+            time=item["time"],
+            peak_memory=item["peakMemory"],
+            waypoints=item["waypoints"],
+            coverage=item["coverage"],
+        )
+        for name, item in data.get("results", {}).items()
+    }
+
+
+def compare_to_baseline(
+    results: Iterable[BenchmarkResult],
+    baseline: dict[str, BenchmarkResult],
+    *,
+    time_tolerance: float = 0.25,
+    min_time_delta: float = 0.005,
+    coverage_tolerance: float = 0.01,
+) -> list[Regression]:
+    """Compares benchmark results to a baseline.
+
+    Cases that are not in the baseline are ignored.
+
+    Parameters:
+        results: the results of the current run
+        baseline: the baseline results, keyed by the names of the cases
+        time_tolerance: the relative slowdown that is still accepted
+        min_time_delta: slowdowns smaller than this many seconds are
+            accepted regardless of their relative size, to filter out noise
+            on very fast cases
+        coverage_tolerance: the decrease of the coverage ratio that is still
+            accepted
+
+    Returns:
+        the regressions found
+    """
+    regressions = []
+    for result in results:
+        reference = baseline.get(result.name)
+        if reference is None:
+            continue
+
+        delta = result.time - reference.time
+        if delta > min_time_delta and delta > reference.time * time_tolerance:
+            regressions.append(
+                Regression(result.name, "time", reference.time, result.time)
+            )
+
+        if (
+            reference.coverage is not None
+            and result.coverage is not None
+            and result.coverage < reference.coverage - coverage_tolerance
+        ):
+            regressions.append(
+                Regression(result.name, "coverage", reference.coverage, result.coverage)
+            )
+
+    return regressions
+
+
+######################################################################
+# Command line interface
+
+
+def _format_result(result: BenchmarkResult) -> str:
+    coverage = "-" if result.coverage is None else f"{result.coverage:6.1%}"
+    return (
+        f"{result.time * 1000:10.1f} ms {result.peak_memory / 1024:10.1f} KiB "
+        f"{result.waypoints:8d} wp {coverage:>7}  {result.name}"
+    )
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    import click
+
+    @click.command()
+    @click.option(
+        "-s",
+        "--suite",
+        type=click.Choice(["quick", "full"]),
+        default="quick",
+        help="Benchmark suite to run",
+    )
+    @click.option(
+        "-b",
+        "--baseline",
+        type=click.Path(dir_okay=False),
+        default=None,
+        help="Baseline file to compare the results to",
+    )
+    @click.option(
+        "-u",
+        "--update-baseline",
+        is_flag=True,
+        default=False,
+        help="Store the results in the baseline file instead of comparing",
+    )
+    @click.option(
+        "-r", "--repeat", type=int, default=3, help="Number of timed runs per case"
+    )
+    @click.option(
+        "--time-tolerance",
+        type=float,
+        default=0.25,
+        help="Relative slowdown that is still accepted",
+    )
+    @click.option(
+        "--coverage-tolerance",
+        type=float,
+        default=0.01,
+        help="Decrease of the coverage ratio that is still accepted",
+    )
+    def cli(
+        suite, baseline, update_baseline, repeat, time_tolerance, coverage_tolerance
+    ):
+        results = run_suite(
+            get_suite(suite),
+            repeat=repeat,
+            on_result=lambda result: click.echo(_format_result(result)),
+        )
+
+        if baseline is None:
+            return 0
+
+        if update_baseline or not Path(baseline).exists():
+            save_baseline(results, Path(baseline))
+            click.echo(f"Baseline saved to {baseline}")
+            return 0
+
+        regressions = compare_to_baseline(
+            results,
+            load_baseline(Path(baseline)),
+            time_tolerance=time_tolerance,
+            coverage_tolerance=coverage_tolerance,
+        )
+        for regression in regressions:
+            click.echo(str(regression), err=True)
+        if regressions:
+            click.echo(f"{len(regressions)} regression(s) found", err=True)
+            return 1
+
+        click.echo("No regressions found")
+        return 0
+
+    return cli.main(args=argv, standalone_mode=False)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,598 @@
+"""Rasterized analysis of how well a set of paths covers a search area.
+
+The search area is rasterized into an occupancy grid in a local metric
+frame, and the camera footprint swath of each path is burned into the grid
+as a union of capsules around the segments of the path. The grid then tells
+which fraction of the area is seen at least once, which fraction is seen more
+than once, and where the gaps are.
+
+The same grid can be updated incrementally from the live positions of the
+UAVs during the sortie; see `CoverageTracker`.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from math import ceil, floor, hypot
+from typing import Hashable, Optional, Sequence
+
+import numpy as np
+
+from .geodesy import LocalFrame
+
+__all__ = (
+    "CoverageGrid",
+    "CoverageReport",
+    "CoverageTracker",
+    "analyze_coverage",
+    "square_area",
+)
+
+
+MAX_CELLS = 2_000_000
+"""Maximum number of cells of a coverage grid when its resolution is chosen
+automatically.
+"""
+
+GAP_OUTLINE_CELLS = 64
+"""Maximum number of cells along each side of a gap when tracing its outline."""
+
+
+@dataclass
+class CoverageReport:
+    """Result of a coverage analysis."""
+
+    coverage: float = 0.0
+    """Fraction of the target area that is covered at least once."""
+
+    overlap: float = 0.0
+    """Fraction of the target area that is covered more than once."""
+
+    target_area: float = 0.0
+    """Size of the target area, in square metres."""
+
+    resolution: float = 0.0
+    """Size of the cells of the grid that the analysis used, in metres."""
+
+    gaps: list[np.ndarray] = field(default_factory=list)
+    """Outlines of the largest uncovered regions of the target area, as
+    longitude-latitude pairs, largest first.
+    """
+
+    gap_areas: list[float] = field(default_factory=list)
+    """Areas of the regions in `gaps`, in square metres."""
+
+    def json(self) -> dict:
+        return {
+            "coverage": round(self.coverage, 4),
+            "overlap": round(self.overlap, 4),
+            "targetArea": round(self.target_area, 1),
+            "resolution": round(self.resolution, 2),
+            "gaps": [
+                {"area": round(area, 1), "points": gap.tolist()}
+                for gap, area in zip(self.gaps, self.gap_areas)
+            ],
+        }
+
+
+def square_area(center: Sequence[float], size: float) -> np.ndarray:
+    """Returns the outline of a square search area around the given centre,
+    in the same way as the rectangular search patterns are laid out.
+
+    Parameters:
+        center: the latitude and longitude of the centre
+        size: the length of the sides of the square, in metres
+
+    Returns:
+        the corners of the square as longitude-latitude pairs
+    """
+    frame = LocalFrame(float(center[0]), float(center[1]))
+    h = size / 2
+    lat, lon = frame.to_geo(np.array([-h, h, h, -h]), np.array([-h, -h, h, h]))
+    return np.column_stack((lon, lat))
+
+
+def _rasterize_rings(
+    rings: Sequence[np.ndarray], origin: np.ndarray, resolution: float, shape
+) -> np.ndarray:
+    """Rasterizes the region enclosed by the given rings with the even-odd
+    rule, i.e. holes are rings inside other rings. A cell belongs to the
+    region if its centre does.
+    """
+    ny, nx = shape
+    # Only the parity of the number of crossings matters, so a small integer
+    # type that wraps around is enough
+    toggles = np.zeros((ny, nx + 1), dtype=np.int8)
+    for ring in rings:
+        p = ring
+        q = np.roll(ring, -1, axis=0)
+        for (px, py), (qx, qy) in zip(p, q):
+            if py == qy:
+                continue
+            lo, hi = (py, qy) if py < qy else (qy, py)
+            # Rows whose centre lies in [lo, hi)
+            first = int(np.ceil((lo - origin[1]) / resolution - 0.5))
+            last = int(np.ceil((hi - origin[1]) / resolution - 0.5))
+            first, last = max(first, 0), min(last, ny)
+            if first >= last:
+                continue
+
+            rows = np.arange(first, last)
+            yc = origin[1] + (rows + 0.5) * resolution
+            x = px + (yc - py) * (qx - px) / (qy - py)
+            cols = np.ceil((x - origin[0]) / resolution - 0.5).astype(np.int64)
+            np.add.at(toggles, (rows, np.clip(cols, 0, nx)), 1)
+
+    return (np.cumsum(toggles, axis=1, dtype=np.int8)[:, :nx] & 1).astype(bool)
+
+
+def _capsule_spans(a: np.ndarray, b: np.ndarray, radius: float, ys: np.ndarray):
+    """Returns the extent of capsules along horizontal lines.
+
+    Each capsule has the given radius around the segment from a row of ``a``
+    to the corresponding row of ``b``, and is intersected with the horizontal
+    line at the corresponding element of ``ys``. Capsules are convex, so the
+    intersection is the hull of the intersections with the two end discs and
+    with the rectangle between them.
+
+    Returns:
+        the left and right ends of the intersections; the left end is larger
+        than the right end where a line misses its capsule
+    """
+    xl = np.full(len(ys), np.inf)
+    xr = np.full(len(ys), -np.inf)
+
+    for c in (a, b):
+        h2 = radius * radius - (ys - c[:, 1]) ** 2
+        hit = h2 >= 0
+        h = np.sqrt(np.where(hit, h2, 0.0))
+        xl = np.where(hit, np.minimum(xl, c[:, 0] - h), xl)
+        xr = np.where(hit, np.maximum(xr, c[:, 0] + h), xr)
+
+    d = b - a
+    length = np.hypot(d[:, 0], d[:, 1])
+    scale = np.divide(radius, length, out=np.zeros_like(length), where=length > 0)
+    n = np.column_stack((-d[:, 1], d[:, 0])) * scale[:, None]
+    corners = (a + n, b + n, b - n, a - n)
+    for p, q in zip(corners, corners[1:] + corners[:1]):
+        dy = q[:, 1] - p[:, 1]
+        hit = (ys >= np.minimum(p[:, 1], q[:, 1])) & (
+            ys <= np.maximum(p[:, 1], q[:, 1])
+        )
+        hit &= dy != 0
+        slope = np.divide(q[:, 0] - p[:, 0], dy, out=np.zeros_like(dy), where=hit)
+        x = p[:, 0] + (ys - p[:, 1]) * slope
+        xl = np.where(hit, np.minimum(xl, x), xl)
+        xr = np.where(hit, np.maximum(xr, x), xr)
+
+    return xl, xr
+
+
+class CoverageGrid:
+    """Occupancy grid of a search area in a local metric frame."""
+
+    def __init__(
+        self,
+        areas: Sequence[np.ndarray],
+        holes: Sequence[np.ndarray] = (),
+        *,
+        resolution: Optional[float] = None,
+        margin: float = 0.0,
+        max_cells: int = MAX_CELLS,
+    ):
+        """Constructor.
+
+        Parameters:
+            areas: the outlines of the search areas, as longitude-latitude
+                pairs
+            holes: the outlines of the regions within the areas that do not
+                need to be covered, as longitude-latitude pairs
+            resolution: the size of the cells of the grid, in metres.
+                Defaults to the finest resolution that keeps the number of
+                cells below ``max_cells``, but at least 0.5 metres.
+            margin: extra space to add around the bounding box of the areas,
+                in metres, so that swaths extending beyond the areas are not
+                clipped
+            max_cells: the maximum number of cells when the resolution is
+                chosen automatically
+        """
+        areas = [np.asarray(area, dtype=np.float64).reshape(-1, 2) for area in areas]
+        holes = [np.asarray(hole, dtype=np.float64).reshape(-1, 2) for hole in holes]
+        if not areas or not any(len(area) for area in areas):
+            raise ValueError("at least one non-empty area is required")
+
+        center = np.concatenate(areas).mean(axis=0)
+        self.frame = LocalFrame(center[1], center[0])
+
+        rings = [self._to_local(ring) for ring in (*areas, *holes) if len(ring) >= 3]
+        points = np.concatenate(rings)
+        lo = points.min(axis=0) - margin
+        hi = points.max(axis=0) + margin
+        extent = np.maximum(hi - lo, 1e-6)
+
+        if resolution is None:
+            resolution = max(float(np.sqrt(extent[0] * extent[1] / max_cells)), 0.5)
+        if resolution <= 0:
+            raise ValueError("resolution must be positive")
+
+        self.resolution = float(resolution)
+        self.origin = lo
+        nx, ny = np.maximum(np.ceil(extent / self.resolution).astype(int), 1)
+        self.shape = (int(ny), int(nx))
+
+        self.target = _rasterize_rings(rings, self.origin, self.resolution, self.shape)
+        self.counts = np.zeros(self.shape, dtype=np.uint16)
+        self._num_target_cells = int(self.target.sum())
+        self._num_covered_cells = 0
+
+    @property
+    def cell_area(self) -> float:
+        """Area of a single cell of the grid, in square metres."""
+        return self.resolution * self.resolution
+
+    @property
+    def target_area(self) -> float:
+        """Size of the area that has to be covered, in square metres."""
+        return self._num_target_cells * self.cell_area
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of the target cells that are covered at least once.
+        Maintained incrementally, hence cheap to query.
+        """
+        return (
+            self._num_covered_cells / self._num_target_cells
+            if self._num_target_cells
+            else 0.0
+        )
+
+    def _to_local(self, lonlat: np.ndarray) -> np.ndarray:
+        lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack(self.frame.to_local(lonlat[:, 1], lonlat[:, 0]))
+
+    def _capsule_spans(self, xy: np.ndarray, radius: float):
+        """Returns the horizontal runs of cells whose centres lie within the
+        capsules of the given radius around the segments of a polyline.
+
+        Returns:
+            the row index, the first column index and the column index after
+            the last one of each run
+        """
+        res = self.resolution
+        ny, nx = self.shape
+        ox, oy = self.origin
+        a, b = xy[:-1], xy[1:]
+
+        # Rows spanned by each capsule, expanded into one entry per row
+        lo = np.minimum(a[:, 1], b[:, 1]) - radius
+        hi = np.maximum(a[:, 1], b[:, 1]) + radius
+        r0 = np.clip(np.ceil((lo - oy) / res - 0.5), 0, ny).astype(np.int64)
+        r1 = np.clip(np.floor((hi - oy) / res - 0.5) + 1, 0, ny).astype(np.int64)
+        num_rows = np.maximum(r1 - r0, 0)
+        segments = np.repeat(np.arange(len(a)), num_rows)
+        rows = (
+            np.arange(len(segments))
+            - np.repeat(np.cumsum(num_rows) - num_rows, num_rows)
+            + np.repeat(r0, num_rows)
+        )
+
+        xl, xr = _capsule_spans(
+            a[segments], b[segments], radius, oy + (rows + 0.5) * res
+        )
+        with np.errstate(invalid="ignore"):
+            starts = np.ceil((xl - ox) / res - 0.5)
+            stops = np.floor((xr - ox) / res - 0.5) + 1
+            valid = (starts < stops) & (stops > 0) & (starts < nx)
+        return (
+            rows[valid],
+            np.clip(starts[valid], 0, nx).astype(np.int64),
+            np.clip(stops[valid], 0, nx).astype(np.int64),
+        )
+
+    def _burn_spans(self, rows, starts, stops, *, accumulate: bool) -> int:
+        """Burns the union of the given runs of cells into the grid.
+
+        Returns:
+            the number of target cells that were not covered before
+        """
+        if not len(rows):
+            return 0
+
+        r0, r1 = int(rows.min()), int(rows.max()) + 1
+        c0, c1 = int(starts.min()), int(stops.max())
+        width = c1 - c0 + 1
+
+        # Overlapping runs are merged by counting how many runs cover each
+        # cell from the difference of their start and end markers
+        diff = np.bincount(
+            np.concatenate(
+                ((rows - r0) * width + starts - c0, (rows - r0) * width + stops - c0)
+            ),
+            weights=np.concatenate((np.ones(len(rows)), -np.ones(len(rows)))),
+            minlength=(r1 - r0) * width,
+        ).reshape(r1 - r0, width)
+        mask = np.cumsum(diff, axis=1)[:, :-1] > 0.5
+
+        window = (slice(r0, r1), slice(c0, c1))
+        counts = self.counts[window]
+        newly = mask & (counts == 0)
+        num_newly_covered = int((newly & self.target[window]).sum())
+        self._num_covered_cells += num_newly_covered
+        if accumulate:
+            counts += mask
+        else:
+            counts[newly] = 1
+        return num_newly_covered
+
+    def burn_path(self, path: np.ndarray, swath_width: float) -> None:
+        """Burns the swath of a planned path into the grid. Cells seen by
+        several paths are counted several times; cells seen several times
+        by the same path are counted once.
+
+        Parameters:
+            path: the path, as longitude-latitude pairs
+            swath_width: the width of the camera footprint, in metres
+        """
+        xy = self._to_local(path)
+        if len(xy) == 0:
+            return
+        if len(xy) == 1:
+            xy = np.concatenate((xy, xy))
+
+        rows, starts, stops = self._capsule_spans(xy, swath_width / 2)
+        self._burn_spans(rows, starts, stops, accumulate=True)
+
+    def burn_segment(
+        self, start: Sequence[float], end: Sequence[float], swath_width: float
+    ) -> float:
+        """Marks the swath of a single flown segment as covered, without
+        increasing the overlap counts of cells that are already covered.
+
+        The cost is proportional to the number of cells in the swath, not
+        to the size of the grid.
+
+        Parameters:
+            start: the longitude and latitude of the start of the segment
+            end: the longitude and latitude of the end of the segment
+            swath_width: the width of the camera footprint, in metres
+
+        Returns:
+            the area that was newly covered, in square metres
+        """
+        return self._burn_local_segment(self._to_local([start, end]), swath_width)
+
+    def _burn_local_segment(self, xy: np.ndarray, swath_width: float) -> float:
+        # Single segments are burned often and cover few cells, so the cells
+        # in the bounding box of the capsule are tested directly against
+        # their distance from the segment
+        (ax, ay), (bx, by) = xy.tolist()
+        radius = swath_width / 2
+        res = self.resolution
+        ox, oy = self.origin
+        ny, nx = self.shape
+
+        c0 = max(ceil((min(ax, bx) - radius - ox) / res - 0.5), 0)
+        c1 = min(floor((max(ax, bx) + radius - ox) / res - 0.5) + 1, nx)
+        r0 = max(ceil((min(ay, by) - radius - oy) / res - 0.5), 0)
+        r1 = min(floor((max(ay, by) + radius - oy) / res - 0.5) + 1, ny)
+        if c0 >= c1 or r0 >= r1:
+            return 0.0
+
+        px = ox + (np.arange(c0, c1) + 0.5) * res - ax
+        py = (oy + (np.arange(r0, r1) + 0.5) * res - ay)[:, None]
+        dx, dy = bx - ax, by - ay
+        length_sq = dx * dx + dy * dy
+        if length_sq > 0:
+            t = np.clip((px * dx + py * dy) / length_sq, 0.0, 1.0)
+            px = px - t * dx
+            py = py - t * dy
+        mask = px * px + py * py <= radius * radius
+
+        window = (slice(r0, r1), slice(c0, c1))
+        counts = self.counts[window]
+        newly = mask & (counts == 0)
+        counts[newly] = 1
+        num_newly_covered = int(np.count_nonzero(newly & self.target[window]))
+        self._num_covered_cells += num_newly_covered
+        return num_newly_covered * self.cell_area
+
+    def clear(self) -> None:
+        """Marks all the cells of the grid as uncovered."""
+        self.counts.fill(0)
+        self._num_covered_cells = 0
+
+    def report(
+        self, *, max_gaps: int = 10, min_gap_area: float = 0.0
+    ) -> CoverageReport:
+        """Analyses the current state of the grid.
+
+        Parameters:
+            max_gaps: the maximum number of gap outlines to return
+            min_gap_area: gaps smaller than this many square metres are not
+                reported
+
+        Returns:
+            the coverage report
+        """
+        target_cells = self._num_target_cells
+        overlapping = int((self.target & (self.counts > 1)).sum())
+        report = CoverageReport(
+            coverage=self.coverage,
+            overlap=overlapping / target_cells if target_cells else 0.0,
+            target_area=self.target_area,
+            resolution=self.resolution,
+        )
+
+        if max_gaps > 0 and self._num_covered_cells < target_cells:
+            self._find_gaps(report, max_gaps, min_gap_area)
+
+        return report
+
+    def _find_gaps(self, report: CoverageReport, max_gaps: int, min_area: float):
+        from scipy.ndimage import find_objects, label
+        from shapely import box, union_all
+
+        uncovered = self.target & (self.counts == 0)
+        labels, num_labels = label(uncovered)
+        if not num_labels:
+            return
+
+        sizes = np.bincount(labels.ravel())[1:]
+        order = np.argsort(-sizes, kind="stable")[:max_gaps]
+        slices = find_objects(labels)
+        res = self.resolution
+
+        for index in order:
+            area = float(sizes[index]) * self.cell_area
+            if area < min_area:
+                break
+
+            rows, cols = slices[index]
+            component = labels[rows, cols] == index + 1
+
+            # Outlines are traced on a coarser grid of at most GAP_OUTLINE_CELLS
+            # cells along each side; a cell of the coarse grid belongs to the
+            # gap if any of the cells it contains does
+            k = max(-(-max(component.shape) // GAP_OUTLINE_CELLS), 1)
+            h, w = -(-component.shape[0] // k), -(-component.shape[1] // k)
+            coarse = np.zeros((h * k, w * k), dtype=bool)
+            coarse[: component.shape[0], : component.shape[1]] = component
+            coarse = coarse.reshape(h, k, w, k).any(axis=(1, 3))
+            step = res * k
+
+            # Union of the horizontal runs of cells of the component
+            edges = np.diff(np.pad(coarse, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+            x0 = self.origin[0] + cols.start * res
+            y0 = self.origin[1] + rows.start * res
+            boxes = []
+            for r, row in enumerate(edges):
+                starts = np.flatnonzero(row == 1)
+                ends = np.flatnonzero(row == -1)
+                for s, e in zip(starts, ends):
+                    boxes.append(
+                        box(
+                            x0 + s * step,
+                            y0 + r * step,
+                            x0 + e * step,
+                            y0 + (r + 1) * step,
+                        )
+                    )
+
+            shape = union_all(boxes).simplify(step / 2)
+            if shape.geom_type == "MultiPolygon":
+                shape = max(shape.geoms, key=lambda geom: geom.area)
+            x, y = np.asarray(shape.exterior.coords).T
+            lat, lon = self.frame.to_geo(x, y)
+
+            report.gaps.append(np.column_stack((lon, lat)))
+            report.gap_areas.append(area)
+
+
+def analyze_coverage(
+    paths: Sequence[np.ndarray],
+    areas: Sequence[np.ndarray],
+    swath_width: float,
+    *,
+    holes: Sequence[np.ndarray] = (),
+    resolution: Optional[float] = None,
+    max_gaps: int = 10,
+    min_gap_area: Optional[float] = None,
+) -> CoverageReport:
+    """Analyses how well the swaths of the given paths cover the given areas.
+
+    Parameters:
+        paths: the paths, as longitude-latitude pairs
+        areas: the outlines of the search areas, as longitude-latitude pairs
+        swath_width: the width of the camera footprint, in metres
+        holes: the outlines of the regions within the areas that do not need
+            to be covered
+        resolution: the size of the cells of the grid, in metres; chosen
+            automatically if omitted
+        max_gaps: the maximum number of gap outlines to return
+        min_gap_area: gaps smaller than this many square metres are not
+            reported; defaults to the area of a square with the swath width
+            as its side
+
+    Returns:
+        the coverage report
+    """
+    grid = CoverageGrid(areas, holes, resolution=resolution)
+    for path in paths:
+        grid.burn_path(path, swath_width)
+
+    if min_gap_area is None:
+        min_gap_area = swath_width * swath_width
+    return grid.report(max_gaps=max_gaps, min_gap_area=min_gap_area)
+
+
+class CoverageTracker:
+    """Tracks the area actually covered by the UAVs during a sortie by
+    burning the swaths between their consecutive reported positions into a
+    coverage grid.
+    """
+
+    def __init__(
+        self, grid: CoverageGrid, swath_width: float, *, max_step: float = 200.0
+    ):
+        """Constructor.
+
+        Parameters:
+            grid: the grid to burn the swaths into
+            swath_width: the default width of the camera footprint, in metres
+            max_step: the maximum distance between consecutive positions of
+                a UAV, in metres, that is still considered continuous flight;
+                longer jumps (e.g., after a telemetry outage) only mark the
+                new position
+        """
+        self.grid = grid
+        self.swath_width = float(swath_width)
+        self.max_step = float(max_step)
+        self._positions: dict[Hashable, tuple[float, float]] = {}
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of the target area covered so far."""
+        return self.grid.coverage
+
+    def update(
+        self,
+        key: Hashable,
+        position: Sequence[float],
+        swath_width: Optional[float] = None,
+    ) -> float:
+        """Reports a new position of a UAV.
+
+        Parameters:
+            key: an identifier of the UAV
+            position: the longitude and latitude of the UAV
+            swath_width: the width of the camera footprint at the current
+                position of the UAV, in metres; defaults to the width given
+                at construction time
+
+        Returns:
+            the area that was newly covered, in square metres
+        """
+        if swath_width is None:
+            swath_width = self.swath_width
+
+        x, y = self.grid.frame.to_local(position[1], position[0])
+        current = float(x), float(y)
+        previous = self._positions.get(key)
+        self._positions[key] = current
+
+        if previous is None or hypot(x - previous[0], y - previous[1]) > self.max_step:
+            previous = current
+
+        return self.grid._burn_local_segment(np.array((previous, current)), swath_width)
+
+    def forget(self, key: Hashable) -> None:
+        """Forgets the last position of a UAV, e.g. when it lands; its next
+        position will not be connected to the previous one.
+        """
+        self._positions.pop(key, None)
+
+    def report(self, **kwds) -> CoverageReport:
+        """Returns a report of the area covered so far; see
+        `CoverageGrid.report()`.
+        """
+        return self.grid.report(**kwds)
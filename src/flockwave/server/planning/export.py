@@ -0,0 +1,126 @@
+"""Lazy exporters that turn the paths of a stored plan into KML or CSV
+documents.
+
+The exporters generate the documents directly as strings instead of building
+a `simplekml` object tree with a separately styled placemark per waypoint,
+which is prohibitively slow for paths with thousands of waypoints.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+
+from io import StringIO
+from pathlib import Path
+from typing import Union
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from .store import Plan
+
+__all__ = ("path_to_csv", "path_to_kml", "save_plan_files")
+
+
+_KML_HEADER = """\
+<?xml version="1.0" encoding="UTF-8"?>
+<kml xmlns="http://www.opengis.net/kml/2.2">
+<Document>
+<name>{name}</name>
+<Style id="path"><LineStyle><color>ff0000ff</color><width>3</width></LineStyle></Style>
+<Style id="waypoint"><IconStyle><color>ff00ffff</color><scale>1.0</scale></IconStyle><LabelStyle><color>ffff0000</color></LabelStyle></Style>
+"""
+
+_KML_FOOTER = "</Document>\n</kml>\n"
+
+
+def _format_coords(path: np.ndarray) -> list[str]:
+    return [f"{lon:.8f},{lat:.8f}" for lon, lat in path.tolist()]
+
+
+def path_to_kml(path: np.ndarray, name: str = "Drone path") -> str:
+    """Converts a single path of a plan into a KML document.
+
+    The document contains the path itself as a line string, clamped to the
+    ground, and a numbered placemark for each waypoint. All the placemarks
+    share a single style.
+
+    Parameters:
+        path: NumPy array of shape ``(N, 2)`` containing longitude-latitude
+            pairs
+        name: the name of the path in the KML document
+
+    Returns:
+        the KML document as a string
+    """
+    coords = _format_coords(path)
+    parts = [_KML_HEADER.format(name=escape(name))]
+
+    if coords:
+        parts.append(
+            f"<Placemark><name>{escape(name)}</name><styleUrl>#path</styleUrl>"
+            "<LineString><altitudeMode>clampToGround</altitudeMode><coordinates>"
+        )
+        parts.append(" ".join(coords))
+        parts.append("</coordinates></LineString></Placemark>\n")
+        parts.extend(
+            f"<Placemark><name>{index}</name><styleUrl>#waypoint</styleUrl>"
+            f"<Point><coordinates>{coord}</coordinates></Point></Placemark>\n"
+            for index, coord in enumerate(coords, start=1)
+        )
+
+    parts.append(_KML_FOOTER)
+    return "".join(parts)
+
+
+def path_to_csv(path: np.ndarray) -> str:
+    """Converts a single path of a plan into a CSV document with a header row
+    and one latitude-longitude pair per row.
+
+    Parameters:
+        path: NumPy array of shape ``(N, 2)`` containing longitude-latitude
+            pairs
+
+    Returns:
+        the CSV document as a string
+    """
+    fp = StringIO()
+    writer = csv.writer(fp, lineterminator="\n")
+    writer.writerow(("lat", "lon"))
+    writer.writerows((lat, lon) for lon, lat in path.tolist())
+    return fp.getvalue()
+
+
+def save_plan_files(plan: Plan, directory: Union[str, Path]) -> list[Path]:
+    """Saves the KML and CSV exports of all the paths of a plan into the given
+    directory.
+
+    This function performs blocking file I/O; call it from a worker thread
+    when running in the event loop.
+
+    Parameters:
+        plan: the plan to export
+        directory: the directory to save the files into; a subdirectory named
+            after the plan will be created in it
+
+    Returns:
+        the list of files that were written
+    """
+    target = Path(directory) / f"plan-{plan.id}-{plan.kind}"
+    os.makedirs(target, exist_ok=True)
+
+    result: list[Path] = []
+    for index, path in enumerate(plan.paths, start=1):
+        if not len(path):
+            continue
+
+        kml_path = target / f"search-drone-{index}.kml"
+        kml_path.write_text(path_to_kml(path, name=f"Drone path {index}"))
+        result.append(kml_path)
+
+        csv_path = target / f"grid_{index}.csv"
+        csv_path.write_text(path_to_csv(path))
+        result.append(csv_path)
+
+    return result
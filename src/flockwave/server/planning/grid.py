@@ -0,0 +1,106 @@
+"""Array-based generator for rectangular lawnmower (boustrophedon) search
+patterns around a given centre point.
+
+The rows of the pattern are computed in a local metric frame where the
+vertical axis is the meridian arc through the centre and the horizontal axis
+runs along the east-pointing geodesic of each row. The whole pattern is then
+converted back to geodetic coordinates in one go.
+"""
+
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+from .geodesy import (
+    destination_east,
+    latitude_from_meridian_arc,
+    meridian_arc,
+    offset_by_bearing,
+)
+
+__all__ = ("rectangular_lawnmower",)
+
+
+def rectangular_lawnmower(
+    center: tuple[float, float],
+    width: float,
+    height: float,
+    spacing: float,
+    num_strips: int = 1,
+    *,
+    strip_height: Optional[float] = None,
+    turn_extension: float = 0.0,
+) -> list[np.ndarray]:
+    """Generates a rectangular lawnmower pattern around the given centre,
+    split into horizontal strips of equal height, one strip per drone.
+
+    Each strip is swept with east-west rows starting from its southern edge;
+    the first row runs from west to east, the next one from east to west and
+    so on. Rows are placed ``spacing`` metres apart along the meridian, and
+    the last row is the northernmost one that still fits into the strip.
+
+    Parameters:
+        center: the latitude and longitude of the centre of the rectangle
+        width: the width of the rectangle, in metres
+        height: the height of the rectangle, in metres
+        spacing: the distance between consecutive rows, in metres
+        num_strips: the number of strips to split the rectangle into
+        strip_height: the height of a single strip, in metres. Strips are
+            laid out from the southern edge of the rectangle at this pitch.
+            Defaults to dividing the height equally among the strips.
+        turn_extension: when positive, an extra waypoint is added after each
+            row at this distance from the end of the row, towards south-east
+            after west-to-east rows and towards south-west after east-to-west
+            rows, to give fixed-wing aircraft room to turn
+
+    Returns:
+        one NumPy array of longitude-latitude pairs for each strip
+    """
+    if spacing <= 0:
+        raise ValueError("spacing must be positive")
+    if num_strips < 1:
+        raise ValueError("num_strips must be at least 1")
+
+    center_lat, center_lon = float(center[0]), float(center[1])
+    if strip_height is None:
+        strip_height = height / num_strips
+
+    _, west_lon = destination_east(center_lat, center_lon, -width / 2)
+
+    # Rows of a strip, measured along the meridian from the southern edge of
+    # the strip. The tiny tolerance keeps the last row if floating-point
+    # noise would push it just above the northern edge.
+    num_rows = int(np.floor(strip_height / spacing + 1e-9)) + 1
+    row_offsets = np.arange(num_rows, dtype=np.float64) * spacing
+
+    center_arc = meridian_arc(center_lat)
+    bottoms = center_arc - height / 2 + np.arange(num_strips) * strip_height
+    arcs = bottoms[:, None] + row_offsets[None, :]
+
+    row_lats = latitude_from_meridian_arc(arcs, initial_lat=center_lat)
+    east_lats, east_lons = destination_east(row_lats, west_lon, width)
+    west_lons = np.full_like(row_lats, west_lon)
+
+    # Odd rows (1st, 3rd, ...) go from west to east, even rows the other way
+    forward = (np.arange(num_rows) % 2 == 0)[None, :]
+    first_lat = np.where(forward, row_lats, east_lats)
+    first_lon = np.where(forward, west_lons, east_lons)
+    second_lat = np.where(forward, east_lats, row_lats)
+    second_lon = np.where(forward, east_lons, west_lons)
+
+    columns = [(first_lon, first_lat), (second_lon, second_lat)]
+    if turn_extension > 0:
+        bearing = np.where(forward, 135.0, 225.0)
+        ext_lat, ext_lon = offset_by_bearing(
+            second_lat, second_lon, turn_extension, bearing
+        )
+        columns.append((ext_lon, ext_lat))
+
+    # Interleave the points of the rows into shape (strips, rows * k, 2)
+    points = np.stack(
+        [np.stack(column, axis=-1) for column in columns], axis=2
+    ).reshape(num_strips, -1, 2)
+
+    return list(points)
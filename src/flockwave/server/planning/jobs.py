@@ -0,0 +1,201 @@
+"""Planning jobs that can be executed either in the current process or in the
+worker processes of a `PlannerPool`.
+
+Each job is a plain function that takes compact arguments (tuples, NumPy
+arrays and numbers) and returns either a list of paths or a small picklable
+object. Jobs are referred to by name so they can be submitted to worker
+processes without pickling the functions themselves.
+"""
+
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional, Sequence, TYPE_CHECKING
+
+import numpy as np
+
+from .grid import rectangular_lawnmower
+
+if TYPE_CHECKING:
+    from .pool import PlannerPool
+
+__all__ = (
+    "PRELOADED_MODULES",
+    "execute_job",
+    "get_planner_pool",
+    "run_job",
+    "use_planner_pool",
+)
+
+
+PRELOADED_MODULES = (
+    "numpy",
+    "scipy.interpolate",
+    "scipy.optimize",
+    "shapely",
+    "shapely.geometry",
+    "flockwave.server.latlon2xy",
+    "flockwave.server.search",
+    "flockwave.server.multipoly_grid",
+    "flockwave.server.AutoMission",
+    "flockwave.server.YamlCreation",
+)
+"""Modules that the worker processes import before accepting any job."""
+
+
+def _search_grid(
+    center: Sequence[float], coverage: float, spacing: float, num_drones: int
+) -> list[np.ndarray]:
+    return rectangular_lawnmower(center, coverage, coverage, spacing, num_drones)
+
+
+def _polygon_search(
+    polygon: np.ndarray, origin: Sequence[float], spacing: float, num_drones: int
+) -> list[np.ndarray]:
+    from flockwave.server.search import PolygonSearchGrid
+
+    planner = PolygonSearchGrid(
+        polygon_latlon=np.asarray(polygon).tolist(),
+        origin_gps=tuple(origin),
+        endDistance=500000,
+        num_drones=num_drones,
+        grid_spacing=spacing,
+        rotation_angle=90,
+        obstacles_latlon=[],
+    )
+    planner.generate_paths()
+    return planner.to_geo_paths()
+
+
+def _polygon_split(
+    polygons: Sequence[np.ndarray],
+    origin: Sequence[float],
+    spacing: float,
+    num_drones: int,
+) -> list[np.ndarray]:
+    from flockwave.server.multipoly_grid import PolygonAutoSplit
+
+    planner = PolygonAutoSplit(
+        polygon_latlon_list=[np.asarray(polygon).tolist() for polygon in polygons],
+        origin_gps=tuple(origin),
+        endDistance=500000,
+        num_drones=num_drones,
+        grid_spacing=spacing,
+        rotation_angle=90,
+        obstacles_latlon_list=[],
+    )
+    planner.generate_paths()
+    return planner.to_geo_paths()
+
+
+def _group_split(
+    centers: np.ndarray, num_drones: int, spacing: float, coverage: float
+) -> list[np.ndarray]:
+    from flockwave.server.AutoMission import AutoSplitMission
+
+    centers = np.asarray(centers).tolist()
+    split = AutoSplitMission(
+        origin=None,
+        center_lat_lons=centers,
+        num_of_drones=num_drones,
+        grid_spacing=spacing,
+        coverage_area=coverage,
+    )
+    return split.GroupSplitting(
+        center_lat_lons=centers,
+        num_of_drones=num_drones,
+        grid_spacing=spacing,
+        coverage_area=coverage,
+    )
+
+
+def _specific_split(
+    centers: np.ndarray, group_sizes: Sequence[int], spacing: float, coverage: float
+) -> list[np.ndarray]:
+    # One strip per UAV of each group, in the order of the groups
+    paths = []
+    for (lat, lon), size in zip(np.asarray(centers), group_sizes):
+        if size > 0:
+            paths.extend(
+                rectangular_lawnmower((lat, lon), coverage, coverage, spacing, size)
+            )
+    return paths
+
+
+def _navigate(
+    center: Sequence[float], spacing: float, coverage: float
+) -> list[np.ndarray]:
+    return rectangular_lawnmower(center, coverage, coverage, spacing, 1)
+
+
+def _fence_to_yaml(
+    fences: Sequence[np.ndarray], labels: Sequence[Optional[str]]
+) -> tuple[Any, str]:
+    from flockwave.server.YamlCreation import FenceToYAML
+
+    fence_yaml = FenceToYAML(
+        fence_coordinates=[np.asarray(fence).tolist() for fence in fences],
+        labels=list(labels),
+    )
+    fence_yaml.process_fences()
+    return fence_yaml.generate_yaml()
+
+
+_JOBS: dict[str, Callable[..., Any]] = {
+    "search_grid": _search_grid,
+    "polygon_search": _polygon_search,
+    "polygon_split": _polygon_split,
+    "group_split": _group_split,
+    "specific_split": _specific_split,
+    "navigate": _navigate,
+    "fence_to_yaml": _fence_to_yaml,
+}
+
+
+def execute_job(name: str, *args: Any) -> Any:
+    """Executes the planning job with the given name in the current process.
+
+    Raises:
+        KeyError: if there is no job with the given name
+    """
+    return _JOBS[name](*args)
+
+
+_pool: Optional[PlannerPool] = None
+"""The planner pool that jobs are submitted to; ``None`` if jobs should be
+executed in the current process.
+"""
+
+
+def get_planner_pool() -> Optional[PlannerPool]:
+    """Returns the planner pool that jobs are currently submitted to, or
+    ``None`` if jobs are executed in the current process.
+    """
+    return _pool
+
+
+@contextmanager
+def use_planner_pool(pool: PlannerPool) -> Iterator[PlannerPool]:
+    """Context manager that submits all jobs started with `run_job()` to the
+    given planner pool while the context is active.
+    """
+    global _pool
+
+    old_pool, _pool = _pool, pool
+    try:
+        yield pool
+    finally:
+        _pool = old_pool
+
+
+def run_job(name: str, *args: Any) -> Any:
+    """Runs the planning job with the given name, blocking until it is done.
+
+    The job is executed in the planner pool if one is active and in the
+    current process otherwise. Must not be called from the event loop
+    directly; use a worker thread instead.
+    """
+    pool = _pool
+    if pool is not None and pool.is_running:
+        return pool.run_sync(name, *args)
+    return execute_job(name, *args)
@@ -0,0 +1,286 @@
+"""Persistent pool of worker processes that execute planning jobs.
+
+The workers are started when the server boots and import the geometry stack
+(NumPy, shapely, SciPy and the planners) before they accept any jobs, so
+planning requests do not pay the import cost. Paths computed by the workers
+are returned through shared memory blocks instead of pickled Python lists.
+"""
+
+from __future__ import annotations
+
+import multiprocessing
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from importlib import import_module
+from multiprocessing import shared_memory
+from threading import Lock
+from time import monotonic, perf_counter
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from .jobs import PRELOADED_MODULES, execute_job
+
+__all__ = ("PlannerPool", "PlannerPoolMetrics")
+
+
+@dataclass(frozen=True)
+class _SharedPaths:
+    """Handle of a list of paths that a worker placed in a shared memory
+    block. The block contains the paths concatenated into one array of
+    shape ``(N, 2)``.
+    """
+
+    name: str
+    lengths: tuple[int, ...]
+
+
+@dataclass(frozen=True)
+class PlannerPoolMetrics:
+    """Snapshot of the load of a planner pool."""
+
+    workers: int
+    """Number of worker processes."""
+
+    busy: int
+    """Number of workers currently executing a job."""
+
+    queue_length: int
+    """Number of jobs waiting for a free worker."""
+
+    completed: int
+    """Number of jobs completed since the pool was started."""
+
+    failed: int
+    """Number of jobs that raised an exception since the pool was started."""
+
+    utilization: float
+    """Fraction of the total worker time spent on executing jobs since the
+    pool was started, between 0 and 1.
+    """
+
+    mean_job_time: float
+    """Mean execution time of a job in the workers, in seconds."""
+
+    def json(self) -> dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "queueLength": self.queue_length,
+            "completed": self.completed,
+            "failed": self.failed,
+            "utilization": round(self.utilization, 4),
+            "meanJobTime": round(self.mean_job_time, 4),
+        }
+
+
+def _warm_up(modules: Sequence[str]) -> None:
+    """Initializer of the worker processes; imports the given modules."""
+    for module in modules:
+        try:
+            import_module(module)
+        except ImportError:
+            pass
+
+
+def _ping() -> None:
+    pass
+
+
+def _to_shared_paths(paths: Sequence[np.ndarray]) -> _SharedPaths:
+    arrays = [np.asarray(path, dtype=np.float64).reshape(-1, 2) for path in paths]
+    lengths = tuple(len(array) for array in arrays)
+    size = max(sum(lengths) * 2 * 8, 1)
+
+    shm = shared_memory.SharedMemory(create=True, size=size)
+    try:
+        data = np.ndarray((sum(lengths), 2), dtype=np.float64, buffer=shm.buf)
+        if arrays:
+            np.concatenate(arrays, out=data)
+        del data
+
+        # The block is unlinked by the parent process once it has copied the
+        # paths out; the worker must not remove it when it exits
+        _untrack_shared_memory(shm)
+        return _SharedPaths(name=shm.name, lengths=lengths)
+    finally:
+        shm.close()
+
+
+def _from_shared_paths(handle: _SharedPaths) -> list[np.ndarray]:
+    shm = shared_memory.SharedMemory(name=handle.name)
+    try:
+        data = np.ndarray(
+            (sum(handle.lengths), 2), dtype=np.float64, buffer=shm.buf
+        ).copy()
+    finally:
+        shm.close()
+        shm.unlink()
+
+    bounds = np.cumsum((0,) + handle.lengths)
+    return [data[start:end] for start, end in zip(bounds[:-1], bounds[1:])]
+
+
+def _untrack_shared_memory(shm: shared_memory.SharedMemory) -> None:
+    try:
+        from multiprocessing import resource_tracker
+
+        resource_tracker.unregister(shm._name, "shared_memory")  # type: ignore
+    except Exception:
+        pass
+
+
+def _run_in_worker(name: str, args: tuple[Any, ...]) -> tuple[Any, float]:
+    """Entry point of a job in a worker process.
+
+    Returns:
+        the result of the job and the time it took to execute it. Lists of
+        paths are returned as handles to shared memory blocks.
+    """
+    started_at = perf_counter()
+    result = execute_job(name, *args)
+    if isinstance(result, list) and all(
+        isinstance(item, np.ndarray) for item in result
+    ):
+        result = _to_shared_paths(result)
+    return result, perf_counter() - started_at
+
+
+class PlannerPool:
+    """Persistent pool of worker processes that execute planning jobs."""
+
+    def __init__(
+        self,
+        workers: int = 2,
+        *,
+        start_method: str = "forkserver",
+        preload: Sequence[str] = PRELOADED_MODULES,
+    ):
+        """Constructor.
+
+        Parameters:
+            workers: the number of worker processes
+            start_method: the multiprocessing start method of the workers.
+                Falls back to ``spawn`` if the requested method is not
+                available on the current platform.
+            preload: names of modules to import in the workers before they
+                accept any jobs
+        """
+        self._workers = max(1, int(workers))
+        self._start_method = start_method
+        self._preload = tuple(preload)
+
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = Lock()
+        self._started_at = 0.0
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._busy_time = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        """Whether the worker processes of the pool are running."""
+        return self._executor is not None
+
+    @property
+    def start_method(self) -> str:
+        """The multiprocessing start method used by the pool."""
+        if self._start_method in multiprocessing.get_all_start_methods():
+            return self._start_method
+        return "spawn"
+
+    def start(self) -> None:
+        """Starts the worker processes and waits until all of them have
+        imported the geometry stack. Blocks; call it from a worker thread.
+        """
+        if self._executor is not None:
+            return
+
+        context = multiprocessing.get_context(self.start_method)
+        if self.start_method == "forkserver":
+            context.set_forkserver_preload(list(self._preload))
+
+        executor = ProcessPoolExecutor(
+            max_workers=self._workers,
+            mp_context=context,
+            initializer=_warm_up,
+            initargs=(self._preload,),
+        )
+
+        # Make sure that all the workers are up and running
+        for future in [executor.submit(_ping) for _ in range(self._workers)]:
+            future.result()
+
+        self._executor = executor
+        self._started_at = monotonic()
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stops the worker processes of the pool."""
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+    def submit(self, name: str, *args: Any) -> Future:
+        """Submits a planning job to the pool.
+
+        Returns:
+            a future that resolves to the result of the job; lists of paths
+            are resolved to lists of NumPy arrays
+
+        Raises:
+            RuntimeError: if the pool is not running
+        """
+        executor = self._executor
+        if executor is None:
+            raise RuntimeError("Planner pool is not running")
+
+        result: Future = Future()
+        with self._lock:
+            self._in_flight += 1
+
+        inner = executor.submit(_run_in_worker, name, args)
+        inner.add_done_callback(lambda future: self._on_job_done(future, result))
+        return result
+
+    def run_sync(self, name: str, *args: Any, timeout: Optional[float] = None) -> Any:
+        """Submits a planning job to the pool and blocks until it is done."""
+        return self.submit(name, *args).result(timeout=timeout)
+
+    def get_metrics(self) -> PlannerPoolMetrics:
+        """Returns a snapshot of the load of the pool."""
+        with self._lock:
+            in_flight = self._in_flight
+            finished = self._completed + self._failed
+            uptime = monotonic() - self._started_at if self.is_running else 0.0
+            return PlannerPoolMetrics(
+                workers=self._workers,
+                busy=min(in_flight, self._workers),
+                queue_length=max(in_flight - self._workers, 0),
+                completed=self._completed,
+                failed=self._failed,
+                utilization=(
+                    min(self._busy_time / (uptime * self._workers), 1.0)
+                    if uptime > 0
+                    else 0.0
+                ),
+                mean_job_time=self._busy_time / finished if finished else 0.0,
+            )
+
+    def _on_job_done(self, inner: Future, outer: Future) -> None:
+        try:
+            value, elapsed = inner.result()
+            if isinstance(value, _SharedPaths):
+                value = _from_shared_paths(value)
+        except BaseException as ex:
+            with self._lock:
+                self._in_flight -= 1
+                self._failed += 1
+            outer.set_exception(ex)
+        else:
+            with self._lock:
+                self._in_flight -= 1
+                self._completed += 1
+                self._busy_time += elapsed
+            outer.set_result(value)
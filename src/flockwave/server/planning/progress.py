@@ -0,0 +1,209 @@
+"""Live tracking of the progress of the search mission that is being flown.
+
+The positions reported by the UAVs are burned into the coverage grid of the
+search area of the latest plan, using the camera footprint at the altitude
+the UAV is actually flying at. The cost of an update is proportional to the
+number of grid cells in the footprint, so the tracker keeps up with large
+swarms reporting their positions frequently.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from time import monotonic
+from typing import Optional
+
+import numpy as np
+
+from .coverage import CoverageGrid, CoverageTracker
+from .replan import estimate_progress
+from .store import Plan
+from .timing import FlightModel, estimate_path_time
+
+__all__ = ("SearchProgress", "UAVSearchProgress", "search_progress")
+
+
+@dataclass
+class UAVSearchProgress:
+    """Progress of a single UAV of the tracked plan."""
+
+    covered_area: float = 0.0
+    """Area that the UAV was the first to cover, in square metres."""
+
+    position: Optional[tuple[float, float]] = None
+    """Last known longitude and latitude of the UAV."""
+
+    updated_at: Optional[float] = None
+    """Monotonic timestamp of the last position update of the UAV."""
+
+
+class SearchProgress:
+    """Tracks how much of the search area of a plan has been covered by the
+    UAVs so far, and how long it will take to complete the rest.
+    """
+
+    plan: Optional[Plan]
+    """The plan being tracked; ``None`` if no plan is being tracked."""
+
+    def __init__(self, *, min_altitude: float = 2.0, max_step: float = 200.0):
+        """Constructor.
+
+        Parameters:
+            min_altitude: the altitude above the home position, in metres,
+                below which a UAV is considered to be on the ground and its
+                positions are not counted as searched
+            max_step: the maximum distance between consecutive positions of
+                a UAV, in metres, that is still considered continuous flight
+        """
+        self.min_altitude = float(min_altitude)
+        self.max_step = float(max_step)
+        self.model = FlightModel()
+
+        self.plan = None
+        self._tracker: Optional[CoverageTracker] = None
+        self._paths: dict[str, np.ndarray] = {}
+        self._uavs: dict[str, UAVSearchProgress] = {}
+        self._version = 0
+
+    @property
+    def active(self) -> bool:
+        """Returns whether a plan is being tracked."""
+        return self._tracker is not None
+
+    @property
+    def coverage(self) -> float:
+        """Fraction of the search area covered so far."""
+        return self._tracker.coverage if self._tracker else 0.0
+
+    @property
+    def version(self) -> int:
+        """Counter that is increased every time the progress changes; can be
+        used to tell whether the progress has to be sent to clients again.
+        """
+        return self._version
+
+    def start(self, plan: Plan) -> bool:
+        """Starts tracking the given plan.
+
+        Plans that cover the same areas with the same UAVs and camera
+        footprint as the tracked plan (e.g., when the remaining part of the
+        path of a UAV was handed over to other UAVs) keep the coverage reached
+        so far; other plans start from scratch.
+
+        Returns:
+            whether the plan is being tracked; plans without a search area or
+            camera footprint cannot be tracked
+        """
+        if not plan.areas or not plan.swath_width or not plan.paths:
+            return False
+
+        if not self._is_continuation_of_tracked_plan(plan):
+            grid = CoverageGrid(plan.areas, margin=plan.swath_width)
+            self._tracker = CoverageTracker(
+                grid, plan.swath_width, max_step=self.max_step
+            )
+            self._uavs = {}
+
+        self.plan = plan
+        self._paths = dict(zip(plan.uav_ids, plan.paths))
+        self._version += 1
+        return True
+
+    def stop(self) -> None:
+        """Stops tracking the current plan."""
+        self.plan = None
+        self._tracker = None
+        self._paths = {}
+        self._uavs = {}
+        self._version += 1
+
+    def update(self, uav_id: str, lon: float, lat: float, altitude: float) -> None:
+        """Reports a new position of a UAV. UAVs not taking part in the
+        tracked plan are ignored.
+
+        Parameters:
+            uav_id: the ID of the UAV
+            lon: the longitude of the UAV
+            lat: the latitude of the UAV
+            altitude: the altitude of the UAV above its home position, in
+                metres
+        """
+        if self._tracker is None or uav_id not in self._paths:
+            return
+
+        progress = self._uavs.get(uav_id)
+        if progress is None:
+            progress = self._uavs[uav_id] = UAVSearchProgress()
+        progress.position = lon, lat
+        progress.updated_at = monotonic()
+
+        if altitude < self.min_altitude:
+            self._tracker.forget(uav_id)
+            return
+
+        progress.covered_area += self._tracker.update(
+            uav_id, progress.position, self._get_swath_width_at(altitude)
+        )
+        self._version += 1
+
+    def json(self) -> dict:
+        """Returns a JSON representation of the progress, including the
+        estimated time needed by each UAV to finish its path.
+        """
+        if self._tracker is None or self.plan is None:
+            return {"active": False}
+
+        target_area = self._tracker.grid.target_area
+        coverage = self._tracker.coverage
+
+        uavs = {}
+        for uav_id, path in self._paths.items():
+            progress = self._uavs.get(uav_id) or UAVSearchProgress()
+            uavs[uav_id] = {
+                "coveredArea": round(progress.covered_area, 1),
+                "eta": self._estimate_remaining_time(path, progress.position),
+            }
+        etas = [uav["eta"] for uav in uavs.values() if uav["eta"] is not None]
+
+        return {
+            "active": True,
+            "plan": self.plan.id,
+            "coverage": round(coverage, 4),
+            "targetArea": round(target_area, 1),
+            "remainingArea": round(target_area * (1 - coverage), 1),
+            "eta": max(etas) if etas else None,
+            "uavs": uavs,
+        }
+
+    def _estimate_remaining_time(
+        self, path: np.ndarray, position: Optional[tuple[float, float]]
+    ) -> Optional[float]:
+        if position is None:
+            return None
+        remaining = path[estimate_progress(path, position) :]
+        time, _ = estimate_path_time(remaining, self.model, home=position)
+        return round(time, 1)
+
+    def _get_swath_width_at(self, altitude: float) -> float:
+        # The camera footprint scales linearly with the altitude
+        plan = self.plan
+        if plan is None or not plan.altitude:
+            return self._tracker.swath_width if self._tracker else 0.0
+        return plan.swath_width * altitude / plan.altitude
+
+    def _is_continuation_of_tracked_plan(self, plan: Plan) -> bool:
+        current = self.plan
+        return (
+            self._tracker is not None
+            and current is not None
+            and current.uav_ids == plan.uav_ids
+            and current.swath_width == plan.swath_width
+            and len(current.areas) == len(plan.areas)
+            and all(
+                np.array_equal(old, new) for old, new in zip(current.areas, plan.areas)
+            )
+        )
+
+
+search_progress = SearchProgress()
+"""Global search progress tracker used by the server."""
@@ -0,0 +1,290 @@
+"""Incremental replanning of a running search when one of the UAVs drops out.
+
+The unflown remainder of the path of the dropped UAV is split into
+contiguous pieces and each piece is appended to the end of the path of one
+of the nearest remaining UAVs. Pieces are sized such that the estimated
+completion times of the receiving UAVs are as close to each other as
+possible. The parts of the paths that the remaining UAVs are already flying
+are never modified; only the new waypoint suffixes are produced.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .geodesy import LocalFrame
+from .timing import FlightModel, estimate_path_time
+
+__all__ = ("Reassignment", "estimate_progress", "reassign_remainder")
+
+
+@dataclass
+class Reassignment:
+    """Result of redistributing the remainder of the path of a dropped UAV
+    among the remaining UAVs.
+    """
+
+    dropped_index: int
+    """Index of the path of the UAV that dropped out."""
+
+    dropped_progress: int
+    """Index of the first waypoint of the dropped path that was not flown."""
+
+    suffixes: dict[int, np.ndarray] = field(default_factory=dict)
+    """Waypoints to append to the paths of the receiving UAVs, keyed by the
+    index of the path. Each value is a NumPy array of longitude-latitude
+    pairs.
+    """
+
+    completion_times: dict[int, float] = field(default_factory=dict)
+    """Estimated time until the receiving UAVs finish their extended paths,
+    in seconds, keyed by the index of the path.
+    """
+
+    remainder_length: float = 0.0
+    """Length of the unflown remainder of the dropped path, in metres."""
+
+    @property
+    def is_empty(self) -> bool:
+        """Whether there was nothing to redistribute."""
+        return not self.suffixes
+
+    def apply(self, paths: Sequence[np.ndarray]) -> list[np.ndarray]:
+        """Returns the updated list of paths after applying the reassignment.
+
+        The path of the dropped UAV is truncated to the part that it has
+        already flown and the suffixes are appended to the receiving paths;
+        all the other paths are returned unchanged.
+        """
+        result = [np.asarray(path, dtype=np.float64) for path in paths]
+        result[self.dropped_index] = result[self.dropped_index][: self.dropped_progress]
+        for index, suffix in self.suffixes.items():
+            result[index] = np.concatenate((result[index], suffix))
+        return result
+
+
+def _polyline_length(xy: np.ndarray) -> float:
+    if len(xy) < 2:
+        return 0.0
+    return float(np.hypot(*np.diff(xy, axis=0).T).sum())
+
+
+def _project_onto_polyline(
+    xy: np.ndarray, point: np.ndarray
+) -> tuple[int, float, float]:
+    """Projects a point onto a polyline in a metric frame.
+
+    Returns:
+        the index of the segment that is closest to the point, the distance
+        of the point from that segment and the relative position of the
+        projected point along the segment
+    """
+    if len(xy) == 1:
+        return 0, float(np.hypot(*(point - xy[0]))), 0.0
+
+    starts, ends = xy[:-1], xy[1:]
+    seg = ends - starts
+    seg_len2 = np.einsum("ij,ij->i", seg, seg)
+    t = np.einsum("ij,ij->i", point - starts, seg)
+    t = np.divide(t, seg_len2, out=np.zeros_like(t), where=seg_len2 > 0)
+    t = np.clip(t, 0.0, 1.0)
+    closest = starts + seg * t[:, None]
+    dist = np.hypot(*(closest - point).T)
+    index = int(np.argmin(dist))
+    return index, float(dist[index]), float(t[index])
+
+
+def estimate_progress(path: np.ndarray, position: Sequence[float]) -> int:
+    """Estimates how far a UAV has progressed along its path from its current
+    position.
+
+    Parameters:
+        path: the path of the UAV, as longitude-latitude pairs
+        position: the current longitude and latitude of the UAV
+
+    Returns:
+        the index of the first waypoint of the path that the UAV has not
+        reached yet
+    """
+    path = np.asarray(path, dtype=np.float64)
+    if len(path) == 0:
+        return 0
+
+    frame = LocalFrame(position[1], position[0])
+    xy = np.column_stack(frame.to_local(path[:, 1], path[:, 0]))
+    if len(xy) == 1:
+        return 0
+
+    index, _, t = _project_onto_polyline(xy, np.zeros(2))
+    if index == 0 and t <= 0:
+        # Still on the way to the first waypoint
+        return 0
+    return len(path) if t >= 1 and index == len(xy) - 2 else index + 1
+
+
+def _cut_polyline(xy: np.ndarray, cum: np.ndarray, start: float, end: float):
+    """Returns the part of a polyline between the given arc lengths, with
+    interpolated endpoints.
+    """
+    inner = np.nonzero((cum > start) & (cum < end))[0]
+    endpoints = np.column_stack(
+        (np.interp([start, end], cum, xy[:, 0]), np.interp([start, end], cum, xy[:, 1]))
+    )
+    return np.concatenate((endpoints[:1], xy[inner], endpoints[1:]))
+
+
+def _fill_levels(offsets: np.ndarray, total: float) -> np.ndarray:
+    """Distributes the given total amount of work among workers that are
+    already busy for the given amounts, such that the maximum finishing level
+    is minimal ("water filling").
+    """
+    order = np.sort(offsets)
+    level = order[0] + total
+    for count in range(1, len(order) + 1):
+        level = (total + order[:count].sum()) / count
+        if count == len(order) or level <= order[count]:
+            break
+    return np.maximum(level - offsets, 0.0)
+
+
+def reassign_remainder(
+    paths: Sequence[np.ndarray],
+    dropped_index: int,
+    progress: Sequence[int],
+    *,
+    positions: Optional[Sequence[Optional[Sequence[float]]]] = None,
+    speed: float = 5.0,
+    model: Optional[FlightModel] = None,
+    max_helpers: int = 3,
+    excluded: Sequence[int] = (),
+    iterations: int = 3,
+) -> Reassignment:
+    """Splits the unflown remainder of the path of a dropped UAV among the
+    nearest remaining UAVs.
+
+    Parameters:
+        paths: the paths of all the UAVs in the running plan, as
+            longitude-latitude pairs
+        dropped_index: index of the path of the UAV that dropped out
+        progress: for each path, the index of the first waypoint that the
+            UAV has not reached yet
+        positions: the current longitude and latitude of each UAV, or
+            ``None`` for UAVs whose position is not known
+        speed: the assumed ground speed of the UAVs, in metres per second
+        model: kinematic model of the UAVs; when given, its cruise speed
+            overrides ``speed`` and the work that the UAVs still have to do
+            on their own paths is estimated with turns taken into account
+        max_helpers: the maximum number of UAVs to share the remainder among
+        excluded: indices of additional paths whose UAVs must not receive
+            any new waypoints (e.g., UAVs that dropped out earlier)
+        iterations: number of refinement rounds for the transit estimates
+
+    Returns:
+        the suffixes to append to the paths of the receiving UAVs
+    """
+    if model is not None:
+        speed = model.cruise_speed
+    if speed <= 0:
+        raise ValueError("speed must be positive")
+
+    paths = [np.asarray(path, dtype=np.float64).reshape(-1, 2) for path in paths]
+    positions = list(positions) if positions is not None else [None] * len(paths)
+    dropped_path = paths[dropped_index]
+    dropped_progress = int(min(max(progress[dropped_index], 0), len(dropped_path)))
+    result = Reassignment(
+        dropped_index=dropped_index, dropped_progress=dropped_progress
+    )
+
+    remainder = dropped_path[dropped_progress:]
+    dropped_position = positions[dropped_index]
+    if len(remainder) and dropped_position is not None and dropped_progress > 0:
+        # The UAV dropped out in the middle of a leg; the rest of that leg
+        # has to be flown as well
+        remainder = np.concatenate(([dropped_position], remainder))
+    if len(remainder) == 0:
+        return result
+
+    frame = LocalFrame(remainder[0, 1], remainder[0, 0])
+
+    def to_local(lonlat):
+        lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack(frame.to_local(lonlat[:, 1], lonlat[:, 0]))
+
+    remainder_xy = to_local(remainder)
+    cum = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(remainder_xy, axis=0).T))))
+    total = float(cum[-1])
+    result.remainder_length = total
+
+    # Where each candidate UAV will be and how much it still has to fly
+    # before it can start working on the remainder
+    skip = set(excluded) | {dropped_index}
+    candidates, ends, own_lengths, distances, anchors = [], [], [], [], []
+    for index, path in enumerate(paths):
+        if index in skip:
+            continue
+
+        own = path[min(max(progress[index], 0), len(path)) :]
+        if positions[index] is not None:
+            own = np.concatenate(([positions[index]], own))
+        if len(own) == 0:
+            continue
+
+        own_xy = to_local(own)
+        segment, distance, t = _project_onto_polyline(remainder_xy, own_xy[-1])
+        candidates.append(index)
+        ends.append(own_xy[-1])
+        if model is not None:
+            # Time lost in turns is expressed as extra distance at cruise
+            # speed so it can be balanced against pieces of the remainder
+            own_lengths.append(estimate_path_time(own, model)[0] * speed)
+        else:
+            own_lengths.append(_polyline_length(own_xy))
+        distances.append(distance)
+        anchors.append(np.interp(segment + t, np.arange(len(cum)), cum))
+
+    if not candidates:
+        return result
+
+    num_helpers = min(max(int(max_helpers), 1), len(candidates))
+    nearest = np.argsort(distances, kind="stable")[:num_helpers]
+
+    # Helpers receive consecutive pieces of the remainder in the order in
+    # which they are located along it
+    helpers = sorted(nearest, key=lambda i: anchors[i])
+    helper_ends = np.array([ends[i] for i in helpers])
+    helper_lengths = np.array([own_lengths[i] for i in helpers])
+
+    transits = np.array([distances[i] for i in helpers])
+    for _ in range(max(int(iterations), 1)):
+        pieces = _fill_levels(helper_lengths + transits, total)
+        bounds = np.concatenate(([0.0], np.cumsum(pieces)))
+        bounds[-1] = total
+        entry_points = np.column_stack(
+            (
+                np.interp(bounds, cum, remainder_xy[:, 0]),
+                np.interp(bounds, cum, remainder_xy[:, 1]),
+            )
+        )
+        to_start = np.hypot(*(entry_points[:-1] - helper_ends).T)
+        to_end = np.hypot(*(entry_points[1:] - helper_ends).T)
+        transits = np.minimum(to_start, to_end)
+
+    for k, index in enumerate(helpers):
+        if pieces[k] <= 0:
+            continue
+
+        piece = _cut_polyline(remainder_xy, cum, bounds[k], bounds[k + 1])
+        if to_end[k] < to_start[k]:
+            piece = piece[::-1]
+
+        lat, lon = frame.to_geo(piece[:, 0], piece[:, 1])
+        path_index = candidates[index]
+        result.suffixes[path_index] = np.column_stack((lon, lat))
+        result.completion_times[path_index] = float(
+            (helper_lengths[k] + transits[k] + pieces[k]) / speed
+        )
+
+    return result
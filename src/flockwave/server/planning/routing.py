@@ -0,0 +1,502 @@
+"""Obstacle-aware routing of the transit legs of the UAVs.
+
+The router keeps the UAVs out of the no-fly zones (the inner fences) and
+inside the outer fence on the legs that are not part of the sweeps: the
+connectors between strips and the legs from the home position to the entry
+point of a path and back. Routes are shortest paths in the visibility graph
+of the corners of the fences, grown by a safety margin.
+
+The shortest paths between all pairs of corners are computed once per fence
+when the router is constructed, so a route query only needs to find which
+corners are visible from its two endpoints, which takes well below a
+millisecond for fences of a few hundred vertices.
+"""
+
+from __future__ import annotations
+
+from typing import Optional, Sequence
+
+import numpy as np
+import shapely
+
+from .geodesy import LocalFrame
+
+__all__ = ("TransitRouter", "get_transit_router")
+
+
+_MAX_LAZY_VISIBILITY_CHECKS = 16
+"""Number of corners whose visibility from the endpoints of a route is
+checked one by one before all the corners are checked at once.
+"""
+
+_VERTEX_OFFSET = 0.5
+"""Extra distance, in metres, between the corners of the visibility graph
+and the blocked regions, so that the legs between corners never touch the
+blocked regions.
+"""
+
+
+def _ring_edges(ring: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Returns the start and end points of the edges of a closed ring, given
+    as an array whose last point repeats the first one.
+    """
+    return ring[:-1], ring[1:]
+
+
+def _convex_corners(ring, *, convex: bool) -> np.ndarray:
+    """Returns the convex or the concave corners of a ring, each along with
+    its two neighbours, as an array of shape ``(N, 3, 2)``.
+    """
+    coords = np.asarray(ring.coords)[:-1]
+    if len(coords) < 3:
+        return np.empty((0, 3, 2))
+    if not ring.is_ccw:
+        coords = coords[::-1]
+    previous = np.roll(coords, 1, axis=0)
+    following = np.roll(coords, -1, axis=0)
+    before = coords - previous
+    after = following - coords
+    cross = before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0]
+    mask = cross > 0 if convex else cross < 0
+    return np.stack((coords, previous, following), axis=1)[mask]
+
+
+class TransitRouter:
+    """Shortest obstacle-free routes between points within a fence."""
+
+    def __init__(
+        self,
+        obstacles: Sequence[Sequence[Sequence[float]]],
+        boundary: Optional[Sequence[Sequence[float]]] = None,
+        *,
+        margin: float = 10.0,
+    ):
+        """Constructor.
+
+        Parameters:
+            obstacles: the outlines of the no-fly zones, as
+                longitude-latitude pairs
+            boundary: the outline of the region that the UAVs must stay in,
+                as longitude-latitude pairs; ``None`` if there is no such
+                region
+            margin: the distance to keep from the obstacles and the
+                boundary, in metres
+        """
+        from scipy.sparse.csgraph import shortest_path
+
+        obstacles = [
+            np.asarray(obstacle, dtype=np.float64).reshape(-1, 2)
+            for obstacle in obstacles
+        ]
+        obstacles = [obstacle for obstacle in obstacles if len(obstacle) >= 3]
+        if boundary is not None:
+            boundary = np.asarray(boundary, dtype=np.float64).reshape(-1, 2)
+            if len(boundary) < 3:
+                boundary = None
+
+        points = [*obstacles, *([boundary] if boundary is not None else [])]
+        if points:
+            center = np.concatenate(points).mean(axis=0)
+        else:
+            center = np.zeros(2)
+        self.frame = LocalFrame(center[1], center[0])
+        self.margin = float(margin)
+
+        buffer_args = {"join_style": "mitre", "mitre_limit": 2.0}
+        local_obstacles = shapely.union_all(
+            [shapely.make_valid(self._to_polygon(obstacle)) for obstacle in obstacles]
+        )
+        blocked = local_obstacles.buffer(self.margin, **buffer_args)
+        grown = local_obstacles.buffer(self.margin + _VERTEX_OFFSET, **buffer_args)
+        self._blocked = list(getattr(blocked, "geoms", [blocked]))
+        self._blocked = [poly for poly in self._blocked if not poly.is_empty]
+
+        if boundary is not None:
+            local_boundary = shapely.make_valid(self._to_polygon(boundary))
+            self._allowed = local_boundary.buffer(-self.margin, **buffer_args)
+            shrunk = local_boundary.buffer(-self.margin - _VERTEX_OFFSET, **buffer_args)
+        else:
+            self._allowed = None
+            shrunk = None
+
+        # Edges that routes must not cross, labelled with the index of the
+        # blocked region they belong to; the boundary has the last index
+        starts, ends, owners = [], [], []
+        for index, poly in enumerate(self._blocked):
+            for ring in (poly.exterior, *poly.interiors):
+                a, b = _ring_edges(np.asarray(ring.coords))
+                starts.append(a)
+                ends.append(b)
+                owners.append(np.full(len(a), index))
+        for poly in getattr(self._allowed, "geoms", [self._allowed]):
+            if poly is None or poly.is_empty:
+                continue
+            for ring in (poly.exterior, *poly.interiors):
+                a, b = _ring_edges(np.asarray(ring.coords))
+                starts.append(a)
+                ends.append(b)
+                owners.append(np.full(len(a), len(self._blocked)))
+
+        self._edge_starts = np.concatenate(starts) if starts else np.empty((0, 2))
+        self._edge_ends = np.concatenate(ends) if ends else np.empty((0, 2))
+        self._edge_owners = np.concatenate(owners) if owners else np.empty(0, dtype=int)
+
+        # Bounding circles of the regions and the ranges of their edges, to
+        # cull the edges that a segment cannot cross
+        num_regions = len(self._blocked) + (self._allowed is not None)
+        self._region_edge_counts = np.bincount(
+            self._edge_owners, minlength=num_regions
+        )[:num_regions]
+        self._region_edge_offsets = np.cumsum(self._region_edge_counts) - (
+            self._region_edge_counts
+        )
+        bounds = np.array(
+            [
+                geometry.bounds
+                for geometry in (*self._blocked, self._allowed)
+                if geometry is not None
+            ]
+        ).reshape(-1, 4)
+        self._region_centers = (bounds[:, :2] + bounds[:, 2:]) / 2
+        self._region_radii_sq = (((bounds[:, 2:] - bounds[:, :2]) / 2) ** 2).sum(
+            axis=1
+        ) + 1e-6
+        self._edge_vectors = self._edge_ends - self._edge_starts
+
+        for geometry in (*self._blocked, self._allowed):
+            if geometry is not None:
+                shapely.prepare(geometry)
+        self._blocked_index = shapely.STRtree(self._blocked)
+
+        # Corners of the visibility graph: the convex corners of the grown
+        # obstacles and the concave corners of the shrunk boundary; other
+        # corners are never part of a shortest path
+        corners = []
+        for poly in getattr(grown, "geoms", [grown]):
+            if not poly.is_empty:
+                corners.append(_convex_corners(poly.exterior, convex=True))
+        if shrunk is not None:
+            for poly in getattr(shrunk, "geoms", [shrunk]):
+                if not poly.is_empty:
+                    corners.append(_convex_corners(poly.exterior, convex=False))
+                    for ring in poly.interiors:
+                        corners.append(_convex_corners(ring, convex=True))
+
+        # Each corner is stored with its neighbours along the ring, which are
+        # needed to tell whether a line from a point is tangent to the corner
+        vertices = (
+            np.concatenate(corners) if corners else np.empty((0, 3, 2))
+        ).reshape(-1, 3, 2)
+        vertices = vertices[self._is_free(vertices[:, 0])]
+        self.vertices = np.ascontiguousarray(vertices[:, 0])
+        self._vertex_neighbors = vertices[:, 1:]
+
+        # Shortest paths between all pairs of corners
+        n = len(vertices)
+        weights = np.zeros((n, n))
+        for i in range(n - 1):
+            others = self.vertices[i + 1 :]
+            visible = ~self._crosses(self.vertices[i], others)
+            lengths = np.hypot(*(others - self.vertices[i]).T)
+            weights[i, i + 1 :] = np.where(visible, lengths, 0.0)
+        weights = weights + weights.T
+
+        if n:
+            self._distances, self._predecessors = shortest_path(
+                weights, method="D", directed=False, return_predecessors=True
+            )
+        else:
+            self._distances = np.zeros((0, 0))
+            self._predecessors = np.zeros((0, 0), dtype=int)
+
+    @property
+    def num_vertices(self) -> int:
+        """Number of corners in the visibility graph."""
+        return len(self.vertices)
+
+    def distance(self, start: Sequence[float], end: Sequence[float]) -> float:
+        """Returns the length of the shortest obstacle-free route between two
+        points, in metres.
+
+        Parameters:
+            start: the longitude and latitude of the start of the route
+            end: the longitude and latitude of the end of the route
+        """
+        xy = self._route_local(self._to_local(start)[0], self._to_local(end)[0])
+        return float(np.hypot(*np.diff(xy, axis=0).T).sum())
+
+    def route(self, start: Sequence[float], end: Sequence[float]) -> np.ndarray:
+        """Returns the shortest obstacle-free route between two points.
+
+        Endpoints within a blocked region may leave or enter that region;
+        if there is no obstacle-free route at all, the straight line is
+        returned.
+
+        Parameters:
+            start: the longitude and latitude of the start of the route
+            end: the longitude and latitude of the end of the route
+
+        Returns:
+            the route as longitude-latitude pairs, including the two endpoints
+        """
+        start = np.asarray(start, dtype=np.float64)
+        end = np.asarray(end, dtype=np.float64)
+        xy = self._route_local(self._to_local(start)[0], self._to_local(end)[0])
+        return np.vstack((start, self._to_lonlat(xy[1:-1]), end))
+
+    def route_path(self, path: np.ndarray) -> np.ndarray:
+        """Replaces the legs of a path that cross an obstacle or leave the
+        boundary with the shortest obstacle-free routes between their ends.
+
+        Parameters:
+            path: the path, as longitude-latitude pairs
+
+        Returns:
+            the routed path; the original path if no leg had to be rerouted
+        """
+        path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+        if len(path) < 2 or not len(self._edge_starts):
+            return path
+
+        xy = self._to_local(path)
+        blocked = np.flatnonzero(self._crosses(xy[:-1], xy[1:]))
+        if not len(blocked):
+            return path
+
+        parts, previous = [], 0
+        for index in blocked:
+            parts.append(path[previous : index + 1])
+            via = self._route_local(xy[index], xy[index + 1])[1:-1]
+            parts.append(self._to_lonlat(via))
+            previous = index + 1
+        parts.append(path[previous:])
+        return np.concatenate(parts)
+
+    def route_transit(
+        self, path: np.ndarray, home: Optional[Sequence[float]]
+    ) -> np.ndarray:
+        """Extends a path with the turning points of the shortest
+        obstacle-free routes from the home position to its first waypoint
+        and from its last waypoint back home. The home position itself is
+        not added.
+
+        Parameters:
+            path: the path, as longitude-latitude pairs
+            home: the longitude and latitude of the home position; ``None``
+                if not known
+
+        Returns:
+            the extended path
+        """
+        path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+        if home is None or len(path) == 0:
+            return path
+
+        home = self._to_local(home)[0]
+        xy = self._to_local(path[[0, -1]])
+        inbound = self._route_local(home, xy[0])[1:-1]
+        outbound = self._route_local(xy[1], home)[1:-1]
+        if not len(inbound) and not len(outbound):
+            return path
+        return np.concatenate(
+            (self._to_lonlat(inbound), path, self._to_lonlat(outbound))
+        )
+
+    def _containing_regions(self, point: np.ndarray) -> np.ndarray:
+        """Returns the indices of the blocked regions that contain the given
+        point; the index of the boundary is included if the point is outside
+        the boundary.
+        """
+        x, y = point
+        result = self._blocked_index.query(shapely.Point(x, y), predicate="within")
+        if self._allowed is not None and not shapely.contains_xy(self._allowed, x, y):
+            result = np.append(result, len(self._blocked))
+        return result
+
+    def _crosses(
+        self, p: np.ndarray, q: np.ndarray, ignored: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Returns whether the segments from the rows of ``p`` to the rows of
+        ``q`` cross any edge that is not owned by the given regions. ``p`` may
+        also be a single point that all the segments start from.
+        """
+        p = np.broadcast_to(p, q.shape)
+        result = np.zeros(len(q), dtype=bool)
+        if not len(q) or not len(self._region_radii_sq):
+            return result
+
+        # Only the edges of the regions whose bounding circle is hit by a
+        # segment need to be checked
+        d = q - p
+        dx, dy = d[:, :1], d[:, 1:]
+        wx = self._region_centers[:, 0] - p[:, :1]
+        wy = self._region_centers[:, 1] - p[:, 1:]
+        length_sq = np.maximum(dx * dx + dy * dy, 1e-12)
+        t = np.minimum(np.maximum((wx * dx + wy * dy) / length_sq, 0.0), 1.0)
+        wx -= t * dx
+        wy -= t * dy
+        hit = wx * wx + wy * wy <= self._region_radii_sq
+        if ignored is not None and len(ignored):
+            hit[:, ignored] = False
+
+        segments, regions = np.nonzero(hit)
+        if not len(segments):
+            return result
+
+        counts = self._region_edge_counts[regions]
+        first_edges = self._region_edge_offsets[regions] - (np.cumsum(counts) - counts)
+        edges = np.arange(counts.sum()) + np.repeat(first_edges, counts)
+        segments = np.repeat(segments, counts)
+
+        # Proper crossing: the ends of each segment are on the two sides of
+        # the edge, and the other way round
+        a = self._edge_starts[edges] - p[segments]
+        e = self._edge_vectors[edges]
+        ds = d[segments]
+        o1 = ds[:, 0] * a[:, 1] - ds[:, 1] * a[:, 0]
+        c = ds[:, 0] * e[:, 1] - ds[:, 1] * e[:, 0]
+        o3 = e[:, 1] * a[:, 0] - e[:, 0] * a[:, 1]
+        crossing = (o1 * (o1 + c) < 0) & (o3 * (o3 - c) < 0)
+        result[segments[crossing]] = True
+        return result
+
+    def _tangent_vertices(self, point: np.ndarray) -> np.ndarray:
+        """Returns whether the lines from the given point to the corners of the
+        visibility graph are tangent to the corners, i.e. whether both
+        neighbours of a corner are on the same side of the line. Shortest
+        routes leave the endpoints along tangent lines only.
+        """
+        vx, vy = (self.vertices - point).T
+        sides = []
+        for neighbor in (self._vertex_neighbors[:, 0], self._vertex_neighbors[:, 1]):
+            nx, ny = (neighbor - point).T
+            sides.append(vx * ny - vy * nx)
+        return sides[0] * sides[1] >= 0
+
+    def _is_free(self, points: np.ndarray) -> np.ndarray:
+        x, y = points.T
+        result = np.ones(len(points), dtype=bool)
+        for poly in self._blocked:
+            result &= ~shapely.contains_xy(poly, x, y)
+        if self._allowed is not None:
+            result &= shapely.contains_xy(self._allowed, x, y)
+        return result
+
+    def _route_local(self, start: np.ndarray, end: np.ndarray) -> np.ndarray:
+        """Returns the shortest route between two points in the local frame,
+        including the endpoints.
+        """
+        direct = np.array((start, end))
+        if not len(self._edge_starts):
+            return direct
+
+        ignored_start = self._containing_regions(start)
+        ignored_end = self._containing_regions(end)
+        ignored = np.union1d(ignored_start, ignored_end)
+        if not self._crosses(start, direct[1:], ignored)[0] or not len(self.vertices):
+            return direct
+
+        # Lower bounds of the lengths of the routes through each pair of
+        # corners, assuming that the first and the last corner are visible
+        # from the endpoints. Shortest routes leave and reach the endpoints
+        # along lines tangent to the corners.
+        to_start = np.hypot(*(self.vertices - start).T)
+        to_start[~self._tangent_vertices(start)] = np.inf
+        to_end = np.hypot(*(self.vertices - end).T)
+        to_end[~self._tangent_vertices(end)] = np.inf
+        total = to_start[:, None] + self._distances + to_end[None, :]
+
+        # The pairs are tried in increasing order of their lower bounds, and
+        # the first one whose corners are actually visible is the shortest
+        # route. Corners hidden from the endpoints are ruled out one by one;
+        # if there are too many of them, the visibility of all the corners is
+        # checked at once instead
+        visible_from_start, visible_from_end = {}, {}
+        for _ in range(_MAX_LAZY_VISIBILITY_CHECKS):
+            first, last = np.unravel_index(np.argmin(total), total.shape)
+            if not np.isfinite(total[first, last]):
+                return direct
+
+            if first not in visible_from_start:
+                visible_from_start[first] = not self._crosses(
+                    start, self.vertices[first : first + 1], ignored_start
+                )[0]
+            if not visible_from_start[first]:
+                total[first, :] = np.inf
+                continue
+
+            if last not in visible_from_end:
+                visible_from_end[last] = not self._crosses(
+                    end, self.vertices[last : last + 1], ignored_end
+                )[0]
+            if not visible_from_end[last]:
+                total[:, last] = np.inf
+                continue
+
+            break
+        else:
+            to_start[self._crosses(start, self.vertices, ignored_start)] = np.inf
+            to_end[self._crosses(end, self.vertices, ignored_end)] = np.inf
+            total = to_start[:, None] + self._distances + to_end[None, :]
+            first, last = np.unravel_index(np.argmin(total), total.shape)
+            if not np.isfinite(total[first, last]):
+                return direct
+
+        # Walk back along the shortest path tree of the first corner
+        indices = [last]
+        while indices[-1] != first:
+            indices.append(self._predecessors[first, indices[-1]])
+        return np.vstack((start, self.vertices[indices[::-1]], end))
+
+    def _to_local(self, lonlat) -> np.ndarray:
+        lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+        return np.column_stack(self.frame.to_local(lonlat[:, 1], lonlat[:, 0]))
+
+    def _to_lonlat(self, xy: np.ndarray) -> np.ndarray:
+        if not len(xy):
+            return np.empty((0, 2))
+        lat, lon = self.frame.to_geo(xy[:, 0], xy[:, 1])
+        return np.column_stack((lon, lat))
+
+    def _to_polygon(self, lonlat: np.ndarray):
+        return shapely.Polygon(self._to_local(lonlat))
+
+
+_cached_router: Optional[TransitRouter] = None
+_cached_router_key = None
+
+
+def get_transit_router(
+    obstacles: Sequence[Sequence[Sequence[float]]],
+    boundary: Optional[Sequence[Sequence[float]]] = None,
+    *,
+    margin: float = 10.0,
+) -> TransitRouter:
+    """Returns a transit router for the given fences, reusing the router that
+    was constructed in the previous call if the fences did not change. This
+    way the visibility graph is computed only once for every fence that the
+    GCS sends.
+
+    Parameters:
+        obstacles: the outlines of the no-fly zones, as longitude-latitude
+            pairs
+        boundary: the outline of the region that the UAVs must stay in, as
+            longitude-latitude pairs
+        margin: the distance to keep from the obstacles and the boundary, in
+            metres
+    """
+    global _cached_router, _cached_router_key
+
+    def freeze(ring):
+        return tuple(tuple(float(x) for x in point) for point in ring)
+
+    key = (
+        tuple(freeze(obstacle) for obstacle in obstacles),
+        freeze(boundary) if boundary is not None else None,
+        float(margin),
+    )
+    if _cached_router is None or _cached_router_key != key:
+        _cached_router = TransitRouter(obstacles, boundary, margin=margin)
+        _cached_router_key = key
+
+    return _cached_router
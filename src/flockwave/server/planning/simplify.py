@@ -0,0 +1,245 @@
+"""Simplification of the paths of a plan before they are sent to the client
+and uploaded to the UAVs.
+
+The planners emit collinear and near-duplicate waypoints: consecutive strip
+endpoints, fragments of the sweep lines split around holes and so on. Every
+waypoint costs a round trip over the MAVLink link during a mission upload,
+so the paths are thinned with the Douglas-Peucker algorithm, within a
+tolerance given in metres. Turning points of the paths (e.g., the endpoints
+of the strips) are always kept so the sweeps are never cut short.
+
+The module also provides a compact delta encoding of the paths for the
+transport to the client.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from math import cos, radians
+from typing import Sequence
+
+import numpy as np
+
+from .geodesy import LocalFrame
+
+__all__ = (
+    "SimplifiedPaths",
+    "decode_path",
+    "encode_path",
+    "simplify_path",
+    "simplify_paths",
+)
+
+
+@dataclass
+class SimplifiedPaths:
+    """Result of simplifying the paths of a plan."""
+
+    paths: list[np.ndarray] = field(default_factory=list)
+    """The simplified paths, as longitude-latitude pairs."""
+
+    original_counts: list[int] = field(default_factory=list)
+    """Number of waypoints in each path before the simplification."""
+
+    tolerance: float = 0.0
+    """Maximum distance between the original and the simplified paths, in
+    metres.
+    """
+
+    @property
+    def num_removed(self) -> int:
+        """Total number of waypoints removed from the paths."""
+        return sum(self.original_counts) - sum(len(path) for path in self.paths)
+
+    def json(self) -> dict:
+        """Returns a JSON representation of the statistics of the
+        simplification.
+        """
+        return {
+            "tolerance": self.tolerance,
+            "original": sum(self.original_counts),
+            "simplified": sum(len(path) for path in self.paths),
+            "removed": self.num_removed,
+            "removedPerPath": [
+                count - len(path)
+                for count, path in zip(self.original_counts, self.paths)
+            ],
+        }
+
+
+def simplify_path(
+    path: Sequence[Sequence[float]],
+    tolerance: float = 1.0,
+    *,
+    corner_angle: float = 30.0,
+) -> np.ndarray:
+    """Removes the redundant waypoints of a path.
+
+    Consecutive waypoints closer to each other than the tolerance are merged
+    first. Waypoints where the path turns by more than the given angle are
+    kept; the waypoints between them are thinned with the Douglas-Peucker
+    algorithm such that the simplified path stays within the tolerance from
+    the original one.
+
+    Parameters:
+        path: the path, as longitude-latitude pairs
+        tolerance: the maximum distance between the original and the
+            simplified path, in metres
+        corner_angle: the minimum change of heading at a waypoint, in
+            degrees, for the waypoint to be always kept
+
+    Returns:
+        the simplified path, as longitude-latitude pairs. The first and the
+        last waypoint of the path are always kept.
+    """
+    path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    if len(path) < 2:
+        return path
+
+    frame = LocalFrame(path[0, 1], path[0, 0])
+    xy = np.column_stack(frame.to_local(path[:, 1], path[:, 0]))
+
+    # Merge near-duplicate waypoints
+    unique = _merge_duplicates(xy, tolerance)
+    path, xy = path[unique], xy[unique]
+    if len(path) < 3:
+        return path
+
+    # Turning points of the path
+    directions = np.diff(xy, axis=0)
+    directions /= np.maximum(np.hypot(*directions.T), 1e-9)[:, None]
+    cosines = (directions[:-1] * directions[1:]).sum(axis=1)
+    keep = np.zeros(len(xy), dtype=bool)
+    keep[[0, -1]] = True
+    keep[1:-1] = cosines < cos(radians(corner_angle))
+
+    # Thin the sections between the turning points
+    anchors = np.flatnonzero(keep)
+    for first, last in zip(anchors[:-1], anchors[1:]):
+        if last - first >= 2:
+            _douglas_peucker(xy, first, last, tolerance, keep)
+
+    return path[keep]
+
+
+def simplify_paths(
+    paths: Sequence[Sequence[Sequence[float]]],
+    tolerance: float = 1.0,
+    *,
+    corner_angle: float = 30.0,
+) -> SimplifiedPaths:
+    """Removes the redundant waypoints of all the paths of a plan.
+
+    Parameters:
+        paths: the paths, as longitude-latitude pairs
+        tolerance: the maximum distance between the original and the
+            simplified paths, in metres
+        corner_angle: the minimum change of heading at a waypoint, in
+            degrees, for the waypoint to be always kept
+
+    Returns:
+        the simplified paths along with the number of waypoints removed
+    """
+    paths = [np.asarray(path, dtype=np.float64).reshape(-1, 2) for path in paths]
+    return SimplifiedPaths(
+        paths=[
+            simplify_path(path, tolerance, corner_angle=corner_angle) for path in paths
+        ],
+        original_counts=[len(path) for path in paths],
+        tolerance=float(tolerance),
+    )
+
+
+def encode_path(path: Sequence[Sequence[float]], *, precision: int = 7) -> list[int]:
+    """Encodes a path compactly for the transport to the client.
+
+    The coordinates are rounded to the given number of decimal digits (the
+    same 1e-7 degree resolution as used by MAVLink by default). The first
+    waypoint is stored as is, and each subsequent one as the difference from
+    the previous one, which are short integers for dense paths.
+
+    Parameters:
+        path: the path, as longitude-latitude pairs
+        precision: the number of decimal digits to keep
+
+    Returns:
+        the flat list of the longitudes and latitudes of the first waypoint,
+        followed by the differences of the longitudes and latitudes of the
+        subsequent waypoints
+    """
+    path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    scaled = np.round(path * 10**precision).astype(np.int64)
+    scaled[1:] = np.diff(scaled, axis=0)
+    return scaled.ravel().tolist()
+
+
+def decode_path(encoded: Sequence[int], *, precision: int = 7) -> np.ndarray:
+    """Decodes a path encoded with `encode_path()`.
+
+    Parameters:
+        encoded: the encoded path
+        precision: the number of decimal digits that the path was encoded
+            with
+
+    Returns:
+        the path, as longitude-latitude pairs
+    """
+    scaled = np.asarray(encoded, dtype=np.int64).reshape(-1, 2)
+    return np.cumsum(scaled, axis=0) / 10**precision
+
+
+def _merge_duplicates(xy: np.ndarray, tolerance: float) -> np.ndarray:
+    """Returns the indices of the points that remain after merging each point
+    into the previous remaining one if they are not farther from each other
+    than the tolerance. The last point always remains, in place of the
+    previous remaining point if needed.
+    """
+    steps = np.hypot(*np.diff(xy, axis=0).T)
+    if not np.any(steps <= tolerance):
+        return np.arange(len(xy))
+
+    tolerance_sq = tolerance * tolerance
+    result = [0]
+    last_x, last_y = xy[0]
+    for index, (x, y) in enumerate(xy[1:].tolist(), 1):
+        if (x - last_x) ** 2 + (y - last_y) ** 2 > tolerance_sq:
+            result.append(index)
+            last_x, last_y = x, y
+
+    if result[-1] != len(xy) - 1:
+        if len(result) > 1:
+            result[-1] = len(xy) - 1
+        else:
+            result.append(len(xy) - 1)
+    return np.array(result)
+
+
+def _douglas_peucker(
+    xy: np.ndarray, first: int, last: int, tolerance: float, keep: np.ndarray
+) -> None:
+    """Marks the points between the given two indices that have to be kept
+    such that the polyline through the kept points stays within the given
+    tolerance from all the points.
+    """
+    stack = [(first, last)]
+    while stack:
+        first, last = stack.pop()
+        start = xy[first]
+        chord = xy[last] - start
+        offsets = xy[first + 1 : last] - start
+
+        length = np.hypot(*chord)
+        if length > 0:
+            distances = np.abs(chord[0] * offsets[:, 1] - chord[1] * offsets[:, 0])
+            distances /= length
+        else:
+            distances = np.hypot(*offsets.T)
+
+        index = int(np.argmax(distances))
+        if distances[index] > tolerance:
+            index += first + 1
+            keep[index] = True
+            if index - first >= 2:
+                stack.append((first, index))
+            if last - index >= 2:
+                stack.append((index, last))
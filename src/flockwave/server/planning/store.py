@@ -0,0 +1,218 @@
+"""In-memory storage for the search and split plans generated by the
+planners of the server.
+
+Plans are kept as NumPy arrays in memory so they can be returned to the
+client immediately after planning. Exports to KML or CSV are generated
+lazily from the stored arrays on demand; see `flockwave.server.planning.export`.
+"""
+
+from __future__ import annotations
+
+from blinker import Signal
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import count
+from time import time
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+__all__ = ("Plan", "PlanStore", "plan_store")
+
+
+@dataclass
+class Plan:
+    """A single plan generated by one of the planners, consisting of one
+    path per UAV.
+    """
+
+    id: str
+    """Unique identifier of the plan."""
+
+    kind: str
+    """The kind of the plan (e.g., ``search``, ``split``, ``navigate``)."""
+
+    paths: list[np.ndarray] = field(default_factory=list)
+    """The paths of the plan, one for each UAV. Each path is a NumPy array of
+    shape ``(N, 2)`` containing longitude-latitude pairs.
+    """
+
+    uav_ids: list[str] = field(default_factory=list)
+    """IDs of the UAVs that the paths were assigned to, in the same order as
+    the paths; empty if the assignment is not known.
+    """
+
+    areas: list[np.ndarray] = field(default_factory=list)
+    """Outlines of the areas that the plan is meant to cover, as NumPy arrays
+    of longitude-latitude pairs; empty if not known.
+    """
+
+    swath_width: Optional[float] = None
+    """Width of the camera footprint that the plan was made for, in metres;
+    ``None`` if not known.
+    """
+
+    altitude: Optional[float] = None
+    """Altitude that the plan is meant to be flown at, in metres above the
+    home position; ``None`` if not known.
+    """
+
+    created_at: float = field(default_factory=time)
+    """UNIX timestamp of the moment when the plan was created."""
+
+    @property
+    def num_paths(self) -> int:
+        """Returns the number of paths in the plan."""
+        return len(self.paths)
+
+    @property
+    def num_waypoints(self) -> int:
+        """Returns the total number of waypoints in all paths of the plan."""
+        return sum(len(path) for path in self.paths)
+
+    def get_path(self, index: int) -> np.ndarray:
+        """Returns the path with the given zero-based index.
+
+        Raises:
+            IndexError: if there is no path with the given index
+        """
+        if index < 0:
+            raise IndexError(index)
+        return self.paths[index]
+
+    def get_uav_id(self, index: int) -> Optional[str]:
+        """Returns the ID of the UAV that the path with the given zero-based
+        index was assigned to, or ``None`` if it is not known.
+        """
+        return self.uav_ids[index] if 0 <= index < len(self.uav_ids) else None
+
+    def json(self) -> dict:
+        """Returns a JSON representation of the metadata of the plan, without
+        the paths themselves.
+        """
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "createdAt": self.created_at,
+            "numPaths": self.num_paths,
+            "numWaypoints": self.num_waypoints,
+            "uavIds": list(self.uav_ids),
+        }
+
+
+def _to_path_array(path: Iterable[Sequence[float]]) -> np.ndarray:
+    """Converts a path given as a sequence of longitude-latitude pairs into
+    a NumPy array of shape ``(N, 2)``.
+    """
+    result = np.asarray(path, dtype=np.float64)
+    if result.size == 0:
+        return np.empty((0, 2), dtype=np.float64)
+    if result.ndim != 2 or result.shape[1] != 2:
+        raise ValueError(f"Path must have shape (N, 2), got {result.shape}")
+    return result
+
+
+class PlanStore:
+    """Bounded in-memory store of the most recently generated plans."""
+
+    added = Signal(doc="Signal sent when a new plan was added to the store.")
+
+    _plans: OrderedDict[str, Plan]
+    _max_plans: int
+
+    def __init__(self, max_plans: int = 32):
+        """Constructor.
+
+        Parameters:
+            max_plans: the maximum number of plans to keep; the oldest plan
+                is dropped when a new plan is added to a full store
+        """
+        self._plans = OrderedDict()
+        self._max_plans = max(1, int(max_plans))
+        self._id_generator = count(1)
+
+    def add(
+        self,
+        kind: str,
+        paths: Iterable[Iterable[Sequence[float]]],
+        uav_ids: Optional[Iterable[object]] = None,
+        *,
+        areas: Iterable[Iterable[Sequence[float]]] = (),
+        swath_width: Optional[float] = None,
+        altitude: Optional[float] = None,
+    ) -> Plan:
+        """Adds a new plan to the store.
+
+        Parameters:
+            kind: the kind of the plan
+            paths: the paths of the plan, one for each UAV, each path being
+                a sequence of longitude-latitude pairs or a NumPy array of
+                shape ``(N, 2)``
+            uav_ids: the IDs of the UAVs that the paths are assigned to, in
+                the same order as the paths
+            areas: the outlines of the areas that the plan is meant to cover,
+                each being a sequence of longitude-latitude pairs
+            swath_width: the width of the camera footprint that the plan was
+                made for, in metres
+            altitude: the altitude that the plan is meant to be flown at, in
+                metres above the home position
+
+        Returns:
+            the plan that was added
+        """
+        plan = Plan(
+            id=str(next(self._id_generator)),
+            kind=kind,
+            paths=[_to_path_array(path) for path in paths],
+            uav_ids=[str(uav_id) for uav_id in uav_ids or ()],
+            areas=[_to_path_array(area) for area in areas],
+            swath_width=swath_width,
+            altitude=altitude,
+        )
+
+        self._plans[plan.id] = plan
+        while len(self._plans) > self._max_plans:
+            self._plans.popitem(last=False)
+
+        self.added.send(self, plan=plan)
+        return plan
+
+    def clear(self) -> None:
+        """Removes all the plans from the store."""
+        self._plans.clear()
+
+    def find_by_id(self, plan_id: str) -> Plan:
+        """Returns the plan with the given ID. The special ID ``latest``
+        refers to the plan that was added most recently.
+
+        Raises:
+            KeyError: if there is no such plan
+        """
+        if plan_id == "latest":
+            plan = self.latest
+            if plan is None:
+                raise KeyError(plan_id)
+            return plan
+        return self._plans[plan_id]
+
+    @property
+    def latest(self) -> Optional[Plan]:
+        """Returns the plan that was added most recently, or ``None`` if the
+        store is empty.
+        """
+        if self._plans:
+            return next(reversed(self._plans.values()))
+        return None
+
+    def __contains__(self, plan_id: str) -> bool:
+        return plan_id in self._plans
+
+    def __iter__(self):
+        return iter(self._plans.values())
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+
+plan_store = PlanStore()
+"""Global plan store instance used by the server."""
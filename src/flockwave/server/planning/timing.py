@@ -0,0 +1,196 @@
+"""Mission-time estimation for planned paths.
+
+The estimator takes the kinematics of the aircraft into account in a simple,
+vectorized way: the path is flown at cruise speed, multirotors slow down
+before each corner in proportion to the heading change, fixed-wing aircraft
+fly an arc of the given turn radius instead, and the aircraft first climbs
+to the mission altitude and transits from its home position to the first
+waypoint.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional, Sequence
+
+import numpy as np
+
+from .geodesy import LocalFrame
+
+__all__ = (
+    "FlightModel",
+    "MissionTimeEstimate",
+    "estimate_mission_time",
+    "estimate_path_time",
+)
+
+
+@dataclass(frozen=True)
+class FlightModel:
+    """Simple kinematic model of an aircraft flying a planned path."""
+
+    cruise_speed: float = 5.0
+    """Horizontal cruise speed, in metres per second."""
+
+    acceleration: float = 1.5
+    """Horizontal acceleration and deceleration of a multirotor, in metres per
+    second squared. Used when the turn radius is zero.
+    """
+
+    turn_radius: float = 0.0
+    """Turn radius of a fixed-wing aircraft, in metres; zero for multirotors
+    that can turn on the spot.
+    """
+
+    climb_rate: float = 2.5
+    """Vertical speed when climbing to the mission altitude, in metres per
+    second.
+    """
+
+
+_DEFAULT_MODEL = FlightModel()
+
+
+@dataclass
+class MissionTimeEstimate:
+    """Estimated flight times of the UAVs of a mission."""
+
+    times: np.ndarray = field(default_factory=lambda: np.empty(0))
+    """Estimated flight time of each UAV, in seconds."""
+
+    distances: np.ndarray = field(default_factory=lambda: np.empty(0))
+    """Horizontal distance flown by each UAV, including the transit from its
+    home position, in metres.
+    """
+
+    @property
+    def makespan(self) -> float:
+        """Time until the last UAV finishes its path, in seconds."""
+        return float(self.times.max()) if len(self.times) else 0.0
+
+    @property
+    def makespan_minutes(self) -> float:
+        """Time until the last UAV finishes its path, in minutes."""
+        return self.makespan / 60
+
+    def json(self) -> dict:
+        return {
+            "times": [round(float(t), 1) for t in self.times],
+            "distances": [round(float(d), 1) for d in self.distances],
+            "makespan": round(self.makespan, 1),
+        }
+
+
+def _turn_angles(xy: np.ndarray) -> np.ndarray:
+    """Returns the heading changes at the inner vertices of a polyline, in
+    radians, between 0 and pi.
+    """
+    if len(xy) < 3:
+        return np.empty(0)
+
+    seg = np.diff(xy, axis=0)
+    a, b = seg[:-1], seg[1:]
+    cross = a[:, 0] * b[:, 1] - a[:, 1] * b[:, 0]
+    dot = np.einsum("ij,ij->i", a, b)
+    return np.abs(np.arctan2(cross, dot))
+
+
+def _turn_penalty(angles: np.ndarray, model: FlightModel) -> float:
+    """Returns the extra time needed to negotiate the given turns compared to
+    flying through them at cruise speed, in seconds.
+    """
+    if not len(angles):
+        return 0.0
+
+    v = model.cruise_speed
+    if model.turn_radius > 0:
+        # Fixed wing: the arc of the turn is longer than the chord that the
+        # straight segments would cut
+        r = model.turn_radius
+        extra = r * (angles - 2 * np.sin(angles / 2))
+        return float(extra.sum() / v)
+
+    # Multirotor: slow down to a corner speed that decreases linearly with
+    # the heading change (full stop at a U-turn) and accelerate again. The
+    # time lost compared to cruising is (v - v_c)^2 / (a * v).
+    corner_speed = v * (1 - angles / np.pi)
+    return float(((v - corner_speed) ** 2).sum() / (model.acceleration * v))
+
+
+def estimate_path_time(
+    path: np.ndarray,
+    model: Optional[FlightModel] = None,
+    *,
+    home: Optional[Sequence[float]] = None,
+    altitude: float = 0.0,
+) -> tuple[float, float]:
+    """Estimates the time needed to fly a single path.
+
+    Parameters:
+        path: the path, as longitude-latitude pairs
+        model: the kinematic model of the aircraft; ``None`` means the
+            default model
+        home: the longitude and latitude where the aircraft starts from;
+            ``None`` if the aircraft starts at the first waypoint
+        altitude: the altitude to climb to before the mission, in metres
+
+    Returns:
+        the estimated flight time in seconds and the horizontal distance in
+        metres
+    """
+    model = model or _DEFAULT_MODEL
+    path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+    if home is not None:
+        path = np.concatenate(([home], path))
+    if len(path) == 0:
+        return 0.0, 0.0
+
+    frame = LocalFrame(path[0, 1], path[0, 0])
+    xy = np.column_stack(frame.to_local(path[:, 1], path[:, 0]))
+
+    # Consecutive duplicate waypoints would make turn angles undefined
+    if len(xy) > 1:
+        keep = np.concatenate(([True], np.any(np.diff(xy, axis=0) != 0, axis=1)))
+        xy = xy[keep]
+
+    distance = float(np.hypot(*np.diff(xy, axis=0).T).sum()) if len(xy) > 1 else 0.0
+    time = distance / model.cruise_speed + _turn_penalty(_turn_angles(xy), model)
+    if altitude > 0 and model.climb_rate > 0:
+        time += altitude / model.climb_rate
+
+    return time, distance
+
+
+def estimate_mission_time(
+    paths: Sequence[np.ndarray],
+    model: Optional[FlightModel] = None,
+    *,
+    homes: Optional[Sequence[Optional[Sequence[float]]]] = None,
+    altitude: float = 0.0,
+) -> MissionTimeEstimate:
+    """Estimates the flight times of all the UAVs of a mission.
+
+    Parameters:
+        paths: the paths of the UAVs, as longitude-latitude pairs
+        model: the kinematic model of the aircraft; ``None`` means the
+            default model
+        homes: the longitude and latitude where each UAV starts from, or
+            ``None`` for UAVs that start at the first waypoint of their path
+        altitude: the altitude to climb to before the mission, in metres
+
+    Returns:
+        the estimated flight time and distance of each UAV
+    """
+    if homes is None:
+        homes = [None] * len(paths)
+
+    times = np.zeros(len(paths))
+    distances = np.zeros(len(paths))
+    for index, (path, home) in enumerate(zip(paths, homes)):
+        if len(path) == 0:
+            continue
+        times[index], distances[index] = estimate_path_time(
+            path, model, home=home, altitude=altitude
+        )
+
+    return MissionTimeEstimate(times=times, distances=distances)
@@ -1,8 +1,6 @@
-import csv, os
-import simplekml
-from geopy.distance import distance
-from geopy.point import Point as GeoPoint
 from .latlon2xy import geoToCart, cartToGeo
+from .logger import log as base_log
+from .planning.grid import rectangular_lawnmower
 import numpy as np
 from shapely.geometry import (
     Point,
@@ -17,6 +15,8 @@ from shapely.errors import TopologicalError
 from functools import cmp_to_key
 from math import atan2, degrees, radians, cos, sin
 
+log = base_log.getChild("planning")
+
 
 class SearchGridGenerator:
     def __init__(
@@ -33,113 +33,21 @@ class SearchGridGenerator:
         self.num_of_drones = num_of_drones
         self.grid_spacing = grid_spacing  # in meters
         self.coverage_area = coverage_area  # in meters (width and height)
-        self.output_dir = self._create_output_directory()
         self.origin = origin
-        self.search_csv_file = os.path.join(self.output_dir, "d{}.csv")
-
-    def _create_output_directory(self):
-        base_dir = os.path.join(os.getcwd(), "searchgrid")
-        if not os.path.exists(base_dir):
-            os.makedirs(base_dir)
-
-        # drone_dir = os.path.join(base_dir, f'{self.num_of_drones}drones')
-        # if not os.path.exists(drone_dir):
-        # os.makedirs(drone_dir)
-
-        return base_dir
 
     def generate_grids(self):
-        center_point = GeoPoint(self.center_lat, self.center_lon)
-        full_width = full_height = self.coverage_area
-        rectangle_height = full_height / self.num_of_drones
-
-        west_edge = distance(meters=full_width / 2).destination(center_point, 270)
-        east_edge = distance(meters=full_width / 2).destination(center_point, 90)
-        csv_datas = []
-        for i in range(self.num_of_drones):
-            top_offset = (
-                (i * rectangle_height) - (full_height / 2) + (rectangle_height / 2)
-            )
-            top_center = distance(meters=top_offset).destination(center_point, 0)
-            top = distance(meters=rectangle_height / 2).destination(top_center, 0)
-            bottom = distance(meters=rectangle_height / 2).destination(top_center, 180)
-
-            kml = simplekml.Kml()
-            csv_data = []
-
-            current_lat = bottom.latitude
-            line_number = 0
-            line = kml.newlinestring()
-            line.altitudemode = simplekml.AltitudeMode.clamptoground
-            line.style.linestyle.color = simplekml.Color.red
-            line.style.linestyle.width = 2
-            waypoint_number = 1
-
-            while current_lat <= top.latitude:
-                line_number += 1
-                current_point = GeoPoint(current_lat, west_edge.longitude)
-                east_point = distance(meters=full_width).destination(current_point, 90)
-
-                if line_number % 2 == 1:
-                    csv_data.extend(
-                        [
-                            (current_point.longitude, current_point.latitude),
-                            (east_point.longitude, east_point.latitude),
-                        ]
-                    )
-                    line.coords.addcoordinates(
-                        [
-                            (current_point.longitude, current_point.latitude),
-                            (east_point.longitude, east_point.latitude),
-                        ]
-                    )
-                    kml.newpoint(
-                        name=str(waypoint_number),
-                        coords=[(current_point.longitude, current_point.latitude)],
-                    )
-                    waypoint_number += 1
-                    kml.newpoint(
-                        name=str(waypoint_number),
-                        coords=[(east_point.longitude, east_point.latitude)],
-                    )
-                    waypoint_number += 1
-                else:
-                    csv_data.extend(
-                        [
-                            (east_point.longitude, east_point.latitude),
-                            (current_point.longitude, current_point.latitude),
-                        ]
-                    )
-                    line.coords.addcoordinates(
-                        [
-                            (east_point.longitude, east_point.latitude),
-                            (current_point.longitude, current_point.latitude),
-                        ]
-                    )
-                    kml.newpoint(
-                        name=str(waypoint_number),
-                        coords=[(east_point.longitude, east_point.latitude)],
-                    )
-                    waypoint_number += 1
-                    kml.newpoint(
-                        name=str(waypoint_number),
-                        coords=[(current_point.longitude, current_point.latitude)],
-                    )
-                    waypoint_number += 1
-
-                current_lat = (
-                    distance(meters=self.grid_spacing)
-                    .destination(current_point, 0)
-                    .latitude
-                )
-
-            kml_filename = os.path.join(self.output_dir, f"search-drone-{i+1}.kml")
-            # csv_filename = os.path.join(self.output_dir, f"d{i+1}.csv")
-
-            kml.save(kml_filename)
-            csv_datas.append(csv_data)
-
-        return csv_datas
+        """Generates the lawnmower search grids of the drones.
+
+        Returns:
+            one NumPy array of longitude-latitude pairs for each drone
+        """
+        return rectangular_lawnmower(
+            (self.center_lat, self.center_lon),
+            self.coverage_area,
+            self.coverage_area,
+            self.grid_spacing,
+            self.num_of_drones,
+        )
 
 
 class PolygonSearchGrid:
@@ -303,9 +211,6 @@ class PolygonSearchGrid:
         self.rotation_angle = rotation_angle
         self.origin_gps = origin_gps
         self.endDistance = endDistance
-        self.output_dir = self._create_output_directory()
-        # os.makedirs(self.output_dir, exist_ok=True)
-        self.path = []
         if obstacles_latlon is None:
             obstacles_latlon = []
 
@@ -344,21 +249,6 @@ class PolygonSearchGrid:
 
         self.rotated_polygon = self.rotate_polygon(self.buffered_polygon, self.rtf)
 
-    def _create_output_directory(self):
-        base_dir = os.path.join(os.getcwd(), "searchgrid")
-        if not os.path.exists(base_dir):
-            os.makedirs(base_dir)
-
-        for filename in os.listdir(base_dir):
-            file_path = os.path.join(base_dir, filename)
-            try:
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
-            except Exception as e:
-                print(f"Error deleting file {file_path}: {e}")
-
-        return base_dir
-
     def gps_to_image_coords(self, gps_list):
         # print("gps_list", gps_list, gps_list[0])
         # If gps_list contains floats instead of pairs, raise a clear error
@@ -442,47 +332,30 @@ class PolygonSearchGrid:
         self.drone_paths = drone_paths
         return drone_paths
 
-    def save_paths(self):
+    def to_geo_paths(self):
+        """Converts the generated paths of the drones to geodetic coordinates.
+
+        Paths that turned out to be empty are returned as empty arrays so the
+        i-th path still belongs to the i-th drone.
+
+        Returns:
+            one NumPy array of longitude-latitude pairs for each drone
+        """
         if not hasattr(self, "drone_paths"):
             raise RuntimeError("Paths not generated yet. Call generate_paths() first.")
 
-        for i, path in enumerate(self.drone_paths):
+        result = []
+        for drone_id, path in enumerate(self.drone_paths, start=1):
             if path is None or len(path) == 0:
-                print(f"Drone {i+1} path is empty. Skipping.")
+                log.warning(f"No path was generated for drone {drone_id}")
+                result.append(np.empty((0, 2)))
                 continue
 
-            kml = simplekml.Kml()
-            ls = kml.newlinestring(name=f"Drone {i+1} Path")
-            ls.altitudemode = simplekml.AltitudeMode.clamptoground
-            ls.style.linestyle.color = simplekml.Color.red
-            ls.style.linestyle.width = 2
-
-            csv_data = []
-            latlon = []
-            waypoint_number = 1
-            for pt in path:
-                lonlat = cartToGeo(self.origin_gps, self.endDistance, [pt[0], pt[1]])
-                ls.coords.addcoordinates([(lonlat[1], lonlat[0])])
-                csv_data.append((float(lonlat[1]), float(lonlat[0])))
-                # x,y = geoToCart(self.origin_gps,500000,[lonlat[0], lonlat[1]])
-                # csv_data.append([x/2,y/2])
-                latlon.append((float(lonlat[1]), float(lonlat[0])))
-                kml.newpoint(name=str(waypoint_number), coords=[(lonlat[1], lonlat[0])])
-                waypoint_number += 1
-            self.path.append(latlon)
-            kml_path = os.path.join(self.output_dir, f"search-drone-{i+1}.kml")
-            # csv_path = os.path.join(self.output_dir, f"d{i+1}.csv")
-
-            kml.save(kml_path)
-            # print(f"Saved KML for drone {i+1} to {kml_path}")
-
-            # with open(csv_path, 'w', newline='') as csvfile:
-            #     writer = csv.writer(csvfile)
-            #     # writer.writerow(['latitude', 'longitude'])
-            #     writer.writerows(csv_data)
-            # print(f"Saved CSV for drone {i+1} to {csv_path}")
-        # print(self.path, "@@@@@")
-        return self.path
+            path = np.asarray(path, dtype=np.float64)
+            lat, lon = cartToGeo(self.origin_gps, self.endDistance, path.T)
+            result.append(np.column_stack((lon, lat)))
+
+        return result
 
 
 # Example usage:
@@ -533,4 +406,4 @@ class PolygonSearchGrid:
 # )
 
 # planner.generate_paths()
-# planner.save_paths()
+# planner.to_geo_paths()
@@ -13,6 +13,7 @@ minutes: int = 0
 seconds: int = 0
 removed_uav_grid_file_name = []
 removed_uav_grid_path_length = []
+removed_uav_ids: list = []
 gimbal_target = []
 mission = []
 mission_index: int = 0
@@ -305,6 +306,23 @@ def getRemovedUAVgridpathlength():
     return removed_uav_grid_path_length
 
 
+def add_removed_uav_id(uav_id):
+    global removed_uav_ids
+    if str(uav_id) not in removed_uav_ids:
+        removed_uav_ids.append(str(uav_id))
+
+
+def discard_removed_uav_id(uav_id):
+    global removed_uav_ids
+    if str(uav_id) in removed_uav_ids:
+        removed_uav_ids.remove(str(uav_id))
+
+
+def get_removed_uav_ids():
+    global removed_uav_ids
+    return removed_uav_ids
+
+
 def find_value_in_dict(value_to_find, data_dict):
     for key, values in data_dict.items():
         if value_to_find in values:
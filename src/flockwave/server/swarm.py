@@ -1,16 +1,32 @@
-import socket, time, csv
+import socket, time
 from math import radians, cos, sin, sqrt, atan2
-from .search import SearchGridGenerator, PolygonSearchGrid
-from .navigate import NavigationGridGenerator
-from .AutoMission import AutoSplitMission
 from .latlon2xy import distance_bearing
 
 # from .swarm_autoscript import TerminalManager
 
 # from .SpecificSplitMission import SpecificSplitMission
 # from .time import TimeCalculation
-from .multipoly_specificgrid import PolygonSpecificSplit
-from .multipoly_grid import PolygonAutoSplit
+
+# The planners (and the shapely / SciPy stack behind them) are imported
+# lazily in the functions that need them to keep the startup time low. They
+# run in the planner pool when the planner_pool extension is loaded.
+
+
+class _LazyUDPSocket:
+    """UDP socket that is created when it is used for the first time, so
+    importing this module does not open any sockets.
+    """
+
+    __slots__ = ("_socket",)
+
+    def __init__(self):
+        self._socket = None
+
+    def __getattr__(self, name):
+        sock = self._socket
+        if sock is None:
+            sock = self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        return getattr(sock, name)
 
 
 def fetch_file_content(file_path):
@@ -40,13 +56,10 @@ def fetch_file_content(file_path):
 # adderss = {1: ("192.168.6.200", 12002), 2: ("192.168.6.200", 12008)}
 
 
-def compute_grid_spacing(uav_altitude, zoom_step, overlap_percentage):
-    print(
-        "uav_altitude, zoom_step, overlap_percentage",
-        uav_altitude,
-        zoom_step,
-        overlap_percentage,
-    )
+def compute_camera_footprint(uav_altitude, zoom_step):
+    """Returns the width and height of the ground area seen by the camera,
+    in metres, when looking straight down from the given altitude.
+    """
     ##IO
     # sensor_width = 7.68
     # sensor_height = 6.14
@@ -57,6 +70,17 @@ def compute_grid_spacing(uav_altitude, zoom_step, overlap_percentage):
     focal_length = 4.7
     dx = (uav_altitude / (focal_length * zoom_step)) * sensor_width
     dy = (uav_altitude / (focal_length * zoom_step)) * sensor_height
+    return dx, dy
+
+
+def compute_grid_spacing(uav_altitude, zoom_step, overlap_percentage):
+    print(
+        "uav_altitude, zoom_step, overlap_percentage",
+        uav_altitude,
+        zoom_step,
+        overlap_percentage,
+    )
+    dx, _ = compute_camera_footprint(uav_altitude, zoom_step)
 
     grid_spacing = dx * (1 - (overlap_percentage / 100))
 
@@ -64,7 +88,7 @@ def compute_grid_spacing(uav_altitude, zoom_step, overlap_percentage):
 
 
 master_num = 0
-udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+udp_socket = _LazyUDPSocket()
 # server_address1 = ("192.168.6.151", 12008)
 # udp_socket2 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 # server_address2 = ("192.168.6.152", 12008)
@@ -93,26 +117,26 @@ origin = (12.58228, 79.865131)  # hanumanthapuram
 # origin = (30.351921, 76.852759)  # chandigarh
 # origin = (12.961654, 80.041917)  # dce
 
-share_data_udp_socket1 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+share_data_udp_socket1 = _LazyUDPSocket()
 share_data_server_address1 = ("192.168.6.151", 12008)
-share_data_udp_socket2 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+share_data_udp_socket2 = _LazyUDPSocket()
 share_data_server_address2 = ("192.168.6.152", 12008)
-share_data_udp_socket3 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+share_data_udp_socket3 = _LazyUDPSocket()
 share_data_server_address3 = ("192.168.6.153", 12008)
-share_data_udp_socket4 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+share_data_udp_socket4 = _LazyUDPSocket()
 share_data_server_address4 = ("192.168.6.154", 12008)
-share_data_udp_socket5 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+share_data_udp_socket5 = _LazyUDPSocket()
 share_data_server_address5 = ("192.168.6.155", 12008)
 
-file_sock1 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+file_sock1 = _LazyUDPSocket()
 file_server_address1 = ("192.168.6.151", 12003)
-file_sock2 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+file_sock2 = _LazyUDPSocket()
 file_server_address2 = ("192.168.6.154", 12003)
-file_sock3 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+file_sock3 = _LazyUDPSocket()
 file_server_address3 = ("192.168.6.153", 12003)
-file_sock4 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+file_sock4 = _LazyUDPSocket()
 file_server_address4 = ("192.168.6.154", 12003)
-file_sock5 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+file_sock5 = _LazyUDPSocket()
 file_server_address5 = ("192.168.6.155", 12003)
 # file_sock6 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 # file_server_address6 = ('192.168.6.156', 12003)
@@ -125,13 +149,13 @@ file_server_address5 = ("192.168.6.155", 12003)
 # file_sock10 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
 # file_server_address10 = ("192.168.6.160", 12003)
 
-mavlink_sock1 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+mavlink_sock1 = _LazyUDPSocket()
 mavlink_server_address1 = ("192.168.6.151", 12045)
 
-mavlink_sock2 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+mavlink_sock2 = _LazyUDPSocket()
 mavlink_server_address2 = ("192.168.6.152", 12045)
 
-mavlink_sock3 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+mavlink_sock3 = _LazyUDPSocket()
 mavlink_server_address3 = ("192.168.6.153", 12045)
 
 # mavlink_sock4 = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -182,33 +206,19 @@ def haversine(lat1, lon1, lat2, lon2):
 
 
 def calculate_flight_time():
+    import numpy as np
+    from .planning.timing import FlightModel, estimate_mission_time
+
     global flight_time_var, csv_files
-    total_distance = 0
-    num_uavs = 0
-
-    for uav, csv_path in csv_files.items():
-        lat_lon_points = []
-        with open(csv_path, "rt") as csvfile:
-            csv_reader = csv.reader(csvfile)
-            next(csv_reader)  # Skip the header (first row)
-            for row in csv_reader:
-                lat, lon = map(float, row)
-                lat_lon_points.append((lat, lon))
-
-        total_distance_uav = 0
-        for i in range(len(lat_lon_points) - 1):
-            lat1, lon1 = lat_lon_points[i]
-            lat2, lon2 = lat_lon_points[i + 1]
-            distance = haversine(lat1, lon1, lat2, lon2)
-            total_distance_uav += distance
-
-        total_distance += total_distance_uav
-        num_uavs += 1
-
-    average_total_distance = total_distance / num_uavs
+
+    # The CSV files contain latitude-longitude pairs after a header row
+    paths = [
+        np.loadtxt(csv_path, delimiter=",", skiprows=1, ndmin=2)[:, ::-1]
+        for csv_path in csv_files.values()
+    ]
     average_speed = 3  # Assume average speed between 4 m/s and 5 m/s
-    flight_time_seconds = average_total_distance / average_speed
-    flight_time_minutes = flight_time_seconds / 60
+    estimate = estimate_mission_time(paths, FlightModel(cruise_speed=average_speed))
+    flight_time_minutes = float(estimate.times.mean()) / 60
 
     flight_time_var.set("Flight Time = {:.2f} minutes".format(flight_time_minutes))
 
@@ -315,6 +325,8 @@ def takeoff_socket(alt):
 
 
 def search_socket(points, camAlt, overlap, zoomLevel, coverage, ids):
+    from .planning.jobs import run_job
+
     global udp_socket, master_num, origin
     print("Searching........", points, len(points))
     # points = [[float(lon), float(lat)] for lon, lat in points]
@@ -339,15 +351,9 @@ def search_socket(points, camAlt, overlap, zoomLevel, coverage, ids):
         print(data, points, len(ids), gridspacing, coverage)
         udp_socket.sendto(data.encode(), addersses[int(master_num)]["data"])
 
-        curve = SearchGridGenerator(
-            origin=origin,
-            center_latitude=points[0][0],
-            center_longitude=points[0][1],
-            coverage_area=coverage,
-            grid_spacing=gridspacing,
-            num_of_drones=len(ids),
+        path = run_job(
+            "search_grid", (points[0][0], points[0][1]), coverage, gridspacing, len(ids)
         )
-        path = curve.generate_grids()
         print("path", path)
         # return path, 30
 
@@ -366,20 +372,12 @@ def search_socket(points, camAlt, overlap, zoomLevel, coverage, ids):
         print(points, len(ids), gridspacing, coverage)
         udp_socket.sendto(data.encode(), addersses[int(master_num)]["data"])
 
-        planner = PolygonSearchGrid(
-            polygon_latlon=points,
-            origin_gps=origin,
-            endDistance=500000,
-            num_drones=len(ids),
-            grid_spacing=gridspacing,
-            rotation_angle=90,
-            obstacles_latlon=[],
-        )
-
-        planner.generate_paths()
-        path = planner.save_paths()
+        path = run_job("polygon_search", points, origin, gridspacing, len(ids))
     # print("path search!!!!!",path,len(path))
-    return path, 30
+    from .planning.timing import estimate_mission_time
+
+    estimate = estimate_mission_time(path, altitude=float(camAlt or 0.0))
+    return path, estimate.makespan_minutes
 
 
 def aggregate_socket(points):
@@ -563,6 +561,8 @@ SwarmChainList = [True, True, True, True, True, True, True, True, True]
 
 
 def navigate(center_latlon, camAlt, overlap, zoomLevel, coverage, ids):
+    from .planning.jobs import run_job
+
     gridspacing = compute_grid_spacing(camAlt, zoomLevel, overlap)
     global master_num, udp_socket, origin
     latlng = str(str(center_latlon[0][1]) + "," + str(center_latlon[0][0]))
@@ -580,15 +580,9 @@ def navigate(center_latlon, camAlt, overlap, zoomLevel, coverage, ids):
 
     udp_socket.sendto(data.encode(), addersses[int(master_num)]["data"])
 
-    curve = NavigationGridGenerator(
-        origin=origin,
-        center_latitude=center_latlon[0][1],
-        center_longitude=center_latlon[0][0],
-        num_of_drones=1,
-        grid_spacing=gridspacing,
-        coverage_area=coverage,
+    path = run_job(
+        "navigate", (center_latlon[0][1], center_latlon[0][0]), gridspacing, coverage
     )
-    path = curve.navigate_grid()
     print("path", path)
     return path
 
@@ -611,6 +605,8 @@ def skip_point(skip_waypoint):
 
 
 def splitmission(center_latlon, uavs, gridspace, coverage, featureType):
+    from .planning.jobs import run_job
+
     global master_num, udp_socket, origin
     if featureType == "points":
         center_latlon = [[[float(lon), float(lat)]] for [[lon, lat]] in center_latlon]
@@ -633,19 +629,7 @@ def splitmission(center_latlon, uavs, gridspace, coverage, featureType):
 
         udp_socket.sendto(data.encode(), addersses[int(master_num)]["data"])
         center_latlon = [coord[0] for coord in center_latlon]
-        split = AutoSplitMission(
-            origin=origin,
-            center_lat_lons=center_latlon,
-            num_of_drones=len(uavs),
-            grid_spacing=gridspace,
-            coverage_area=coverage,
-        )
-        isDone = split.GroupSplitting(
-            center_lat_lons=center_latlon,
-            num_of_drones=len(uavs),
-            grid_spacing=gridspace,
-            coverage_area=coverage,
-        )
+        isDone = run_job("group_split", center_latlon, len(uavs), gridspace, coverage)
         # path = split.return_latlon()
         # print("..................................", isDone, len(isDone))
         return isDone
@@ -665,23 +649,16 @@ def splitmission(center_latlon, uavs, gridspace, coverage, featureType):
 
         udp_socket.sendto(data.encode(), addersses[int(master_num)]["data"])
 
-        planner = PolygonAutoSplit(
-            polygon_latlon_list=center_latlon,
-            origin_gps=origin,
-            endDistance=500000,
-            num_drones=len(uavs),
-            grid_spacing=gridspace,
-            rotation_angle=90,
-            obstacles_latlon_list=[],
-        )
-
-        path1 = planner.generate_paths()
-        path = planner.save_paths()
+        path = run_job("polygon_split", center_latlon, origin, gridspace, len(uavs))
         # print(path, len(path), "SPLIT@")
         return path
 
 
-def specificsplit(center_latlon, uavs, gridspace, coverage, featureType):
+def specificsplit(
+    center_latlon, uavs, gridspace, coverage, featureType, order_uavs=None
+):
+    from .planning.jobs import run_job
+
     global master_num, udp_socket, origin
     grid = []
     coverageSpace = []
@@ -690,19 +667,20 @@ def specificsplit(center_latlon, uavs, gridspace, coverage, featureType):
         coverageSpace.append(coverage)
     print(center_latlon, uavs, gridspace, coverage)
 
-    split = AutoSplitMission(
-        origin=origin,
-        center_lat_lons=center_latlon,
-        num_of_drones=len(uavs),
-        grid_spacing=gridspace,
-        coverage_area=coverage,
-    )
-    path = split.GroupSplitting(
-        center_lat_lons=center_latlon,
-        num_of_drones=len(uavs),
-        grid_spacing=gridspace,
-        coverage_area=coverage,
+    path = run_job(
+        "specific_split",
+        center_latlon,
+        [len(group) for group in uavs],
+        gridspace,
+        coverage,
     )
+
+    # The master hands out the paths of each group to the UAVs of the group in
+    # the order they are listed; order_uavs() may reorder them based on the
+    # planned paths before they are sent
+    if order_uavs is not None:
+        uavs = order_uavs(path, uavs)
+
     data = str(
         "specificsplit"
         + "_"
@@ -716,7 +694,7 @@ def specificsplit(center_latlon, uavs, gridspace, coverage, featureType):
     )
     udp_socket.sendto(data.encode(), addersses[int(master_num)]["data"])
 
-    return path
+    return path, uavs
 
 
 def compute_antenna_az(
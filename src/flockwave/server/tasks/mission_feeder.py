@@ -0,0 +1,222 @@
+from abc import ABCMeta, abstractmethod
+from logging import Logger
+from trio import CancelScope, Event, TooSlowError, fail_after
+from typing import Optional, Sequence
+
+import numpy as np
+
+__all__ = ("MissionFeederBase",)
+
+
+class MissionFeederBase(metaclass=ABCMeta):
+    """Base class for objects that feed a path that is too long to fit into
+    the mission storage of an autopilot to a UAV, a window of a few waypoints
+    at a time.
+
+    The full path is kept in memory as a compact integer array. The first
+    window of the path is uploaded as the mission of the UAV; when the UAV
+    gets close to the end of the window, the next window, starting from the
+    waypoint that the UAV is heading to, is uploaded and the UAV is told to
+    continue from the start of the new window.
+
+    Attributes:
+        window_size: maximum number of waypoints uploaded to the UAV at once
+        refill_margin: the next window is uploaded when fewer waypoints than
+            this remain in the current window after the one that the UAV is
+            heading to
+        timeout: maximum number of seconds to wait for the UAV to report its
+            current mission item before the feeder gives up
+    """
+
+    altitude: float
+    refill_margin: int
+    timeout: float
+    window_size: int
+
+    _cancel_scope: Optional[CancelScope]
+    _current: Optional[int]
+    _current_changed: Event
+    _log: Optional[Logger]
+    _offset: int
+    _restarting: bool
+    _waypoints: np.ndarray
+    _window_length: int
+
+    def __init__(
+        self,
+        path: Sequence[Sequence[float]],
+        altitude: float,
+        *,
+        window_size: int = 100,
+        refill_margin: Optional[int] = None,
+        timeout: float = 5.0,
+        log: Optional[Logger] = None,
+    ):
+        """Constructor.
+
+        Parameters:
+            path: the waypoints of the path, as longitude-latitude pairs
+            altitude: the altitude of the waypoints, relative to the home
+                position, in metres
+            window_size: maximum number of waypoints uploaded to the UAV at
+                once
+            refill_margin: number of waypoints left in the current window
+                below which the next window is uploaded; `None` means one
+                fifth of the window size
+            timeout: maximum number of seconds to wait for the UAV to report
+                its current mission item before the feeder gives up; should
+                not be shorter than the time after which the link to the UAV
+                is considered lost
+            log: optional logger to use for logging messages
+        """
+        if window_size < 2:
+            raise ValueError("window size must be at least 2")
+        if refill_margin is None:
+            refill_margin = max(window_size // 5, 1)
+        if not 0 < refill_margin < window_size:
+            raise ValueError("refill margin must be between zero and the window size")
+
+        path = np.asarray(path, dtype=np.float64).reshape(-1, 2)
+        if not len(path):
+            raise ValueError("path must contain at least one waypoint")
+
+        self.altitude = float(altitude)
+        self.refill_margin = int(refill_margin)
+        self.timeout = float(timeout)
+        self.window_size = int(window_size)
+
+        # Latitudes and longitudes in 1e-7 degrees, the same way as they are
+        # sent to the autopilot; eight bytes per waypoint
+        self._waypoints = np.empty((len(path), 2), dtype=np.int32)
+        self._waypoints[:, 0] = np.round(path[:, 1] * 1e7)
+        self._waypoints[:, 1] = np.round(path[:, 0] * 1e7)
+
+        self._cancel_scope = None
+        self._current = None
+        self._current_changed = Event()
+        self._log = log
+        self._offset = 0
+        self._restarting = False
+        self._window_length = 0
+
+    @property
+    def finished(self) -> bool:
+        """Returns whether the last window of the path was uploaded to the
+        UAV.
+        """
+        return self._window_length > 0 and self._window_end >= len(self._waypoints)
+
+    @property
+    def num_waypoints(self) -> int:
+        """Returns the number of waypoints in the full path."""
+        return len(self._waypoints)
+
+    @property
+    def progress(self) -> Optional[int]:
+        """Returns the index of the waypoint of the full path that the UAV is
+        heading to, or `None` if no window was uploaded yet.
+        """
+        return None if self._current is None else self._offset + self._current
+
+    @property
+    def waypoints(self) -> np.ndarray:
+        """Returns the waypoints of the full path as an array of latitudes and
+        longitudes, in 1e-7 degrees.
+        """
+        return self._waypoints
+
+    def cancel(self) -> None:
+        """Stops feeding the path to the UAV."""
+        if self._cancel_scope is not None:
+            self._cancel_scope.cancel()
+
+    def notify_current(self, index: int) -> None:
+        """Notifies the feeder about the index of the waypoint within the
+        current window that the UAV is heading to.
+
+        This function has to be called whenever the UAV reports its current
+        mission item.
+        """
+        if index < 0 or not self._window_length:
+            return
+
+        if self._restarting:
+            # Until the UAV confirms that it restarted from the beginning of
+            # the new window, the indices it reports may still refer to the
+            # previous window. Those indices are all beyond the point where a
+            # refill is triggered.
+            if index >= self.window_size - self.refill_margin:
+                return
+            self._restarting = False
+
+        self._current = min(index, self._window_length - 1)
+        self._current_changed.set()
+
+    async def run(self) -> None:
+        """Uploads the first window of the path to the UAV and then keeps on
+        uploading the next windows as the UAV progresses along the path.
+        Returns when the last window was uploaded.
+
+        Raises:
+            TooSlowError: if the UAV stopped reporting its current mission item
+        """
+        with CancelScope() as self._cancel_scope:
+            await self._upload_window_from(0)
+
+            while not self.finished:
+                try:
+                    with fail_after(self.timeout):
+                        await self._current_changed.wait()
+                except TooSlowError:
+                    raise TooSlowError(
+                        "UAV stopped reporting its current mission item"
+                    ) from None
+                self._current_changed = Event()
+
+                current = self._current
+                if current is None or not self._should_refill(current):
+                    continue
+
+                await self._upload_window_from(self._offset + current)
+                self._restarting = True
+                await self._set_current_waypoint(0)
+
+                if self._log:
+                    self._log.info(
+                        f"Uploaded waypoints {self._offset + 1}-{self._window_end} "
+                        f"of {self.num_waypoints}"
+                    )
+
+    @property
+    def _window_end(self) -> int:
+        return self._offset + self._window_length
+
+    def _should_refill(self, current: int) -> bool:
+        return self._window_length - current - 1 < self.refill_margin
+
+    async def _upload_window_from(self, offset: int) -> None:
+        window = self._waypoints[offset : offset + self.window_size]
+        await self._upload_window(window, self.altitude)
+        self._offset = offset
+        self._window_length = len(window)
+        self._current = 0
+
+    @abstractmethod
+    async def _upload_window(self, waypoints: np.ndarray, altitude: float) -> None:
+        """Uploads the given waypoints as the mission of the UAV, replacing
+        the previous window.
+
+        Parameters:
+            waypoints: the waypoints of the window, as an array of latitudes
+                and longitudes, in 1e-7 degrees
+            altitude: the altitude of the waypoints, relative to the home
+                position, in metres
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    async def _set_current_waypoint(self, index: int) -> None:
+        """Instructs the UAV to head to the waypoint with the given index
+        within the current window.
+        """
+        raise NotImplementedError
@@ -0,0 +1,128 @@
+"""Utility functions to measure the startup time of the server."""
+
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+import re
+import subprocess
+import sys
+
+__all__ = (
+    "ImportTimeRecord",
+    "format_import_time_report",
+    "measure_import_times",
+)
+
+
+@dataclass(frozen=True)
+class ImportTimeRecord:
+    """Import time of a single module, as reported by ``python -X importtime``."""
+
+    module: str
+    """Fully qualified name of the module."""
+
+    self_us: int
+    """Time spent in the module itself, in microseconds."""
+
+    cumulative_us: int
+    """Time spent in the module and the modules it imported, in microseconds."""
+
+    depth: int
+    """Nesting depth of the import; zero for the module that was measured."""
+
+    @property
+    def package(self) -> str:
+        """The top-level package of the module."""
+        return self.module.split(".", 1)[0]
+
+
+_IMPORT_TIME_LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+
+def measure_import_times(
+    module: str, *, timeout: Optional[float] = 120
+) -> list[ImportTimeRecord]:
+    """Imports the given module in a fresh interpreter and returns the import
+    times of all the modules that were loaded as a consequence.
+
+    Parameters:
+        module: the name of the module to import
+        timeout: maximum number of seconds to wait for the import
+
+    Returns:
+        the import time records in the order reported by the interpreter, i.e.
+        nested imports first and the measured module last
+
+    Raises:
+        RuntimeError: if the module could not be imported or the server is
+            running from a packaged executable
+    """
+    from .packaging import is_packaged
+
+    if is_packaged():
+        raise RuntimeError("Import times cannot be measured in a packaged server")
+
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        timeout=timeout,
+    )
+
+    records = []
+    errors = []
+    for line in process.stderr.splitlines():
+        match = _IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            records.append(
+                ImportTimeRecord(
+                    module=name,
+                    self_us=int(self_us),
+                    cumulative_us=int(cumulative_us),
+                    depth=len(indent) // 2,
+                )
+            )
+        elif not line.startswith("import time:"):
+            errors.append(line)
+
+    if process.returncode != 0:
+        raise RuntimeError(f"Failed to import {module}:\n" + "\n".join(errors))
+
+    return records
+
+
+def format_import_time_report(
+    records: list[ImportTimeRecord], module: str, *, limit: int = 20
+) -> str:
+    """Formats a human-readable breakdown of the given import time records.
+
+    Parameters:
+        records: the records returned from `measure_import_times()`
+        module: the name of the module that was measured
+        limit: the number of entries to show in each section
+
+    Returns:
+        the formatted report
+    """
+    total_us = max((r.cumulative_us for r in records if r.module == module), default=0)
+    by_package: defaultdict[str, int] = defaultdict(int)
+    for record in records:
+        by_package[record.package] += record.self_us
+
+    lines = [f"Importing {module} took {total_us / 1000:.1f} ms", ""]
+
+    lines.append("Time spent per top-level package:")
+    packages = sorted(by_package.items(), key=lambda item: item[1], reverse=True)
+    for package, self_us in packages[:limit]:
+        share = self_us / total_us * 100 if total_us else 0.0
+        lines.append(f"  {self_us / 1000:9.1f} ms {share:5.1f}%  {package}")
+
+    lines.append("")
+    lines.append("Slowest modules (including their own imports):")
+    slowest = sorted(records, key=lambda r: r.cumulative_us, reverse=True)
+    for record in slowest[:limit]:
+        lines.append(f"  {record.cumulative_us / 1000:9.1f} ms  {record.module}")
+
+    return "\n".join(lines)
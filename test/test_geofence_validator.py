@@ -0,0 +1,81 @@
+from pytest import approx
+
+import numpy as np
+
+from flockwave.server.geofence_validator import (
+    Fence,
+    SearchAreaValidator,
+    clear_fence_cache,
+    get_fence,
+)
+from flockwave.server.planning.geodesy import LocalFrame
+
+
+def _fence_from_local(frame, xy):
+    lat, lon = frame.to_geo(*np.array(xy, dtype=float).T)
+    return list(zip(lat, lon))
+
+
+def test_local_frame_round_trip():
+    frame = LocalFrame(13.0, 80.0)
+    x, y = frame.to_local([13.01, 12.99], [80.02, 79.99])
+    lat, lon = frame.to_geo(x, y)
+    assert lat == approx([13.01, 12.99], abs=1e-10)
+    assert lon == approx([80.02, 79.99], abs=1e-10)
+
+
+def test_batch_coverage_check_on_non_convex_fence():
+    frame = LocalFrame(13.0, 80.0)
+
+    # L-shaped fence with a notch in the north-east quadrant
+    fence = Fence(
+        _fence_from_local(
+            frame,
+            [(-500, -500), (500, -500), (500, 0), (0, 0), (0, 500), (-500, 500)],
+        )
+    )
+    validator = SearchAreaValidator(fence)
+
+    lat, lon = frame.to_geo(
+        np.array([-250.0, 100.0, 250.0, 700.0]),
+        np.array([-250.0, 100.0, -250.0, -250.0]),
+    )
+    points = list(zip(lat, lon))
+
+    # The second disk is centred in the notch, outside the fence; the fourth
+    # one is east of the fence
+    result = validator.check_coverage(points, 200)
+    assert result.inside.tolist() == [True, False, True, False]
+    assert result.violation[0] == 0
+    assert result.violation[2] == 0
+    assert result.violation[1] == approx(200, abs=0.5)
+    assert result.violation[3] == approx(300, abs=0.5)
+    assert result.max_violation == approx(300, abs=0.5)
+    assert not result.all_inside
+
+    # Disk near the inner corner of the notch: the four compass samples are
+    # all inside the fence but the disk itself pokes into the notch
+    lat, lon = frame.to_geo(np.array([-60.0]), np.array([-60.0]))
+    point = (lat[0], lon[0])
+    assert not validator.is_point_with_coverage_inside(point, 200)
+    result = validator.check_coverage([point], 200)
+    assert result.violation[0] == approx(100 - np.hypot(60, 60), abs=0.5)
+
+    assert validator.are_points_with_coverage_inside([points[0], points[2]], 200)
+
+
+def test_empty_fence_rejects_everything():
+    validator = SearchAreaValidator(Fence([]))
+    result = validator.check_coverage([(13.0, 80.0)], 100)
+    assert result.inside.tolist() == [False]
+
+
+def test_fence_cache():
+    coords = [(13.0, 80.0), (13.0, 80.01), (13.01, 80.01), (13.01, 80.0)]
+    first = get_fence(coords, label="outer")
+    assert get_fence([list(c) for c in coords], label="outer") is first
+    assert get_fence(coords[::-1], label="outer") is not first
+
+    second = get_fence(coords, label="outer")
+    clear_fence_cache()
+    assert get_fence(coords, label="outer") is not second
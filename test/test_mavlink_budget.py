@@ -0,0 +1,127 @@
+from pytest import approx
+
+from flockwave.server.ext.mavlink.budget import (
+    LinkBudgetConfiguration,
+    LinkBudgetManager,
+    TelemetryStream,
+    allocate_stream_rates,
+)
+from flockwave.server.ext.mavlink.enums import MAVMessageType
+
+GLOBAL_POSITION_INT = MAVMessageType.GLOBAL_POSITION_INT
+GPS_RAW_INT = MAVMessageType.GPS_RAW_INT
+SYS_STATUS = MAVMessageType.SYS_STATUS
+
+
+class RadioStatus:
+    def __init__(self, txbuf):
+        self.txbuf = txbuf
+
+
+class UAV:
+    def __init__(self, system_id):
+        self.system_id = system_id
+        self.is_connected = True
+        self.stream_rates = {}
+        self.updates = []
+
+    def set_stream_rates(self, rates):
+        self.stream_rates.update(rates)
+        self.updates.append(rates)
+
+
+class Network:
+    log = None
+
+    def __init__(self, uavs):
+        self._uavs = uavs
+
+    def uavs(self):
+        return self._uavs
+
+
+def test_allocate_stream_rates():
+    streams = LinkBudgetConfiguration().streams
+
+    # Plenty of bandwidth; everything gets its desired rate
+    rates = allocate_stream_rates(1000, streams)
+    assert rates == {GLOBAL_POSITION_INT: 2, SYS_STATUS: 1, GPS_RAW_INT: 1}
+
+    # Minimum rates need 40 + 21.5 + 12.8 = 74.3 bytes/s; the remaining budget
+    # goes to the position stream first
+    rates = allocate_stream_rates(100, streams)
+    assert rates[GLOBAL_POSITION_INT] == approx(1.64)
+    assert rates[SYS_STATUS] == 0.5
+    assert rates[GPS_RAW_INT] == 0.2
+
+    # Minimum rates are granted even if the link is over-subscribed
+    rates = allocate_stream_rates(0, streams)
+    assert rates == {GLOBAL_POSITION_INT: 1, SYS_STATUS: 0.5, GPS_RAW_INT: 0.2}
+
+
+def test_configuration_from_json():
+    config = LinkBudgetConfiguration.from_json(
+        {
+            "capacity": 5000,
+            "streams": [
+                {"message": "SYS_STATUS", "rate": 2, "min_rate": 0.5},
+                {"message": 33, "rate": 4, "size": 30},
+            ],
+        }
+    )
+    assert config.enabled
+    assert config.utilization == 0.7
+    assert config.streams == (
+        TelemetryStream(SYS_STATUS, 2, 0.5, 43),
+        TelemetryStream(GLOBAL_POSITION_INT, 4, 4, 30),
+    )
+    assert LinkBudgetConfiguration.from_json(config.json) == config
+    assert not LinkBudgetConfiguration.DISABLED.enabled
+
+
+def test_manager_scales_rates_with_fleet_size():
+    uavs = [UAV(index + 1) for index in range(10)]
+    network = Network(uavs[:1])
+    manager = LinkBudgetManager(
+        network, LinkBudgetConfiguration(capacity=2000), interval=1
+    )
+
+    # A single drone gets all its desired rates
+    ((uav, rates),) = manager._allocate(network.uavs())
+    assert rates == {GLOBAL_POSITION_INT: 2, SYS_STATUS: 1, GPS_RAW_INT: 1}
+
+    # Ten drones on the same link have to slow down. Drone 1 also uses the
+    # link for something else so it gets even less.
+    for uav in uavs:
+        uav.stream_rates.update(rates)
+    manager.notify_message("radio", 1, 500)
+    manager._update_measurements(1)
+    allocation = dict(manager._allocate(uavs))
+    assert allocation[uavs[0]][GLOBAL_POSITION_INT] == 1
+    assert allocation[uavs[0]][SYS_STATUS] == 0.5
+    assert allocation[uavs[1]] == {
+        GLOBAL_POSITION_INT: 2,
+        SYS_STATUS: approx(0.61),
+        GPS_RAW_INT: 0.2,
+    }
+    assert manager.stream_rates == allocation[uavs[1]]
+
+
+def test_manager_backs_off_when_link_is_congested():
+    manager = LinkBudgetManager(Network([]), LinkBudgetConfiguration(capacity=5000))
+
+    manager.notify_message("radio", 1, 1000)
+    manager.notify_radio_status(RadioStatus(txbuf=80))
+    manager.notify_radio_status(RadioStatus(txbuf=20))
+    manager._update_measurements(2)
+    assert manager.bytes_per_second_by_connection == {"radio": 500}
+    assert manager.bytes_per_second_by_system_id == {1: 500}
+    assert manager.scale == 0.75
+
+    manager.notify_message("radio", 1, 6000)
+    manager._update_measurements(1)
+    assert manager.scale == approx(0.5625)
+
+    manager._update_measurements(1)
+    assert manager.bytes_per_second_by_connection == {}
+    assert manager.scale == approx(0.6125)
@@ -0,0 +1,61 @@
+from flockwave.server.ext.mavlink.benchmark import benchmark_inbound_dispatch
+from flockwave.server.ext.mavlink.dispatch import MessageHandlerTable
+
+
+class Message:
+    def __init__(self, type, msgid):
+        self._type = type
+        self._msgid = msgid
+        self.type_lookups = 0
+
+    def get_msgId(self):
+        return self._msgid
+
+    def get_type(self):
+        self.type_lookups += 1
+        return self._type
+
+
+def handle_heartbeat(message, *, connection_id, address):
+    pass
+
+
+def handle_position(uav, message):
+    pass
+
+
+def test_handler_table_resolves_each_type_once():
+    unknown = []
+    table = MessageHandlerTable(
+        {"HEARTBEAT": handle_heartbeat, "PARAM_VALUE": None},
+        {"GLOBAL_POSITION_INT": handle_position},
+        on_unknown=unknown.append,
+    )
+    assert len(table) == 0
+
+    position = Message("GLOBAL_POSITION_INT", 33)
+    assert table.lookup(position) == ("GLOBAL_POSITION_INT", handle_position, True)
+    assert table.lookup(position) == ("GLOBAL_POSITION_INT", handle_position, True)
+    assert position.type_lookups == 1
+    assert 33 in table
+
+    heartbeat = Message("HEARTBEAT", 0)
+    assert table.lookup(heartbeat) == ("HEARTBEAT", handle_heartbeat, False)
+
+    param = Message("PARAM_VALUE", 22)
+    assert table.lookup(param) == ("PARAM_VALUE", None, False)
+    assert not unknown
+
+    attitude = Message("ATTITUDE", 30)
+    assert table.lookup(attitude) == ("ATTITUDE", None, False)
+    assert table.lookup(attitude) == ("ATTITUDE", None, False)
+    assert unknown == [attitude]
+    assert len(table) == 4
+
+
+def test_benchmark_inbound_dispatch():
+    result = benchmark_inbound_dispatch(5, num_messages=500, repeat=1)
+    assert result.num_uavs == 5
+    assert result.legacy_rate > 0
+    assert result.indexed_rate > 0
+    assert "msg/s" in str(result)
@@ -0,0 +1,248 @@
+from collections import Counter
+from itertools import count
+from random import Random
+from trio import Event, current_time, sleep
+
+from pytest import fixture
+
+from flockwave.server.ext.mavlink.ftp import (
+    MAVFTP,
+    MAVFTPErrorCode,
+    MAVFTPMessage,
+    MAVFTPOpCode,
+)
+from flockwave.server.show.utils import crc32_mavftp
+
+
+class Message:
+    def __init__(self, payload):
+        self.payload = payload
+
+
+class AsyncBuffer:
+    def __init__(self, data=b""):
+        self.data = bytearray(data)
+        self.position = 0
+
+    async def read(self, size):
+        chunk = bytes(self.data[self.position : self.position + size])
+        self.position += len(chunk)
+        return chunk
+
+    async def write(self, data):
+        self.data += data
+
+
+class SimulatedMAVFTPServer:
+    """MAVFTP server of a simulated UAV, reachable over a link with the given
+    one-way latency and packet loss probability.
+    """
+
+    _SESSION_OPCODES = (
+        MAVFTPOpCode.READ_FILE,
+        MAVFTPOpCode.BURST_READ_FILE,
+        MAVFTPOpCode.WRITE_FILE,
+    )
+
+    def __init__(
+        self,
+        nursery,
+        *,
+        latency=0.05,
+        loss=0.0,
+        burst_size=16,
+        supports_burst_read=True,
+        seed=42,
+    ):
+        self.files = {}
+        self.requests = Counter()
+
+        self._burst_size = burst_size
+        self._latency = latency
+        self._loss = loss
+        self._nursery = nursery
+        self._random = Random(seed)
+        self._session_ids = count(1)
+        self._sessions = {}
+        self._supports_burst_read = supports_burst_read
+        self._waiters = []
+
+    async def send(self, spec, wait_for_response=None):
+        payload = spec[1]["payload"]
+        if not self._is_lost():
+            self._nursery.start_soon(self._receive_request, payload)
+
+        if wait_for_response is None:
+            return
+
+        waiter = [wait_for_response[1], Event(), None]
+        self._waiters.append(waiter)
+        try:
+            await waiter[1].wait()
+            return waiter[2]
+        finally:
+            self._waiters.remove(waiter)
+
+    def _is_lost(self):
+        return self._loss > 0 and self._random.random() < self._loss
+
+    async def _receive_request(self, payload):
+        await sleep(self._latency)
+
+        seq_no = payload[0] + (payload[1] << 8)
+        request = MAVFTPMessage.decode(payload)
+        self.requests[request.opcode] += 1
+
+        for index, reply in enumerate(self._handle(request)):
+            reply.req_opcode = request.opcode
+            if not self._is_lost():
+                message = Message(reply.encode((seq_no + index + 1) % 65536))
+                self._nursery.start_soon(self._send_reply, message, index * 0.005)
+
+    async def _send_reply(self, message, delay):
+        await sleep(self._latency + delay)
+        for waiter in list(self._waiters):
+            matcher, event, _ = waiter
+            if not event.is_set() and matcher(message):
+                waiter[2] = message
+                event.set()
+
+    def _handle(self, request):
+        opcode = request.opcode
+        session_id = request.session_id
+        if opcode in self._SESSION_OPCODES and session_id not in self._sessions:
+            return [self._nak(MAVFTPErrorCode.INVALID_SESSION, session_id)]
+        elif opcode == MAVFTPOpCode.OPEN_FILE_RO:
+            path = request.data.decode("utf-8")
+            if path not in self.files:
+                return [self._nak(MAVFTPErrorCode.FILE_NOT_FOUND)]
+            return [self._open_session(path)]
+        elif opcode == MAVFTPOpCode.CREATE_FILE:
+            path = request.data.decode("utf-8")
+            self.files[path] = bytearray()
+            return [self._open_session(path)]
+        elif opcode == MAVFTPOpCode.READ_FILE:
+            data = self._read(session_id, request.offset, request.size)
+            if not data:
+                return [self._nak(MAVFTPErrorCode.EOF, session_id)]
+            return [self._ack(session_id, request.offset, data)]
+        elif opcode == MAVFTPOpCode.BURST_READ_FILE:
+            if not self._supports_burst_read:
+                return [self._nak(MAVFTPErrorCode.UNKNOWN_COMMAND, session_id)]
+
+            replies = []
+            offset = request.offset
+            for _ in range(self._burst_size):
+                data = self._read(session_id, offset, request.size)
+                if not data:
+                    replies.append(self._nak(MAVFTPErrorCode.EOF, session_id))
+                    return replies
+                replies.append(self._ack(session_id, offset, data))
+                offset += len(data)
+            replies[-1].burst_complete = True
+            return replies
+        elif opcode == MAVFTPOpCode.WRITE_FILE:
+            contents = self.files[self._sessions[session_id]]
+            end = request.offset + len(request.data)
+            if len(contents) < end:
+                contents.extend(bytes(end - len(contents)))
+            contents[request.offset : end] = request.data
+            return [self._ack(session_id, request.offset)]
+        elif opcode == MAVFTPOpCode.CALC_FILE_CRC32:
+            crc = crc32_mavftp(bytes(self.files[request.data.decode("utf-8")]))
+            return [self._ack(data=crc.to_bytes(4, "little"))]
+        elif opcode == MAVFTPOpCode.TERMINATE_SESSION:
+            self._sessions.pop(session_id, None)
+            return [self._ack(session_id)]
+        elif opcode == MAVFTPOpCode.RESET_SESSIONS:
+            self._sessions.clear()
+            return [self._ack()]
+        else:
+            return [self._nak(MAVFTPErrorCode.UNKNOWN_COMMAND, session_id)]
+
+    def _ack(self, session_id=0, offset=0, data=b""):
+        return MAVFTPMessage(
+            MAVFTPOpCode.ACK, session_id=session_id, offset=offset, data=data
+        )
+
+    def _nak(self, code, session_id=0):
+        return MAVFTPMessage(
+            MAVFTPOpCode.NAK, session_id=session_id, data=bytes([code])
+        )
+
+    def _open_session(self, path):
+        session_id = next(self._session_ids)
+        self._sessions[session_id] = path
+        size = len(self.files[path]).to_bytes(4, "little")
+        return self._ack(session_id, data=size)
+
+    def _read(self, session_id, offset, size):
+        return bytes(self.files[self._sessions[session_id]][offset : offset + size])
+
+
+@fixture
+def contents():
+    return Random(1).randbytes(20000)
+
+
+async def download(server, path, **kwds):
+    ftp = MAVFTP(server.send, **kwds)
+    buffer = AsyncBuffer()
+    started_at = current_time()
+    await ftp.get(path, buffer)
+    return bytes(buffer.data), ftp.statistics, current_time() - started_at
+
+
+async def upload(server, contents, path, **kwds):
+    ftp = MAVFTP(server.send, **kwds)
+    started_at = current_time()
+    await ftp.put(AsyncBuffer(contents), path)
+    return ftp.statistics, current_time() - started_at
+
+
+async def test_burst_download(nursery, autojump_clock, contents):
+    server = SimulatedMAVFTPServer(nursery)
+    server.files["show.skyb"] = contents
+
+    data, stats, burst_duration = await download(server, "show.skyb")
+    assert data == contents
+    assert server.requests[MAVFTPOpCode.BURST_READ_FILE] == 6
+    assert server.requests[MAVFTPOpCode.READ_FILE] == 1
+    assert stats.bytes_read == len(contents)
+    assert stats.retries == 0
+    assert stats.throughput > 0
+
+    server = SimulatedMAVFTPServer(nursery, supports_burst_read=False)
+    server.files["show.skyb"] = contents
+
+    data, stats, duration = await download(server, "show.skyb")
+    assert data == contents
+    assert server.requests[MAVFTPOpCode.BURST_READ_FILE] == 1
+    assert server.requests[MAVFTPOpCode.READ_FILE] == 84
+    assert duration > 5 * burst_duration
+
+
+async def test_burst_download_over_lossy_link(nursery, autojump_clock, contents):
+    server = SimulatedMAVFTPServer(nursery, loss=0.1)
+    server.files["show.skyb"] = contents
+
+    data, stats, _ = await download(server, "show.skyb")
+    assert data == contents
+    assert stats.gaps > 0
+    assert stats.retries > 0
+    assert stats.bytes_read == len(contents)
+
+
+async def test_windowed_upload_over_lossy_link(nursery, autojump_clock, contents):
+    server = SimulatedMAVFTPServer(nursery, loss=0.1)
+    stats, duration = await upload(server, contents, "collmot/show.skyb")
+    assert server.files["collmot/show.skyb"] == contents
+    assert stats.bytes_written == len(contents)
+    assert stats.retries > 0
+
+    server = SimulatedMAVFTPServer(nursery, loss=0.1)
+    _, sequential_duration = await upload(
+        server, contents, "collmot/show.skyb", window_size=1
+    )
+    assert server.files["collmot/show.skyb"] == contents
+    assert sequential_duration > 2 * duration
@@ -0,0 +1,179 @@
+from pytest import fixture
+
+from flockwave.protocols.mavlink.dialects.v20 import ardupilotmega as dialect
+from flockwave.server.ext.mavlink.enums import MAVCommand, MAVMissionResult
+from flockwave.server.ext.mavlink.loadgen import (
+    SimulatedVehicle,
+    decode_latency_marker,
+    encode_latency_marker,
+    iter_tlog,
+    percentile,
+    rewrite_system_id,
+)
+
+
+class Outbox(list):
+    def write(self, data):
+        self.append(bytes(data))
+
+
+@fixture
+def gcs():
+    outbox = Outbox()
+    mav = dialect.MAVLink(outbox, srcSystem=255, srcComponent=190)
+    return mav, outbox
+
+
+def decode(frames):
+    parser = dialect.MAVLink(None)
+    return parser.parse_buffer(b"".join(frames)) or []
+
+
+def send(vehicle, gcs, name, *args, **kwds):
+    mav, outbox = gcs
+    getattr(mav, f"{name}_send")(*args, **kwds)
+    vehicle.feed(b"".join(outbox), 0.0)
+    outbox.clear()
+    messages = decode(vehicle.outbox)
+    vehicle.outbox.clear()
+    return messages
+
+
+def test_latency_marker():
+    for system_id, slot in ((1, 0), (42, 999), (254, 1234)):
+        marker = encode_latency_marker(system_id, slot)
+        assert decode_latency_marker(marker) == (system_id, slot % 1000)
+
+    assert decode_latency_marker(12000) is None
+    assert decode_latency_marker(None) is None
+
+
+def test_percentile():
+    assert percentile([], 50) is None
+    assert percentile([3.0], 99) == 3.0
+    assert percentile([4.0, 1.0, 3.0, 2.0], 50) == 2.5
+    assert percentile([4.0, 1.0, 3.0, 2.0], 100) == 4.0
+
+
+def test_tlog_parsing_and_system_id_rewriting(gcs):
+    mav, outbox = gcs
+    mav.heartbeat_send(2, 3, 0, 0, 4)
+    mav.param_value_send(b"RTL_ALT", 1500.0, 9, 10, 3)
+
+    log = b"garbage"
+    for index, frame in enumerate(outbox):
+        log += (1000000 + index).to_bytes(8, "big") + frame
+    log += (2000000).to_bytes(8, "big") + outbox[0][:-3]
+
+    frames = list(iter_tlog(log))
+    assert [timestamp for timestamp, _ in frames] == [1000000, 1000001]
+    assert [frame for _, frame in frames] == outbox
+
+    def crc_extras(msgid):
+        return dialect.mavlink_map[msgid].crc_extra
+
+    rewritten = [rewrite_system_id(frame, 17, crc_extras) for _, frame in frames]
+    messages = decode(rewritten)
+    assert [message.get_type() for message in messages] == ["HEARTBEAT", "PARAM_VALUE"]
+    assert all(message.get_srcSystem() == 17 for message in messages)
+    assert messages[1].param_value == 1500.0
+
+
+def test_vehicle_streams_telemetry():
+    vehicle = SimulatedVehicle(
+        7, dialect, rates={"GLOBAL_POSITION_INT": 5, "GPS_RAW_INT": 0}
+    )
+    vehicle.start(0.0)
+    assert 0 <= vehicle.next_deadline < 1
+
+    assert vehicle.tick(1.0) == 3
+    assert vehicle.tick(1.1) == 0
+    assert vehicle.tick(1.25) == 1
+
+    messages = decode(vehicle.outbox)
+    assert [message.get_type() for message in messages] == [
+        "HEARTBEAT",
+        "GLOBAL_POSITION_INT",
+        "SYS_STATUS",
+        "GLOBAL_POSITION_INT",
+    ]
+    assert all(message.get_srcSystem() == 7 for message in messages)
+    assert decode_latency_marker(messages[-1].relative_alt) == (7, 1)
+    assert vehicle.position_sent_at[1] == 1.25
+
+
+def test_vehicle_commands_and_params(gcs):
+    vehicle = SimulatedVehicle(3, dialect)
+
+    replies = send(
+        vehicle,
+        gcs,
+        "command_long",
+        3,
+        1,
+        MAVCommand.REQUEST_AUTOPILOT_CAPABILITIES,
+        0,
+        1,
+        0,
+        0,
+        0,
+        0,
+        0,
+        0,
+    )
+    assert [reply.get_type() for reply in replies] == [
+        "AUTOPILOT_VERSION",
+        "COMMAND_ACK",
+    ]
+
+    # Commands to other vehicles are ignored
+    assert not send(vehicle, gcs, "command_long", 4, 1, 400, 0, 1, 0, 0, 0, 0, 0, 0)
+
+    (reply,) = send(vehicle, gcs, "param_set", 3, 1, b"RTL_ALT", 2000.0, 9)
+    assert reply.get_type() == "PARAM_VALUE"
+    assert reply.param_value == 2000.0
+
+    (reply,) = send(vehicle, gcs, "param_request_read", 3, 1, b"RTL_ALT", -1)
+    assert reply.param_value == 2000.0
+
+
+def test_vehicle_mission_upload_and_download(gcs):
+    vehicle = SimulatedVehicle(3, dialect)
+
+    (reply,) = send(vehicle, gcs, "mission_count", 3, 1, 2, 0)
+    assert reply.get_type() == "MISSION_REQUEST_INT"
+    assert reply.seq == 0
+
+    for seq in range(2):
+        (reply,) = send(
+            vehicle,
+            gcs,
+            "mission_item_int",
+            3,
+            1,
+            seq,
+            3,
+            16,
+            0,
+            1,
+            0,
+            0,
+            0,
+            0,
+            474979000 + seq,
+            190402000,
+            10.0,
+            0,
+        )
+
+    assert reply.get_type() == "MISSION_ACK"
+    assert reply.type == MAVMissionResult.ACCEPTED
+    assert len(vehicle.missions[0]) == 2
+
+    (reply,) = send(vehicle, gcs, "mission_request_list", 3, 1, 0)
+    assert reply.get_type() == "MISSION_COUNT"
+    assert reply.count == 2
+
+    (reply,) = send(vehicle, gcs, "mission_request_int", 3, 1, 1, 0)
+    assert reply.get_type() == "MISSION_ITEM_INT"
+    assert reply.x == 474979001
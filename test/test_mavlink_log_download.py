@@ -0,0 +1,188 @@
+from random import Random
+from trio import TooSlowError, current_time, sleep, sleep_forever
+
+from pytest import fixture, raises
+
+from flockwave.concurrency import aclosing
+from flockwave.server.ext.mavlink.log_download import (
+    MAVLinkLogDownloader,
+    PartialLogFile,
+)
+from flockwave.server.ext.mavlink.utils import BandwidthLimiter, ChunkAssembler
+from flockwave.server.model.commands import Progress
+from flockwave.server.model.log import FlightLog, FlightLogMetadata
+
+
+class Message:
+    def __init__(self, type, **kwds):
+        self._type = type
+        self.__dict__.update(kwds)
+
+    def get_type(self):
+        return self._type
+
+
+class SimulatedLogServer:
+    """Log download service of a simulated UAV that streams LOG_DATA messages
+    at a fixed rate and optionally goes silent after sending a given number
+    of bytes.
+    """
+
+    def __init__(self, nursery, contents, *, interval=0.001, silent_after=None):
+        self.downloader = None
+        self.requested_offsets = []
+
+        self._contents = contents
+        self._interval = interval
+        self._nursery = nursery
+        self._num_sent = 0
+        self._silent_after = silent_after
+
+    async def send(self, spec, wait_for_response=None):
+        type, fields = spec
+        if wait_for_response is None:
+            return
+
+        if self._is_silent():
+            await sleep_forever()
+
+        await sleep(self._interval)
+        if type == "LOG_REQUEST_LIST":
+            return Message(
+                "LOG_ENTRY",
+                id=1,
+                num_logs=1,
+                size=len(self._contents),
+                time_utc=1700000000,
+            )
+        elif type == "LOG_REQUEST_DATA":
+            self.requested_offsets.append(fields["ofs"])
+            messages = list(self._iter_log_data(fields["ofs"], fields["count"]))
+            self._nursery.start_soon(self._stream, messages[1:])
+            return messages[0]
+
+    def _is_silent(self):
+        return self._silent_after is not None and self._num_sent >= self._silent_after
+
+    def _iter_log_data(self, offset, count):
+        end = min(offset + count, len(self._contents))
+        while offset < end:
+            data = self._contents[offset : min(offset + 90, end)]
+            yield Message("LOG_DATA", id=1, ofs=offset, count=len(data), data=data)
+            offset += len(data)
+
+    async def _stream(self, messages):
+        for message in messages:
+            await sleep(self._interval)
+            if self._is_silent():
+                return
+            self._num_sent += message.count
+            self.downloader.handle_message_log_data(message)
+
+
+@fixture
+def contents():
+    return Random(1).randbytes(100000)
+
+
+async def download(server, **kwds):
+    server.downloader = downloader = MAVLinkLogDownloader(server.send, **kwds)
+    progress = []
+    async with aclosing(downloader.get_log(1)) as it:
+        async for item in it:
+            if isinstance(item, Progress):
+                progress.append(item)
+            else:
+                return item, progress
+
+
+def test_chunk_assembler_resume():
+    chunks = ChunkAssembler(100, offset=40)
+    assert chunks.num_flushed == 40
+    assert chunks.get_next_range() == (40, 60)
+    assert chunks.add_chunk(30, b"x" * 20) == b"x" * 10
+    assert chunks.add_chunk(50, b"y" * 50) == b"y" * 50
+    assert chunks.done
+
+
+async def test_bandwidth_limiter(autojump_clock):
+    limiter = BandwidthLimiter(1000)
+    started_at = current_time()
+    await limiter.acquire(500)
+    await limiter.acquire(500)
+    assert current_time() - started_at == 0.5
+    await limiter.acquire(2000)
+    assert current_time() - started_at == 1
+
+    limiter = BandwidthLimiter(0)
+    assert not limiter.enabled
+    await limiter.acquire(1000000)
+    assert current_time() - started_at == 1
+
+
+async def test_download_into_temporary_file(nursery, autojump_clock, contents):
+    server = SimulatedLogServer(nursery, contents)
+    log, progress = await download(server)
+
+    assert isinstance(log, FlightLog)
+    assert log.size == len(contents)
+    assert server.requested_offsets == [0, 46080, 92160]
+    assert progress
+    assert all(item.message.endswith("B/s") for item in progress)
+    assert "KB/s" in progress[-1].message
+
+
+async def test_resume_download(nursery, autojump_clock, contents, tmp_path):
+    server = SimulatedLogServer(nursery, contents, silent_after=60000)
+    with raises(TooSlowError):
+        await download(server, cache_dir=tmp_path)
+
+    (log_path,) = tmp_path.glob("*.bin")
+    assert log_path.with_suffix(".json").exists()
+    received = log_path.read_bytes()
+    assert len(received) > 46080
+    assert contents.startswith(received)
+
+    server = SimulatedLogServer(nursery, contents)
+    log, _ = await download(server, cache_dir=tmp_path)
+    assert log.size == len(contents)
+    assert server.requested_offsets[0] == len(received)
+    assert not list(tmp_path.iterdir())
+
+
+def test_partial_log_file_ignores_stale_range_map(tmp_path):
+    metadata = FlightLogMetadata.create(id="1", size=100, timestamp=1700000000)
+    with PartialLogFile.open(metadata, tmp_path) as log_file:
+        log_file.write(b"x" * 40)
+    with PartialLogFile.open(metadata, tmp_path) as log_file:
+        assert log_file.num_received == 40
+
+    # Range map claims more than what is in the file
+    (tmp_path / "1-100-1700000000.json").write_text('{"ranges": [[0, 80]]}')
+    with PartialLogFile.open(metadata, tmp_path) as log_file:
+        assert log_file.num_received == 40
+
+    # Range map is corrupted
+    (tmp_path / "1-100-1700000000.json").write_text("{")
+    with PartialLogFile.open(metadata, tmp_path) as log_file:
+        assert log_file.num_received == 0
+
+
+async def test_concurrent_downloads_share_bandwidth(nursery, autojump_clock, contents):
+    limiter = BandwidthLimiter(10000)
+    results = []
+
+    async def download_from(server):
+        results.append(await download(server, limiter=limiter))
+
+    started_at = current_time()
+    for _ in range(2):
+        nursery.start_soon(download_from, SimulatedLogServer(nursery, contents))
+    while len(results) < 2:
+        await sleep(0.1)
+
+    # 200000 bytes at 10000 bytes/s; the first request is granted immediately
+    assert current_time() - started_at >= 19
+    for log, progress in results:
+        assert log.size == len(contents)
+        assert any("KB/s" in item.message for item in progress)
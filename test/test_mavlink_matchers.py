@@ -0,0 +1,92 @@
+from flockwave.server.ext.mavlink.benchmark import benchmark_matchers
+from flockwave.server.ext.mavlink.matchers import MessageMatcherIndex, compile_matcher
+
+
+class Message:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class Future:
+    def __init__(self):
+        self.cancelled = False
+        self.result = None
+
+    def cancel(self):
+        self.cancelled = True
+
+    def done(self):
+        return self.cancelled or self.result is not None
+
+    def set_result(self, value):
+        self.result = value
+
+
+def test_compile_matcher():
+    message = Message(param_id="FOO", param_value=1.0)
+
+    assert compile_matcher(None)(message)
+    assert compile_matcher({})(message)
+    assert compile_matcher(lambda msg: msg.param_value > 0)(message)
+
+    assert compile_matcher({"param_id": "FOO"})(message)
+    assert not compile_matcher({"param_id": "BAR"})(message)
+    assert compile_matcher({"param_id": "FOO", "param_value": 1.0})(message)
+    assert not compile_matcher({"param_id": "FOO", "param_value": 2.0})(message)
+
+    # Missing fields are treated as None
+    assert compile_matcher({"param_id": "FOO", "param_index": None})(message)
+    assert not compile_matcher({"param_id": "FOO", "param_index": 3})(message)
+
+
+def test_dispatch_by_type_and_system_id():
+    index = MessageMatcherIndex()
+    from_one, from_two, from_any = Future(), Future(), Future()
+    index.add("PARAM_VALUE", {"param_id": "FOO"}, 1, from_one)
+    index.add("PARAM_VALUE", {"param_id": "FOO"}, 2, from_two)
+    handle = index.add("PARAM_VALUE", None, None, from_any)
+    assert len(index) == 3
+
+    message = Message(param_id="FOO")
+    assert index.dispatch("HEARTBEAT", 1, message) == 0
+    assert index.dispatch("PARAM_VALUE", 1, message) == 2
+    assert from_one.result is message
+    assert from_any.result is message
+    assert from_two.result is None
+
+    # Resolved futures are not resolved again
+    assert index.dispatch("PARAM_VALUE", 1, Message(param_id="FOO")) == 0
+    assert from_one.result is message
+
+    index.remove(handle)
+    index.remove(handle)
+    assert len(index) == 2
+
+    index.cancel_all()
+    assert from_two.cancelled
+
+
+def test_removal_in_any_order():
+    index = MessageMatcherIndex()
+    futures = [Future() for _ in range(10)]
+    handles = [
+        index.add("MISSION_REQUEST", {"seq": seq}, 1, future)
+        for seq, future in enumerate(futures)
+    ]
+    for handle in handles[::2]:
+        index.remove(handle)
+    assert len(index) == 5
+
+    assert index.dispatch("MISSION_REQUEST", 1, Message(seq=4)) == 0
+    assert index.dispatch("MISSION_REQUEST", 1, Message(seq=5)) == 1
+    assert futures[5].result is not None
+
+    for handle in handles[1::2]:
+        index.remove(handle)
+    assert len(index) == 0
+    assert index.dispatch("MISSION_REQUEST", 1, Message(seq=7)) == 0
+
+
+def test_indexed_matchers_are_faster():
+    result = benchmark_matchers(50, 20, num_messages=5000, repeat=1)
+    assert result.indexed_rate > 2 * result.legacy_rate
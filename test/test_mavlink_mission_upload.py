@@ -0,0 +1,337 @@
+from collections import Counter, defaultdict
+from itertools import count
+from trio import current_time, sleep, sleep_forever
+
+from pytest import mark
+
+from flockwave.server.ext.mavlink.automission import (
+    AutoMissionManager,
+    encode_mission_items,
+)
+from flockwave.server.ext.mavlink.enums import (
+    MAVCommand,
+    MAVFrame,
+    MAVMissionResult,
+    MAVMissionType,
+)
+from flockwave.server.ext.mavlink.mission_cache import MissionCache
+from flockwave.server.ext.mavlink.mission_upload import FleetMissionUploader
+from flockwave.server.model.commands import Progress
+
+
+class Message:
+    def __init__(self, message_type, **kwds):
+        self._type = message_type
+        self.__dict__.update(kwds)
+
+    def get_type(self):
+        return self._type
+
+
+class SimulatedVehicle:
+    """Mission protocol implementation of a simulated UAV that is reachable
+    over a link with the given round-trip time.
+    """
+
+    def __init__(
+        self,
+        id,
+        network_id,
+        *,
+        use_int=True,
+        rtt=0.1,
+        active=None,
+        supports_opaque_id=False,
+        partial_write="supported",
+        silent_download=False,
+    ):
+        self.id = id
+        self.network_id = network_id
+        self.missions = defaultdict(list)
+        self.received = Counter()
+        self.uploaded_at = None
+
+        self._active = active if active is not None else Counter()
+        self._opaque_ids = count(1)
+        self._opaque_id = {}
+        self._range = None
+        self._rtt = rtt
+        self._supports_opaque_id = supports_opaque_id
+        self._partial_write = partial_write
+        self._silent_download = silent_download
+        self._use_int = use_int
+
+    @property
+    def mission(self):
+        return self.missions[MAVMissionType.MISSION]
+
+    async def send(self, message, wait_for_one_of=None):
+        type, fields = message
+        mission_type = fields.get("mission_type", MAVMissionType.MISSION)
+        self.received[type] += 1
+        if wait_for_one_of is None:
+            return
+
+        await sleep(self._rtt)
+
+        if type == "MISSION_CLEAR_ALL":
+            self.missions[mission_type] = []
+            reply = self._commit(mission_type)
+        elif type == "MISSION_REQUEST_LIST":
+            reply = self._with_opaque_id(
+                Message("MISSION_COUNT", count=len(self.missions[mission_type])),
+                mission_type,
+            )
+        elif type == "MISSION_REQUEST_INT":
+            if self._silent_download:
+                await sleep_forever()
+            item = dict(self.missions[mission_type][fields["seq"]][1])
+            if mission_type == MAVMissionType.MISSION and fields["seq"] == 0:
+                # Home position is overwritten by the autopilot
+                item.update(x=473977000, y=85455000, z=0)
+            reply = Message("MISSION_ITEM_INT", **item)
+        elif type == "MISSION_COUNT":
+            self._active[self.network_id] += 1
+            self._items = [None] * fields["count"]
+            self._range = 0, fields["count"] - 1
+            reply = self._request(0)
+        elif type == "MISSION_WRITE_PARTIAL_LIST":
+            if self._partial_write == "ignored":
+                await sleep_forever()
+            elif self._partial_write == "rejected":
+                reply = Message("MISSION_ACK", type=MAVMissionResult.UNSUPPORTED)
+            else:
+                self._active[self.network_id] += 1
+                self._items = list(self.missions[mission_type])
+                self._range = fields["start_index"], fields["end_index"]
+                reply = self._request(fields["start_index"])
+        elif type == "MISSION_ITEM_INT":
+            self._items[fields["seq"]] = message
+            if fields["seq"] < self._range[1]:
+                reply = self._request(fields["seq"] + 1)
+            else:
+                self._active[self.network_id] -= 1
+                self.missions[mission_type] = self._items
+                self.uploaded_at = current_time()
+                reply = self._commit(mission_type)
+        else:
+            raise ValueError(type)
+
+        for key, matcher in wait_for_one_of.items():
+            if matcher[0] == reply.get_type():
+                return key, reply
+
+        await sleep_forever()
+
+    def _commit(self, mission_type):
+        self._opaque_id[mission_type] = next(self._opaque_ids)
+        return self._with_opaque_id(
+            Message("MISSION_ACK", type=MAVMissionResult.ACCEPTED), mission_type
+        )
+
+    def _request(self, seq):
+        if self._use_int:
+            return Message("MISSION_REQUEST_INT", seq=seq)
+        else:
+            return Message("MISSION_REQUEST", seq=seq)
+
+    def _with_opaque_id(self, message, mission_type):
+        if self._supports_opaque_id:
+            message.opaque_id = self._opaque_id.get(mission_type, 0)
+        return message
+
+
+class BrokenVehicle(SimulatedVehicle):
+    async def send(self, message, wait_for_one_of=None):
+        await sleep_forever()
+
+
+class ConcurrencyMonitor(Counter):
+    def __init__(self):
+        super().__init__()
+        self.peak = Counter()
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self.peak[key] = max(self.peak[key], value)
+
+
+ITEMS = [
+    (MAVCommand.NAV_WAYPOINT, {"x": 473977420 + index, "y": 85455940, "z": 30})
+    for index in range(10)
+]
+
+
+def create_manager(uav):
+    return AutoMissionManager(uav.send)
+
+
+def test_encode_mission_items():
+    (first, second) = encode_mission_items(ITEMS[:2])
+    assert first[0] == second[0] == "MISSION_ITEM_INT"
+    assert first[1]["seq"] == 0
+    assert second[1]["seq"] == 1
+    assert second[1]["command"] == MAVCommand.NAV_WAYPOINT
+    assert second[1]["x"] == 473977421
+    assert second[1]["frame"] == MAVFrame.GLOBAL_RELATIVE_ALT
+    assert second[1]["param1"] == 0
+
+
+@mark.parametrize("use_int", [True, False])
+async def test_upload_accepts_both_request_types(autojump_clock, use_int):
+    uav = SimulatedVehicle("01", "mav", use_int=use_int)
+    progress = []
+    await create_manager(uav).upload_AutoMission(
+        ITEMS, on_progress=lambda *args: progress.append(args)
+    )
+    assert uav.mission == encode_mission_items(ITEMS)
+    assert progress[0] == (0, 10)
+    assert progress[-1] == (10, 10)
+
+
+async def test_fleet_upload(nursery, autojump_clock):
+    active = ConcurrencyMonitor()
+    uavs = [
+        SimulatedVehicle(f"{network_id}{index}", network_id, active=active)
+        for network_id in ("a", "b")
+        for index in range(4)
+    ]
+    uavs.append(BrokenVehicle("c0", "c"))
+
+    uploader = FleetMissionUploader(
+        max_uploads_per_network=2, manager_factory=create_manager
+    )
+    missions = dict.fromkeys(uavs, ITEMS)
+    nursery.start_soon(uploader.run, missions)
+
+    started_at = current_time()
+    updates = [item async for item in uploader.updates()]
+
+    # Each upload takes 11 round trips; the two networks run in parallel, with
+    # two uploads at once in each
+    duration = max(uav.uploaded_at for uav in uavs[:-1]) - started_at
+    assert duration < 2 * 11 * 0.1 + 0.1
+    assert active.peak == {"a": 2, "b": 2}
+
+    *progress, results = updates
+    assert all(isinstance(item, Progress) for item in progress)
+    assert results.pop("c0") == "MAVLink mission operation timed out"
+    assert results == {uav.id: None for uav in uavs[:-1]}
+    for uav in uavs[:-1]:
+        assert uav.mission == encode_mission_items(ITEMS)
+
+
+def with_altitude(items, index, altitude):
+    command, kwds = items[index]
+    return [*items[:index], (command, {**kwds, "z": altitude}), *items[index + 1 :]]
+
+
+@mark.parametrize("supports_opaque_id", [True, False])
+async def test_unchanged_upload_is_skipped(autojump_clock, supports_opaque_id):
+    uav = SimulatedVehicle("01", "mav", supports_opaque_id=supports_opaque_id)
+    manager = AutoMissionManager(uav.send, cache=MissionCache())
+    await manager.upload_AutoMission(ITEMS)
+    assert uav.received["MISSION_ITEM_INT"] == 10
+
+    progress = []
+    await manager.upload_AutoMission(
+        ITEMS, on_progress=lambda *args: progress.append(args)
+    )
+    assert progress == [(10, 10)]
+    assert uav.received["MISSION_COUNT"] == 1
+    assert uav.received["MISSION_ITEM_INT"] == 10
+
+    # The cached mission is trusted only if the opaque ID confirms it
+    assert uav.received["MISSION_REQUEST_INT"] == (0 if supports_opaque_id else 10)
+
+
+async def test_unchanged_upload_is_skipped_with_empty_cache(autojump_clock):
+    uav = SimulatedVehicle("01", "mav")
+    await AutoMissionManager(uav.send).upload_AutoMission(ITEMS)
+
+    # Mission is downloaded and compared; item 0 is overwritten with the
+    # home position by the autopilot and is ignored
+    manager = AutoMissionManager(uav.send, cache=MissionCache())
+    await manager.upload_AutoMission(ITEMS)
+    assert uav.received["MISSION_REQUEST_INT"] == 10
+    assert uav.received["MISSION_COUNT"] == 1
+
+    # Mission with a different number of items is not downloaded
+    await manager.upload_AutoMission(ITEMS[:5])
+    assert uav.received["MISSION_REQUEST_INT"] == 10
+    assert uav.received["MISSION_COUNT"] == 2
+    assert uav.mission == encode_mission_items(ITEMS[:5])
+
+
+async def test_failed_download_falls_back_to_full_upload(autojump_clock):
+    uav = SimulatedVehicle("01", "mav", silent_download=True)
+    await AutoMissionManager(uav.send).upload_AutoMission(ITEMS)
+
+    items = with_altitude(ITEMS, 4, 50)
+    await AutoMissionManager(uav.send, cache=MissionCache()).upload_AutoMission(items)
+    assert uav.mission == encode_mission_items(items)
+    assert uav.received["MISSION_COUNT"] == 2
+
+
+@mark.parametrize("partial_write", ["supported", "rejected", "ignored"])
+async def test_small_change_is_written_partially(autojump_clock, partial_write):
+    uav = SimulatedVehicle("01", "mav", partial_write=partial_write)
+    manager = AutoMissionManager(uav.send, cache=MissionCache())
+    await manager.upload_AutoMission(ITEMS)
+
+    items = with_altitude(with_altitude(ITEMS, 4, 50), 6, 50)
+    await manager.upload_AutoMission(items)
+    assert uav.mission == encode_mission_items(items)
+    if partial_write == "supported":
+        assert uav.received["MISSION_WRITE_PARTIAL_LIST"] == 1
+        assert uav.received["MISSION_COUNT"] == 1
+        assert uav.received["MISSION_ITEM_INT"] == 13
+    else:
+        assert uav.received["MISSION_WRITE_PARTIAL_LIST"] >= 1
+        assert uav.received["MISSION_COUNT"] == 2
+        assert uav.received["MISSION_ITEM_INT"] == 20
+
+    # Large changes are uploaded in full
+    num_partial_writes = uav.received["MISSION_WRITE_PARTIAL_LIST"]
+    items = [with_altitude(ITEMS, index, 70)[index] for index in range(10)]
+    await manager.upload_AutoMission(items)
+    assert uav.mission == encode_mission_items(items)
+    assert uav.received["MISSION_WRITE_PARTIAL_LIST"] == num_partial_writes
+
+
+@mark.parametrize("supports_opaque_id", [True, False])
+async def test_mission_changed_by_other_client_is_uploaded(
+    autojump_clock, supports_opaque_id
+):
+    uav = SimulatedVehicle("01", "mav", supports_opaque_id=supports_opaque_id)
+    manager = AutoMissionManager(uav.send, cache=MissionCache())
+    await manager.upload_AutoMission(ITEMS)
+
+    other_items = [with_altitude(ITEMS, index, 70)[index] for index in range(10)]
+    await AutoMissionManager(uav.send).upload_AutoMission(other_items)
+
+    await manager.upload_AutoMission(ITEMS)
+    assert uav.mission == encode_mission_items(ITEMS)
+    assert uav.received["MISSION_REQUEST_INT"] == 10
+    assert uav.received["MISSION_COUNT"] == 3
+
+
+async def test_unchanged_geofence_upload_is_skipped(autojump_clock):
+    uav = SimulatedVehicle("01", "mav")
+    manager = AutoMissionManager(uav.send, cache=MissionCache())
+    fence_type = MAVMissionType.FENCE
+    items = encode_mission_items(ITEMS[:4], fence_type, frame=MAVFrame.GLOBAL)
+
+    await manager.upload_encoded_mission(items, mission_type=fence_type)
+    await manager.upload_encoded_mission(items, mission_type=fence_type)
+    assert uav.missions[fence_type] == items
+    assert uav.received["MISSION_COUNT"] == 1
+
+    # Geofences are never written partially
+    items = encode_mission_items(
+        with_altitude(ITEMS[:4], 1, 50), fence_type, frame=MAVFrame.GLOBAL
+    )
+    await manager.upload_encoded_mission(items, mission_type=fence_type)
+    assert uav.missions[fence_type] == items
+    assert uav.received["MISSION_COUNT"] == 2
+    assert uav.received["MISSION_WRITE_PARTIAL_LIST"] == 0
@@ -0,0 +1,145 @@
+from itertools import count
+from trio import sleep
+
+from pytest import fixture
+
+from flockwave.server.ext.mavlink import recorder as recorder_module
+from flockwave.server.ext.mavlink.loadgen import iter_tlog
+from flockwave.server.ext.mavlink.recorder import FlightRecorder, FlightRecording
+
+
+class Message:
+    def __init__(self, system_id, msgid, payload=b"\x01\x02\x03"):
+        self._system_id = system_id
+        self._msgid = msgid
+        self._msgbuf = (
+            bytes([0xFD, len(payload), 0, 0, 0, system_id, 1, msgid, 0, 0])
+            + payload
+            + b"\x00\x00"
+        )
+
+    def get_msgbuf(self):
+        return self._msgbuf
+
+    def get_msgId(self):
+        return self._msgid
+
+    def get_srcSystem(self):
+        return self._system_id
+
+
+@fixture
+def clock(monkeypatch):
+    ticks = count(1000000000, 1000000)
+    monkeypatch.setattr(recorder_module, "monotonic_ns", lambda: next(ticks))
+    monkeypatch.setattr(recorder_module, "time_ns", lambda: 1700000000000000000)
+
+
+def test_record_and_query(tmp_path, clock):
+    connection = object()
+    with FlightRecorder(tmp_path) as recorder:
+        recorder.add_connection(connection, "mav")
+        write = recorder.create_writer(connection)
+        write([Message(1, 0), Message(2, 33)], ("192.168.1.1", 14550))
+        write([Message(1, 33)], ("192.168.1.1", 14550))
+        write([Message(2, 0)], ("192.168.1.2", 14550))
+        recorder.record("radio", [Message(1, 109)], "")
+
+    recording = FlightRecording(tmp_path)
+    assert len(recording.segments) == 1
+
+    frames = list(recording.frames())
+    assert [(frame.system_id, frame.message_id) for frame in frames] == [
+        (1, 0),
+        (2, 33),
+        (1, 33),
+        (2, 0),
+        (1, 109),
+    ]
+    assert frames[0].connection_id == "mav"
+    assert frames[0].address == "192.168.1.1:14550"
+    assert frames[3].address == "192.168.1.2:14550"
+    assert frames[4].connection_id == "radio"
+    assert frames[4].address == ""
+    assert frames[1].data == Message(2, 33).get_msgbuf()
+    assert frames[1].timestamp == frames[0].timestamp
+    assert frames[2].timestamp > frames[1].timestamp
+
+    assert [frame.message_id for frame in recording.frames(system_id=1)] == [
+        0,
+        33,
+        109,
+    ]
+    assert [frame.system_id for frame in recording.frames(message_id={0, 109})] == [
+        1,
+        2,
+        1,
+    ]
+
+    window = list(recording.frames(frames[2].timestamp, frames[4].timestamp))
+    assert [(frame.system_id, frame.message_id) for frame in window] == [
+        (1, 33),
+        (2, 0),
+    ]
+
+
+def test_segment_rotation_and_export(tmp_path, clock):
+    with FlightRecorder(tmp_path, segment_size=100, max_segments=3) as recorder:
+        for index in range(10):
+            recorder.record("mav", [Message(index + 1, 0, b"x" * 40)], "")
+
+    recording = FlightRecording(tmp_path)
+    assert len(recording.segments) == 3
+    assert [frame.system_id for frame in recording.frames()] == [7, 8, 9, 10]
+
+    path = tmp_path / "export.tlog"
+    assert recording.export_tlog(path, system_id={8, 10}) == 2
+    exported = list(iter_tlog(path.read_bytes()))
+    assert [frame[5] for _, frame in exported] == [8, 10]
+
+
+class FailingFile:
+    def write(self, data):
+        raise OSError(28, "No space left on device")
+
+    def flush(self):
+        pass
+
+    def close(self):
+        raise OSError(28, "No space left on device")
+
+
+class Log:
+    def __init__(self):
+        self.errors = []
+
+    def error(self, message):
+        self.errors.append(message)
+
+
+def test_disk_error_disables_recorder(tmp_path, clock):
+    log = Log()
+    with FlightRecorder(tmp_path, flush_interval=0, log=log) as recorder:
+        recorder.record("mav", [Message(1, 0)], "")
+        recorder._frames.close()
+        recorder._frames = FailingFile()
+
+        recorder.record("mav", [Message(1, 33)], "")
+        recorder.record("mav", [Message(1, 109)], "")
+        assert not recorder.is_open
+
+    assert len(log.errors) == 1
+    assert "No space left on device" in log.errors[0]
+    frames = list(FlightRecording(tmp_path).frames())
+    assert [frame.message_id for frame in frames] == [0]
+
+
+async def test_frames_are_flushed_when_traffic_stops(tmp_path, nursery, autojump_clock):
+    with FlightRecorder(tmp_path, flush_interval=1) as recorder:
+        nursery.start_soon(recorder.run)
+        recorder.record("mav", [Message(1, 0)], "")
+        recorder.record("mav", [Message(1, 33)], "")
+        assert len(list(FlightRecording(tmp_path).frames())) < 2
+
+        await sleep(1.5)
+        assert len(list(FlightRecording(tmp_path).frames())) == 2
@@ -0,0 +1,85 @@
+from pytest import raises
+from trio import TooSlowError, sleep
+
+import numpy as np
+
+from flockwave.server.tasks.mission_feeder import MissionFeederBase
+
+
+class MockMissionFeeder(MissionFeederBase):
+    """Mission feeder that feeds a simulated UAV that reaches a waypoint every
+    second.
+    """
+
+    def __init__(self, path, **kwds):
+        super().__init__(path, 50, **kwds)
+        self.mission = np.empty((0, 2), dtype=np.int32)
+        self.uploads = []
+        self.current = 0
+        self.visited = []
+
+    async def fly(self):
+        while True:
+            await sleep(1)
+            if self.current < len(self.mission):
+                self.visited.append(tuple(self.mission[self.current]))
+                if self.current < len(self.mission) - 1:
+                    self.current += 1
+            self.notify_current(self.current)
+
+    async def _upload_window(self, waypoints, altitude):
+        await sleep(0.5)
+        self.mission = waypoints.copy()
+        self.uploads.append(len(waypoints))
+
+    async def _set_current_waypoint(self, index):
+        self.current = index
+
+
+def _path(num_waypoints):
+    lon = 80 + np.arange(num_waypoints) * 1e-4
+    return np.column_stack((lon, np.full(num_waypoints, 13.0)))
+
+
+async def test_feeder_streams_long_path(nursery, autojump_clock):
+    path = _path(250)
+    feeder = MockMissionFeeder(path, window_size=40, refill_margin=10)
+    assert feeder.progress is None
+    assert feeder.waypoints.dtype == np.int32
+    assert feeder.waypoints[0].tolist() == [130000000, 800000000]
+
+    nursery.start_soon(feeder.fly)
+    await feeder.run()
+    assert feeder.finished
+    assert all(size <= 40 for size in feeder.uploads)
+    assert len(feeder.uploads) > 250 // 40
+
+    # Let the UAV finish the last window
+    await sleep(60)
+
+    # Every waypoint was visited in order; the waypoint that the UAV was
+    # heading to when a new window was uploaded may be visited twice
+    visited = list(dict.fromkeys(feeder.visited))
+    assert visited == [tuple(point) for point in feeder.waypoints.tolist()]
+    assert feeder.progress == 249
+
+
+async def test_short_path_is_uploaded_at_once(autojump_clock):
+    feeder = MockMissionFeeder(_path(10), window_size=40)
+    await feeder.run()
+    assert feeder.finished
+    assert feeder.uploads == [10]
+
+
+def test_invalid_arguments():
+    with raises(ValueError):
+        MockMissionFeeder(_path(0))
+    with raises(ValueError):
+        MockMissionFeeder(_path(10), window_size=10, refill_margin=10)
+
+
+async def test_feeder_stops_when_uav_stops_reporting(autojump_clock):
+    feeder = MockMissionFeeder(_path(100), window_size=40, timeout=5)
+    with raises(TooSlowError):
+        await feeder.run()
+    assert feeder.uploads == [40]
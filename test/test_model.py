@@ -1,6 +1,8 @@
+from flockwave.gps.vectors import GPSCoordinate, VelocityNED
 from flockwave.server.model.attitude import Attitude
 from flockwave.server.model.gps import GPSFix, GPSFixType
 from flockwave.server.model import UAVStatusInfo
+from flockwave.server.model.uav import PassiveUAV, PassiveUAVDriver
 
 
 def test_attitude():
@@ -40,4 +42,32 @@ def test_uavstatusinfo():
     assert status.attitude is None
 
 
+def test_uav_update_position():
+    driver = PassiveUAVDriver()
+    gcs_position = GPSCoordinate(47.47, 19.06, amsl=0)
+    position = GPSCoordinate(47.4701234, 19.0612345, amsl=105.5, ahl=20.25)
+    velocity = VelocityNED(1.234, -2.345, 0.5)
+
+    expected = PassiveUAV("01", driver)
+    expected.update_status(
+        position=position,
+        velocity=velocity,
+        heading=370.123,
+        gcsLocation=gcs_position,
+    )
+
+    uav = PassiveUAV("01", driver)
+    uav.update_position(position, velocity, 370.123, gcs_position=gcs_position)
+
+    for status in (expected.status, uav.status):
+        status.timestamp = 0
+    assert uav.status.json == expected.status.json
+    assert uav.status.distance == expected.status.distance > 0
+    assert uav.status.bearing == expected.status.bearing
+
+    # The status information must not share objects with the caller
+    position.lat = 0
+    assert uav.status.position.lat == 47.4701234
+
+
 test_attitude()
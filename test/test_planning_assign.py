@@ -0,0 +1,60 @@
+from pytest import approx
+
+import numpy as np
+
+from flockwave.server.planning.assign import assign_paths
+from flockwave.server.planning.grid import rectangular_lawnmower
+
+
+def test_assign_paths_minimizes_transit():
+    paths = rectangular_lawnmower((13.0, 80.0), 1000, 1000, 50, 3)
+
+    # UAVs are sitting at the entry points of the paths in reverse order
+    positions = [tuple(paths[2][0]), tuple(paths[1][0]), tuple(paths[0][0])]
+    assignment = assign_paths(paths, positions)
+
+    assert assignment.path_indices == [2, 1, 0]
+    assert assignment.transit == approx(0, abs=1e-6)
+    assert assignment.naive_transit == approx(2 * 2 * 1000 / 3, rel=1e-3)
+    assert assignment.saved == approx(assignment.naive_transit)
+
+    assigned = assignment.apply(paths)
+    assert np.array_equal(assigned[0], paths[2])
+    assert np.array_equal(assigned[2], paths[0])
+
+
+def test_assign_paths_with_unknown_positions_and_reversal():
+    paths = rectangular_lawnmower((13.0, 80.0), 1000, 1000, 50, 2)
+    positions = [None, tuple(paths[0][-1]), None]
+
+    assignment = assign_paths(paths, positions, allow_reverse=True)
+
+    assert assignment.path_indices[1] == 0
+    assert assignment.reversed[1]
+    assert sorted(i for i in assignment.path_indices if i is not None) == [0, 1]
+
+    assigned = assignment.apply(paths)
+    assert np.array_equal(assigned[1], paths[0][::-1])
+    assert sum(len(path) == 0 for path in assigned) == 1
+
+
+def test_assign_paths_skips_empty_paths():
+    paths = [np.empty((0, 2)), np.array([[80.0, 13.0], [80.001, 13.0]])]
+    assignment = assign_paths(paths, [(80.0, 13.0)])
+    assert assignment.path_indices == [1]
+
+
+def test_order_uavs():
+    paths = rectangular_lawnmower((13.0, 80.0), 1000, 1000, 50, 3)
+    positions = [tuple(paths[2][0]), tuple(paths[0][0]), tuple(paths[1][0])]
+    assignment = assign_paths(paths, positions)
+    assert assignment.order_uavs(["a", "b", "c"]) == ["b", "c", "a"]
+
+    # Not every UAV receives a path
+    assignment = assign_paths(paths[:2], positions)
+    assert assignment.order_uavs(["a", "b", "c"]) is None
+
+    # Paths flown in reverse cannot be expressed as an order of the UAVs
+    positions = [tuple(paths[0][-1]), tuple(paths[1][0]), tuple(paths[2][0])]
+    assignment = assign_paths(paths, positions, allow_reverse=True)
+    assert assignment.order_uavs(["a", "b", "c"]) is None
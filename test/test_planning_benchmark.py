@@ -0,0 +1,107 @@
+from pathlib import Path
+from pytest import approx, fixture, raises
+
+from flockwave.server.planning.benchmark import (
+    BenchmarkCase,
+    BenchmarkResult,
+    compare_to_baseline,
+    get_suite,
+    load_baseline,
+    run_case,
+    run_suite,
+    save_baseline,
+)
+
+
+BASELINE = Path(__file__).parent / "fixtures" / "planner_benchmark_quick.json"
+
+
+@fixture(scope="module")
+def quick_results():
+    return run_suite(get_suite("quick"), repeat=1)
+
+
+def test_suites():
+    quick = get_suite("quick")
+    assert {case.planner for case in quick} == {
+        "search_grid",
+        "navigate",
+        "polygon_search",
+        "polygon_split",
+        "specific_split",
+        "vtol_grid",
+        "fence_to_yaml",
+    }
+    assert len({case.name for case in quick}) == len(quick)
+
+    full = get_suite("full")
+    assert {case.scale for case in full} == {100, 1000, 5000}
+    assert {case.spacing for case in full} == {5, 20, 50}
+    assert {case.num_drones for case in full} == {1, 8, 50}
+    assert all(case.scale >= case.spacing * case.num_drones for case in full)
+
+    with raises(ValueError):
+        get_suite("nonexistent")
+
+
+def test_run_case():
+    result = run_case(BenchmarkCase("search_grid", "square", 1000, 20, 4), repeat=1)
+
+    assert result.name == "search_grid/square/1000m/20m/4"
+    assert result.time > 0
+    assert result.peak_memory > 0
+    assert result.waypoints > 0
+    assert result.coverage == approx(1.0, abs=0.02)
+
+
+def test_baseline_roundtrip(tmp_path):
+    results = [
+        BenchmarkResult("a", 0.5, 1024, 100, 0.95),
+        BenchmarkResult("b", 0.01, 64, 0, None),
+    ]
+    save_baseline(results, tmp_path / "baseline.json")
+    assert load_baseline(tmp_path / "baseline.json") == {r.name: r for r in results}
+
+
+def test_compare_to_baseline():
+    baseline = {
+        "a": BenchmarkResult("a", 0.5, 1024, 100, 0.95),
+        "b": BenchmarkResult("b", 0.001, 64, 10, 0.9),
+    }
+
+    # Small slowdowns, noise on fast cases and new cases are accepted
+    assert not compare_to_baseline(
+        [
+            BenchmarkResult("a", 0.6, 1024, 100, 0.945),
+            BenchmarkResult("b", 0.003, 64, 10, 0.9),
+            BenchmarkResult("c", 10.0, 64, 10, 0.1),
+        ],
+        baseline,
+    )
+
+    regressions = compare_to_baseline(
+        [
+            BenchmarkResult("a", 0.8, 1024, 100, 0.95),
+            BenchmarkResult("b", 0.001, 64, 10, 0.8),
+        ],
+        baseline,
+    )
+    assert [(r.name, r.metric) for r in regressions] == [
+        ("a", "time"),
+        ("b", "coverage"),
+    ]
+
+
+def test_quick_suite_against_baseline(quick_results):
+    baseline = load_baseline(BASELINE)
+    assert {result.name for result in quick_results} == set(baseline)
+
+    # Timings depend on the machine, so they are only checked for gross
+    # regressions here; coverage and waypoint counts must match closely
+    regressions = compare_to_baseline(
+        quick_results, baseline, time_tolerance=10, min_time_delta=0.25
+    )
+    assert not regressions, "\n".join(str(r) for r in regressions)
+
+    for result in quick_results:
+        assert result.waypoints == baseline[result.name].waypoints, result.name
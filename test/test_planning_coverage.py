@@ -0,0 +1,126 @@
+from pytest import approx, raises
+from time import perf_counter
+
+import numpy as np
+
+from flockwave.server.planning.coverage import (
+    CoverageGrid,
+    CoverageTracker,
+    analyze_coverage,
+    square_area,
+)
+from flockwave.server.planning.geodesy import LocalFrame
+from flockwave.server.planning.grid import rectangular_lawnmower
+
+CENTER = (13.0, 80.0)
+
+
+def _lonlat(frame, xy):
+    xy = np.asarray(xy, dtype=float)
+    lat, lon = frame.to_geo(xy[:, 0], xy[:, 1])
+    return np.column_stack((lon, lat))
+
+
+def test_square_area():
+    frame = LocalFrame(*CENTER)
+    corners = square_area(CENTER, 1000)
+    lat, lon = corners[:, 1], corners[:, 0]
+    x, y = frame.to_local(lat, lon)
+    assert x == approx([-500, 500, 500, -500], abs=1e-6)
+    assert y == approx([-500, -500, 500, 500], abs=1e-6)
+
+
+def test_lawnmower_covers_its_area():
+    paths = rectangular_lawnmower(CENTER, 1000, 1000, 50, 1)
+    report = analyze_coverage(paths, [square_area(CENTER, 1000)], 50)
+
+    assert report.coverage == approx(1.0, abs=0.01)
+    assert report.overlap == 0.0
+    assert report.target_area == approx(1e6, rel=0.01)
+    assert not report.gaps
+
+    # Neighbouring strips share their boundary sweeps
+    paths = rectangular_lawnmower(CENTER, 1000, 1000, 50, 4)
+    report = analyze_coverage(paths, [square_area(CENTER, 1000)], 50)
+    assert report.coverage == approx(1.0, abs=0.01)
+    assert report.overlap == approx(3 * 50 / 1000, abs=0.01)
+
+    # Narrower camera footprint than the spacing leaves seams between strips
+    report = analyze_coverage(paths, [square_area(CENTER, 1000)], 30)
+    assert report.coverage == approx(0.6, abs=0.03)
+
+
+def test_gaps_and_holes():
+    frame = LocalFrame(*CENTER)
+    area = _lonlat(frame, [(0, 0), (400, 0), (400, 400), (0, 400)])
+    hole = _lonlat(frame, [(0, 300), (400, 300), (400, 400), (0, 400)])
+
+    # A single pass along the bottom leaves a 200 m strip uncovered
+    path = _lonlat(frame, [(0, 50), (400, 50)])
+    report = analyze_coverage([path], [area], 100, holes=[hole], resolution=2)
+
+    assert report.target_area == approx(120000, rel=0.02)
+    assert report.coverage == approx(1 / 3, abs=0.02)
+    assert len(report.gaps) == 1
+    assert report.gap_areas[0] == approx(80000, rel=0.02)
+
+    lon, lat = report.gaps[0].T
+    x, y = frame.to_local(lat, lon)
+    assert x.min() == approx(0, abs=5) and x.max() == approx(400, abs=5)
+    assert y.min() == approx(100, abs=5) and y.max() == approx(300, abs=5)
+
+    json = report.json()
+    assert json["gaps"][0]["area"] == approx(80000, rel=0.02)
+    assert len(json["gaps"][0]["points"]) >= 4
+
+
+def test_overlap_between_paths():
+    frame = LocalFrame(*CENTER)
+    area = _lonlat(frame, [(0, 0), (100, 0), (100, 100), (0, 100)])
+    path = _lonlat(frame, [(0, 50), (100, 50)])
+
+    report = analyze_coverage([path, path], [area], 50, resolution=1)
+    assert report.coverage == approx(0.5, abs=0.02)
+    assert report.overlap == approx(0.5, abs=0.02)
+
+    # Revisits by the same path are not overlaps
+    back_and_forth = _lonlat(frame, [(0, 50), (100, 50), (0, 50)])
+    report = analyze_coverage([back_and_forth], [area], 50, resolution=1)
+    assert report.overlap == 0.0
+
+
+def test_empty_areas_are_rejected():
+    with raises(ValueError):
+        CoverageGrid([])
+
+
+def test_tracker():
+    frame = LocalFrame(*CENTER)
+    area = _lonlat(frame, [(0, 0), (200, 0), (200, 100), (0, 100)])
+    tracker = CoverageTracker(CoverageGrid([area], resolution=1), 50, max_step=50)
+
+    for x in range(0, 201, 20):
+        tracker.update("a", _lonlat(frame, [(x, 25)])[0])
+    assert tracker.coverage == approx(0.5, abs=0.02)
+
+    # Jumps longer than the maximum step are not treated as flown segments
+    tracker.update("b", _lonlat(frame, [(0, 75)])[0])
+    tracker.update("b", _lonlat(frame, [(200, 75)])[0])
+    assert tracker.coverage < 0.6
+
+    tracker.forget("b")
+    for x in range(0, 201, 20):
+        tracker.update("b", _lonlat(frame, [(x, 75)])[0])
+    report = tracker.report()
+    assert report.coverage == approx(1.0, abs=0.02)
+    assert report.overlap == 0.0
+
+
+def test_analysis_is_fast():
+    paths = rectangular_lawnmower(CENTER, 5000, 5000, 25, 8)
+    area = square_area(CENTER, 5000)
+    analyze_coverage(paths, [area], 25)
+
+    started_at = perf_counter()
+    analyze_coverage(paths, [area], 25)
+    assert perf_counter() - started_at < 0.1
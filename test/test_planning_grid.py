@@ -0,0 +1,133 @@
+from pytest import importorskip, mark
+
+import numpy as np
+
+from flockwave.server.planning.grid import rectangular_lawnmower
+
+
+def reference_lawnmower(
+    center_lat,
+    center_lon,
+    width,
+    height,
+    spacing,
+    num_strips,
+    strip_height=None,
+    turn_extension=0,
+):
+    """Geodesic row-by-row implementation of the lawnmower pattern that the
+    planners used before the vectorized generator was introduced.
+    """
+    distance = importorskip("geopy.distance").distance
+    Point = importorskip("geopy.point").Point
+
+    if strip_height is None:
+        strip_height = height / num_strips
+
+    center_point = Point(center_lat, center_lon)
+    west_edge = distance(meters=width / 2).destination(center_point, 270)
+    result = []
+    for i in range(num_strips):
+        top_offset = (i * strip_height) - (height / 2) + (strip_height / 2)
+        top_center = distance(meters=top_offset).destination(center_point, 0)
+        top = distance(meters=strip_height / 2).destination(top_center, 0)
+        bottom = distance(meters=strip_height / 2).destination(top_center, 180)
+
+        points = []
+        current_lat = bottom.latitude
+        line_number = 0
+        while current_lat <= top.latitude:
+            line_number += 1
+            current_point = Point(current_lat, west_edge.longitude)
+            east_point = distance(meters=width).destination(current_point, 90)
+            if line_number % 2 == 1:
+                row = [current_point, east_point]
+            else:
+                row = [east_point, current_point]
+            if turn_extension:
+                bearing = 135 if line_number % 2 == 1 else 225
+                row.append(
+                    distance(meters=turn_extension).destination(row[-1], bearing)
+                )
+            points.extend((p.longitude, p.latitude) for p in row)
+            current_lat = (
+                distance(meters=spacing).destination(current_point, 0).latitude
+            )
+
+        result.append(np.array(points))
+    return result
+
+
+def _max_error_in_metres(expected, observed, lat):
+    # Small-angle conversion of degree differences to metres is accurate
+    # enough for centimetre-level comparisons
+    diff = np.abs(np.asarray(expected) - np.asarray(observed))
+    scale = np.array([111320 * np.cos(np.radians(lat)), 110574])
+    return float((diff * scale).max())
+
+
+@mark.parametrize(
+    "center,width,spacing,num_strips",
+    [
+        ((13.38946, 80.233607), 200, 8, 3),
+        ((12.58228, 79.865131), 1500, 37, 5),
+        ((47.486305, 18.915125), 730, 21, 1),
+        ((-33.8688, 151.2093), 2000, 45, 4),
+    ],
+)
+def test_matches_geodesic_implementation(center, width, spacing, num_strips):
+    expected = reference_lawnmower(
+        center[0], center[1], width, width, spacing, num_strips
+    )
+    observed = rectangular_lawnmower(center, width, width, spacing, num_strips)
+
+    assert len(observed) == len(expected)
+    for exp, obs in zip(expected, observed):
+        assert exp.shape == obs.shape
+        assert _max_error_in_metres(exp, obs, center[0]) < 0.02
+
+
+def test_matches_geodesic_implementation_with_gaps_and_turns():
+    center, size, spacing, num_strips = (13.386046, 80.231535), 1200, 50, 3
+    strip_height = (size - (num_strips - 1) * 50) / num_strips
+
+    expected = reference_lawnmower(
+        center[0],
+        center[1],
+        size,
+        size,
+        spacing,
+        num_strips,
+        strip_height=strip_height,
+        turn_extension=250,
+    )
+    observed = rectangular_lawnmower(
+        center,
+        size,
+        size,
+        spacing,
+        num_strips,
+        strip_height=strip_height,
+        turn_extension=250,
+    )
+
+    for exp, obs in zip(expected, observed):
+        assert exp.shape == obs.shape
+        assert _max_error_in_metres(exp, obs, center[0]) < 0.02
+
+
+def test_row_order():
+    (path,) = rectangular_lawnmower((13.0, 80.0), 100, 25, 10)
+
+    # 3 rows, two points each, alternating direction
+    assert path.shape == (6, 2)
+    assert path[0, 0] < path[1, 0]
+    assert path[2, 0] > path[3, 0]
+    assert path[4, 0] < path[5, 0]
+    assert np.all(np.diff(path[::2, 1]) > 0)
+
+
+def test_includes_row_on_northern_edge():
+    # 100 m strip with 25 m spacing has rows at 0, 25, 50, 75 and 100 m
+    (path,) = rectangular_lawnmower((13.0, 80.0), 100, 100, 25)
+    assert path.shape == (10, 2)
@@ -0,0 +1,54 @@
+from pytest import fixture, raises
+
+import numpy as np
+
+from flockwave.server.planning.jobs import execute_job, run_job, use_planner_pool
+from flockwave.server.planning.pool import PlannerPool
+
+
+@fixture(scope="module")
+def pool():
+    pool = PlannerPool(workers=2, preload=("numpy",))
+    pool.start()
+    try:
+        yield pool
+    finally:
+        pool.shutdown()
+
+
+def test_pool_returns_paths_through_shared_memory(pool):
+    args = ((13.0, 80.0), 1000, 50, 3)
+    expected = execute_job("search_grid", *args)
+
+    observed = pool.run_sync("search_grid", *args)
+
+    assert len(observed) == len(expected)
+    for exp, obs in zip(expected, observed):
+        assert np.array_equal(exp, obs)
+
+
+def test_run_job_uses_active_pool(pool):
+    centers = np.array([[13.0, 80.0], [13.01, 80.01]])
+    with use_planner_pool(pool):
+        before = pool.get_metrics().completed
+        paths = run_job("specific_split", centers, [2, 1], 50, 500)
+        assert pool.get_metrics().completed == before + 1
+
+    assert len(paths) == 3
+
+
+def test_pool_metrics_and_failures(pool):
+    with raises(KeyError):
+        pool.run_sync("no_such_job")
+
+    metrics = pool.get_metrics()
+    assert metrics.workers == 2
+    assert metrics.failed >= 1
+    assert metrics.queue_length == 0
+    assert 0 <= metrics.utilization <= 1
+    assert metrics.json()["queueLength"] == 0
+
+
+def test_pool_not_running():
+    with raises(RuntimeError):
+        PlannerPool().submit("search_grid")
@@ -0,0 +1,141 @@
+from pytest import approx
+from time import perf_counter
+
+import numpy as np
+
+from flockwave.server.planning import PlanStore
+from flockwave.server.planning.coverage import square_area
+from flockwave.server.planning.grid import rectangular_lawnmower
+from flockwave.server.planning.progress import SearchProgress
+
+CENTER = (13.0, 80.0)
+
+
+def _add_plan(store, num_uavs=2, **kwds):
+    paths = rectangular_lawnmower(CENTER, 400, 400, 50, num_uavs)
+    return store.add(
+        "search",
+        paths,
+        [str(index + 1) for index in range(num_uavs)],
+        areas=[square_area(CENTER, 400)],
+        swath_width=50,
+        altitude=50,
+        **kwds,
+    )
+
+
+def _fly(progress, uav_id, path, altitude=50, step=5):
+    # Densify the path to one position every few metres, as telemetry would
+    for start, end in zip(path[:-1], path[1:]):
+        for t in np.linspace(0, 1, step, endpoint=False):
+            lon, lat = start + (end - start) * t
+            progress.update(uav_id, lon, lat, altitude)
+    progress.update(uav_id, *path[-1], altitude)
+
+
+def test_progress_of_plan():
+    store = PlanStore()
+    progress = SearchProgress()
+    assert progress.json() == {"active": False}
+
+    # Plans without a search area are not tracked
+    assert not progress.start(store.add("navigate", [[(80.0, 13.0)]], ["1"]))
+
+    plan = _add_plan(store)
+    assert progress.start(plan)
+
+    # Positions of UAVs that are not part of the plan or still on the ground
+    # are not counted
+    version = progress.version
+    progress.update("3", 80.0, 13.0, 50)
+    progress.update("1", 80.0, 13.0, 0)
+    assert progress.version == version
+    assert progress.coverage == 0.0
+
+    first = plan.paths[0]
+    half = len(first) // 2
+    progress.update("1", *first[0], 50)
+    eta_before = progress.json()["uavs"]["1"]["eta"]
+
+    _fly(progress, "1", first[:half])
+    state = progress.json()
+    assert 0.1 < state["coverage"] < 0.4
+    assert state["remainingArea"] == approx(
+        state["targetArea"] * (1 - state["coverage"]), rel=1e-3
+    )
+    assert state["uavs"]["1"]["eta"] < eta_before
+    assert state["uavs"]["1"]["coveredArea"] > 0
+    assert state["uavs"]["2"] == {"coveredArea": 0.0, "eta": None}
+    assert state["eta"] == state["uavs"]["1"]["eta"]
+
+    _fly(progress, "1", first[half - 1 :])
+    _fly(progress, "2", plan.paths[1])
+    state = progress.json()
+    assert state["coverage"] == approx(1.0, abs=0.01)
+    assert state["eta"] == approx(0, abs=1)
+
+    covered = sum(uav["coveredArea"] for uav in state["uavs"].values())
+    assert covered == approx(state["targetArea"] * state["coverage"], rel=1e-3)
+
+
+def test_lower_altitude_covers_narrower_swath():
+    store = PlanStore()
+    corners = square_area(CENTER, 300)
+
+    for altitude in (50, 25):
+        progress = SearchProgress()
+        progress.start(_add_plan(store))
+        _fly(progress, "1", corners[:2], altitude=altitude, step=50)
+
+        # Swath width scales with the altitude from 50 m at 50 m
+        width = altitude
+        expected = (300 * width + np.pi * width**2 / 4) / 400**2
+        assert progress.coverage == approx(expected, rel=0.03)
+
+
+def test_replanned_paths_keep_coverage():
+    store = PlanStore()
+    progress = SearchProgress()
+    plan = _add_plan(store)
+    progress.start(plan)
+    _fly(progress, "1", plan.paths[0][:4])
+    coverage = progress.coverage
+    assert coverage > 0
+
+    replanned = store.add(
+        plan.kind,
+        plan.paths[::-1],
+        plan.uav_ids,
+        areas=plan.areas,
+        swath_width=plan.swath_width,
+        altitude=plan.altitude,
+    )
+    progress.start(replanned)
+    assert progress.coverage == coverage
+    assert progress.json()["plan"] == replanned.id
+
+    progress.start(_add_plan(store, num_uavs=3))
+    assert progress.coverage == 0.0
+
+
+def test_updates_are_fast():
+    store = PlanStore()
+    progress = SearchProgress()
+    paths = rectangular_lawnmower(CENTER, 5000, 5000, 25, 50)
+    plan = store.add(
+        "search",
+        paths,
+        [str(index) for index in range(50)],
+        areas=[square_area(CENTER, 5000)],
+        swath_width=25,
+        altitude=50,
+    )
+    progress.start(plan)
+
+    # 50 UAVs at 10 Hz for one second
+    positions = [(str(index), *paths[index][0]) for index in range(50)]
+    started_at = perf_counter()
+    for _ in range(10):
+        for uav_id, lon, lat in positions:
+            progress.update(uav_id, lon + 1e-5, lat, 50)
+    assert perf_counter() - started_at < 0.25
@@ -0,0 +1,69 @@
+from pytest import approx
+from time import perf_counter
+
+import numpy as np
+
+from flockwave.server.planning.geodesy import LocalFrame
+from flockwave.server.planning.grid import rectangular_lawnmower
+from flockwave.server.planning.replan import estimate_progress, reassign_remainder
+
+
+def _length(frame, path):
+    x, y = frame.to_local(path[:, 1], path[:, 0])
+    return float(np.hypot(np.diff(x), np.diff(y)).sum())
+
+
+def test_estimate_progress():
+    frame = LocalFrame(13.0, 80.0)
+    lat, lon = frame.to_geo(np.array([0.0, 100.0, 100.0, 0.0]), np.zeros(4))
+    lat = lat + np.array([0, 0, 1e-3, 1e-3])
+    path = np.column_stack((lon, lat))
+
+    assert estimate_progress(path, path[0] - (1e-3, 0)) == 0
+    assert estimate_progress(path, (path[0] + path[1]) / 2) == 1
+    assert estimate_progress(path, (path[2] + path[3]) / 2) == 3
+    assert estimate_progress(path, path[3] - (1e-3, 0)) == 4
+
+
+def test_reassign_remainder_keeps_existing_paths():
+    frame = LocalFrame(13.0, 80.0)
+    paths = rectangular_lawnmower((13.0, 80.0), 800, 800, 50, 4)
+    progress = [6, 6, 6, 6]
+
+    result = reassign_remainder(paths, 1, progress, speed=5.0, max_helpers=2)
+
+    assert set(result.suffixes) == {0, 2}
+    remainder = paths[1][6:]
+    assert result.remainder_length == approx(_length(frame, remainder), rel=1e-6)
+
+    # The pieces together cover the whole remainder
+    covered = sum(_length(frame, suffix) for suffix in result.suffixes.values())
+    assert covered == approx(result.remainder_length, rel=1e-6)
+
+    # Completion times are balanced between the helpers
+    times = list(result.completion_times.values())
+    assert max(times) - min(times) < 1.0
+
+    updated = result.apply(paths)
+    assert len(updated[1]) == 6
+    for index in (0, 2):
+        assert np.array_equal(updated[index][: len(paths[index])], paths[index])
+    assert np.array_equal(updated[3], paths[3])
+
+
+def test_reassign_remainder_with_nothing_left():
+    paths = rectangular_lawnmower((13.0, 80.0), 400, 400, 50, 2)
+    result = reassign_remainder(paths, 0, [len(paths[0]), 0])
+    assert result.is_empty
+
+
+def test_reassign_remainder_is_fast_for_20_uavs():
+    paths = rectangular_lawnmower((13.0, 80.0), 5000, 5000, 20, 20)
+    progress = [len(path) // 3 for path in paths]
+    positions = [path[p] for path, p in zip(paths, progress)]
+
+    start = perf_counter()
+    result = reassign_remainder(paths, 7, progress, positions=positions, max_helpers=19)
+    assert perf_counter() - start < 0.5
+    assert result.suffixes
+    assert 7 not in result.suffixes
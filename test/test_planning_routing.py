@@ -0,0 +1,155 @@
+from pytest import approx
+from shapely import LineString, Point, Polygon
+from time import perf_counter
+
+import numpy as np
+
+from flockwave.server.planning.geodesy import LocalFrame
+from flockwave.server.planning.routing import TransitRouter, get_transit_router
+
+CENTER = (13.0, 80.0)
+
+
+def _lonlat(frame, xy):
+    xy = np.asarray(xy, dtype=float)
+    lat, lon = frame.to_geo(xy[:, 0], xy[:, 1])
+    return np.column_stack((lon, lat))
+
+
+def _local(frame, lonlat):
+    lonlat = np.asarray(lonlat, dtype=float)
+    return np.column_stack(frame.to_local(lonlat[:, 1], lonlat[:, 0]))
+
+
+def _square(frame, x, y, size):
+    half = size / 2
+    return _lonlat(
+        frame,
+        [
+            (x - half, y - half),
+            (x + half, y - half),
+            (x + half, y + half),
+            (x - half, y + half),
+        ],
+    )
+
+
+def test_detour_around_obstacle():
+    frame = LocalFrame(*CENTER)
+    router = TransitRouter([_square(frame, 0, 0, 100)], margin=10)
+
+    start, end = _lonlat(frame, [(-200, 0), (200, 0)])
+    route = _local(frame, router.route(start, end))
+
+    assert route[0] == approx([-200, 0], abs=1e-6)
+    assert route[-1] == approx([200, 0], abs=1e-6)
+    assert len(route) == 4
+    assert np.abs(route[1:-1]) == approx(np.full((2, 2), 60.5), abs=0.1)
+
+    expected = 2 * np.hypot(139.5, 60.5) + 121
+    assert router.distance(start, end) == approx(expected, abs=0.5)
+
+    # Routes that do not cross the obstacle stay straight
+    start, end = _lonlat(frame, [(-200, 100), (200, 100)])
+    assert len(router.route(start, end)) == 2
+
+
+def test_route_stays_inside_concave_boundary():
+    frame = LocalFrame(*CENTER)
+    outline = [(0, 0), (400, 0), (400, 400), (250, 400), (250, 100), (150, 100)]
+    outline += [(150, 400), (0, 400)]
+    boundary = _lonlat(frame, outline)
+    router = TransitRouter([], boundary, margin=10)
+
+    start, end = _lonlat(frame, [(50, 350), (350, 350)])
+    route = _local(frame, router.route(start, end))
+    assert len(route) == 4
+    assert Polygon(outline).buffer(-9.9).contains(LineString(route))
+
+
+def test_route_avoids_random_obstacles():
+    frame = LocalFrame(*CENTER)
+    rng = np.random.default_rng(1)
+    polygons = []
+    for _ in range(20):
+        center = rng.uniform(-1000, 1000, 2)
+        angles = np.sort(rng.uniform(0, 2 * np.pi, 6))
+        radii = rng.uniform(20, 80, 6)
+        polygons.append(
+            center + np.column_stack((np.cos(angles), np.sin(angles))) * radii[:, None]
+        )
+    router = TransitRouter([_lonlat(frame, xy) for xy in polygons], margin=10)
+
+    blocked = [Polygon(xy).buffer(9.9) for xy in polygons]
+    free = [
+        point
+        for point in rng.uniform(-1200, 1200, (200, 2))
+        if not any(poly.contains(Point(point)) for poly in blocked)
+    ]
+    for start, end in zip(free[::2], free[1::2]):
+        route = _local(frame, router.route(*_lonlat(frame, [start, end])))
+        line = LineString(route)
+        assert not any(line.intersects(poly) for poly in blocked)
+
+
+def test_route_path():
+    frame = LocalFrame(*CENTER)
+    router = TransitRouter([_square(frame, 0, 0, 100)], margin=10)
+
+    path = _lonlat(frame, [(-200, 100), (200, 100), (200, 0), (-200, 0)])
+    routed = _local(frame, router.route_path(path))
+
+    assert len(routed) == 6
+    assert routed[:3] == approx(_local(frame, path[:3]), abs=1e-6)
+    assert routed[-1] == approx([-200, 0], abs=1e-6)
+    assert np.abs(routed[3:5]) == approx(np.full((2, 2), 60.5), abs=0.1)
+
+    # Clear paths are returned unchanged
+    path = _lonlat(frame, [(-200, 100), (200, 100)])
+    assert np.array_equal(router.route_path(path), path)
+
+
+def test_route_transit():
+    frame = LocalFrame(*CENTER)
+    router = TransitRouter([_square(frame, 0, 0, 100)], margin=10)
+
+    path = _lonlat(frame, [(200, -100), (200, 100)])
+    home = _lonlat(frame, [(-200, 0)])[0]
+    extended = _local(frame, router.route_transit(path, home))
+
+    # One turning point on the way out below the obstacle, one on the way
+    # back above it
+    assert len(extended) == 4
+    assert extended[1:3] == approx(_local(frame, path), abs=1e-6)
+    assert extended[[0, 3]] == approx(
+        np.array([(-60.5, -60.5), (-60.5, 60.5)]), abs=0.1
+    )
+
+    assert np.array_equal(router.route_transit(path, None), path)
+
+
+def test_router_is_cached():
+    frame = LocalFrame(*CENTER)
+    obstacles = [_square(frame, 0, 0, 100)]
+
+    router = get_transit_router(obstacles)
+    assert get_transit_router([obstacle.copy() for obstacle in obstacles]) is router
+    assert get_transit_router(obstacles, margin=20) is not router
+
+
+def test_queries_are_fast():
+    frame = LocalFrame(*CENTER)
+    rng = np.random.default_rng(2)
+    obstacles = []
+    for _ in range(40):
+        center = rng.uniform(-2000, 2000, 2)
+        obstacles.append(_square(frame, *center, rng.uniform(40, 150)))
+    router = TransitRouter(obstacles, _square(frame, 0, 0, 5000), margin=10)
+
+    points = _lonlat(frame, rng.uniform(-2400, 2400, (200, 2)))
+    router.route(points[0], points[1])
+
+    started_at = perf_counter()
+    for start, end in zip(points[::2], points[1::2]):
+        router.route(start, end)
+    assert (perf_counter() - started_at) / 100 < 0.002
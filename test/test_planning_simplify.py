@@ -0,0 +1,108 @@
+from pytest import approx
+from shapely import LineString, Point
+from time import perf_counter
+
+import numpy as np
+
+from flockwave.server.planning.coverage import square_area
+from flockwave.server.planning.geodesy import LocalFrame
+from flockwave.server.planning.grid import rectangular_lawnmower
+from flockwave.server.planning.simplify import (
+    decode_path,
+    encode_path,
+    simplify_path,
+    simplify_paths,
+)
+
+CENTER = (13.0, 80.0)
+
+
+def _lonlat(frame, xy):
+    xy = np.asarray(xy, dtype=float)
+    lat, lon = frame.to_geo(xy[:, 0], xy[:, 1])
+    return np.column_stack((lon, lat))
+
+
+def _local(frame, lonlat):
+    lonlat = np.asarray(lonlat, dtype=float)
+    return np.column_stack(frame.to_local(lonlat[:, 1], lonlat[:, 0]))
+
+
+def test_collinear_and_duplicate_waypoints_are_removed():
+    frame = LocalFrame(*CENTER)
+    xy = [(0, 0), (50, 0), (50, 0), (100, 0.2), (100.1, 0), (100, 25)]
+    xy += [(60, 25), (0, 25)]
+    simplified = _local(frame, simplify_path(_lonlat(frame, xy), 1.0))
+
+    # Strip endpoints are kept
+    assert simplified == approx(
+        np.array([(0, 0), (100, 0), (100, 25), (0, 25)]), abs=0.2
+    )
+
+
+def test_simplified_path_stays_within_tolerance():
+    frame = LocalFrame(*CENTER)
+    angles = np.linspace(0, np.pi, 1000)
+    xy = np.column_stack((np.cos(angles), np.sin(angles))) * 200
+    path = _lonlat(frame, xy)
+
+    for tolerance in (0.5, 2.0):
+        simplified = simplify_path(path, tolerance)
+        assert len(simplified) < 100
+        assert simplified[[0, -1]] == approx(path[[0, -1]])
+
+        line = LineString(_local(frame, simplified))
+        distances = [line.distance(Point(p)) for p in xy[::10]]
+        assert max(distances) <= tolerance + 1e-6
+
+
+def test_lawnmower_corners_are_preserved():
+    paths = rectangular_lawnmower(CENTER, 1000, 1000, 50, 2)
+
+    # Densify the rows the way the sweep line fragments do
+    dense = []
+    for path in paths:
+        points = [path[0]]
+        for start, end in zip(path[:-1], path[1:]):
+            for t in np.linspace(0, 1, 6)[1:]:
+                points.append(start + (end - start) * t)
+        dense.append(np.array(points))
+
+    result = simplify_paths(dense, 1.0)
+    for original, simplified in zip(paths, result.paths):
+        assert simplified == approx(original, abs=1e-9)
+
+    assert result.num_removed == sum(len(path) for path in dense) - sum(
+        len(path) for path in paths
+    )
+    json = result.json()
+    assert json["removed"] == result.num_removed
+    assert json["original"] == json["simplified"] + json["removed"]
+    assert sum(json["removedPerPath"]) == json["removed"]
+
+
+def test_short_paths():
+    assert simplify_path([]).shape == (0, 2)
+    assert len(simplify_path([(80.0, 13.0)])) == 1
+    assert len(simplify_path([(80.0, 13.0), (80.0, 13.0)])) == 2
+
+
+def test_delta_encoding():
+    path = square_area(CENTER, 300)
+    encoded = encode_path(path)
+    assert all(isinstance(value, int) for value in encoded)
+    assert encoded[:2] == [round(path[0, 0] * 1e7), round(path[0, 1] * 1e7)]
+    assert max(abs(value) for value in encoded[2:]) < 1e5
+    assert decode_path(encoded) == approx(path, abs=1e-7)
+    assert decode_path(encode_path([])).shape == (0, 2)
+
+
+def test_simplification_is_fast():
+    paths = rectangular_lawnmower(CENTER, 5000, 5000, 10, 4)
+    dense = [np.repeat(path, 3, axis=0) for path in paths]
+    simplify_paths(dense)
+
+    started_at = perf_counter()
+    result = simplify_paths(dense)
+    assert perf_counter() - started_at < 0.2
+    assert result.num_removed >= 2 * sum(len(path) for path in paths)
@@ -0,0 +1,53 @@
+from pytest import raises
+
+from flockwave.server.planning import PlanStore, path_to_csv, path_to_kml
+
+
+def test_plan_store_add_and_find():
+    store = PlanStore(max_plans=2)
+    added = []
+
+    def on_added(sender, plan):
+        added.append(plan)
+
+    store.added.connect(on_added, sender=store)
+
+    first = store.add("search", [[(80.0, 13.0), (80.1, 13.0)], []])
+    assert first.num_paths == 2
+    assert first.num_waypoints == 2
+    assert first.paths[0].shape == (2, 2)
+    assert first.paths[1].shape == (0, 2)
+    assert store.find_by_id(first.id) is first
+    assert store.find_by_id("latest") is first
+
+    second = store.add("split", [[(80.0, 13.0)]])
+    third = store.add("split", [[(80.0, 13.0)]])
+    assert len(store) == 2
+    assert first.id not in store
+    assert store.latest is third
+    assert added == [first, second, third]
+
+    with raises(KeyError):
+        store.find_by_id(first.id)
+
+    with raises(ValueError):
+        store.add("search", [[1.0, 2.0, 3.0]])
+
+
+def test_plan_store_latest_on_empty_store():
+    store = PlanStore()
+    assert store.latest is None
+    with raises(KeyError):
+        store.find_by_id("latest")
+
+
+def test_path_exports():
+    store = PlanStore()
+    plan = store.add("search", [[(80.25, 13.5), (80.5, 13.75)]])
+
+    assert path_to_csv(plan.paths[0]) == "lat,lon\n13.5,80.25\n13.75,80.5\n"
+
+    kml = path_to_kml(plan.paths[0], name="Drone path 1")
+    assert kml.count("<Point>") == 2
+    assert "80.25000000,13.50000000 80.50000000,13.75000000" in kml
+    assert "<name>2</name>" in kml
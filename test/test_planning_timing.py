@@ -0,0 +1,80 @@
+from math import pi
+from pytest import approx
+from time import perf_counter
+
+import numpy as np
+
+from flockwave.server.planning.geodesy import LocalFrame
+from flockwave.server.planning.grid import rectangular_lawnmower
+from flockwave.server.planning.timing import (
+    FlightModel,
+    estimate_mission_time,
+    estimate_path_time,
+)
+
+
+def _path(frame, xs, ys):
+    lat, lon = frame.to_geo(np.asarray(xs, float), np.asarray(ys, float))
+    return np.column_stack((lon, lat))
+
+
+def test_straight_path():
+    frame = LocalFrame(13.0, 80.0)
+    path = _path(frame, [0, 500, 1000], [0, 0, 0])
+
+    time, distance = estimate_path_time(path, FlightModel(cruise_speed=5.0))
+    assert distance == approx(1000, rel=1e-6)
+    assert time == approx(200, rel=1e-6)
+
+
+def test_multirotor_u_turn_costs_a_full_stop():
+    frame = LocalFrame(13.0, 80.0)
+    path = _path(frame, [0, 100, 100, 0], [0, 0, 20, 20])
+    model = FlightModel(cruise_speed=5.0, acceleration=1.0)
+
+    time, distance = estimate_path_time(path, model)
+    assert distance == approx(220, rel=1e-6)
+
+    # Two right-angle turns, each slowing down to half the cruise speed
+    assert time == approx(220 / 5 + 2 * 2.5**2 / 5, rel=1e-6)
+
+
+def test_fixed_wing_turns_and_climb():
+    frame = LocalFrame(13.0, 80.0)
+    path = _path(frame, [0, 100, 100], [0, 0, 100])
+    model = FlightModel(cruise_speed=20.0, turn_radius=50.0, climb_rate=2.0)
+
+    time, _ = estimate_path_time(path, model, altitude=100)
+    turn = 50 * (pi / 2 - 2 * np.sin(pi / 4))
+    assert time == approx(200 / 20 + turn / 20 + 50, rel=1e-6)
+
+
+def test_transit_from_home():
+    frame = LocalFrame(13.0, 80.0)
+    path = _path(frame, [0, 100], [0, 0])
+    home = _path(frame, [-300], [0])[0]
+
+    time, distance = estimate_path_time(path, FlightModel(cruise_speed=5.0), home=home)
+    assert distance == approx(400, rel=1e-6)
+    assert time == approx(80, rel=1e-6)
+
+
+def test_mission_estimate():
+    paths = rectangular_lawnmower((13.0, 80.0), 1000, 1000, 50, 4)
+    paths[3] = paths[3][:4]
+
+    estimate = estimate_mission_time(paths, altitude=60)
+    assert len(estimate.times) == 4
+    assert estimate.makespan == approx(estimate.times[:3].max())
+    assert estimate.times[3] < estimate.times[0]
+    assert estimate.json()["makespan"] == approx(estimate.makespan, abs=0.1)
+
+    assert estimate_mission_time([]).makespan == 0.0
+
+
+def test_mission_estimate_is_fast():
+    paths = rectangular_lawnmower((13.0, 80.0), 5000, 5000, 10, 8)
+
+    started_at = perf_counter()
+    estimate_mission_time(paths, altitude=60)
+    assert perf_counter() - started_at < 0.05
@@ -0,0 +1,24 @@
+from pytest import importorskip, mark
+
+# Packages that must not be imported when the server starts up; they are
+# needed only by the planners and are loaded on first use
+LAZY_PACKAGES = ("geopy", "matplotlib", "scipy", "shapely", "simplekml", "sympy")
+
+
+@mark.parametrize(
+    "module,budget_ms",
+    [("flockwave.server.swarm", 500), ("flockwave.server.app", 3000)],
+)
+def test_startup_time_budget(module, budget_ms):
+    startup = importorskip("flockwave.server.utils.startup")
+    if module == "flockwave.server.app":
+        importorskip("flockwave.app_framework")
+
+    records = startup.measure_import_times(module)
+    loaded = {record.package for record in records}
+    assert not loaded.intersection(LAZY_PACKAGES)
+
+    total_us = max(r.cumulative_us for r in records if r.module == module)
+    assert total_us < budget_ms * 1000, startup.format_import_time_report(
+        records, module
+    )
@@ -0,0 +1,91 @@
+from pytest import approx, raises
+
+import numpy as np
+
+from flockwave.server.latlon2xy import geoToCart
+from flockwave.server.YamlCreation import (
+    FenceToYAML,
+    fence_geometry_hash,
+    fence_to_yaml,
+)
+
+
+OUTER = [
+    [13.079819155564664, 78.9954979229914],
+    [12.504506464230573, 78.79522115056197],
+    [12.290696013318666, 79.38863392227263],
+    [12.77604374599403, 79.42572221608327],
+]
+INNER = [
+    [12.602293129009254, 79.2514071361368],
+    [12.537106054529474, 79.17723054851551],
+    [12.493639019394095, 79.25511597966594],
+]
+
+
+def test_geo_to_cart_matches_interpolation():
+    fence_yaml = FenceToYAML(fence_coordinates=[INNER, OUTER], labels=[None, "outer"])
+    origin = fence_yaml.compute_origin()
+
+    rng = np.random.default_rng(42)
+    points = np.column_stack((rng.uniform(12.2, 13.2, 50), rng.uniform(78.7, 79.5, 50)))
+    xy = fence_yaml.geo_to_cart_array(points)
+    expected = [geoToCart(origin, 500000, tuple(point)) for point in points]
+    assert xy == approx(np.array(expected, dtype=float), abs=1e-6)
+
+    assert fence_yaml.geoToCart(points[0]) == approx(tuple(map(float, expected[0])))
+
+    with raises(ValueError):
+        fence_yaml.geo_to_cart_array([[20.0, 79.0]])
+
+
+def test_process_fences():
+    fence_yaml = FenceToYAML(fence_coordinates=[INNER, OUTER], labels=[None, "outer"])
+    obstacles = fence_yaml.process_fences()
+
+    # Four boundary quads between the outer fence and its buffer, followed
+    # by the inner fence
+    assert [len(obstacle) for obstacle in obstacles] == [4, 4, 4, 4, 3]
+    expected = [fence_yaml.geoToCart(point) for point in INNER]
+    assert obstacles[4] == approx(np.array(expected) / 2)
+
+    # Boundaries share their corners with the outer fence
+    outer_xy = fence_yaml.geo_to_cart_array(OUTER) / 2
+    assert obstacles[0][0] == approx(outer_xy[1])
+    assert obstacles[0][3] == approx(outer_xy[2])
+    assert obstacles[3][0] == approx(outer_xy[0])
+
+    size_x, size_y, shifted = fence_yaml.compute_size_and_shift()
+    all_points = np.concatenate(obstacles)
+    assert size_x == round(np.ptp(all_points[:, 0]) + 1)
+    assert size_y == round(np.ptp(all_points[:, 1]) + 1)
+    assert len(shifted) == len(obstacles)
+
+
+def test_fence_to_yaml_is_cached():
+    calls = []
+
+    def convert(fences, labels):
+        calls.append(fences)
+        return (len(calls), 0), f"yaml {len(calls)}"
+
+    first = fence_to_yaml([INNER, OUTER], [None, "outer"], convert=convert)
+    again = fence_to_yaml(
+        [list(map(list, INNER)), OUTER], [None, "outer"], convert=convert
+    )
+    assert first == again
+    assert len(calls) == 1
+
+    moved = [[lat + 1e-6, lon] for lat, lon in INNER]
+    assert fence_to_yaml([moved, OUTER], [None, "outer"], convert=convert) != first
+    assert len(calls) == 2
+
+    relabelled = fence_to_yaml([moved, OUTER], ["inner", "outer"], convert=convert)
+    assert relabelled[1] == "yaml 3"
+
+
+def test_fence_geometry_hash():
+    key = fence_geometry_hash([INNER, OUTER], [None, "outer"])
+    assert key == fence_geometry_hash([tuple(INNER), OUTER], [None, "outer"])
+    assert key != fence_geometry_hash([OUTER, INNER], [None, "outer"])
+    assert key != fence_geometry_hash([INNER, OUTER], ["outer", None])